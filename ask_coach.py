@@ -38,6 +38,22 @@ def build_chat_history(messages: Iterable, max_age_days: int = 14) -> str:
     return "\n".join(out)
 
 
+CHAT_RESPONSE_RULES = """ZASADY ODPOWIEDZI:
+- Pisz naturalnie, jak realny trener w rozmowie 1:1. Nie brzmisz jak sztywny formularz.
+- Najpierw odpowiedz bezpośrednio na pytanie użytkownika (2-6 krótkich zdań), dopiero potem ewentualne wskazówki.
+- Nie używaj stałego szablonu nagłówków w każdej odpowiedzi. To ma być konwersacja, nie raport.
+- Jeśli użytkownik pyta o <konkretny trening/plan tygodnia>, wtedy użyj lekkiej struktury:
+  <b>Plan</b>, <b>Dlaczego</b>, <b>Na podstawie czego</b>, <b>Na co uważać</b>.
+- Jeśli użytkownik pyta ogólnie (motywacja, sens planu, regeneracja, ból, technika), odpowiadaj po ludzku bez formalnych sekcji.
+- Uzasadniaj rekomendacje faktami z kontekstu, ale wplecionymi naturalnie (1-3 najważniejsze fakty, bez długiej listy).
+- Respektuj pole <STYL TRENERA> z profilu (concise/motivating/technical/balanced), ale nadal odpowiadaj ludzko i jasno.
+- Gdy ma to sens, odnieś odpowiedź do celu i fazy przygotowania (base/build/taper/post-race), ale tylko jeśli pomaga zrozumieć odpowiedź.
+- Jeśli brakuje krytycznej informacji, zadaj maksymalnie 1 krótkie pytanie doprecyzowujące.
+- Używaj prostego HTML tylko gdy pomaga czytelności (<b>, <br>, opcjonalnie <ul><li>). Bez Markdown.
+- Unikaj powtórzeń, sztucznego tonu i klisz typu "na podstawie wskazane regularne elementy".
+"""
+
+
 def build_chat_prompt(
     *,
     today_iso: str,
@@ -77,17 +93,63 @@ KONTEKST CELU (JSON):
 NOWE PYTANIE:
 {user_msg}
 
-ZASADY ODPOWIEDZI:
-- Pisz naturalnie, jak realny trener w rozmowie 1:1. Nie brzmisz jak sztywny formularz.
-- Najpierw odpowiedz bezpośrednio na pytanie użytkownika (2-6 krótkich zdań), dopiero potem ewentualne wskazówki.
-- Nie używaj stałego szablonu nagłówków w każdej odpowiedzi. To ma być konwersacja, nie raport.
-- Jeśli użytkownik pyta o <konkretny trening/plan tygodnia>, wtedy użyj lekkiej struktury:
-  <b>Plan</b>, <b>Dlaczego</b>, <b>Na podstawie czego</b>, <b>Na co uważać</b>.
-- Jeśli użytkownik pyta ogólnie (motywacja, sens planu, regeneracja, ból, technika), odpowiadaj po ludzku bez formalnych sekcji.
-- Uzasadniaj rekomendacje faktami z kontekstu, ale wplecionymi naturalnie (1-3 najważniejsze fakty, bez długiej listy).
-- Respektuj pole <STYL TRENERA> z profilu (concise/motivating/technical/balanced), ale nadal odpowiadaj ludzko i jasno.
-- Gdy ma to sens, odnieś odpowiedź do celu i fazy przygotowania (base/build/taper/post-race), ale tylko jeśli pomaga zrozumieć odpowiedź.
-- Jeśli brakuje krytycznej informacji, zadaj maksymalnie 1 krótkie pytanie doprecyzowujące.
-- Używaj prostego HTML tylko gdy pomaga czytelności (<b>, <br>, opcjonalnie <ul><li>). Bez Markdown.
-- Unikaj powtórzeń, sztucznego tonu i klisz typu "na podstawie wskazane regularne elementy".
+{CHAT_RESPONSE_RULES}"""
+
+
+# Kolejność sekcji kontekstu w trybie sesji (ta sama co w pełnym prompcie).
+CHAT_CONTEXT_SECTIONS = (
+    ("profile_state", None),
+    ("weekly_agg", None),
+    ("recent_details", None),
+    ("recent_checkins", None),
+    ("execution_context", None),
+    ("checkin_signals", "SYGNAŁY CHECK-IN (JSON):"),
+    ("goal_context", "KONTEKST CELU (JSON):"),
+)
+
+
+def _render_context_sections(sections: dict) -> str:
+    parts = []
+    for key, header in CHAT_CONTEXT_SECTIONS:
+        if key not in sections:
+            continue
+        body = sections.get(key) or ""
+        parts.append(f"{header}\n{body}" if header else body)
+    return "\n\n".join(parts)
+
+
+def build_chat_session_system(language_rule: str) -> str:
+    """Instrukcja systemowa sesji czatu: rola + zasady (stała przez całe okno rozmowy)."""
+    return f"""Jesteś doświadczonym trenerem sportowym.
+Na początku rozmowy dostajesz kontekst zawodnika. Później dostajesz tylko nowe wiadomości
+i ewentualnie AKTUALIZACJĘ KONTEKSTU — zastępuje ona odpowiadające sekcje z początku rozmowy.
+
+{CHAT_RESPONSE_RULES}
+{language_rule}
+"""
+
+
+def build_chat_session_opening(*, today_iso: str, sections: dict, chat_history: str, user_msg: str) -> str:
+    """Pierwsza wiadomość sesji: pełny kontekst warstwowy + historia sprzed okna + pytanie."""
+    return f"""DZIŚ: {today_iso}
+
+KONTEKST (warstwowo, nie pełna baza):
+{_render_context_sections(sections)}
+
+{chat_history}
+
+NOWE PYTANIE:
+{user_msg}
+"""
+
+
+def build_chat_session_turn(*, changed_sections: dict, user_msg: str) -> str:
+    """Kolejna wiadomość sesji: tylko zmienione sekcje kontekstu (jeśli są) + pytanie."""
+    if not changed_sections:
+        return user_msg
+    return f"""AKTUALIZACJA KONTEKSTU (zastępuje wcześniejsze wersje tych sekcji):
+{_render_context_sections(changed_sections)}
+
+NOWE PYTANIE:
+{user_msg}
 """
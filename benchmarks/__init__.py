@@ -0,0 +1 @@
+"""Syntetyczne dane i benchmarki ścieżek krytycznych (python -m benchmarks.run)."""
@@ -0,0 +1,232 @@
+"""Benchmark przepustowości importu archiwów Garmin / Strava na syntetycznych eksportach.
+
+    python -m benchmarks.import_bench --activities 1000 --fit-ratio 1.0
+    python -m benchmarks.import_bench --only garmin --activities 3000 --record-interval 1
+
+Każdy scenariusz idzie w osobnym procesie, żeby szczytowe RSS (ru_maxrss) dotyczyło
+tylko tego importu. Raport: aktywności/s, pliki FIT/s (cały import i sama faza FIT),
+szczytowe RSS, pamięć per faza importu (ImportMemoryTracker), liczba zapytań SQL
+(+ najczęstsze odciski), osobno dla pierwszego importu i ponownego importu tego samego
+archiwum. --memory-limit-mb sprawdza, czy import przerywa się czysto po przekroczeniu limitu.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def _rss_mb_now() -> float | None:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024, 1)
+    except Exception:
+        return None
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KB, macOS: bajty
+    return round(peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def run_child(kind: str, archive_path: str, db_path: str, memory_limit_mb: float = 0.0) -> dict:
+    """Uruchamiane w procesie potomnym: import archiwum do świeżej bazy i pomiar."""
+    os.environ["DATABASE_URL"] = "sqlite:///" + db_path
+    os.environ.setdefault("REQUEST_METRICS_LOG", "0")
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+
+    import app as appmod
+    import importers
+    from instrumentation import query_budget
+    from models import User
+    from werkzeug.security import generate_password_hash
+
+    fit_phase = {"seconds": 0.0, "payloads": 0}
+    original_index = importers._build_fit_payload_index
+
+    def _timed_fit_index(z, **kwargs):
+        t0 = time.perf_counter()
+        payloads, minute_index = original_index(z, **kwargs)
+        fit_phase["seconds"] += time.perf_counter() - t0
+        fit_phase["payloads"] += len(payloads)
+        return payloads, minute_index
+
+    importers._build_fit_payload_index = _timed_fit_index
+    importer = importers.import_garmin_zip_for_user if kind == "garmin" else importers.import_strava_zip_for_user
+
+    with appmod.app.app_context():
+        appmod.db.create_all()
+        user = User(email=f"import-{kind}@example.com", password_hash=generate_password_hash("x"))
+        appmod.db.session.add(user)
+        appmod.db.session.commit()
+        user_id = user.id
+
+        with open(archive_path, "rb") as f:
+            detected = importers.detect_activity_archive_type(f)
+
+        baseline_rss = _rss_mb_now()
+        runs = {}
+        for label in ("first", "reimport"):
+            fit_phase["seconds"], fit_phase["payloads"] = 0.0, 0
+            memory = importers.ImportMemoryTracker(limit_mb=memory_limit_mb)
+            with open(archive_path, "rb") as f, query_budget() as tracker:
+                t0 = time.perf_counter()
+                try:
+                    added, skipped = importer(f, user_id, memory=memory)
+                except importers.ImportMemoryLimitExceeded as e:
+                    appmod.db.session.rollback()
+                    runs[label] = {"aborted": str(e), "memory_phases": memory.phases, "peak_rss_mb": _peak_rss_mb()}
+                    break
+                finally:
+                    memory.close()
+                elapsed = time.perf_counter() - t0
+            processed = added + skipped
+            top = sorted(tracker.fingerprints.items(), key=lambda x: -x[1])[:3]
+            runs[label] = {
+                "seconds": round(elapsed, 3),
+                "added": added,
+                "skipped": skipped,
+                "activities_per_s": round(processed / elapsed, 1) if elapsed else None,
+                "fit_files": fit_phase["payloads"],
+                "fit_phase_seconds": round(fit_phase["seconds"], 3),
+                "fit_files_per_s": round(fit_phase["payloads"] / fit_phase["seconds"], 1) if fit_phase["seconds"] else None,
+                "sql_statements": tracker.total,
+                "sql_top": [{"count": cnt, "statement": fp[:160]} for fp, cnt in top],
+                "peak_rss_mb": _peak_rss_mb(),
+                "memory_phases": memory.phases,
+            }
+
+    return {
+        "kind": kind,
+        "detected_type": detected,
+        "archive_bytes": os.path.getsize(archive_path),
+        "baseline_rss_mb": baseline_rss,
+        "runs": runs,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--activities", type=int, default=1000)
+    parser.add_argument("--fit-ratio", type=float, default=1.0, help="udział aktywności z plikiem FIT")
+    parser.add_argument("--record-interval", type=int, default=5, help="co ile sekund rekord w FIT")
+    parser.add_argument("--wellness-days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--only", choices=("garmin", "strava"), default=None)
+    parser.add_argument("--keep", action="store_true", help="zostaw wygenerowane archiwa")
+    parser.add_argument("--memory-limit-mb", type=float, default=0.0, help="limit RSS importu (0 = bez limitu)")
+    parser.add_argument("--out", default="")
+    parser.add_argument("--child", nargs=4, metavar=("KIND", "ARCHIVE", "DB", "LIMIT"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        kind, archive, db_path, limit = args.child
+        print(json.dumps(run_child(kind, archive, db_path, float(limit))))
+        return 0
+
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+    from benchmarks.synthetic_exports import build_garmin_export, build_strava_export, synthetic_activities
+
+    workdir = tempfile.mkdtemp(prefix="import-bench-")
+    activities = synthetic_activities(args.activities, seed=args.seed)
+    scenarios = {}
+
+    kinds = [args.only] if args.only else ["garmin", "strava"]
+    for kind in kinds:
+        archive = os.path.join(workdir, f"{kind}.zip")
+        t0 = time.perf_counter()
+        if kind == "garmin":
+            build_stats = build_garmin_export(
+                archive,
+                activities,
+                fit_ratio=args.fit_ratio,
+                wellness_days=args.wellness_days,
+                record_interval_s=args.record_interval,
+                seed=args.seed,
+            )
+        else:
+            build_stats = build_strava_export(archive, activities)
+        build_stats["build_seconds"] = round(time.perf_counter() - t0, 2)
+
+        db_path = os.path.join(workdir, f"{kind}.db")
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.import_bench", "--child", kind, archive, db_path, str(args.memory_limit_mb)],
+            cwd=REPO_DIR,
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            print(proc.stderr, file=sys.stderr)
+            return proc.returncode
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        result["archive"] = build_stats
+        scenarios[kind] = result
+
+        for label, r in result["runs"].items():
+            if r.get("aborted"):
+                print(f"{kind:<7} {label:<9} przerwany: {r['aborted']}")
+                continue
+            fit_rate = f"{r['fit_files_per_s']:.1f}/s" if r["fit_files_per_s"] else "-"
+            print(
+                f"{kind:<7} {label:<9} {r['seconds']:>8.2f} s  {r['activities_per_s'] or 0:>8.1f} act/s"
+                f"  FIT {r['fit_files']:>5} ({fit_rate})  sql {r['sql_statements']:>6}  peak RSS {r['peak_rss_mb']} MB"
+            )
+            for p in r["memory_phases"]:
+                print(f"          {p['phase']:<17} peak {p['peak_mb']:>7} MB  retained {p['retained_mb']:>7} MB  {p['seconds']:>7.2f} s")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {
+                "activities": args.activities,
+                "fit_ratio": args.fit_ratio,
+                "record_interval_s": args.record_interval,
+                "wellness_days": args.wellness_days,
+                "seed": args.seed,
+                "memory_limit_mb": args.memory_limit_mb,
+            },
+        },
+        "scenarios": scenarios,
+    }
+    try:
+        report["meta"]["git_commit"] = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        report["meta"]["git_commit"] = None
+
+    out = args.out or os.path.join(
+        REPO_DIR, "benchmarks", "results", f"import-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nzapisano: {out}")
+
+    if not args.keep:
+        for name in os.listdir(workdir):
+            os.remove(os.path.join(workdir, name))
+        os.rmdir(workdir)
+    else:
+        print(f"archiwa: {workdir}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,440 @@
+"""Test obciążeniowy: realistyczne sesje użytkowników na lokalnie uruchomionym serwerze.
+
+    python -m benchmarks.load_test --users 16 --levels 1,2,4,8,16 --duration 30
+    python -m benchmarks.load_test --reuse-db --levels 8,16,32 --think-ms 0 --max-p95-ms 500
+
+Dane: syntetyczni zawodnicy z benchmarks.synthetic_data (load-<n>@example.com), AI
+zastąpione stubami z benchmarks.run. Serwer (werkzeug, wątkowy) startuje w osobnym
+procesie na tej samej bazie SQLite; klienci to wątki z własnymi ciasteczkami, każdy
+powtarza losowe sesje z mieszanki SCENARIOS (logowanie, panel, przełączanie zakresów
+metryk, czat, odświeżenie i przesuwanie planu, ręczne dodanie treningu, check-in).
+
+Dla każdego poziomu współbieżności raport podaje przepustowość oraz p50/p95/p99 i błędy
+per endpoint, a na końcu najwyższy poziom, który mieści się w --max-p95-ms bez błędów —
+czyli ilu aktywnych użytkowników uniesie jedna instancja na SQLite.
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_DB = os.path.join(REPO_DIR, "benchmarks", "load.db")
+EMAIL_TEMPLATE = "load-{}@example.com"
+
+# (nazwa, waga w mieszance sesji)
+SCENARIOS = (
+    ("browse", 0.40),
+    ("coach", 0.20),
+    ("plan", 0.20),
+    ("log", 0.20),
+)
+
+
+# -------------------- klient HTTP --------------------
+
+class _Client:
+    """Minimalny klient z ciasteczkami i pamięcią ETagów (jeden na wirtualnego użytkownika).
+
+    Jak przeglądarka: GET wysyła If-None-Match z ostatnim ETagiem dla tego adresu.
+    """
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.cookies: dict[str, str] = {}
+        self.etags: dict[str, str] = {}
+
+    def request(self, method: str, path: str, *, form: dict | None = None, json_body: dict | None = None) -> tuple[int, bytes]:
+        headers = {}
+        body = None
+        if form is not None:
+            body = urlencode(form).encode("utf-8")
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        elif json_body is not None:
+            body = json.dumps(json_body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+        if method == "GET" and path in self.etags:
+            headers["If-None-Match"] = self.etags[path]
+
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            data = resp.read()
+            for header in resp.headers.get_all("Set-Cookie") or []:
+                jar = SimpleCookie()
+                jar.load(header)
+                for name, morsel in jar.items():
+                    self.cookies[name] = morsel.value
+            if method == "GET" and resp.headers.get("ETag"):
+                self.etags[path] = resp.headers["ETag"]
+            return resp.status, data
+        finally:
+            conn.close()
+
+
+# -------------------- sesje --------------------
+
+class _Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.error_examples: dict[str, str] = {}
+
+    def add(self, endpoint: str, ms: float, error: str | None) -> None:
+        with self.lock:
+            self.samples.setdefault(endpoint, []).append(ms)
+            if error:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+                self.error_examples.setdefault(endpoint, error)
+
+
+class _VirtualUser:
+    def __init__(self, client: _Client, email: str, password: str, recorder: _Recorder,
+                 rng: random.Random, think_ms: float, deadline: float):
+        self.client = client
+        self.email = email
+        self.password = password
+        self.recorder = recorder
+        self.rng = rng
+        self.think_ms = think_ms
+        self.deadline = deadline
+
+    def _think(self) -> None:
+        if self.think_ms > 0:
+            time.sleep(self.think_ms * self.rng.uniform(0.5, 1.5) / 1000.0)
+
+    def call(self, endpoint: str, method: str, path: str, *, expect=(200,), **kwargs) -> bytes | None:
+        if time.perf_counter() >= self.deadline:
+            return None
+        t0 = time.perf_counter()
+        error = None
+        data = b""
+        try:
+            status, data = self.client.request(method, path, **kwargs)
+            if status not in expect and not (method == "GET" and status == 304):
+                error = f"HTTP {status}"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        self.recorder.add(endpoint, (time.perf_counter() - t0) * 1000.0, error)
+        self._think()
+        return None if error else data
+
+    # Każda sesja zaczyna się od logowania — tak jak nowa wizyta w aplikacji.
+    def login(self) -> None:
+        self.client.cookies.clear()
+        self.call("login", "POST", "/login", form={"email": self.email, "password": self.password}, expect=(302,))
+
+    def browse(self) -> None:
+        self.call("dashboard", "GET", "/")
+        # Jak przeglądarka: powłoka /metrics raz, potem serie dla przełączanych zakresów
+        # (rozdzielczość jak seriesResolution w metrics.html).
+        ranges = self.rng.sample((7, 30, 90, 365), k=3)
+        self.call("metrics_shell", "GET", f"/metrics?days={ranges[0]}")
+        for days in ranges:
+            resolution = "week" if days > 90 else "day"
+            self.call(f"metrics_{days}d", "GET", f"/api/metrics/series?days={days}&resolution={resolution}")
+        self.call("dashboard", "GET", "/")
+
+    def coach(self) -> None:
+        from benchmarks.synthetic_data import CHAT_PROMPTS
+
+        self.call("dashboard", "GET", "/")
+        self.call("chat_history", "GET", "/api/chat/history")
+        for _ in range(self.rng.randint(1, 3)):
+            self.call("chat", "POST", "/api/chat", json_body={"message": self.rng.choice(CHAT_PROMPTS)})
+
+    def plan(self) -> None:
+        self.call("dashboard", "GET", "/")
+        engine = self.rng.choice(("local", "ai"))
+        path = "/api/forecast?engine=local" if engine == "local" else "/api/forecast"
+        self.call(f"forecast_{engine}", "GET", path)
+        today = date.today()
+        # Zamiana dni w obrębie bieżącego tygodnia — zbiór dat planu zostaje ten sam.
+        if today.weekday() < 6:
+            offset = self.rng.randint(1, 6 - today.weekday())
+            self.call("plan_move", "POST", "/api/plan/move", json_body={
+                "from_date": today.isoformat(),
+                "to_date": (today + timedelta(days=offset)).isoformat(),
+            })
+        self.call("dashboard", "GET", "/")
+
+    def log(self) -> None:
+        self.call("dashboard", "GET", "/")
+        now = datetime.now() - timedelta(minutes=self.rng.randint(0, 60 * 24 * 7))
+        self.call("activity_manual", "POST", "/activity/manual", expect=(302,), form={
+            "activity_type": self.rng.choice(("run", "ride", "swim", "weighttraining")),
+            "date": now.strftime("%Y-%m-%d"),
+            "time": now.strftime("%H:%M"),
+            "duration_min": str(self.rng.randint(25, 90)),
+            "distance_km": f"{self.rng.uniform(3, 20):.1f}",
+            "avg_hr": str(self.rng.randint(120, 165)),
+            "notes": "load test",
+        })
+        self.call("checkin", "POST", "/checkin", expect=(302,), form={
+            "checkin_text": "Nogi ciężkie, ale tempo ok.",
+        })
+        self.call("dashboard", "GET", "/")
+
+    def run(self) -> int:
+        names = [name for name, _ in SCENARIOS]
+        weights = [w for _, w in SCENARIOS]
+        sessions = 0
+        while time.perf_counter() < self.deadline:
+            self.login()
+            getattr(self, self.rng.choices(names, weights=weights, k=1)[0])()
+            sessions += 1
+        return sessions
+
+
+# -------------------- serwer --------------------
+
+def serve(db_path: str, port: int) -> None:
+    """Uruchamiane w procesie potomnym: aplikacja ze stubami AI na werkzeug (wątkowo)."""
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.abspath(db_path)
+    os.environ.setdefault("REQUEST_METRICS_LOG", "0")
+    os.environ.setdefault("QUERY_DETECTOR", "0")
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+
+    import logging
+
+    from werkzeug.serving import make_server
+
+    import app as appmod
+    from benchmarks.run import install_ai_stubs
+
+    install_ai_stubs()
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    make_server("127.0.0.1", port, appmod.app, threaded=True).serve_forever()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(port: int, proc: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"serwer zakończył się (kod {proc.returncode})")
+        try:
+            status, _ = _Client("127.0.0.1", port, 2.0).request("GET", "/login")
+            if status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("serwer nie wystartował w czasie")
+
+
+# -------------------- raport --------------------
+
+def run_level(port: int, concurrency: int, users: int, password: str, duration: float,
+              think_ms: float, timeout: float, seed: int) -> dict:
+    from benchmarks.run import _percentile
+
+    recorder = _Recorder()
+    deadline = time.perf_counter() + duration
+    sessions = [0] * concurrency
+
+    def _worker(i: int) -> None:
+        vu = _VirtualUser(
+            _Client("127.0.0.1", port, timeout),
+            EMAIL_TEMPLATE.format(i % users),
+            password,
+            recorder,
+            random.Random(seed * 1000 + concurrency * 100 + i),
+            think_ms,
+            deadline,
+        )
+        sessions[i] = vu.run()
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=_worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    endpoints = {}
+    all_samples = []
+    for name, samples in sorted(recorder.samples.items()):
+        all_samples.extend(samples)
+        endpoints[name] = {
+            "count": len(samples),
+            "errors": recorder.errors.get(name, 0),
+            "p50_ms": round(_percentile(samples, 50), 1),
+            "p95_ms": round(_percentile(samples, 95), 1),
+            "p99_ms": round(_percentile(samples, 99), 1),
+            "max_ms": round(max(samples), 1),
+        }
+        if name in recorder.error_examples:
+            endpoints[name]["error_example"] = recorder.error_examples[name]
+
+    total_errors = sum(recorder.errors.values())
+    return {
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 2),
+        "sessions": sum(sessions),
+        "requests": len(all_samples),
+        "errors": total_errors,
+        "requests_per_s": round(len(all_samples) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(_percentile(all_samples, 50), 1),
+        "p95_ms": round(_percentile(all_samples, 95), 1),
+        "p99_ms": round(_percentile(all_samples, 99), 1),
+        "endpoints": endpoints,
+    }
+
+
+def _print_level(res: dict) -> None:
+    print(
+        f"\n== {res['concurrency']} równoległych użytkowników: {res['requests']} żądań"
+        f" ({res['requests_per_s']}/s), {res['sessions']} sesji, błędy {res['errors']},"
+        f" p50 {res['p50_ms']} / p95 {res['p95_ms']} / p99 {res['p99_ms']} ms"
+    )
+    for name, r in res["endpoints"].items():
+        err = f"  ({r['error_example']})" if r.get("error_example") else ""
+        print(
+            f"  {name:<18} n {r['count']:>6}  p50 {r['p50_ms']:>8.1f}  p95 {r['p95_ms']:>8.1f}"
+            f"  p99 {r['p99_ms']:>8.1f} ms  err {r['errors']:>4}{err}"
+        )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=16, help="liczba syntetycznych kont")
+    parser.add_argument("--years", type=float, default=1.0, help="historia na konto")
+    parser.add_argument("--sessions-per-week", type=int, default=8)
+    parser.add_argument("--levels", default="1,2,4,8,16", help="poziomy współbieżności po przecinku")
+    parser.add_argument("--duration", type=float, default=20.0, help="sekundy na poziom")
+    parser.add_argument("--think-ms", type=float, default=300.0, help="średnia pauza między krokami sesji")
+    parser.add_argument("--timeout", type=float, default=30.0, help="timeout pojedynczego żądania")
+    parser.add_argument("--max-p95-ms", type=float, default=1000.0, help="próg p95 dla oceny pojemności")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", default=DEFAULT_DB, help="plik SQLite na dane testu")
+    parser.add_argument("--reuse-db", action="store_true", help="nie generuj danych, jeśli baza już istnieje")
+    parser.add_argument("--out", default="")
+    parser.add_argument("--serve", nargs=2, metavar=("DB", "PORT"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args.serve[0], int(args.serve[1]))
+        return 0
+
+    levels = sorted({int(x) for x in args.levels.split(",") if x.strip()})
+    reuse = args.reuse_db and os.path.exists(args.db)
+    if not reuse and os.path.exists(args.db):
+        os.remove(args.db)
+
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.abspath(args.db)
+    os.environ.setdefault("REQUEST_METRICS_LOG", "0")
+    os.environ.setdefault("QUERY_DETECTOR", "0")
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+
+    import app as appmod
+    from benchmarks.run import _git_commit
+    from benchmarks.synthetic_data import DEFAULT_PASSWORD, SyntheticConfig, generate_athlete
+    from models import Activity, User
+
+    t0 = time.perf_counter()
+    with appmod.app.app_context():
+        appmod.db.create_all()
+        for i in range(args.users):
+            email = EMAIL_TEMPLATE.format(i)
+            if User.query.filter_by(email=email).first() is None:
+                generate_athlete(email, SyntheticConfig(
+                    years=args.years,
+                    sessions_per_week=args.sessions_per_week,
+                    chat_messages=40,
+                    seed=args.seed + i,
+                ))
+        dataset = {
+            "users": args.users,
+            "activities": Activity.query.count(),
+            "db_bytes": os.path.getsize(args.db) if os.path.exists(args.db) else None,
+            "prepare_seconds": round(time.perf_counter() - t0, 2),
+        }
+        appmod.db.engine.dispose()
+
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.load_test", "--serve", args.db, str(port)],
+        cwd=REPO_DIR,
+    )
+    results = []
+    try:
+        _wait_ready(port, proc)
+        for level in levels:
+            res = run_level(port, level, args.users, DEFAULT_PASSWORD, args.duration,
+                            args.think_ms, args.timeout, args.seed)
+            results.append(res)
+            _print_level(res)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    carried = [r["concurrency"] for r in results if r["errors"] == 0 and r["p95_ms"] <= args.max_p95_ms]
+    capacity = max(carried) if carried else None
+    print(f"\npojemność (p95 <= {args.max_p95_ms:.0f} ms, bez błędów): "
+          f"{capacity if capacity is not None else 'poniżej najniższego poziomu'}")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {
+                "users": args.users,
+                "years": args.years,
+                "sessions_per_week": args.sessions_per_week,
+                "levels": levels,
+                "duration_s": args.duration,
+                "think_ms": args.think_ms,
+                "max_p95_ms": args.max_p95_ms,
+                "scenarios": dict(SCENARIOS),
+                "seed": args.seed,
+            },
+            "dataset": dataset,
+        },
+        "capacity_concurrency": capacity,
+        "levels": results,
+    }
+    out = args.out or os.path.join(
+        REPO_DIR, "benchmarks", "results", f"load-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"zapisano: {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
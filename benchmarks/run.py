@@ -0,0 +1,336 @@
+"""Benchmark głównych ścieżek aplikacji na syntetycznych danych (AI zastąpione stubami).
+
+Uruchomienie (z katalogu repo):
+
+    python -m benchmarks.run --years 5 --sessions-per-week 8 --repeat 7
+    python -m benchmarks.run --reuse-db --compare benchmarks/results/<poprzedni>.json
+
+Wynik trafia do JSON (domyślnie benchmarks/results/bench-<czas>.json): dla każdego
+przypadku min/mediana/p95 czasu oraz liczba zapytań SQL, plus metadane przebiegu
+(commit, rozmiar danych), żeby dało się porównywać przebiegi w czasie.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_DB = os.path.join(REPO_DIR, "benchmarks", "bench.db")
+DEFAULT_EMAIL = "bench@example.com"
+
+
+# -------------------- AI stubs --------------------
+
+class _StubUsage:
+    def __init__(self, prompt_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.cached_content_token_count = 0
+
+
+class _StubResponse:
+    def __init__(self, text: str, prompt_tokens: int = 0):
+        self.text = text
+        self.usage_metadata = _StubUsage(prompt_tokens)
+
+
+def _contents_len(contents) -> int:
+    if isinstance(contents, str):
+        return len(contents)
+    total = 0
+    for item in contents or []:
+        if isinstance(item, str):
+            total += len(item)
+        elif isinstance(item, dict):
+            for part in item.get("parts", []):
+                total += len(part) if isinstance(part, str) else 0
+    return total
+
+
+class StubChatModel:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def generate_content(self, contents, **kwargs):
+        return _StubResponse("Trzymaj plan, jutro spokojnie.", _contents_len(contents) // 4)
+
+
+class StubPlanModel:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def generate_content(self, contents, **kwargs):
+        today = datetime.now().date()
+        days = []
+        for i in range(7 - today.weekday()):
+            d = today + timedelta(days=i)
+            days.append({
+                "date": d.isoformat(),
+                "activity_type": "run" if i % 2 == 0 else "rest",
+                "workout": "Bieg spokojny 8 km" if i % 2 == 0 else "Odpoczynek",
+                "why": "Budowa bazy tlenowej.",
+                "intensity": "easy",
+                "warmup": "10 min trucht",
+                "main_set": "8 km w strefie 2",
+                "cooldown": "5 min marsz",
+                "distance_km": 8 if i % 2 == 0 else 0,
+                "duration_min": 48 if i % 2 == 0 else 0,
+            })
+        return _StubResponse(json.dumps({"days": days}), _contents_len(contents) // 4)
+
+
+class StubVisionModel:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def generate_content(self, contents, **kwargs):
+        return _StubResponse(json.dumps({"activity_type": "run", "distance_km": 10, "duration_min": 50}))
+
+
+def install_ai_stubs() -> None:
+    import llm
+
+    llm.chat_model = StubChatModel()
+    llm.plan_model = StubPlanModel()
+    llm.vision_model = StubVisionModel()
+    # Tryb sesji czatu tworzy model z system_instruction w locie.
+    llm.build_generative_model = StubChatModel
+
+
+# -------------------- runner --------------------
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def time_case(fn, repeat: int, warmup: int, query_budget) -> dict:
+    for _ in range(warmup):
+        fn()
+    timings = []
+    queries = []
+    for _ in range(repeat):
+        with query_budget() as tracker:
+            t0 = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - t0) * 1000.0)
+        queries.append(tracker.total)
+    return {
+        "runs": repeat,
+        "min_ms": round(min(timings), 2),
+        "median_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(_percentile(timings, 95), 2),
+        "mean_ms": round(statistics.fmean(timings), 2),
+        "sql_queries": int(statistics.median(queries)),
+    }
+
+
+def build_cases(appmod, client, user_id: int, activity_id: int | None) -> dict:
+    from flask_login import login_user
+
+    from coach_chat import build_chat_context_sections
+    from models import User, UserProfile
+    from plan_engine import build_rule_based_plan_days
+    from training_data import build_weekly_target_context
+
+    def _get(url):
+        def _fn():
+            resp = client.get(url)
+            if resp.status_code != 200:
+                raise RuntimeError(f"{url} -> HTTP {resp.status_code}")
+        return _fn
+
+    def _in_request(fn):
+        def _wrapped():
+            with appmod.app.test_request_context():
+                user = appmod.db.session.get(User, user_id)
+                login_user(user)
+                fn(user)
+        return _wrapped
+
+    def _chat_context(user):
+        build_chat_context_sections(user)
+
+    def _forecast_context(user):
+        profile_obj = UserProfile.query.filter_by(user_id=user.id).first()
+        today_dt = datetime.now().date()
+        ctx = build_weekly_target_context(user.id, profile_obj, today_dt)
+        build_rule_based_plan_days(
+            user_id=user.id,
+            profile_obj=profile_obj,
+            weekly_target_context=ctx,
+            days_to_generate=7 - today_dt.weekday(),
+            today_dt=today_dt,
+        )
+
+    cases = {
+        "index": _get("/"),
+        # /metrics to sama powłoka HTML; agregacja zakresu idzie przez /api/metrics/series.
+        "metrics_shell": _get("/metrics?days=30"),
+    }
+    for days in (7, 30, 90, 365):
+        # Ta sama rozdzielczość, o którą prosi metrics.html (seriesResolution).
+        resolution = "week" if days > 90 else "day"
+        cases[f"metrics_{days}d"] = _get(f"/api/metrics/series?days={days}&resolution={resolution}")
+    cases["history"] = _get("/history")
+    if activity_id:
+        cases["activity_detail"] = _get(f"/activity/{activity_id}")
+    cases["chat_context"] = _in_request(_chat_context)
+    cases["forecast_context"] = _in_request(_forecast_context)
+    cases["forecast_local"] = _get("/api/forecast?engine=local")
+    cases["forecast_ai_stubbed"] = _get("/api/forecast")
+    return cases
+
+
+def compare(current: dict, previous_path: str) -> None:
+    with open(previous_path, encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"\nvs {previous_path} ({previous.get('meta', {}).get('git_commit')}):")
+    for name, res in current["results"].items():
+        prev = previous.get("results", {}).get(name)
+        if not prev:
+            continue
+        delta = res["median_ms"] - prev["median_ms"]
+        pct = (delta / prev["median_ms"] * 100.0) if prev["median_ms"] else 0.0
+        print(f"  {name:<22} {prev['median_ms']:>9.1f} -> {res['median_ms']:>9.1f} ms  ({pct:+.1f}%)"
+              f"  sql {prev.get('sql_queries')} -> {res.get('sql_queries')}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=float, default=5.0)
+    parser.add_argument("--sessions-per-week", type=int, default=8)
+    parser.add_argument("--no-routes", action="store_true")
+    parser.add_argument("--chat-messages", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--db", default=DEFAULT_DB, help="plik SQLite na dane benchmarku")
+    parser.add_argument("--reuse-db", action="store_true", help="nie generuj danych, jeśli baza już istnieje")
+    parser.add_argument("--only", default="", help="lista przypadków po przecinku")
+    parser.add_argument("--out", default="")
+    parser.add_argument("--compare", default="", help="poprzedni plik JSON do porównania")
+    args = parser.parse_args(argv)
+
+    reuse = args.reuse_db and os.path.exists(args.db)
+    if not reuse and os.path.exists(args.db):
+        os.remove(args.db)
+
+    # Konfiguracja musi być ustawiona przed importem aplikacji.
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.abspath(args.db)
+    os.environ.setdefault("REQUEST_METRICS_LOG", "0")
+    os.environ.setdefault("QUERY_DETECTOR", "0")
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+
+    import app as appmod
+    from instrumentation import query_budget
+    from models import Activity, ChatMessage, Exercise, TrainingCheckin, User
+    from benchmarks.synthetic_data import DEFAULT_PASSWORD, SyntheticConfig, generate_athlete
+
+    install_ai_stubs()
+    app = appmod.app
+    db = appmod.db
+
+    gen_seconds = None
+    with app.app_context():
+        db.create_all()
+        user = User.query.filter_by(email=DEFAULT_EMAIL).first()
+        if user is None:
+            t0 = time.perf_counter()
+            user = generate_athlete(DEFAULT_EMAIL, SyntheticConfig(
+                years=args.years,
+                sessions_per_week=args.sessions_per_week,
+                routes=not args.no_routes,
+                chat_messages=args.chat_messages,
+                seed=args.seed,
+            ))
+            gen_seconds = round(time.perf_counter() - t0, 2)
+        user_id = user.id
+        dataset = {
+            "activities": Activity.query.filter_by(user_id=user_id).count(),
+            "exercises": Exercise.query.filter_by(user_id=user_id).count(),
+            "checkins": TrainingCheckin.query.filter_by(user_id=user_id).count(),
+            "chat_messages": ChatMessage.query.filter_by(user_id=user_id).count(),
+            "db_bytes": os.path.getsize(args.db) if os.path.exists(args.db) else None,
+            "generate_seconds": gen_seconds,
+        }
+        latest = (
+            Activity.query
+            .filter(Activity.user_id == user_id, Activity.route_points_json.isnot(None))
+            .order_by(Activity.start_time.desc())
+            .first()
+        )
+        activity_id = latest.id if latest else None
+
+    client = app.test_client()
+    resp = client.post("/login", data={"email": DEFAULT_EMAIL, "password": DEFAULT_PASSWORD})
+    if resp.status_code not in (200, 302):
+        print(f"login failed: HTTP {resp.status_code}", file=sys.stderr)
+        return 1
+
+    cases = build_cases(appmod, client, user_id, activity_id)
+    if args.only:
+        wanted = {x.strip() for x in args.only.split(",") if x.strip()}
+        cases = {k: v for k, v in cases.items() if k in wanted}
+
+    results = {}
+    for name, fn in cases.items():
+        results[name] = time_case(fn, args.repeat, args.warmup, query_budget)
+        r = results[name]
+        print(f"{name:<22} median {r['median_ms']:>9.1f} ms  p95 {r['p95_ms']:>9.1f} ms  sql {r['sql_queries']}")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {
+                "years": args.years,
+                "sessions_per_week": args.sessions_per_week,
+                "routes": not args.no_routes,
+                "chat_messages": args.chat_messages,
+                "seed": args.seed,
+                "repeat": args.repeat,
+                "warmup": args.warmup,
+            },
+            "dataset": dataset,
+        },
+        "results": results,
+    }
+
+    out = args.out or os.path.join(
+        REPO_DIR, "benchmarks", "results", f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nzapisano: {out}")
+
+    if args.compare:
+        compare(report, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,230 @@
+"""Generator syntetycznych danych zawodnika (do benchmarków i testów wydajności).
+
+Tworzy użytkownika z profilem i wieloletnią historią bezpośrednio przez modele:
+aktywności (z trasami GPS i metadanymi), ćwiczenia siłowe, check-iny i wiadomości czatu.
+Dane są deterministyczne dla danego `seed`, więc kolejne przebiegi są porównywalne.
+
+    from benchmarks.synthetic_data import generate_athlete
+    with app.app_context():
+        user = generate_athlete("bench@example.com", years=5, sessions_per_week=8)
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import random
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from models import db, User, UserProfile, Activity, Exercise, TrainingCheckin, ChatMessage
+
+
+DEFAULT_PASSWORD = "bench-password"
+
+# (activity_type, udział w tygodniu, ma trasę GPS)
+SPORT_MIX = (
+    ("run", 0.45, True),
+    ("weighttraining", 0.2, False),
+    ("ride", 0.15, True),
+    ("swim", 0.1, False),
+    ("yoga", 0.1, False),
+)
+
+GYM_EXERCISES = ("Przysiad", "Martwy ciąg", "Wyciskanie leżąc", "Wiosłowanie", "Wykroki", "Plank", "Podciąganie")
+CHECKIN_NOTES = (
+    "Dobre samopoczucie, nogi świeże.",
+    "Lekkie zmęczenie po wczorajszym treningu.",
+    "Spałem 6h, tętno wyższe niż zwykle.",
+    "Łydki spięte, ale bez bólu.",
+    "Świetny trening, tempo wchodziło lekko.",
+)
+CHAT_PROMPTS = (
+    "Jak rozłożyć akcenty w tym tygodniu?",
+    "Czy mogę jutro zrobić interwały?",
+    "Czuję zmęczenie, odpuścić długie wybieganie?",
+    "Ile białka po treningu siłowym?",
+)
+
+
+@dataclass
+class SyntheticConfig:
+    years: float = 5.0
+    sessions_per_week: int = 8
+    routes: bool = True
+    route_points: int = 300
+    exercises_per_gym_session: int = 5
+    checkins_per_week: int = 2
+    chat_messages: int = 200
+    seed: int = 42
+    commit_every: int = 500
+
+
+def _route(rng: random.Random, n_points: int, dist_km: float) -> list[list[float]]:
+    """Pętla wokół losowego punktu startowego (mniej więcej zgodna z dystansem)."""
+    lat0 = 50.0 + rng.uniform(-0.05, 0.05)
+    lng0 = 19.9 + rng.uniform(-0.05, 0.05)
+    radius_deg = max(0.002, dist_km / (2 * math.pi) / 111.0)
+    pts = []
+    for i in range(n_points):
+        a = 2 * math.pi * i / max(1, n_points - 1)
+        wobble = 1 + 0.08 * math.sin(a * 7)
+        pts.append([
+            round(lat0 + radius_deg * wobble * math.sin(a), 6),
+            round(lng0 + radius_deg * wobble * (1 - math.cos(a)) / math.cos(math.radians(lat0)), 6),
+        ])
+    return pts
+
+
+def _pick_sport(rng: random.Random) -> tuple[str, bool]:
+    r = rng.random()
+    acc = 0.0
+    for sport, share, has_route in SPORT_MIX:
+        acc += share
+        if r <= acc:
+            return sport, has_route
+    return SPORT_MIX[0][0], SPORT_MIX[0][2]
+
+
+def _session_numbers(rng: random.Random, sport: str) -> tuple[int, float, int | None]:
+    """(duration_s, distance_m, avg_hr) dla danego sportu."""
+    if sport == "run":
+        km = rng.choice((5, 6, 8, 10, 12, 16, 21)) * rng.uniform(0.9, 1.1)
+        pace = rng.uniform(4.6, 6.2)  # min/km
+        return int(km * pace * 60), km * 1000.0, rng.randint(135, 168)
+    if sport == "ride":
+        km = rng.uniform(25, 90)
+        return int(km / rng.uniform(24, 32) * 3600), km * 1000.0, rng.randint(120, 150)
+    if sport == "swim":
+        m = rng.choice((1500, 2000, 2500, 3000))
+        return int(m / 100 * rng.uniform(110, 140)), float(m), rng.randint(125, 150)
+    return rng.randint(35, 70) * 60, 0.0, rng.randint(95, 125)
+
+
+def generate_athlete(email: str, cfg: SyntheticConfig | None = None, **overrides) -> User:
+    """Utwórz użytkownika z historią treningów. Wymaga aktywnego app_context."""
+    cfg = cfg or SyntheticConfig()
+    for k, v in overrides.items():
+        setattr(cfg, k, v)
+    rng = random.Random(cfg.seed)
+
+    user = User(
+        email=email,
+        password_hash=generate_password_hash(DEFAULT_PASSWORD),
+        first_name="Bench",
+        onboarding_completed=True,
+    )
+    db.session.add(user)
+    db.session.flush()
+
+    db.session.add(UserProfile(
+        user_id=user.id,
+        primary_sports="run, gym",
+        weekly_time_hours=8,
+        weekly_distance_km=40,
+        days_per_week=6,
+        weekly_goal_workouts=cfg.sessions_per_week,
+        weekly_focus_sports="run,gym,swim",
+        weekly_run_sessions=4,
+        weekly_gym_sessions=2,
+        weekly_swim_sessions=1,
+        gender="male",
+        birth_date=date(1990, 5, 17),
+        height_cm=180,
+        weight_kg=74,
+        vo2max=54,
+        resting_hr=48,
+        coach_style="balanced",
+        risk_tolerance="balanced",
+        training_priority="performance",
+        goals_text="Półmaraton poniżej 1:35",
+        target_event="Half marathon",
+        target_date=date.today() + timedelta(days=70),
+    ))
+
+    now = datetime.now().replace(microsecond=0)
+    start = now - timedelta(days=int(cfg.years * 365))
+    total_days = (now - start).days
+    n_sessions = int(total_days / 7 * cfg.sessions_per_week)
+
+    pending_gym: list[Activity] = []
+    created = 0
+    for i in range(n_sessions):
+        day_offset = i * total_days / max(1, n_sessions)
+        start_dt = start + timedelta(days=day_offset, hours=rng.choice((6, 7, 12, 17, 18, 19)), minutes=rng.randint(0, 59))
+        sport, has_route = _pick_sport(rng)
+        duration_s, distance_m, avg_hr = _session_numbers(rng, sport)
+
+        route_json = None
+        start_lat = start_lng = None
+        if cfg.routes and has_route:
+            pts = _route(rng, cfg.route_points, distance_m / 1000.0)
+            route_json = json.dumps(pts, separators=(",", ":"))
+            start_lat, start_lng = pts[0]
+
+        act = Activity(
+            user_id=user.id,
+            activity_type=sport,
+            start_time=start_dt,
+            duration=duration_s,
+            moving_duration=int(duration_s * 0.97),
+            elapsed_duration=int(duration_s * 1.05),
+            distance=round(distance_m, 1),
+            avg_hr=avg_hr,
+            max_hr=(avg_hr + rng.randint(10, 25)) if avg_hr else None,
+            avg_speed_mps=round(distance_m / duration_s, 3) if distance_m and duration_s else None,
+            elevation_gain=round(rng.uniform(0, 250), 1) if has_route else None,
+            calories=round(duration_s / 60 * rng.uniform(8, 13), 0),
+            start_lat=start_lat,
+            start_lng=start_lng,
+            route_points_json=route_json,
+            source="garmin",
+            external_id=f"synthetic-{cfg.seed}-{i}",
+            metadata_json=json.dumps({"training_effect": round(rng.uniform(1.5, 4.5), 1)}),
+        )
+        db.session.add(act)
+        if sport == "weighttraining" and cfg.exercises_per_gym_session:
+            pending_gym.append(act)
+        created += 1
+
+        if created % cfg.commit_every == 0:
+            _flush_exercises(rng, user.id, pending_gym, cfg.exercises_per_gym_session)
+            pending_gym = []
+            db.session.commit()
+
+    _flush_exercises(rng, user.id, pending_gym, cfg.exercises_per_gym_session)
+
+    weeks = int(total_days / 7)
+    for w in range(weeks * cfg.checkins_per_week):
+        db.session.add(TrainingCheckin(
+            user_id=user.id,
+            created_at=start + timedelta(days=w * 7 / max(1, cfg.checkins_per_week), hours=20),
+            notes=rng.choice(CHECKIN_NOTES),
+        ))
+
+    for m in range(cfg.chat_messages):
+        ts = now - timedelta(hours=(cfg.chat_messages - m) * 6)
+        sender = "user" if m % 2 == 0 else "ai"
+        content = rng.choice(CHAT_PROMPTS) if sender == "user" else "Spokojnie — trzymaj się planu, ale słuchaj organizmu."
+        db.session.add(ChatMessage(user_id=user.id, sender=sender, content=content, timestamp=ts))
+
+    db.session.commit()
+    return user
+
+
+def _flush_exercises(rng: random.Random, user_id: int, acts: list[Activity], per_session: int) -> None:
+    if not acts:
+        return
+    db.session.flush()  # potrzebne activity.id
+    for act in acts:
+        for name in rng.sample(GYM_EXERCISES, k=min(per_session, len(GYM_EXERCISES))):
+            db.session.add(Exercise(
+                user_id=user_id,
+                activity_id=act.id,
+                name=name,
+                sets=rng.randint(3, 5),
+                reps=rng.choice((5, 6, 8, 10, 12)),
+                weight=round(rng.uniform(20, 120) / 2.5) * 2.5,
+            ))
@@ -0,0 +1,371 @@
+"""Syntetyczne archiwa eksportu Garmin / Strava (do benchmarku importu).
+
+Układ plików odpowiada temu, czego oczekują `detect_activity_archive_type`,
+`import_garmin_zip_for_user` i `import_strava_zip_for_user`:
+
+Garmin:
+  DI_CONNECT/DI-Connect-Fitness/<user>_0_summarizedActivities.json
+  DI_CONNECT/DI-Connect-Uploaded-Files/UploadedFiles_0-_Part<N>.zip   (zagnieżdżone pliki .fit)
+  DI_CONNECT/DI-Connect-Aggregator/UDSFile_<od>_<do>.json             (kroki / stres / tętno spoczynkowe)
+  DI_CONNECT/DI-Connect-Wellness/<od>_<do>_<id>_sleepData.json
+  DI_CONNECT/DI-Connect-Wellness/<id>_userBiometricProfileData.json
+  DI_CONNECT/DI-Connect-User/user_profile.json
+
+Strava:
+  activities.csv
+
+Pliki FIT są kodowane ręcznie (fitparse tylko czyta): file_id + session + rekordy
+co `record_interval_s` sekund z pozycją GPS, tętnem, kadencją i prędkością.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import math
+import random
+import struct
+import zipfile
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+
+# -------------------- FIT encoder --------------------
+
+FIT_EPOCH = datetime(1989, 12, 31, tzinfo=timezone.utc)
+_SEMICIRCLES = 2 ** 31 / 180.0
+
+_CRC_TABLE = (
+    0x0000, 0xCC01, 0xD801, 0x1400, 0xF001, 0x3C00, 0x2800, 0xE401,
+    0xA001, 0x6C00, 0x7800, 0xB401, 0x5000, 0x9C01, 0x8801, 0x4400,
+)
+
+# base types (FIT SDK)
+ENUM, UINT8, UINT16, SINT32, UINT32 = 0x00, 0x02, 0x84, 0x85, 0x86
+_STRUCT = {ENUM: "B", UINT8: "B", UINT16: "H", SINT32: "i", UINT32: "I"}
+
+MSG_FILE_ID, MSG_SESSION, MSG_RECORD = 0, 18, 20
+FIT_SPORT = {"run": 1, "ride": 2, "swim": 5, "walk": 11, "hike": 17, "weighttraining": 10}
+
+FILE_ID_FIELDS = ((0, ENUM), (1, UINT16), (4, UINT32))  # type, manufacturer, time_created
+SESSION_FIELDS = (
+    (253, UINT32),  # timestamp
+    (2, UINT32),    # start_time
+    (5, ENUM),      # sport
+    (7, UINT32),    # total_elapsed_time (ms)
+    (8, UINT32),    # total_timer_time (ms)
+    (9, UINT32),    # total_distance (cm)
+    (11, UINT16),   # total_calories
+    (14, UINT16),   # avg_speed (mm/s)
+    (16, UINT8),    # avg_heart_rate
+    (17, UINT8),    # max_heart_rate
+    (22, UINT16),   # total_ascent
+)
+RECORD_FIELDS = (
+    (253, UINT32),  # timestamp
+    (0, SINT32),    # position_lat (semicircles)
+    (1, SINT32),    # position_long
+    (3, UINT8),     # heart_rate
+    (4, UINT8),     # cadence
+    (5, UINT32),    # distance (cm)
+    (6, UINT16),    # speed (mm/s)
+)
+
+
+def fit_crc(data: bytes, crc: int = 0) -> int:
+    for byte in data:
+        tmp = _CRC_TABLE[crc & 0xF]
+        crc = (crc >> 4) & 0x0FFF
+        crc = crc ^ tmp ^ _CRC_TABLE[byte & 0xF]
+        tmp = _CRC_TABLE[crc & 0xF]
+        crc = (crc >> 4) & 0x0FFF
+        crc = crc ^ tmp ^ _CRC_TABLE[(byte >> 4) & 0xF]
+    return crc
+
+
+def _fit_ts(dt: datetime) -> int:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int((dt - FIT_EPOCH).total_seconds())
+
+
+def _definition(local: int, global_num: int, fields: tuple) -> bytes:
+    out = struct.pack("<BBBHB", 0x40 | local, 0, 0, global_num, len(fields))
+    for num, base in fields:
+        out += struct.pack("<BBB", num, struct.calcsize(_STRUCT[base]), base)
+    return out
+
+
+def _data(local: int, fields: tuple, values: tuple) -> bytes:
+    fmt = "<B" + "".join(_STRUCT[base] for _num, base in fields)
+    return struct.pack(fmt, local, *values)
+
+
+def build_fit_activity(
+    *,
+    start: datetime,
+    sport: str,
+    duration_s: int,
+    distance_m: float,
+    avg_hr: int,
+    route: list[list[float]] | None,
+    record_interval_s: int = 5,
+) -> bytes:
+    """Minimalny, poprawny plik FIT aktywności (czytelny dla fitparse)."""
+    body = bytearray()
+    body += _definition(0, MSG_FILE_ID, FILE_ID_FIELDS)
+    body += _data(0, FILE_ID_FIELDS, (4, 1, _fit_ts(start)))
+
+    body += _definition(1, MSG_RECORD, RECORD_FIELDS)
+    n_records = max(2, duration_s // max(1, record_interval_s))
+    speed_mm_s = int(distance_m / max(1, duration_s) * 1000)
+    for i in range(n_records):
+        t = start + timedelta(seconds=i * record_interval_s)
+        if route:
+            lat, lng = route[min(len(route) - 1, i * len(route) // n_records)]
+            lat_sc, lng_sc = int(lat * _SEMICIRCLES), int(lng * _SEMICIRCLES)
+        else:
+            lat_sc, lng_sc = 0x7FFFFFFF, 0x7FFFFFFF  # invalid -> brak pozycji
+        hr = max(60, min(220, avg_hr + int(8 * math.sin(i / 15.0))))
+        dist_cm = int(distance_m * 100 * i / n_records)
+        body += _data(1, RECORD_FIELDS, (_fit_ts(t), lat_sc, lng_sc, hr, 85, dist_cm, speed_mm_s))
+
+    end = start + timedelta(seconds=duration_s)
+    body += _definition(2, MSG_SESSION, SESSION_FIELDS)
+    body += _data(2, SESSION_FIELDS, (
+        _fit_ts(end),
+        _fit_ts(start),
+        FIT_SPORT.get(sport, 0),
+        duration_s * 1000,
+        duration_s * 1000,
+        int(distance_m * 100),
+        int(duration_s / 60 * 11),
+        speed_mm_s,
+        avg_hr,
+        min(220, avg_hr + 15),
+        int(distance_m / 100),
+    ))
+
+    header = struct.pack("<BBHI4s", 14, 0x20, 2132, len(body), b".FIT")
+    header += struct.pack("<H", fit_crc(header))
+    data = header + bytes(body)
+    return data + struct.pack("<H", fit_crc(data))
+
+
+# -------------------- activity stream --------------------
+
+@dataclass
+class SyntheticActivity:
+    activity_id: int
+    start: datetime  # naive UTC
+    sport: str
+    duration_s: int
+    distance_m: float
+    avg_hr: int
+    route: list[list[float]] | None
+
+
+GARMIN_TYPES = {
+    "run": ("running", "RUNNING"),
+    "ride": ("cycling", "CYCLING"),
+    "swim": ("lap_swimming", "SWIMMING"),
+    "weighttraining": ("strength_training", "TRAINING"),
+    "walk": ("walking", "GENERIC"),
+}
+STRAVA_TYPES = {"run": "Run", "ride": "Ride", "swim": "Swim", "weighttraining": "Weight Training", "walk": "Walk"}
+
+
+def synthetic_activities(n: int, *, seed: int = 7, route_points: int = 200, end: datetime | None = None) -> list[SyntheticActivity]:
+    """Ciąg `n` aktywności wstecz od `end`, ~1 dziennie (deterministyczny dla seed)."""
+    rng = random.Random(seed)
+    end = end or datetime.utcnow().replace(microsecond=0)
+    out = []
+    for i in range(n):
+        sport = rng.choices(("run", "ride", "swim", "weighttraining", "walk"), weights=(5, 2, 1, 2, 1))[0]
+        start = end - timedelta(days=n - i, hours=rng.randint(0, 10), minutes=rng.randint(0, 59))
+        if sport == "run":
+            dist = rng.uniform(5, 21) * 1000
+            dur = int(dist / 1000 * rng.uniform(280, 360))
+        elif sport == "ride":
+            dist = rng.uniform(20, 80) * 1000
+            dur = int(dist / 1000 * rng.uniform(110, 150))
+        elif sport == "swim":
+            dist = float(rng.choice((1500, 2000, 2500)))
+            dur = int(dist / 100 * rng.uniform(110, 140))
+        elif sport == "walk":
+            dist = rng.uniform(3, 8) * 1000
+            dur = int(dist / 1000 * 720)
+        else:
+            dist, dur = 0.0, rng.randint(40, 70) * 60
+        route = None
+        if sport in ("run", "ride", "walk") and route_points:
+            lat0, lng0 = 50.06 + rng.uniform(-0.05, 0.05), 19.94 + rng.uniform(-0.05, 0.05)
+            r = max(0.003, dist / 1000 / (2 * math.pi) / 111.0)
+            route = [
+                [lat0 + r * math.sin(2 * math.pi * k / route_points), lng0 + r * 1.5 * (1 - math.cos(2 * math.pi * k / route_points))]
+                for k in range(route_points)
+            ]
+        out.append(SyntheticActivity(
+            activity_id=10_000_000_000 + seed * 100_000 + i,
+            start=start,
+            sport=sport,
+            duration_s=dur,
+            distance_m=round(dist, 1),
+            avg_hr=rng.randint(120, 165) if sport != "weighttraining" else rng.randint(95, 120),
+            route=route,
+        ))
+    return out
+
+
+def _epoch_ms(dt: datetime) -> int:
+    return int(dt.replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+# -------------------- Garmin --------------------
+
+def build_garmin_export(
+    target,
+    activities: list[SyntheticActivity],
+    *,
+    fit_ratio: float = 1.0,
+    fits_per_part: int = 500,
+    wellness_days: int = 365,
+    record_interval_s: int = 5,
+    seed: int = 7,
+) -> dict:
+    """Zapisz archiwum Garmina do `target` (ścieżka albo obiekt plikowy). Zwraca statystyki."""
+    rng = random.Random(seed)
+    rows = []
+    for a in activities:
+        activity_type, sport_type = GARMIN_TYPES.get(a.sport, ("other", "GENERIC"))
+        row = {
+            "activityId": a.activity_id,
+            "name": f"Synthetic {a.sport}",
+            "activityType": activity_type,
+            "sportType": sport_type,
+            "startTimeGmt": _epoch_ms(a.start),
+            "startTimeLocal": _epoch_ms(a.start + timedelta(hours=1)),
+            "duration": a.duration_s * 1000,
+            "movingDuration": int(a.duration_s * 0.97) * 1000,
+            "elapsedDuration": int(a.duration_s * 1.03) * 1000,
+            "distance": a.distance_m * 100,
+            "avgHr": a.avg_hr,
+            "maxHr": a.avg_hr + 15,
+            "calories": int(a.duration_s / 60 * 11),
+            "elevationGain": rng.randint(0, 30000),
+            "elevationLoss": rng.randint(0, 30000),
+            "maxSpeed": round(a.distance_m / max(1, a.duration_s) * 1.3 / 10.0, 4),
+            "aerobicTrainingEffect": round(rng.uniform(1.5, 4.5), 1),
+            "locationName": "Kraków",
+            "manufacturer": "GARMIN",
+        }
+        if a.route:
+            row["startLatitude"], row["startLongitude"] = a.route[0]
+            row["endLatitude"], row["endLongitude"] = a.route[-1]
+        rows.append(row)
+
+    fit_activities = [a for a in activities if rng.random() < fit_ratio]
+    fit_bytes_total = 0
+    end_day = max((a.start for a in activities), default=datetime.utcnow()).date()
+    start_day = end_day - timedelta(days=wellness_days - 1)
+
+    with zipfile.ZipFile(target, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr(
+            "DI_CONNECT/DI-Connect-Fitness/bench@example.com_0_summarizedActivities.json",
+            json.dumps([{"summarizedActivitiesExport": rows}]),
+        )
+
+        for part_idx in range(0, len(fit_activities), fits_per_part):
+            part = fit_activities[part_idx:part_idx + fits_per_part]
+            nested_buf = io.BytesIO()
+            with zipfile.ZipFile(nested_buf, "w", compression=zipfile.ZIP_DEFLATED) as nested:
+                for a in part:
+                    blob = build_fit_activity(
+                        start=a.start,
+                        sport=a.sport,
+                        duration_s=a.duration_s,
+                        distance_m=a.distance_m,
+                        avg_hr=a.avg_hr,
+                        route=a.route,
+                        record_interval_s=record_interval_s,
+                    )
+                    fit_bytes_total += len(blob)
+                    nested.writestr(f"bench@example.com_{a.activity_id}.fit", blob)
+            z.writestr(
+                f"DI_CONNECT/DI-Connect-Uploaded-Files/UploadedFiles_0-_Part{part_idx // fits_per_part + 1}.zip",
+                nested_buf.getvalue(),
+            )
+
+        uds = []
+        sleep = []
+        for d in range(wellness_days):
+            day = start_day + timedelta(days=d)
+            uds.append({
+                "calendarDate": day.isoformat(),
+                "totalSteps": rng.randint(4000, 16000),
+                "restingHeartRate": rng.randint(44, 56),
+                "allDayStress": {"aggregatorList": [
+                    {"type": "TOTAL", "averageStressLevel": rng.randint(18, 45)},
+                    {"type": "AWAKE", "averageStressLevel": rng.randint(20, 50)},
+                ]},
+            })
+            sleep_start = datetime.combine(day, datetime.min.time()) - timedelta(hours=rng.uniform(1, 2.5))
+            sleep.append({
+                "calendarDate": day.isoformat(),
+                "sleepStartTimestampGMT": sleep_start.strftime("%Y-%m-%dT%H:%M:%S.0"),
+                "sleepEndTimestampGMT": (sleep_start + timedelta(hours=rng.uniform(6, 8.5))).strftime("%Y-%m-%dT%H:%M:%S.0"),
+                "deepSleepSeconds": rng.randint(3600, 7200),
+                "lightSleepSeconds": rng.randint(10000, 16000),
+                "remSleepSeconds": rng.randint(3600, 6000),
+                "awakeSleepSeconds": rng.randint(300, 1800),
+            })
+        span = f"{start_day.isoformat()}_{end_day.isoformat()}"
+        z.writestr(f"DI_CONNECT/DI-Connect-Aggregator/UDSFile_{span}.json", json.dumps(uds))
+        z.writestr(f"DI_CONNECT/DI-Connect-Wellness/{span}_1001_sleepData.json", json.dumps(sleep))
+        z.writestr(
+            "DI_CONNECT/DI-Connect-Wellness/1001_userBiometricProfileData.json",
+            json.dumps([{"height": 180.0, "weight": 74000.0, "vo2Max": 54.0}]),
+        )
+        z.writestr(
+            "DI_CONNECT/DI-Connect-User/user_profile.json",
+            json.dumps({"firstName": "Bench", "gender": "MALE", "birthDate": "1990-05-17"}),
+        )
+
+    return {
+        "activities": len(rows),
+        "fit_files": len(fit_activities),
+        "fit_bytes": fit_bytes_total,
+        "wellness_days": wellness_days,
+    }
+
+
+# -------------------- Strava --------------------
+
+STRAVA_COLUMNS = (
+    "Activity ID", "Activity Date", "Activity Name", "Activity Type", "Activity Description",
+    "Elapsed Time", "Distance", "Max Heart Rate", "Average Heart Rate", "Moving Time",
+)
+
+
+def build_strava_export(target, activities: list[SyntheticActivity]) -> dict:
+    """Zapisz archiwum Stravy (activities.csv) do `target`. Zwraca statystyki."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(STRAVA_COLUMNS)
+    for a in activities:
+        writer.writerow((
+            a.activity_id,
+            a.start.strftime("%b %d, %Y, %I:%M:%S %p"),
+            f"Synthetic {a.sport}",
+            STRAVA_TYPES.get(a.sport, "Workout"),
+            "",
+            int(a.duration_s * 1.03),
+            f"{a.distance_m / 1000.0:.2f}",
+            a.avg_hr + 15,
+            a.avg_hr,
+            a.duration_s,
+        ))
+    with zipfile.ZipFile(target, "w", compression=zipfile.ZIP_DEFLATED) as z:
+        z.writestr("activities.csv", buf.getvalue())
+    return {"activities": len(activities), "fit_files": 0}
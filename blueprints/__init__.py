@@ -0,0 +1,15 @@
+"""Blueprinty aplikacji.
+
+Moduły widoków importują na górze tylko lekkie rzeczy (modele, helpery danych treningowych,
+planer). Importery archiwów, czat i odczyt zrzutów ekranu są importowane wewnątrz widoków,
+które ich używają, więc ładują się przy pierwszym takim żądaniu, a nie przy starcie workera.
+
+Nazwy endpointów mają prefiks blueprintu, np. url_for("dashboard.index"), url_for("auth.login").
+"""
+
+
+def register_blueprints(app) -> None:
+    from blueprints import activities, ai, auth, dashboard, imports, metrics, plans
+
+    for module in (auth, dashboard, metrics, imports, ai, activities, plans):
+        app.register_blueprint(module.bp)
@@ -0,0 +1,543 @@
+"""Aktywności: historia, szczegóły, szybkie dodawanie, check-iny i ćwiczenia."""
+
+import os
+import re
+from datetime import datetime, timezone
+
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+
+from models import Activity, Exercise, TrainingCheckin, WorkoutPlan, db
+from http_cache import conditional_on_data_version
+from idempotency import idempotent
+from i18n import tr
+from parsing import _parse_date_time, _parse_decimal_input, _parse_minutes_input, _safe_int
+from route_geometry import (
+    ROUTE_DEFAULT_DETAIL,
+    ROUTE_DETAIL_TOLERANCE_M,
+    ROUTE_FORMATS,
+    build_route_payload,
+    route_version,
+)
+from training_data import _build_activity_detail_payload, _looks_like_duplicate_activity
+
+bp = Blueprint("activities", __name__)
+
+ROUTE_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+@bp.route("/history")
+@login_required
+@conditional_on_data_version()
+def history():
+    all_activities = (
+        Activity.query
+        .filter_by(user_id=current_user.id)
+        .order_by(Activity.start_time.desc())
+        .all()
+    )
+    return render_template("all_activities.html", activities=all_activities)
+
+
+@bp.route("/activity/manual", methods=["POST"])
+@login_required
+@idempotent
+def add_activity_manual():
+    """Szybkie dodanie treningu ręcznie lub po odczycie screenshotu."""
+    from vision import _read_upload_for_vision, parse_strava_screenshot_to_activity
+
+    act_type = (request.form.get("activity_type") or "other").strip().lower()
+    date_str = (request.form.get("date") or "").strip()
+    time_str = (request.form.get("time") or "").strip()
+    notes = (request.form.get("notes") or "").strip()
+
+    duration_min = _parse_minutes_input(request.form.get("duration_min"))
+    distance_km = _parse_decimal_input(request.form.get("distance_km"))
+    avg_hr = _parse_decimal_input(request.form.get("avg_hr"))
+    avg_pace = _parse_decimal_input(request.form.get("avg_pace_min_km"))
+
+    # Optional screenshot: if provided, fill only missing fields from AI parse
+    upload = _read_upload_for_vision(request.files.get("activity_image"))
+    if upload:
+        parsed = parse_strava_screenshot_to_activity(*upload) or {}
+        act_type = act_type if act_type != "other" else (parsed.get("activity_type") or act_type)
+        if not date_str and parsed.get("start_date"):
+            date_str = parsed["start_date"]
+        if not time_str and parsed.get("start_time"):
+            time_str = parsed["start_time"]
+        if duration_min is None and parsed.get("duration_min") is not None:
+            duration_min = float(parsed["duration_min"])
+        if distance_km is None and parsed.get("distance_km") is not None:
+            distance_km = float(parsed["distance_km"])
+        if avg_hr is None and parsed.get("avg_hr") is not None:
+            avg_hr = float(parsed["avg_hr"])
+
+    if duration_min is None and avg_pace is not None and distance_km and distance_km > 0:
+        duration_min = float(avg_pace) * float(distance_km)
+
+    duration_min = max(0.0, float(duration_min or 0.0))
+    distance_km = max(0.0, float(distance_km or 0.0))
+    avg_hr_int = int(round(avg_hr)) if avg_hr and avg_hr > 0 else None
+
+    # data + godzina -> datetime aware (UTC)
+    dt = _parse_date_time(date_str, time_str)
+
+    act = Activity(
+        user_id=current_user.id,
+        activity_type=act_type,
+        start_time=dt,
+        duration=int(round(duration_min * 60)),
+        distance=distance_km * 1000.0,
+        avg_hr=avg_hr_int,
+        source="manual",
+        notes=notes,
+    )
+    if _looks_like_duplicate_activity(
+        user_id=current_user.id,
+        activity_type=act.activity_type or "other",
+        start_time=act.start_time,
+        duration_sec=act.duration or 0,
+        distance_m=act.distance or 0.0,
+        notes=act.notes,
+    ):
+        flash(tr("Wykryto duplikat — trening już istnieje.", "Duplicate detected — workout already exists."))
+        return redirect(url_for("dashboard.index"))
+
+    db.session.add(act)
+    db.session.commit()
+    flash(tr("Dodano trening.", "Workout added."))
+    return redirect(url_for("dashboard.index"))
+
+
+@bp.route("/checkin", methods=["POST"])
+@login_required
+@idempotent
+def add_checkin():
+    """Dodaj check-in po treningu (tekst + opcjonalny screenshot)."""
+    from vision import _IMAGE_EXT_BY_MIME, _read_upload_for_vision, parse_strava_screenshot_to_activity_detailed
+
+    text_note = (request.form.get("checkin_text") or "").strip()
+    f = request.files.get("checkin_image")
+
+    # Walidacja: przynajmniej jedno pole
+    if not text_note and (not f or not f.filename):
+        flash(tr("⚠️ Dodaj opis lub obrazek.", "⚠️ Add a description or screenshot."), "warning")
+        return redirect(url_for("dashboard.index"))
+
+    # Zapisz screenshot jeśli jest (już przeskalowany — ten sam bufor idzie do modelu)
+    image_path = None
+    upload = _read_upload_for_vision(f)
+    if upload:
+        img_bytes, mime_type = upload
+        os.makedirs("uploads", exist_ok=True)
+        stem = os.path.splitext(re.sub(r'[^a-zA-Z0-9._-]', '_', f.filename))[0]
+        ext = _IMAGE_EXT_BY_MIME.get(mime_type) or os.path.splitext(f.filename)[1] or ".bin"
+        safe_name = f"{current_user.id}_{int(datetime.now(timezone.utc).timestamp())}_{stem}{ext}"
+        image_path = os.path.join("uploads", safe_name)
+        with open(image_path, "wb") as out:
+            out.write(img_bytes)
+
+    # Zapisz check-in (zawsze)
+    entry = TrainingCheckin(
+        user_id=current_user.id,
+        created_at=datetime.now(timezone.utc),
+        notes=text_note,
+        image_path=image_path,
+    )
+    db.session.add(entry)
+
+    # === PRÓBA UTWORZENIA ACTIVITY ===
+    created_activity = False
+    screenshot_failed = False
+    screenshot_error_msg = None
+
+    if image_path:
+        try:
+            parsed, screenshot_error_msg = parse_strava_screenshot_to_activity_detailed(img_bytes, mime_type)
+            act_type = (parsed.get("activity_type") or "").strip().lower()
+            dur_min = parsed.get("duration_min")
+            dist_km = parsed.get("distance_km")
+            avg_hr = parsed.get("avg_hr")
+            start_date = parsed.get("start_date") or ""
+            start_time = parsed.get("start_time") or ""
+
+            # Sprawdź czy AI cokolwiek wyciągnęło
+            has_data = (
+                (dur_min and dur_min > 0)
+                or (dist_km and dist_km > 0)
+                or (avg_hr and avg_hr > 0)
+                or (act_type and act_type != "other")
+            )
+
+            if has_data:
+                # Sukces parsowania - twórz Activity
+                dt = _parse_date_time(start_date, start_time)
+                prepared_type = act_type or "other"
+                prepared_duration = max(0, int(round(dur_min or 0))) * 60
+                prepared_distance = max(0.0, float(dist_km or 0.0)) * 1000.0
+                prepared_notes = f"📸 Auto: {text_note}" if text_note else "📸 Auto-import ze screena"
+
+                if not _looks_like_duplicate_activity(
+                    user_id=current_user.id,
+                    activity_type=prepared_type,
+                    start_time=dt,
+                    duration_sec=prepared_duration,
+                    distance_m=prepared_distance,
+                    notes=prepared_notes,
+                ):
+                    act = Activity(
+                        user_id=current_user.id,
+                        activity_type=prepared_type,
+                        start_time=dt,
+                        duration=prepared_duration,
+                        distance=prepared_distance,
+                        avg_hr=int(avg_hr) if avg_hr else None,
+                        source="checkin",
+                        notes=prepared_notes,
+                    )
+                    db.session.add(act)
+                    created_activity = True
+            else:
+                # AI nie wyciągnęło danych
+                screenshot_failed = True
+
+        except Exception as e:
+            # Błąd parsowania (np. plik uszkodzony)
+            print(f"⚠️ Błąd parsowania screenshota: {e}")
+            screenshot_error_msg = tr(
+                "Błąd techniczny podczas odczytu screenshotu.",
+                "Technical error while parsing screenshot.",
+            )
+            screenshot_failed = True
+
+    # Fallback: Utwórz Activity "other" jeśli screenshot się nie powiódł
+    if not created_activity and text_note:
+        fallback_dt = datetime.now(timezone.utc)
+        if not _looks_like_duplicate_activity(
+            user_id=current_user.id,
+            activity_type="other",
+            start_time=fallback_dt,
+            duration_sec=0,
+            distance_m=0.0,
+            notes=text_note,
+        ):
+            act = Activity(
+                user_id=current_user.id,
+                activity_type="other",
+                start_time=fallback_dt,
+                duration=0,
+                distance=0.0,
+                avg_hr=None,
+                source="checkin",
+                notes=text_note,
+            )
+            db.session.add(act)
+            created_activity = True
+
+    db.session.commit()
+
+    # === KOMUNIKATY DLA UŻYTKOWNIKA ===
+    if created_activity and not screenshot_failed:
+        # Sukces: Activity utworzona ze screena lub tekstu
+        if image_path:
+            flash(tr("✅ Check-in zapisany! Trening dodany automatycznie ze screenshota.", "✅ Check-in saved! Workout added automatically from screenshot."), "success")
+        else:
+            flash(tr("✅ Check-in zapisany jako trening 'other'. Uzupełnij szczegóły ręcznie.", "✅ Check-in saved as 'other' workout. Complete details manually."), "info")
+
+    elif created_activity and screenshot_failed:
+        # Częściowy sukces: Screenshot nie zadziałał, ale tekst zapisany
+        flash(
+            (
+                tr(
+                    "⚠️ Screenshot nie zawierał danych treningowych. Zapisano check-in jako trening 'other' - uzupełnij dane ręcznie.",
+                    "⚠️ Screenshot did not contain workout data. Check-in was saved as 'other' workout - complete details manually.",
+                )
+                + (f" ({screenshot_error_msg})" if screenshot_error_msg else "")
+            ),
+            "warning")
+
+    elif not created_activity:
+        # Tylko check-in bez Activity (nie powinno się zdarzyć, ale zabezpieczenie)
+        flash(tr("ℹ️ Check-in zapisany bez treningu. Dodaj trening ręcznie.", "ℹ️ Check-in saved without workout. Add workout manually."), "info")
+
+    return redirect(url_for("dashboard.index"))
+
+
+@bp.route("/activity/<int:activity_id>")
+@login_required
+@conditional_on_data_version()
+def activity_detail(activity_id: int):
+    activity = (
+        Activity.query
+        .options(db.undefer(Activity.route_points_json))
+        .filter_by(id=activity_id, user_id=current_user.id)
+        .first_or_404()
+    )
+    plans = WorkoutPlan.query.filter_by(user_id=current_user.id).all()
+    metric_cards = _build_activity_detail_payload(activity)
+    return render_template(
+        "activity.html",
+        activity=activity,
+        plans=plans,
+        metric_cards=metric_cards,
+        route_version=route_version(activity.route_points_json),
+    )
+
+
+@bp.route("/activity/<int:activity_id>/route")
+@login_required
+def activity_route(activity_id: int):
+    """Trasa jako GeoJSON albo encoded polyline: ?detail=low|medium|high|full&format=geojson|polyline.
+
+    ETag wynika z treści trasy, więc inne zapisy użytkownika go nie unieważniają; URL z ?v=<wersja>
+    (tak linkuje strona aktywności) jest cache'owany przez przeglądarkę bez rewalidacji.
+    """
+    detail = (request.args.get("detail") or ROUTE_DEFAULT_DETAIL).strip().lower()
+    fmt = (request.args.get("format") or "geojson").strip().lower()
+    if detail not in ROUTE_DETAIL_TOLERANCE_M:
+        return jsonify({"ok": False, "error": tr("Nieznany poziom szczegółowości.", "Unknown detail level.")}), 400
+    if fmt not in ROUTE_FORMATS:
+        return jsonify({"ok": False, "error": tr("Nieznany format trasy.", "Unknown route format.")}), 400
+
+    raw_json = db.one_or_404(
+        db.select(Activity.route_points_json).filter_by(id=activity_id, user_id=current_user.id)
+    )
+    version = route_version(raw_json)
+    if version is None:
+        return jsonify({"ok": False, "error": tr("Ta aktywność nie ma trasy.", "This activity has no route.")}), 404
+
+    etag = f"{activity_id}-{version}-{detail}-{fmt}"
+    if request.args.get("v") == version:
+        cache_control = f"private, max-age={ROUTE_IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        cache_control = "private, no-cache"
+
+    if request.if_none_match.contains_weak(etag):
+        resp = current_app.response_class(status=304)
+    else:
+        payload = build_route_payload(raw_json, activity_id, detail, fmt)
+        if payload is None:
+            return jsonify({"ok": False, "error": tr("Ta aktywność nie ma trasy.", "This activity has no route.")}), 404
+        resp = jsonify(payload)
+        if fmt == "geojson":
+            resp.mimetype = "application/geo+json"
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = cache_control
+    return resp
+
+
+@bp.route("/activity/<int:activity_id>/apply_plan", methods=["POST"])
+@login_required
+def apply_plan_to_activity(activity_id: int):
+    activity = Activity.query.filter_by(id=activity_id, user_id=current_user.id).first_or_404()
+    plan_id = request.form.get("plan_id")
+    if not plan_id:
+        return redirect(url_for("activities.activity_detail", activity_id=activity_id))
+
+    plan = WorkoutPlan.query.filter_by(id=int(plan_id), user_id=current_user.id).first_or_404()
+
+    for template_ex in plan.exercises:
+        last_entry = (
+            Exercise.query
+            .join(Activity)
+            .filter(
+                Exercise.user_id == current_user.id,
+                Exercise.name == template_ex.name,
+                Activity.user_id == current_user.id,
+            )
+            .order_by(Activity.start_time.desc())
+            .first()
+        )
+        current_weight = last_entry.weight if last_entry else 0
+
+        new_ex = Exercise(
+            user_id=current_user.id,
+            activity_id=activity.id,
+            name=template_ex.name,
+            sets=template_ex.default_sets,
+            reps=template_ex.default_reps,
+            weight=current_weight,
+        )
+        db.session.add(new_ex)
+
+    db.session.commit()
+    return redirect(url_for("activities.activity_detail", activity_id=activity_id))
+
+
+@bp.route("/activity/<int:activity_id>/update", methods=["POST"])
+@login_required
+def update_activity(activity_id: int):
+    activity = Activity.query.filter_by(id=activity_id, user_id=current_user.id).first_or_404()
+
+    act_type = (request.form.get("activity_type") or activity.activity_type or "other").strip().lower()
+    date_str = (request.form.get("date") or "").strip()
+    time_str = (request.form.get("time") or "").strip()
+
+    duration_min = request.form.get("duration_min")
+    distance_km = request.form.get("distance_km")
+    avg_hr = request.form.get("avg_hr")
+    notes = request.form.get("notes")
+
+    activity.activity_type = act_type
+    activity.start_time = _parse_date_time(date_str, time_str)
+
+    duration_val = _parse_minutes_input(duration_min)
+    if duration_min not in (None, "") and duration_val is not None:
+        activity.duration = max(0, int(round(duration_val * 60)))
+
+    distance_val = _parse_decimal_input(distance_km)
+    if distance_km not in (None, "") and distance_val is not None:
+        activity.distance = max(0.0, distance_val) * 1000.0
+
+    hr_val = _parse_decimal_input(avg_hr)
+    if avg_hr not in (None, "") and hr_val is not None:
+        activity.avg_hr = int(round(hr_val))
+
+    activity.notes = notes
+
+    db.session.commit()
+    flash(tr("Zapisano zmiany w treningu.", "Workout changes saved."), "success")
+    return redirect(url_for("activities.activity_detail", activity_id=activity_id))
+
+
+@bp.route("/activity/<int:activity_id>/delete", methods=["POST"])
+@login_required
+def delete_activity(activity_id: int):
+    activity = Activity.query.filter_by(id=activity_id, user_id=current_user.id).first_or_404()
+    db.session.delete(activity)
+    db.session.commit()
+    flash(tr("Usunięto trening.", "Workout deleted."), "success")
+    return redirect(url_for("dashboard.index"))
+
+
+def _exercise_int(raw) -> int:
+    try:
+        return max(0, int(raw or 0))
+    except Exception:
+        return 0
+
+
+def _exercise_weight(raw) -> float:
+    try:
+        return max(0.0, float(str(raw or 0).replace(",", ".")))
+    except Exception:
+        return 0.0
+
+
+def _apply_exercise_fields(ex: Exercise, data: dict) -> None:
+    if "name" in data and isinstance(data["name"], str) and data["name"].strip():
+        ex.name = data["name"].strip()[:100]
+    if "sets" in data:
+        ex.sets = _exercise_int(data["sets"])
+    if "reps" in data:
+        ex.reps = _exercise_int(data["reps"])
+    if "weight" in data:
+        ex.weight = _exercise_weight(data["weight"])
+
+
+def _exercise_to_dict(ex: Exercise) -> dict:
+    return {"id": ex.id, "name": ex.name, "sets": ex.sets, "reps": ex.reps, "weight": ex.weight}
+
+
+@bp.route("/exercise/<int:exercise_id>/update", methods=["POST"])
+@login_required
+def update_exercise(exercise_id: int):
+    ex = Exercise.query.filter_by(id=exercise_id, user_id=current_user.id).first_or_404()
+    data = request.json or {}
+    _apply_exercise_fields(ex, {k: v for k, v in data.items() if k in ("sets", "reps", "weight")})
+    db.session.commit()
+    return jsonify({"success": True})
+
+
+@bp.route("/exercise/<int:exercise_id>/delete", methods=["POST"])
+@login_required
+def delete_exercise(exercise_id: int):
+    ex = Exercise.query.filter_by(id=exercise_id, user_id=current_user.id).first_or_404()
+    aid = ex.activity_id
+    db.session.delete(ex)
+    db.session.commit()
+    return redirect(url_for("activities.activity_detail", activity_id=aid))
+
+
+@bp.route("/activity/<int:activity_id>/exercises", methods=["POST"])
+@login_required
+def add_exercise_api(activity_id: int):
+    activity = Activity.query.filter_by(id=activity_id, user_id=current_user.id).first_or_404()
+    data = request.json or {}
+
+    for item in data.get("exercises", []):
+        ex = Exercise(
+            user_id=current_user.id,
+            activity_id=activity.id,
+            name=item.get("name"),
+            sets=_exercise_int(item.get("sets")),
+            reps=_exercise_int(item.get("reps")),
+            weight=_exercise_weight(item.get("weight")),
+        )
+        db.session.add(ex)
+
+    db.session.commit()
+    return jsonify({"status": "ok"})
+
+
+EXERCISE_BATCH_MAX_OPS = 200
+
+
+@bp.route("/activity/<int:activity_id>/exercises/batch", methods=["POST"])
+@login_required
+@idempotent
+def exercises_batch(activity_id: int):
+    """Wiele zmian dziennika ćwiczeń w jednym żądaniu i jednej transakcji.
+
+    Body: {"operations": [{"op": "create", "name", "sets", "reps", "weight"},
+                          {"op": "update", "id", ...pola},
+                          {"op": "delete", "id"}]}
+    Całość jest walidowana przed zapisem: błąd w jednej operacji -> 400/404 i nic nie jest zmieniane.
+    """
+    activity = Activity.query.filter_by(id=activity_id, user_id=current_user.id).first_or_404()
+    body = request.get_json(silent=True)
+    ops = body.get("operations") if isinstance(body, dict) else None
+    if not isinstance(ops, list) or not ops:
+        return jsonify({"ok": False, "error": tr("Brak operacji do wykonania.", "No operations to apply.")}), 400
+    if len(ops) > EXERCISE_BATCH_MAX_OPS:
+        return jsonify({"ok": False, "error": tr("Za dużo operacji w jednym żądaniu.", "Too many operations in one request.")}), 400
+
+    # Jedno zapytanie o ćwiczenia aktywności zamiast sprawdzania właściciela dla każdego id.
+    existing = {ex.id: ex for ex in Exercise.query.filter_by(activity_id=activity.id, user_id=current_user.id)}
+    for op in ops:
+        kind = op.get("op") if isinstance(op, dict) else None
+        if kind not in ("create", "update", "delete"):
+            return jsonify({"ok": False, "error": tr("Nieznana operacja.", "Unknown operation.")}), 400
+        if "name" in op and op["name"] is not None and not isinstance(op["name"], str):
+            return jsonify({"ok": False, "error": tr("Nazwa ćwiczenia musi być tekstem.", "Exercise name must be text.")}), 400
+        if kind == "create" and not (op.get("name") or "").strip():
+            return jsonify({"ok": False, "error": tr("Podaj nazwę ćwiczenia.", "Exercise name is required.")}), 400
+        if kind in ("update", "delete") and _safe_int(op.get("id")) not in existing:
+            return jsonify({"ok": False, "error": tr("Nie znaleziono ćwiczenia.", "Exercise not found.")}), 404
+
+    created = []
+    for op in ops:
+        kind = op["op"]
+        if kind == "create":
+            ex = Exercise(user_id=current_user.id, activity_id=activity.id, sets=0, reps=0, weight=0.0)
+            _apply_exercise_fields(ex, op)
+            db.session.add(ex)
+            created.append(ex)
+            continue
+        ex = existing.get(_safe_int(op["id"]))
+        if ex is None:  # usunięte wcześniej w tej samej paczce
+            continue
+        if kind == "update":
+            _apply_exercise_fields(ex, op)
+        else:
+            db.session.delete(ex)
+            existing.pop(ex.id, None)
+
+    # Odpowiedź składana przed commitem — po nim każdy obiekt byłby doczytywany osobnym SELECT.
+    db.session.flush()
+    payload = {
+        "ok": True,
+        "created": [ex.id for ex in created],
+        "exercises": [_exercise_to_dict(ex) for ex in sorted([*existing.values(), *created], key=lambda e: e.id)],
+    }
+    db.session.commit()
+    return jsonify(payload)
@@ -0,0 +1,466 @@
+"""Endpointy AI: czat z trenerem, generowanie planu, odczyt zrzutów ekranu, raport kosztów LLM.
+
+Moduły czatu i wizji (SDK Gemini, Pillow, prompty) są importowane wewnątrz widoków.
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import Blueprint, abort, copy_current_request_context, current_app, jsonify, request
+from flask_login import current_user, login_required
+
+from models import ChatMessage, LlmCall, UserProfile, db
+from http_cache import conditional_on_data_version
+from instrumentation import metrics_access_allowed
+from i18n import tr
+from parsing import _parse_date_time, _safe_int
+from training_data import (
+    _looks_like_duplicate_activity,
+    build_goal_progress,
+    build_weekly_target_context,
+    get_checkin_signal_snapshot,
+    get_execution_context,
+    get_profile_and_state_context,
+    get_recent_activity_details,
+    get_recent_checkins_summary,
+    get_week_execution_context,
+    get_weekly_aggregates,
+)
+from plan_engine import _apply_plan_rules, _finalize_plan_days, _save_active_plan, build_rule_based_plan_days
+import llm
+from llm import llm_generate
+
+bp = Blueprint("ai", __name__)
+
+VISION_BATCH_WORKERS = int(os.environ.get("VISION_BATCH_WORKERS", "4"))
+VISION_BATCH_MAX_FILES = int(os.environ.get("VISION_BATCH_MAX_FILES", "12"))
+
+
+@bp.route("/api/chat/history", methods=["GET"])
+@login_required
+@conditional_on_data_version("chat_version")
+def get_chat_history():
+    messages = (
+        ChatMessage.query
+        .filter_by(user_id=current_user.id)
+        .order_by(ChatMessage.timestamp.asc())
+        .all()
+    )
+    messages = messages[-50:]
+    history_data = [{"sender": m.sender, "content": m.content} for m in messages]
+    return jsonify(history_data)
+
+
+@bp.route("/api/chat", methods=["POST"])
+@login_required
+def chat_with_coach():
+    from coach_chat import CHAT_MODE, _chat_reply_full_prompt, _chat_reply_session, build_chat_context_sections
+
+    payload = request.json or {}
+    user_msg = payload.get("message")
+    if not user_msg:
+        return jsonify({"response": tr("Brak wiadomości.", "Missing message.")})
+
+    mode = (payload.get("mode") or CHAT_MODE or "session").strip().lower()
+    if mode not in ("session", "prompt"):
+        mode = "session"
+
+    user_message_db = ChatMessage(user_id=current_user.id, sender="user", content=user_msg)
+    db.session.add(user_message_db)
+    db.session.commit()
+
+    sections = build_chat_context_sections(current_user)
+    language_rule = tr(
+        "ODPOWIADAJ WYŁĄCZNIE PO POLSKU.",
+        "RESPOND ONLY IN ENGLISH.",
+    )
+
+    try:
+        if mode == "session":
+            clean_text, usage = _chat_reply_session(user_msg, sections, language_rule)
+        else:
+            clean_text, usage = _chat_reply_full_prompt(user_msg, sections, language_rule)
+
+        ai_message_db = ChatMessage(user_id=current_user.id, sender="ai", content=clean_text, chat_mode=mode, **usage)
+        db.session.add(ai_message_db)
+        db.session.commit()
+
+        return jsonify({"response": clean_text})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"response": tr(f"Błąd AI: {str(e)}", f"AI error: {str(e)}")})
+
+
+@bp.route("/api/chat/stats", methods=["GET"])
+@login_required
+def chat_stats():
+    """Porównanie trybów czatu ('session' vs 'prompt'): średnie tokeny promptu i czas odpowiedzi na turę.
+
+    Do pomiaru A/B można wymusić tryb per wiadomość: POST /api/chat {"mode": "prompt"}.
+    """
+    from coach_chat import CHAT_MODE
+
+    rows = (
+        db.session.query(
+            ChatMessage.chat_mode,
+            db.func.count(ChatMessage.id),
+            db.func.avg(ChatMessage.prompt_tokens),
+            db.func.avg(ChatMessage.cached_tokens),
+            db.func.avg(ChatMessage.prompt_tokens - db.func.coalesce(ChatMessage.cached_tokens, 0)),
+            db.func.avg(ChatMessage.latency_ms),
+            db.func.max(ChatMessage.latency_ms),
+        )
+        .filter(
+            ChatMessage.user_id == current_user.id,
+            ChatMessage.sender == "ai",
+            ChatMessage.chat_mode.isnot(None),
+        )
+        .group_by(ChatMessage.chat_mode)
+        .all()
+    )
+    modes = {}
+    for mode, count, avg_prompt, avg_cached, avg_uncached, avg_latency, max_latency in rows:
+        modes[mode] = {
+            "turns": int(count or 0),
+            "avg_prompt_tokens": round(float(avg_prompt), 1) if avg_prompt is not None else None,
+            "avg_cached_tokens": round(float(avg_cached), 1) if avg_cached is not None else None,
+            # Tokeny faktycznie przetwarzane od zera (stały prefiks sesji trafia w cache modelu).
+            "avg_uncached_prompt_tokens": round(float(avg_uncached), 1) if avg_uncached is not None else None,
+            "avg_latency_ms": round(float(avg_latency), 1) if avg_latency is not None else None,
+            "max_latency_ms": int(max_latency) if max_latency is not None else None,
+        }
+    return jsonify({"default_mode": CHAT_MODE, "modes": modes})
+
+
+@bp.route("/internal/llm-usage", methods=["GET"])
+def llm_usage_report():
+    """Zbiorczy raport z llm_calls: koszt i opóźnienie per funkcja / model / użytkownik / dzień / endpoint.
+
+    GET /internal/llm-usage?days=30&group_by=feature  (dostęp jak /internal/metrics)
+    """
+    if not metrics_access_allowed():
+        abort(404)
+
+    days = max(1, min(_safe_int(request.args.get("days")) or 30, 365))
+    group_by = (request.args.get("group_by") or "feature").strip().lower()
+    group_cols = {
+        "feature": LlmCall.feature,
+        "model": LlmCall.model,
+        "user": LlmCall.user_id,
+        "endpoint": LlmCall.endpoint,
+        "day": db.func.date(LlmCall.created_at),
+    }
+    if group_by not in group_cols:
+        return jsonify({"ok": False, "error": f"group_by must be one of: {', '.join(group_cols)}"}), 400
+    key_col = group_cols[group_by]
+    since = datetime.utcnow() - timedelta(days=days)
+
+    rows = (
+        db.session.query(
+            key_col.label("key"),
+            db.func.count(LlmCall.id),
+            db.func.sum(db.case((LlmCall.outcome == "error", 1), else_=0)),
+            db.func.sum(db.case((LlmCall.outcome == "empty", 1), else_=0)),
+            db.func.avg(LlmCall.latency_ms),
+            db.func.max(LlmCall.latency_ms),
+            db.func.sum(LlmCall.latency_ms),
+            db.func.sum(LlmCall.prompt_tokens),
+            db.func.sum(LlmCall.response_tokens),
+            db.func.sum(LlmCall.cached_tokens),
+            db.func.sum(LlmCall.prompt_chars),
+            db.func.sum(LlmCall.attachment_bytes),
+        )
+        .filter(LlmCall.created_at >= since)
+        .group_by(key_col)
+        .order_by(db.func.sum(LlmCall.latency_ms).desc())
+        .all()
+    )
+
+    groups = []
+    for key, calls, errors, empty, avg_ms, max_ms, total_ms, p_tok, r_tok, c_tok, p_chars, att_bytes in rows:
+        groups.append({
+            group_by: key,
+            "calls": int(calls or 0),
+            "errors": int(errors or 0),
+            "empty": int(empty or 0),
+            "avg_latency_ms": round(float(avg_ms), 1) if avg_ms is not None else None,
+            "max_latency_ms": int(max_ms) if max_ms is not None else None,
+            "total_latency_s": round(float(total_ms or 0) / 1000.0, 1),
+            "prompt_tokens": int(p_tok or 0),
+            "response_tokens": int(r_tok or 0),
+            "cached_tokens": int(c_tok or 0),
+            "prompt_chars": int(p_chars or 0),
+            "attachment_bytes": int(att_bytes or 0),
+        })
+
+    return jsonify({
+        "ok": True,
+        "days": days,
+        "group_by": group_by,
+        "totals": {
+            "calls": sum(g["calls"] for g in groups),
+            "errors": sum(g["errors"] for g in groups),
+            "prompt_tokens": sum(g["prompt_tokens"] for g in groups),
+            "response_tokens": sum(g["response_tokens"] for g in groups),
+            "total_latency_s": round(sum(g["total_latency_s"] for g in groups), 1),
+        },
+        "groups": groups,
+    })
+
+
+@bp.route("/api/forecast", methods=["GET"])
+@login_required
+def generate_forecast():
+    """Generuje plan od dziś do końca tygodnia i zapisuje go jako aktywny.
+
+    `?engine=local` pomija model i zwraca od razu plan z reguł (szkic na czas generowania
+    planu AI). Gdy model zawiedzie, ten sam planer służy jako fallback.
+    """
+    profile_obj = UserProfile.query.filter_by(user_id=current_user.id).first()
+    today_dt = datetime.now().date()
+    today = today_dt.strftime("%Y-%m-%d")
+    days_to_generate = max(1, 7 - today_dt.weekday())  # do niedzieli włącznie
+    weekly_target_context = build_weekly_target_context(current_user.id, profile_obj, today_dt)
+
+    def _local_plan_response(fallback: bool):
+        try:
+            days = build_rule_based_plan_days(
+                user_id=current_user.id,
+                profile_obj=profile_obj,
+                weekly_target_context=weekly_target_context,
+                days_to_generate=days_to_generate,
+                today_dt=today_dt,
+            )
+            text = _save_active_plan(current_user.id, _finalize_plan_days(days, profile_obj, today_dt), days_to_generate)
+        except Exception as e:
+            current_app.logger.exception("Local plan engine failed for user %s: %s", current_user.id, e)
+            db.session.rollback()
+            return jsonify({"plan": tr("Nie udało się wygenerować planu.", "Could not generate plan.")})
+        return jsonify({"plan": text, "source": "local", "fallback": fallback})
+
+    if (request.args.get("engine") or "").strip().lower() == "local":
+        return _local_plan_response(fallback=False)
+
+    profile_state = get_profile_and_state_context(current_user)
+    weekly_agg = get_weekly_aggregates(user_id=current_user.id, weeks=12)
+    recent_details = get_recent_activity_details(user_id=current_user.id, days=21)
+    recent_checkins = get_recent_checkins_summary(user_id=current_user.id, days=14)
+    execution_ctx = get_execution_context(user_id=current_user.id, days=10)
+    week_execution_ctx = get_week_execution_context(
+        user_id=current_user.id,
+        week_start=today_dt - timedelta(days=today_dt.weekday()),
+        week_end=today_dt,
+    )
+    checkin_signals = get_checkin_signal_snapshot(user_id=current_user.id, days=14)
+    goal_progress = build_goal_progress(
+        user_id=current_user.id,
+        profile_obj=profile_obj,
+    )
+
+    language_hint = tr(
+        "Opis i uzasadnienie pisz po polsku.",
+        "Write workout description and rationale in English.",
+    )
+
+    prompt = f"""
+Jesteś trenerem sportowym. Stwórz plan treningowy od dziś do końca tygodnia ({days_to_generate} dni, start: {today}).
+
+WAŻNE:
+- Uwzględnij ograniczenia i dostępność z PROFILU.
+- Jeżeli STATE wskazuje aktywny uraz/ograniczenia — plan ma być konserwatywny.
+- Uwzględnij WYKONANE TRENINGI: nie dubluj jednostek już wykonanych, chyba że to celowe.
+- Jeśli dziś wykonano już siłę/mobility, jutro preferuj inną modalność (np. bieg easy / regeneracja), chyba że cel wymaga inaczej.
+
+{profile_state}
+
+{weekly_agg}
+
+{recent_details}
+
+{recent_checkins}
+
+{execution_ctx}
+
+{week_execution_ctx}
+
+SYGNAŁY CHECK-IN:
+{json.dumps(checkin_signals, ensure_ascii=False)}
+
+KONTEKST CELU:
+{json.dumps(goal_progress, ensure_ascii=False) if goal_progress else "Brak aktywnego celu z datą."}
+
+CELE TYGODNIOWE UŻYTKOWNIKA (MUSISZ UWZGLĘDNIĆ):
+{json.dumps(weekly_target_context, ensure_ascii=False)}
+
+FORMAT (BARDZO WAŻNE):
+- Zwróć WYŁĄCZNIE JSON (bez markdown, bez komentarzy) w formie:
+  {{
+    "days": [
+      {{
+        "date": "YYYY-MM-DD",
+        "activity_type": "run|ride|swim|weighttraining|yoga|walk|other",
+        "workout": "konkretna jednostka z czasem/dystansem",
+        "details": "dokładny opis: rozgrzewka, część główna, schłodzenie",
+        "warmup": "krótko: czas + tempo/tętno + dystans jeśli dotyczy",
+        "main_set": "krótko: główna część treningu z parametrami",
+        "cooldown": "krótko: schłodzenie z czasem/zakresem",
+        "distance_km": number|null,
+        "duration_min": number|null,
+        "intensity": "easy|moderate|hard",
+        "phase": "base|build|taper|post-race",
+        "goal_link": "jedno zdanie jak ten trening wspiera cel użytkownika",
+        "why": "krótkie uzasadnienie",
+        "source_facts": ["3 krótkie fakty użyte do decyzji"]
+      }}
+    ]
+  }}
+- Dokładnie {days_to_generate} dni.
+- {language_hint}
+- Każdy dzień MUSI mieć: warmup, main_set, cooldown (bez pustych pól).
+- Priorytet: plan na pozostałe dni tygodnia powinien dążyć do domknięcia `remaining_to_fill`.
+- Nie dokładamy zbędnie modalności z `remaining_to_fill = 0`, chyba że wymagają tego regeneracja lub bezpieczeństwo.
+"""
+
+    try:
+        response = llm_generate(llm.plan_model, prompt, feature="forecast")
+        raw = (response.text or "").replace("```json", "").replace("```", "").strip()
+        plan_json = json.loads(raw)
+    except Exception as e:
+        current_app.logger.warning("Plan model failed for user %s, using local plan engine: %s", current_user.id, e)
+        return _local_plan_response(fallback=True)
+
+    days = []
+    if isinstance(plan_json, dict) and isinstance(plan_json.get("days"), list):
+        days = [d for d in plan_json["days"] if isinstance(d, dict)]
+    if len(days) < 1:
+        return _local_plan_response(fallback=True)
+
+    try:
+        days = _apply_plan_rules(
+            days,
+            user_id=current_user.id,
+            profile_obj=profile_obj,
+            days_to_generate=days_to_generate,
+        )[:days_to_generate]
+        text = _save_active_plan(current_user.id, _finalize_plan_days(days, profile_obj, today_dt), days_to_generate)
+    except Exception as e:
+        current_app.logger.exception("Saving AI plan failed for user %s: %s", current_user.id, e)
+        db.session.rollback()
+        return _local_plan_response(fallback=True)
+
+    return jsonify({"plan": text, "source": "ai", "fallback": False})
+
+
+@bp.route("/api/checkin/parse", methods=["POST"])
+@login_required
+def parse_checkin_screenshot():
+    from vision import _read_upload_for_vision, _screenshot_form_data, parse_strava_screenshot_to_activity_detailed
+
+    upload = _read_upload_for_vision(request.files.get("checkin_image"))
+    if not upload:
+        return jsonify({"ok": False, "error": tr("Brak pliku obrazu.", "Missing image file.")}), 400
+
+    img_bytes, mime_type = upload
+    parsed, parse_error = parse_strava_screenshot_to_activity_detailed(img_bytes, mime_type)
+    if parse_error:
+        return jsonify({"ok": False, "error": parse_error}), 422
+
+    return jsonify({"ok": True, "data": _screenshot_form_data(parsed)})
+
+
+@bp.route("/api/activity/batch-parse", methods=["POST"])
+@login_required
+def batch_parse_activity_screenshots():
+    """Parse several workout screenshots at once and return a reviewable list (nothing is saved).
+
+    Vision calls are I/O bound, so they run in a bounded thread pool; wall time stays close to a
+    single parse. Each item is flagged when it duplicates an existing activity or an earlier item
+    in the same batch.
+    """
+    from vision import _screenshot_form_data, normalize_image_for_vision, parse_strava_screenshot_to_activity_detailed
+
+    files = [f for f in request.files.getlist("activity_images") if f and f.filename]
+    if not files:
+        return jsonify({"ok": False, "error": tr("Brak plików obrazów.", "Missing image files.")}), 400
+    if len(files) > VISION_BATCH_MAX_FILES:
+        return jsonify({
+            "ok": False,
+            "error": tr(
+                f"Maksymalnie {VISION_BATCH_MAX_FILES} zrzutów naraz.",
+                f"At most {VISION_BATCH_MAX_FILES} screenshots at once.",
+            ),
+        }), 400
+
+    uploads = [(f.filename, f.read()) for f in files]
+
+    def _parse_one(filename: str, blob: bytes):
+        if not blob:
+            return {}, tr("Pusty plik.", "Empty file.")
+        img_bytes, mime_type = normalize_image_for_vision(blob, filename)
+        return parse_strava_screenshot_to_activity_detailed(img_bytes, mime_type)
+
+    workers = max(1, min(VISION_BATCH_WORKERS, len(uploads)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # tr() reads the session, so every worker gets its own copy of the request context.
+        futures = [
+            pool.submit(copy_current_request_context(_parse_one), filename, blob)
+            for filename, blob in uploads
+        ]
+        results = []
+        for fut in futures:
+            try:
+                results.append(fut.result())
+            except Exception as e:
+                current_app.logger.exception("Batch screenshot parse failed")
+                results.append(({}, str(e)))
+
+    items = []
+    seen: list[tuple[int, str, datetime, int, float]] = []
+    for idx, ((filename, _blob), (parsed, parse_error)) in enumerate(zip(uploads, results)):
+        item = {"index": idx, "filename": filename, "ok": not parse_error, "duplicate": False, "duplicate_of": None}
+        if parse_error:
+            item["error"] = parse_error
+            items.append(item)
+            continue
+
+        data = _screenshot_form_data(parsed)
+        item["data"] = data
+
+        # Same normalization as /activity/manual, so the guard matches what a save would store.
+        act_type = (data["activity_type"] or "other").strip().lower()
+        start_dt = _parse_date_time(data["date"], data["time"])
+        duration_sec = int(round(max(0.0, float(data["duration_min"] or 0.0)) * 60))
+        distance_m = max(0.0, float(data["distance_km"] or 0.0)) * 1000.0
+
+        for prev_idx, prev_type, prev_start, prev_dur, prev_dist in seen:
+            if (
+                prev_type == act_type
+                and abs((prev_start - start_dt).total_seconds()) <= 120
+                and prev_dur == duration_sec
+                and prev_dist == distance_m
+            ):
+                item["duplicate"] = True
+                item["duplicate_of"] = prev_idx
+                break
+        if not item["duplicate"] and _looks_like_duplicate_activity(
+            user_id=current_user.id,
+            activity_type=act_type,
+            start_time=start_dt,
+            duration_sec=duration_sec,
+            distance_m=distance_m,
+            notes=None,
+        ):
+            item["duplicate"] = True
+            item["duplicate_of"] = "existing"
+        if not item["duplicate"]:
+            seen.append((idx, act_type, start_dt, duration_sec, distance_m))
+        items.append(item)
+
+    return jsonify({
+        "ok": True,
+        "items": items,
+        "parsed": sum(1 for it in items if it["ok"]),
+        "duplicates": sum(1 for it in items if it["duplicate"]),
+    })
@@ -0,0 +1,549 @@
+"""Rejestracja, logowanie, reset hasła, onboarding i profil."""
+
+import os
+import smtplib
+import ssl
+from datetime import datetime
+from email.message import EmailMessage
+
+from flask import Blueprint, current_app, flash, redirect, render_template, request, session, url_for
+from flask_login import current_user, login_required, login_user, logout_user
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from models import User, UserProfile, db
+from i18n import tr
+from parsing import _clip
+from training_data import (
+    TARGET_SPORT_FIELDS,
+    TARGET_SPORT_ORDER,
+    _build_weekly_target_form_context,
+    _normalize_focus_sports,
+    _sync_legacy_weekly_goal,
+    clear_active_injury_states,
+    compute_profile_defaults_from_history,
+    get_current_injury_text,
+    set_or_refresh_injury_state,
+)
+
+bp = Blueprint("auth", __name__)
+
+def _password_reset_serializer() -> URLSafeTimedSerializer:
+    return URLSafeTimedSerializer(current_app.config["SECRET_KEY"])
+
+
+def _build_password_reset_token(user: User) -> str:
+    payload = {
+        "uid": user.id,
+        "ph": (user.password_hash or "")[-16:],
+    }
+    return _password_reset_serializer().dumps(payload, salt="password-reset")
+
+
+def _verify_password_reset_token(token: str, max_age_seconds: int = 3600) -> User | None:
+    try:
+        data = _password_reset_serializer().loads(token, salt="password-reset", max_age=max_age_seconds)
+    except (SignatureExpired, BadSignature):
+        return None
+
+    user_id = data.get("uid")
+    ph_tail = data.get("ph", "")
+    if not user_id:
+        return None
+
+    user = db.session.get(User, int(user_id))
+    if not user:
+        return None
+    if (user.password_hash or "")[-16:] != ph_tail:
+        return None
+    return user
+
+
+def _send_password_reset_email(to_email: str, reset_url: str) -> bool:
+    smtp_host = os.environ.get("MAIL_HOST", "smtp.gmail.com")
+    smtp_port = int(os.environ.get("MAIL_PORT", "587"))
+    smtp_user = os.environ.get("MAIL_USER")
+    smtp_password = os.environ.get("MAIL_PASSWORD")
+    mail_from = os.environ.get("MAIL_FROM") or smtp_user
+    use_tls = os.environ.get("MAIL_USE_TLS", "1").lower() in {"1", "true", "yes"}
+
+    if not smtp_user or not smtp_password or not mail_from:
+        current_app.logger.warning("Password reset mail not sent: missing MAIL_USER/MAIL_PASSWORD/MAIL_FROM.")
+        return False
+
+    subject = tr("Reset hasła - Training App", "Password reset - Training App")
+    body_text = tr(
+        f"""Cześć!
+
+Otrzymaliśmy prośbę o reset hasła.
+Kliknij link, aby ustawić nowe hasło (link ważny 60 minut):
+{reset_url}
+
+Jeśli to nie Ty, zignoruj tę wiadomość.""",
+        f"""Hi!
+
+We received a password reset request.
+Use the link below to set a new password (valid for 60 minutes):
+{reset_url}
+
+If this wasn't you, you can ignore this email.""",
+    )
+
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = mail_from
+    msg["To"] = to_email
+    msg.set_content(body_text)
+
+    try:
+        with smtplib.SMTP(smtp_host, smtp_port, timeout=20) as server:
+            if use_tls:
+                server.starttls(context=ssl.create_default_context())
+            server.login(smtp_user, smtp_password)
+            server.send_message(msg)
+        return True
+    except Exception as exc:
+        current_app.logger.exception("SMTP mail send failed: %s", exc)
+        return False
+
+
+@bp.route("/register", methods=["GET", "POST"])
+def register():
+    if current_user.is_authenticated:
+        return redirect(url_for("dashboard.index"))
+
+    if request.method == "POST":
+        preferred_lang = (request.form.get("preferred_lang") or "pl").strip().lower()
+        if preferred_lang not in ("pl", "en"):
+            preferred_lang = "pl"
+        session["lang"] = preferred_lang
+
+        email = (request.form.get("email") or "").strip().lower()
+        password = request.form.get("password") or ""
+        first_name = (request.form.get("first_name") or "").strip()
+        last_name = (request.form.get("last_name") or "").strip()
+        selected_sports = _normalize_focus_sports(request.form.getlist("weekly_focus_sports"))
+
+        zip_file = request.files.get("strava_zip")
+
+        if not email or not password:
+            flash(tr("Email i hasło są wymagane.", "Email and password are required."))
+            return redirect(url_for("auth.register"))
+
+        if User.query.filter_by(email=email).first():
+            flash(tr("Taki email już istnieje. Zaloguj się.", "This email already exists. Please sign in."))
+            return redirect(url_for("auth.login"))
+
+        user = User(
+            email=email,
+            password_hash=generate_password_hash(password),
+            first_name=first_name,
+            last_name=last_name,
+            preferred_lang=preferred_lang,
+        )
+        db.session.add(user)
+        db.session.commit()
+
+        profile = UserProfile(
+            user_id=user.id,
+            weekly_focus_sports=",".join(selected_sports),
+            primary_sports=",".join(selected_sports),
+        )
+        for sport in selected_sports:
+            field_name = TARGET_SPORT_FIELDS.get(sport)
+            if field_name:
+                setattr(profile, field_name, 1)
+        _sync_legacy_weekly_goal(profile)
+        db.session.add(profile)
+        db.session.commit()
+
+        login_user(user)
+        session["profile_prompt_seen"] = False
+
+        # ZIP jest opcjonalny podczas rejestracji.
+        if zip_file and getattr(zip_file, "filename", ""):
+            from importers import import_activity_archive_for_user_resilient
+
+            try:
+                source_kind, added, skipped = import_activity_archive_for_user_resilient(zip_file, user.id)
+                compute_profile_defaults_from_history(user.id)
+                flash(
+                    tr(
+                        f"Konto utworzone. ZIP ({source_kind}) zaimportowany: {added} aktywności (pominięto {skipped} duplikatów).",
+                        f"Account created. ZIP ({source_kind}) imported: {added} activities (skipped {skipped} duplicates).",
+                    )
+                )
+            except Exception as e:
+                current_app.logger.exception("ZIP import failed during registration: %s", e)
+                flash(
+                    tr(
+                        f"Konto utworzone, ale import ZIP się nie udał ({str(e)[:180]}).",
+                        f"Account created, but ZIP import failed ({str(e)[:180]}).",
+                    )
+                )
+        else:
+            flash(
+                tr(
+                    "Konto utworzone. Możesz od razu zacząć i uzupełnić profil później.",
+                    "Account created. You can start now and complete your profile later.",
+                )
+            )
+
+        return redirect(url_for("dashboard.index"))
+
+    return render_template(
+        "register.html",
+        target_sport_keys=TARGET_SPORT_ORDER,
+        focus_sports=["run", "gym"],
+    )
+
+
+@bp.route("/login", methods=["GET", "POST"])
+def login():
+    if current_user.is_authenticated:
+        return redirect(url_for("dashboard.index"))
+
+    if request.method == "POST":
+        email = (request.form.get("email") or "").strip().lower()
+        password = request.form.get("password") or ""
+
+        user = User.query.filter_by(email=email).first()
+        if not user or not check_password_hash(user.password_hash, password):
+            flash(tr("Nieprawidłowy email lub hasło.", "Invalid email or password."))
+            return redirect(url_for("auth.login"))
+
+        login_user(user)
+        session["lang"] = (getattr(user, "preferred_lang", None) or "pl")
+        if user.onboarding_completed:
+            session["profile_prompt_seen"] = True
+        else:
+            session.setdefault("profile_prompt_seen", False)
+        return redirect(url_for("dashboard.index"))
+
+    return render_template("login.html")
+
+
+@bp.route("/forgot-password", methods=["GET", "POST"])
+def forgot_password():
+    if current_user.is_authenticated:
+        return redirect(url_for("dashboard.index"))
+
+    if request.method == "POST":
+        email = (request.form.get("email") or "").strip().lower()
+        user = User.query.filter_by(email=email).first()
+
+        if user:
+            token = _build_password_reset_token(user)
+            reset_url = url_for("auth.reset_password", token=token, _external=True)
+            _send_password_reset_email(user.email, reset_url)
+
+        flash(
+            tr(
+                "Jeśli konto istnieje, wysłaliśmy link do resetu hasła.",
+                "If the account exists, we sent a password reset link.",
+            )
+        )
+        return redirect(url_for("auth.login"))
+
+    return render_template("forgot_password.html")
+
+
+@bp.route("/reset-password/<token>", methods=["GET", "POST"])
+def reset_password(token: str):
+    if current_user.is_authenticated:
+        return redirect(url_for("dashboard.index"))
+
+    user = _verify_password_reset_token(token)
+    if not user:
+        flash(
+            tr(
+                "Link do resetu jest nieprawidłowy albo wygasł. Spróbuj ponownie.",
+                "The reset link is invalid or expired. Please try again.",
+            )
+        )
+        return redirect(url_for("auth.forgot_password"))
+
+    if request.method == "POST":
+        password = request.form.get("password") or ""
+        password2 = request.form.get("password2") or ""
+
+        if len(password) < 8:
+            flash(tr("Hasło musi mieć co najmniej 8 znaków.", "Password must be at least 8 characters long."))
+            return render_template("reset_password.html", token=token)
+
+        if password != password2:
+            flash(tr("Hasła nie są takie same.", "Passwords do not match."))
+            return render_template("reset_password.html", token=token)
+
+        user.password_hash = generate_password_hash(password)
+        db.session.commit()
+        flash(tr("Hasło zostało zresetowane. Możesz się zalogować.", "Password has been reset. You can sign in now."))
+        return redirect(url_for("auth.login"))
+
+    return render_template("reset_password.html", token=token)
+
+
+@bp.route("/logout")
+@login_required
+def logout():
+    logout_user()
+    return redirect(url_for("auth.login"))
+
+
+@bp.route("/onboarding", methods=["GET", "POST"])
+@login_required
+def onboarding():
+    """Po rejestracji: użytkownik musi uzupełnić profil (FACTS/GOALS) + opcjonalny STATE."""
+    profile = UserProfile.query.filter_by(user_id=current_user.id).first()
+    if not profile:
+        profile = UserProfile(user_id=current_user.id)
+        db.session.add(profile)
+        db.session.commit()
+
+    if request.method == "POST":
+        def _to_float(v):
+            try:
+                if v is None:
+                    return None
+                s = str(v).strip().replace(",", ".")
+                return float(s) if s else None
+            except Exception:
+                return None
+
+        def _to_int(v):
+            try:
+                if v is None:
+                    return None
+                s = str(v).strip()
+                return int(s) if s else None
+            except Exception:
+                return None
+
+        # FACTS (bardziej otwarte)
+        profile.primary_sports = _clip(request.form.get("primary_sports"), 200)
+        profile.weekly_time_hours = _to_float(request.form.get("weekly_time_hours"))
+        profile.weekly_distance_km = _to_float(request.form.get("weekly_distance_km"))
+        profile.days_per_week = _to_int(request.form.get("days_per_week"))
+        selected_sports = _normalize_focus_sports(request.form.getlist("weekly_focus_sports"))
+        profile.weekly_focus_sports = ",".join(selected_sports)
+        for sport, field_name in TARGET_SPORT_FIELDS.items():
+            if sport in selected_sports:
+                setattr(profile, field_name, _to_int(request.form.get(field_name)) or 0)
+            else:
+                setattr(profile, field_name, 0)
+        profile.coach_style = _clip(request.form.get("coach_style"), 40)
+        profile.risk_tolerance = _clip(request.form.get("risk_tolerance"), 40)
+        profile.training_priority = _clip(request.form.get("training_priority"), 40)
+        profile.target_time_text = _clip(request.form.get("target_time_text"), 80)
+        experience_text = _clip(request.form.get("experience_text"), 10000)
+        context_text = _clip(request.form.get("context_text"), 10000)
+        if experience_text and context_text:
+            profile.experience_text = (experience_text + "\n" + context_text).strip()[:10000]
+        else:
+            profile.experience_text = experience_text or context_text
+
+        # GOALS
+        profile.goals_text = _clip(request.form.get("goals_text"), 10000)
+        profile.target_event = _clip(request.form.get("target_event"), 200) or None
+
+        target_date_str = (request.form.get("target_date") or "").strip()
+        if target_date_str:
+            try:
+                profile.target_date = datetime.strptime(target_date_str, "%Y-%m-%d").date()
+            except Exception:
+                profile.target_date = None
+
+        profile.preferences_text = _clip(request.form.get("preferences_text"), 10000)
+        profile.constraints_text = _clip(request.form.get("constraints_text"), 10000)
+
+        # STATE (czasowo wrażliwe) — zapisujemy osobno z TTL
+        injuries_text = (request.form.get("injuries_text") or "").strip()
+        if injuries_text:
+            set_or_refresh_injury_state(current_user.id, injuries_text)
+
+        _sync_legacy_weekly_goal(profile)
+        current_user.onboarding_completed = True
+        try:
+            db.session.commit()
+        except Exception as e:
+            current_app.logger.exception("Onboarding save failed for user %s: %s", current_user.id, e)
+            db.session.rollback()
+            flash(tr("Nie udało się zapisać profilu. Skróć wpisy i spróbuj ponownie.", "Could not save profile. Please shorten inputs and try again."))
+            return redirect(url_for("auth.onboarding"))
+
+        session["profile_prompt_seen"] = True
+        flash(tr("Dzięki! Profil zapisany. Możesz korzystać z dashboardu.", "Thanks! Profile saved. You can now use the dashboard."))
+        return redirect(url_for("dashboard.index"))
+
+    focus_sports, target_values = _build_weekly_target_form_context(profile)
+    return render_template(
+        "onboarding.html",
+        profile=profile,
+        target_sport_keys=TARGET_SPORT_ORDER,
+        target_sport_fields=TARGET_SPORT_FIELDS,
+        focus_sports=focus_sports,
+        target_values=target_values,
+    )
+
+
+@bp.route("/profile", methods=["GET", "POST"])
+@login_required
+def profile():
+    """Ekran edycji danych osobistych (po onboardingu)."""
+    profile_obj = UserProfile.query.filter_by(user_id=current_user.id).first()
+    if not profile_obj:
+        profile_obj = UserProfile(user_id=current_user.id)
+        db.session.add(profile_obj)
+        db.session.commit()
+
+    if request.method == "POST":
+        action = request.form.get("action") or "save"
+
+        if action == "reimport_zip":
+            zip_file = request.files.get("strava_zip")
+            if not zip_file or not getattr(zip_file, "filename", ""):
+                flash(tr("Wybierz plik ZIP do importu.", "Choose a ZIP file to import."))
+                return redirect(url_for("auth.profile"))
+            from importers import import_activity_archive_for_user_resilient
+
+            try:
+                source_kind, added, skipped = import_activity_archive_for_user_resilient(zip_file, current_user.id)
+                compute_profile_defaults_from_history(current_user.id)
+                flash(
+                    tr(
+                        f"Zaimportowano {added} aktywności z archiwum {source_kind} (pominięto {skipped} duplikatów).",
+                        f"Imported {added} activities from {source_kind} archive (skipped {skipped} duplicates).",
+                    )
+                )
+            except Exception as e:
+                current_app.logger.exception("ZIP reimport failed for user %s: %s", current_user.id, e)
+                flash(tr(f"Import nieudany: {str(e)[:180]}", f"Import failed: {str(e)[:180]}"))
+            return redirect(url_for("auth.profile"))
+
+        try:
+            # save
+            def _to_float(v):
+                try:
+                    if v is None:
+                        return None
+                    s = str(v).strip().replace(",", ".")
+                    return float(s) if s else None
+                except Exception:
+                    return None
+
+            def _to_int(v):
+                try:
+                    if v is None:
+                        return None
+                    s = str(v).strip()
+                    return int(s) if s else None
+                except Exception:
+                    return None
+
+            profile_obj.primary_sports = _clip(request.form.get("primary_sports"), 200)
+            profile_obj.weekly_time_hours = _to_float(request.form.get("weekly_time_hours"))
+            profile_obj.weekly_distance_km = _to_float(request.form.get("weekly_distance_km"))
+            profile_obj.days_per_week = _to_int(request.form.get("days_per_week"))
+            selected_sports = _normalize_focus_sports(request.form.getlist("weekly_focus_sports"))
+            profile_obj.weekly_focus_sports = ",".join(selected_sports)
+            for sport, field_name in TARGET_SPORT_FIELDS.items():
+                if sport in selected_sports:
+                    setattr(profile_obj, field_name, _to_int(request.form.get(field_name)) or 0)
+                else:
+                    setattr(profile_obj, field_name, 0)
+            profile_obj.coach_style = _clip(request.form.get("coach_style"), 40)
+            profile_obj.risk_tolerance = _clip(request.form.get("risk_tolerance"), 40)
+            profile_obj.training_priority = _clip(request.form.get("training_priority"), 40)
+            profile_obj.target_time_text = _clip(request.form.get("target_time_text"), 80)
+            profile_obj.experience_text = _clip(request.form.get("experience_text"), 10000)
+
+            profile_obj.goals_text = _clip(request.form.get("goals_text"), 10000)
+            profile_obj.target_event = _clip(request.form.get("target_event"), 200) or None
+
+            target_date_str = (request.form.get("target_date") or "").strip()
+            if target_date_str:
+                try:
+                    profile_obj.target_date = datetime.strptime(target_date_str, "%Y-%m-%d").date()
+                except Exception:
+                    profile_obj.target_date = None
+
+            profile_obj.preferences_text = _clip(request.form.get("preferences_text"), 10000)
+            profile_obj.constraints_text = _clip(request.form.get("constraints_text"), 10000)
+
+            injuries_text = (request.form.get("injuries_text") or "").strip()
+            if injuries_text:
+                set_or_refresh_injury_state(current_user.id, injuries_text)
+            else:
+                clear_active_injury_states(current_user.id)
+
+            _sync_legacy_weekly_goal(profile_obj)
+            db.session.commit()
+        except Exception as e:
+            current_app.logger.exception("Profile save failed for user %s: %s", current_user.id, e)
+            db.session.rollback()
+            flash(tr("Nie udało się zapisać profilu. Skróć wpisy i spróbuj ponownie.", "Could not save profile. Please shorten inputs and try again."))
+            return redirect(url_for("auth.profile"))
+
+        flash(tr("Zapisano zmiany w profilu.", "Profile changes saved."))
+        return redirect(url_for("auth.profile"))
+
+    try:
+        focus_sports, target_values = _build_weekly_target_form_context(profile_obj)
+        return render_template(
+            "profile.html",
+            profile=profile_obj,
+            current_injury_text=get_current_injury_text(current_user.id),
+            target_sport_keys=TARGET_SPORT_ORDER,
+            target_sport_fields=TARGET_SPORT_FIELDS,
+            focus_sports=focus_sports,
+            target_values=target_values,
+        )
+    except Exception as e:
+        current_app.logger.exception("Profile render failed for user %s: %s", current_user.id, e)
+        return (
+            tr(
+                "Błąd renderowania profilu. Sprawdź logi serwera.",
+                "Profile render error. Check server logs.",
+            ),
+            500,
+        )
+
+
+@bp.route("/profile/delete_account", methods=["POST"])
+@login_required
+def delete_account():
+    password = (request.form.get("password") or "").strip()
+    confirm_phrase = (request.form.get("confirm_phrase") or "").strip().lower()
+    allowed_phrases = {"usun konto", "usuń konto", "delete account"}
+
+    if not password:
+        flash(tr("Podaj hasło, aby usunąć konto.", "Enter your password to delete account."))
+        return redirect(url_for("auth.profile"))
+
+    if confirm_phrase not in allowed_phrases:
+        flash(
+            tr(
+                "Wpisz dokładnie „USUN KONTO” w potwierdzeniu usunięcia.",
+                "Type exactly “DELETE ACCOUNT” in the confirmation field.",
+            )
+        )
+        return redirect(url_for("auth.profile"))
+
+    if not check_password_hash(current_user.password_hash, password):
+        flash(tr("Nieprawidłowe hasło.", "Invalid password."))
+        return redirect(url_for("auth.profile"))
+
+    user_id = current_user.id
+    try:
+        logout_user()
+        user = db.session.get(User, int(user_id))
+        if user:
+            db.session.delete(user)
+            db.session.commit()
+        flash(tr("Konto zostało usunięte.", "Account has been deleted."))
+        return redirect(url_for("auth.register"))
+    except Exception as e:
+        current_app.logger.exception("Delete account failed for user %s: %s", user_id, e)
+        db.session.rollback()
+        flash(tr("Nie udało się usunąć konta.", "Could not delete account."))
+        return redirect(url_for("auth.profile"))
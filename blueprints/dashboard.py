@@ -0,0 +1,455 @@
+"""Panel główny: kalendarz tygodnia z planem, cele tygodnia i ostatnie aktywności.
+
+/api/dashboard oddaje to samo (plus dni aktywnego planu i ostatnią stronę czatu) jednym
+JSON-em — PWA na wolnej sieci komórkowej startuje z jednego żądania zamiast kilku po kolei.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+from flask import Blueprint, current_app, jsonify, render_template, request, session
+from flask_login import current_user, login_required
+
+from http_cache import conditional_on_data_version
+from models import Activity, ChatMessage, UserProfile, db
+from i18n import tr
+from parsing import _to_naive_utc
+from training_data import (
+    SPORT_STYLES,
+    WEEKDAYS_SHORT,
+    _activity_start_dt,
+    _count_sessions_by_target,
+    _get_focus_sports,
+    _get_weekly_session_targets,
+    _load_user_activities_with_fallback,
+    _target_bucket_label,
+    activity_label,
+    classify_sport,
+)
+from plan_engine import _plan_day_to_dict, get_active_plan_days
+from weather import (
+    GEOCODE_NAME_MAX_LEN,
+    WeatherUnavailable,
+    geocode_city,
+    get_forecast,
+    grid_cell,
+    requests_fetch_json,
+    seconds_to_next_hour,
+)
+
+bp = Blueprint("dashboard", __name__)
+
+# Model widoku tygodnia (kalendarz + cele) w pamięci procesu: jeden wpis na użytkownika.
+WEEK_VIEW_CACHE_MAX_USERS = 512
+DASHBOARD_RECENT_LIMIT = 10
+# Tyle samo, ile zwraca /api/chat/history.
+DASHBOARD_CHAT_PAGE_SIZE = 50
+_week_view_cache: OrderedDict = OrderedDict()
+_week_view_lock = threading.Lock()
+
+
+def _cached_week_view(
+    user_id: int,
+    data_version: int,
+    today: date,
+    lang: str,
+    week_acts: list[Activity] | None = None,
+    plan_rows: list | None = None,
+) -> dict:
+    """Model tygodnia z cache'u, o ile od ostatniego razu nie zmieniły się dane, dzień ani język.
+
+    Każdy zapis danych podbija users.data_version (http_cache), więc nowa wersja to nowy klucz —
+    stary wpis jest po prostu nadpisywany, bez osobnego unieważniania.
+    """
+    key = (data_version, today, lang)
+    with _week_view_lock:
+        hit = _week_view_cache.get(user_id)
+        if hit is not None and hit[0] == key:
+            _week_view_cache.move_to_end(user_id)
+            return hit[1]
+
+    view = _build_week_view(user_id, today, lang, week_acts=week_acts, plan_rows=plan_rows)
+    with _week_view_lock:
+        _week_view_cache[user_id] = (key, view)
+        _week_view_cache.move_to_end(user_id)
+        while len(_week_view_cache) > WEEK_VIEW_CACHE_MAX_USERS:
+            _week_view_cache.popitem(last=False)
+    return view
+
+
+def _week_bounds(today: date) -> tuple[datetime, datetime]:
+    """[poniedziałek 00:00, następny poniedziałek 00:00) bieżącego tygodnia."""
+    week_start = today - timedelta(days=today.weekday())
+    start = datetime.combine(week_start, datetime.min.time())
+    return start, start + timedelta(days=7)
+
+
+def _load_dashboard_activities(user_id: int, today: date) -> tuple[list[Activity] | None, list[Activity]]:
+    """Aktywności tygodnia i ostatnie DASHBOARD_RECENT_LIMIT jednym zapytaniem (zwykle się pokrywają).
+
+    Zwraca (aktywności tygodnia rosnąco, ostatnie malejąco). Gdy w tygodniu nic nie wyszło,
+    zamiast pustej listy jest None — model tygodnia czyta wtedy sam, z fallbackiem
+    dla mieszanych formatów dat w SQLite.
+    """
+    start, end = _week_bounds(today)
+    latest_ids = (
+        db.select(Activity.id)
+        .where(Activity.user_id == user_id)
+        .order_by(Activity.start_time.desc())
+        .limit(DASHBOARD_RECENT_LIMIT)
+    )
+    rows = (
+        Activity.query
+        .filter(
+            Activity.user_id == user_id,
+            db.or_(
+                db.and_(Activity.start_time >= start, Activity.start_time < end),
+                Activity.id.in_(latest_ids),
+            ),
+        )
+        .order_by(Activity.start_time.desc())
+        .all()
+    )
+    # Każda aktywność tygodnia spoza 10 najnowszych ma nad sobą 10 nowszych, więc początek
+    # posortowanej listy to dokładnie 10 najnowszych.
+    recent = rows[:DASHBOARD_RECENT_LIMIT]
+    week_acts = [
+        act for act in reversed(rows)
+        if (dt := _to_naive_utc(_activity_start_dt(act))) is not None and start <= dt < end
+    ]
+    return (week_acts or None), recent
+
+
+def _build_week_view(
+    user_id: int,
+    today: date,
+    lang: str,
+    week_acts: list[Activity] | None = None,
+    plan_rows: list | None = None,
+) -> dict:
+    """Kalendarz bieżącego tygodnia (wykonane + plan) i postęp celów tygodnia — tylko dane, bez ORM.
+
+    `week_acts` / `plan_rows` już wczytane przez wołającego oszczędzają własne zapytania.
+    """
+    if plan_rows is None:
+        _active_plan, plan_rows = get_active_plan_days(user_id)
+    week_start = today - timedelta(days=today.weekday())
+    week_dates = [week_start + timedelta(days=i) for i in range(7)]
+    week_end = week_start + timedelta(days=6)
+
+    if week_acts is None:
+        week_acts = _load_user_activities_with_fallback(
+            user_id=user_id,
+            start=datetime.combine(week_start, datetime.min.time()),
+            end=datetime.combine(week_end + timedelta(days=1), datetime.min.time()),
+            order_asc=True,
+        )
+
+    day_done = {
+        d.isoformat(): {
+            "count": 0,
+            "dist_km": 0.0,
+            "dur_min": 0,
+            "hr_sum": 0,
+            "hr_count": 0,
+            "sport_counts": {},
+            "activities": [],
+        }
+        for d in week_dates
+    }
+
+    def _normalize_sport(activity_type: str | None) -> str:
+        t = (activity_type or "").lower()
+        if t in SPORT_STYLES:
+            return t
+        return classify_sport(t)
+
+    for act in week_acts:
+        start_dt = _activity_start_dt(act)
+        if not start_dt:
+            continue
+        ds = start_dt.date().isoformat()
+        if ds not in day_done:
+            continue
+        entry = day_done[ds]
+        sport = _normalize_sport(act.activity_type)
+        entry["count"] += 1
+        entry["dist_km"] += float(act.distance or 0.0) / 1000.0
+        entry["dur_min"] += int((act.duration or 0) / 60)
+        if act.avg_hr:
+            entry["hr_sum"] += int(act.avg_hr)
+            entry["hr_count"] += 1
+        entry["sport_counts"][sport] = entry["sport_counts"].get(sport, 0) + 1
+        entry["activities"].append({
+            "id": act.id,
+            "sport": sport,
+            "label": activity_label(act.activity_type),
+            "dist_km": round(float(act.distance or 0.0) / 1000.0, 2),
+            "dur_min": int((act.duration or 0) / 60),
+            "avg_hr": int(act.avg_hr) if act.avg_hr else None,
+            "time": start_dt.strftime("%H:%M"),
+        })
+
+    plan_map = {}
+    for row in plan_rows:
+        d_obj = row.day_date
+        if not d_obj or d_obj < week_start or d_obj > week_end:
+            continue
+        item = _plan_day_to_dict(row)
+        plan_map[d_obj.isoformat()] = {
+            "sport": _normalize_sport(item.get("sport")),
+            "workout": item.get("workout") or "",
+            "why": item.get("why") or "",
+            "details": item.get("details") or "",
+            "intensity": (item.get("intensity") or "").lower(),
+            "phase": item.get("phase") or "",
+            "goal_link": item.get("goal_link") or "",
+            "warmup": item.get("warmup") or "",
+            "main_set": item.get("main_set") or "",
+            "cooldown": item.get("cooldown") or "",
+            "distance_km": item.get("distance_km"),
+            "duration_min": item.get("duration_min"),
+            "source_facts": item.get("source_facts") or [],
+        }
+
+    weekday_short = WEEKDAYS_SHORT.get(lang, WEEKDAYS_SHORT["pl"])
+    week_days = []
+    for d in week_dates:
+        iso = d.isoformat()
+        done = day_done[iso]
+        plan = plan_map.get(iso)
+        dominant_sport = "other"
+        if done["sport_counts"]:
+            dominant_sport = max(done["sport_counts"].items(), key=lambda x: x[1])[0]
+        elif plan:
+            dominant_sport = plan.get("sport") or "other"
+
+        avg_hr = int(round(done["hr_sum"] / done["hr_count"])) if done["hr_count"] else None
+        if done["count"] > 0:
+            card_kind = "done"
+        elif plan and d >= today:
+            card_kind = "planned"
+        else:
+            card_kind = "empty"
+
+        week_days.append({
+            "date": iso,
+            "weekday_short": weekday_short[d.weekday()],
+            "is_today": d == today,
+            "is_past": d < today,
+            "drop_allowed": (d >= today and done["count"] == 0),
+            "card_kind": card_kind,
+            "sport": dominant_sport,
+            "done": {
+                "count": done["count"],
+                "dist_km": round(done["dist_km"], 2),
+                "dur_min": done["dur_min"],
+                "avg_hr": avg_hr,
+                "activities": done["activities"],
+            },
+            "plan": plan,
+        })
+
+    # Weekly goals + coach note
+    profile_obj = UserProfile.query.filter_by(user_id=user_id).first()
+    weekly_targets = _get_weekly_session_targets(profile_obj)
+    # Do dziś włącznie — z aktywności tygodnia już wczytanych wyżej, bez drugiego zapytania.
+    until = datetime.combine(today + timedelta(days=1), datetime.min.time())
+    weekly_done = _count_sessions_by_target([
+        act for act in week_acts
+        if (dt := _to_naive_utc(_activity_start_dt(act))) is not None and dt < until
+    ])
+    focus_sports = _get_focus_sports(profile_obj, weekly_targets)
+
+    weekly_goal_items = []
+    for bucket in focus_sports:
+        target_val = int(weekly_targets.get(bucket, 0) or 0)
+        if target_val <= 0:
+            continue
+        done_val = int(weekly_done.get(bucket, 0) or 0)
+        weekly_goal_items.append(f"{_target_bucket_label(bucket)}: {done_val}/{target_val}")
+
+    done_total = sum(int(weekly_done.get(k, 0) or 0) for k in focus_sports)
+    weekly_goal_target = max(1, sum(int(weekly_targets.get(k, 0) or 0) for k in focus_sports))
+    completion_pct = int(round(min(100.0, (done_total / max(1, weekly_goal_target)) * 100.0)))
+    days_left = (week_end - today).days
+
+    if completion_pct >= 100:
+        coach_note = tr(
+            "Świetna robota — cel tygodnia już domknięty. Utrzymaj jakość i regenerację.",
+            "Great work — weekly goal already completed. Keep quality and recovery high.",
+        )
+    elif days_left <= 2 and completion_pct < 60:
+        coach_note = tr(
+            "Końcówka tygodnia jest napięta. Postaw na 1 kluczową jednostkę + 1 krótszy trening.",
+            "Week ending is tight. Focus on 1 key session + 1 shorter workout.",
+        )
+    else:
+        coach_note = tr(
+            "Plan wygląda stabilnie. Pilnuj regularności i unikaj dwóch ciężkich dni pod rząd.",
+            "Plan looks stable. Stay consistent and avoid two hard days back-to-back.",
+        )
+
+    return {
+        "week_days": week_days,
+        "weekly_goal_items": weekly_goal_items,
+        "weekly_goal_target": weekly_goal_target,
+        "weekly_done_total": done_total,
+        "weekly_completion_pct": completion_pct,
+        "coach_note": coach_note,
+    }
+
+
+@bp.route("/")
+@login_required
+def index():
+    show_profile_prompt = (not current_user.onboarding_completed) and (not session.get("profile_prompt_seen", False))
+    if show_profile_prompt:
+        session["profile_prompt_seen"] = True
+
+    today = datetime.now().date()
+    week_acts, recent_activities = _load_dashboard_activities(current_user.id, today)
+    week_view = _cached_week_view(
+        current_user.id,
+        current_user.data_version or 0,
+        today,
+        session.get("lang", "pl"),
+        week_acts=week_acts,
+    )
+
+    return render_template(
+        "index.html",
+        activities=recent_activities,
+        today_str=today.isoformat(),
+        show_profile_prompt=show_profile_prompt,
+        **week_view,
+    )
+
+
+@bp.route("/dashboard/week")
+@login_required
+@conditional_on_data_version()
+def week_calendar():
+    """Sam kalendarz tygodnia z celami (HTML) — strona podmienia go po zapisie szkicu planu bez przeładowania."""
+    week_view = _cached_week_view(
+        current_user.id,
+        current_user.data_version or 0,
+        datetime.now().date(),
+        session.get("lang", "pl"),
+    )
+    return render_template("_week_calendar.html", **week_view)
+
+
+@bp.route("/api/dashboard", methods=["GET"])
+@login_required
+@conditional_on_data_version(("data_version", "chat_version"))
+def dashboard_bootstrap():
+    """Dane startowe panelu w jednym JSON-ie.
+
+    - week: model tygodnia jak w index.html (week_days, cele, coach_note)
+    - recent_activities: ostatnie DASHBOARD_RECENT_LIMIT aktywności
+    - plan: aktywny plan z dniami od początku bieżącego tygodnia (albo null)
+    - chat: ostatnie DASHBOARD_CHAT_PAGE_SIZE wiadomości rosnąco, has_more gdy jest starsza historia
+
+    Tydzień i ostatnie aktywności pochodzą z jednego odczytu aktywności, a dni planu z jednego
+    odczytu planu (używanego też przez model tygodnia). ETag obejmuje wersję danych i czatu.
+    """
+    user_id = current_user.id
+    today = datetime.now().date()
+    week_acts, recent = _load_dashboard_activities(user_id, today)
+    active_plan, plan_rows = get_active_plan_days(user_id)
+    week_view = _cached_week_view(
+        user_id,
+        current_user.data_version or 0,
+        today,
+        session.get("lang", "pl"),
+        week_acts=week_acts,
+        plan_rows=plan_rows,
+    )
+
+    week_start = today - timedelta(days=today.weekday())
+    plan = None
+    if active_plan is not None:
+        plan = {
+            "id": active_plan.id,
+            "days": [
+                _plan_day_to_dict(row) for row in plan_rows
+                if row.day_date and row.day_date >= week_start
+            ],
+        }
+
+    chat_rows = (
+        ChatMessage.query
+        .filter_by(user_id=user_id)
+        .order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc())
+        .limit(DASHBOARD_CHAT_PAGE_SIZE + 1)
+        .all()
+    )
+    has_more = len(chat_rows) > DASHBOARD_CHAT_PAGE_SIZE
+    chat_rows = chat_rows[:DASHBOARD_CHAT_PAGE_SIZE][::-1]
+
+    return jsonify({
+        "ok": True,
+        "today": today.isoformat(),
+        "week": week_view,
+        "recent_activities": [
+            {
+                "id": act.id,
+                "type": act.activity_type,
+                "label": activity_label(act.activity_type),
+                "start_time": act.start_time.isoformat() if act.start_time else None,
+                "duration_min": int((act.duration or 0) / 60),
+                "distance_km": round(float(act.distance or 0.0) / 1000.0, 2),
+            }
+            for act in recent
+        ],
+        "plan": plan,
+        "chat": {
+            "messages": [{"sender": m.sender, "content": m.content} for m in chat_rows],
+            "has_more": has_more,
+        },
+    })
+
+
+@bp.route("/api/weather", methods=["GET"])
+@login_required
+def weather():
+    """Prognoza dzienna do kalendarza: ?lat=&lon= albo ?city=; wspólny cache okolicy (weather.py)."""
+    fetcher = current_app.config.get("WEATHER_FETCHER") or requests_fetch_json
+    lang = session.get("lang", "pl")
+    place = None
+
+    city = (request.args.get("city") or "").strip()
+    try:
+        if city:
+            if len(city) > GEOCODE_NAME_MAX_LEN:
+                return jsonify({"ok": False, "error": tr("Za długa nazwa miasta.", "City name is too long.")}), 400
+            place = geocode_city(city, lang, fetcher)
+            if place is None:
+                return jsonify({"ok": False, "error": tr("Nie znaleziono miasta.", "City not found.")}), 404
+            lat, lon = place["lat"], place["lon"]
+        else:
+            try:
+                lat = float(request.args.get("lat", ""))
+                lon = float(request.args.get("lon", ""))
+            except ValueError:
+                lat = lon = None
+            if lat is None or not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+                return jsonify({"ok": False, "error": tr("Nieprawidłowe współrzędne.", "Invalid coordinates.")}), 400
+
+        forecast, stale = get_forecast(lat, lon, fetcher, current_app.logger)
+    except WeatherUnavailable as exc:
+        current_app.logger.warning("Weather unavailable: %s", exc)
+        return jsonify({"ok": False, "error": tr("Pogoda chwilowo niedostępna.", "Weather is temporarily unavailable.")}), 502
+
+    cell_lat, cell_lon = grid_cell(lat, lon)
+    resp = jsonify({
+        "ok": True,
+        "stale": stale,
+        "location": {"lat": cell_lat, "lon": cell_lon, "name": place["name"] if place else None},
+        **forecast,
+    })
+    # Do końca godziny prognozy odpowiedź się nie zmieni (nieświeżą przeglądarka dopyta za minutę).
+    resp.headers["Cache-Control"] = f"private, max-age={60 if stale else seconds_to_next_hour()}"
+    return resp
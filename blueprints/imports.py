@@ -0,0 +1,41 @@
+"""Import archiwum ZIP (Garmin / Strava) z poziomu panelu."""
+
+from flask import Blueprint, current_app, flash, redirect, request, url_for
+from flask_login import current_user, login_required
+
+from i18n import tr
+from training_data import compute_profile_defaults_from_history
+
+bp = Blueprint("imports", __name__)
+
+@bp.route("/import_zip", methods=["POST"])
+@login_required
+def import_zip():
+    from importers import import_activity_archive_for_user_resilient
+
+    if "file" not in request.files:
+        flash(tr("Nie wybrano pliku", "No file selected"))
+        return redirect(url_for("dashboard.index"))
+
+    file = request.files["file"]
+    if not file or file.filename == "":
+        flash(tr("Nie wybrano pliku", "No file selected"))
+        return redirect(url_for("dashboard.index"))
+
+    try:
+        source_kind, added_count, skipped_count = import_activity_archive_for_user_resilient(file, current_user.id)
+        flash(
+            tr(
+                f"Sukces! Zaimportowano {added_count} treningów z archiwum {source_kind}. Pominięto {skipped_count}.",
+                f"Success! Imported {added_count} workouts from {source_kind} archive. Skipped {skipped_count}.",
+            )
+        )
+        try:
+            compute_profile_defaults_from_history(current_user.id)
+        except Exception:
+            pass
+    except Exception as e:
+        current_app.logger.exception("ZIP import endpoint error for user %s: %s", current_user.id, e)
+        flash(tr(f"Błąd pliku ZIP: {str(e)[:180]}", f"ZIP file error: {str(e)[:180]}"))
+
+    return redirect(url_for("dashboard.index"))
@@ -0,0 +1,80 @@
+"""Metryki: wykresy i postęp celu dla wybranego zakresu dni.
+
+Strona to lekka powłoka (profil celu, postęp do startu); kafelki i wykresy zakresu
+strona dociąga z /api/metrics/series, więc przełączanie zakresu nie przeładowuje HTML.
+"""
+
+from datetime import date, datetime, timedelta
+
+from flask import Blueprint, jsonify, render_template, request
+from flask_login import current_user, login_required
+
+from http_cache import conditional_on_data_version
+from i18n import tr
+from models import UserProfile
+from training_data import SERIES_RESOLUTIONS, _get_weekly_session_targets, build_goal_progress, compute_metric_series
+
+bp = Blueprint("metrics", __name__)
+
+METRICS_RANGES = (7, 30, 90, 365)
+SERIES_MAX_DAYS = 3 * 366
+
+
+@bp.route("/metrics")
+@login_required
+@conditional_on_data_version()
+def metrics():
+    try:
+        range_days = int(request.args.get("days", "7"))
+    except Exception:
+        range_days = 7
+    if range_days not in METRICS_RANGES:
+        range_days = 7
+
+    profile_obj = UserProfile.query.filter_by(user_id=current_user.id).first()
+    weekly_targets = _get_weekly_session_targets(profile_obj)
+    weekly_goal = int(weekly_targets.get("run", 0) or 0)
+    if weekly_goal <= 0:
+        weekly_goal = int(profile_obj.weekly_goal_workouts or 3) if profile_obj else 3
+    weekly_goal = max(1, int(weekly_goal))
+
+    goal_progress = build_goal_progress(user_id=current_user.id, profile_obj=profile_obj)
+
+    return render_template(
+        "metrics.html",
+        range_days=range_days,
+        metrics_ranges=METRICS_RANGES,
+        weekly_goal=weekly_goal,
+        goal_progress=goal_progress,
+    )
+
+
+@bp.route("/api/metrics/series", methods=["GET"])
+@login_required
+@conditional_on_data_version()
+def metrics_series():
+    """Serie wykresów dla zakresu: ?days=N albo ?start=YYYY-MM-DD&end=YYYY-MM-DD, &resolution=day|week|month."""
+    resolution = (request.args.get("resolution") or "day").strip().lower()
+    if resolution not in SERIES_RESOLUTIONS:
+        return jsonify({"ok": False, "error": tr("Nieznana rozdzielczość.", "Unknown resolution.")}), 400
+
+    invalid_range = jsonify({"ok": False, "error": tr("Niepoprawny zakres dat.", "Invalid date range.")}), 400
+    today = date.today()
+    try:
+        if request.args.get("start"):
+            start_date = datetime.strptime(request.args["start"], "%Y-%m-%d").date()
+            end_date = datetime.strptime(request.args.get("end") or today.isoformat(), "%Y-%m-%d").date()
+        else:
+            days = max(1, int(request.args.get("days", "7")))
+            # Limit przed timedelta — ogromne `days` rzuca OverflowError zamiast dojść do sprawdzenia niżej.
+            if days > SERIES_MAX_DAYS:
+                return invalid_range
+            end_date = today
+            start_date = today - timedelta(days=days - 1)
+    except ValueError:
+        return invalid_range
+    if start_date > end_date or (end_date - start_date).days >= SERIES_MAX_DAYS:
+        return invalid_range
+
+    series = compute_metric_series(current_user.id, start_date, end_date, resolution)
+    return jsonify({"ok": True, **series})
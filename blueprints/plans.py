@@ -0,0 +1,108 @@
+"""Plany siłowe użytkownika i przesuwanie dni aktywnego planu tygodnia."""
+
+from datetime import date, datetime
+
+from flask import Blueprint, jsonify, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+
+from models import PlanExercise, WorkoutPlan, db
+from i18n import tr
+from idempotency import idempotent
+from plan_engine import _plan_day_to_dict, get_active_plan_days
+
+bp = Blueprint("plans", __name__)
+
+@bp.route("/api/plan/move", methods=["POST"])
+@login_required
+@idempotent
+def move_plan_day():
+    payload = request.json or {}
+    from_date = (payload.get("from_date") or "").strip()
+    to_date = (payload.get("to_date") or "").strip()
+    if not from_date or not to_date:
+        return jsonify({"ok": False, "error": tr("Brak dat do zmiany.", "Missing dates.")}), 400
+
+    try:
+        from_day = datetime.strptime(from_date, "%Y-%m-%d").date()
+        to_day = datetime.strptime(to_date, "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"ok": False, "error": tr("Niepoprawny format daty.", "Invalid date format.")}), 400
+
+    active_plan, rows = get_active_plan_days(current_user.id)
+    if not active_plan:
+        return jsonify({"ok": False, "error": tr("Brak aktywnego planu.", "No active plan.")}), 404
+    if not rows:
+        return jsonify({"ok": False, "error": tr("Brak dni do modyfikacji.", "No days to move.")}), 400
+
+    src_row = next((r for r in rows if r.day_date == from_day), None)
+    dst_row = next((r for r in rows if r.day_date == to_day), None)
+    if src_row is None:
+        return jsonify({"ok": False, "error": tr("Nie znaleziono dnia źródłowego.", "Source day not found.")}), 404
+
+    # Zamiana to update dwóch wierszy; html_content zostaje migawką z generowania.
+    src_row.day_date = to_day
+    if dst_row is not None and dst_row is not src_row:
+        dst_row.day_date = from_day
+    db.session.commit()
+
+    rows.sort(key=lambda r: r.day_date or date.min)
+    return jsonify({"ok": True, "days": [_plan_day_to_dict(r) for r in rows]})
+
+
+@bp.route("/plans")
+@login_required
+def plans_list():
+    plans = WorkoutPlan.query.filter_by(user_id=current_user.id).all()
+    return render_template("plans.html", plans=plans)
+
+
+@bp.route("/plans/add", methods=["POST"])
+@login_required
+def add_plan():
+    name = request.form.get("name")
+    if name:
+        new_plan = WorkoutPlan(user_id=current_user.id, name=name)
+        db.session.add(new_plan)
+        db.session.commit()
+    return redirect(url_for("plans.plans_list"))
+
+
+@bp.route("/plans/<int:plan_id>/add_exercise", methods=["POST"])
+@login_required
+def add_plan_exercise(plan_id: int):
+    plan = WorkoutPlan.query.filter_by(id=plan_id, user_id=current_user.id).first_or_404()
+
+    name = request.form.get("name")
+    sets = request.form.get("sets")
+    reps = request.form.get("reps")
+
+    if name:
+        ex = PlanExercise(
+            user_id=current_user.id,
+            plan=plan,
+            name=name,
+            default_sets=int(sets) if sets else 0,
+            default_reps=int(reps) if reps else 0,
+        )
+        db.session.add(ex)
+        db.session.commit()
+
+    return redirect(url_for("plans.plans_list"))
+
+
+@bp.route("/plans/<int:plan_id>/delete", methods=["POST"])
+@login_required
+def delete_plan(plan_id: int):
+    plan = WorkoutPlan.query.filter_by(id=plan_id, user_id=current_user.id).first_or_404()
+    db.session.delete(plan)
+    db.session.commit()
+    return redirect(url_for("plans.plans_list"))
+
+
+@bp.route("/plans/exercise/<int:exercise_id>/delete", methods=["POST"])
+@login_required
+def delete_plan_exercise(exercise_id: int):
+    ex = PlanExercise.query.filter_by(id=exercise_id, user_id=current_user.id).first_or_404()
+    db.session.delete(ex)
+    db.session.commit()
+    return redirect(url_for("plans.plans_list"))
@@ -0,0 +1,171 @@
+"""Czat z trenerem AI: kontekst użytkownika, tryb pełnego promptu i tryb sesji z deltami.
+
+Importowany dopiero przez widoki czatu (razem z promptami z ask_coach).
+"""
+
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+from flask import session
+from flask_login import current_user
+
+from models import ChatMessage, ChatSession, UserProfile, db
+from training_data import (
+    build_goal_progress,
+    get_checkin_signal_snapshot,
+    get_execution_context,
+    get_profile_and_state_context,
+    get_recent_activity_details,
+    get_recent_checkins_summary,
+    get_weekly_aggregates,
+)
+import llm
+from llm import CHAT_MODEL, llm_generate
+from ask_coach import (
+    build_chat_history,
+    build_chat_prompt,
+    build_chat_session_opening,
+    build_chat_session_system,
+    build_chat_session_turn,
+)
+
+
+# Tryb czatu: 'session' (kontekst raz na okno rozmowy + delty) albo 'prompt' (pełny prompt co turę).
+CHAT_MODE = os.environ.get("CHAT_MODE", "session").strip().lower()
+CHAT_SESSION_IDLE_MINUTES = int(os.environ.get("CHAT_SESSION_IDLE_MINUTES", "120"))
+CHAT_SESSION_MAX_TURNS = int(os.environ.get("CHAT_SESSION_MAX_TURNS", "20"))
+
+
+def build_chat_context_sections(user) -> dict:
+    """Kontekst warstwowy czatu (bez zalewania całej bazy), jako nazwane sekcje."""
+    goal_progress = build_goal_progress(
+        user_id=user.id,
+        profile_obj=UserProfile.query.filter_by(user_id=user.id).first(),
+    )
+    return {
+        "profile_state": get_profile_and_state_context(user),
+        "weekly_agg": get_weekly_aggregates(user_id=user.id, weeks=12),
+        "recent_details": get_recent_activity_details(user_id=user.id, days=21),
+        "recent_checkins": get_recent_checkins_summary(user_id=user.id, days=14),
+        "execution_context": get_execution_context(user_id=user.id, days=10),
+        "checkin_signals": json.dumps(get_checkin_signal_snapshot(user_id=user.id, days=14), ensure_ascii=False),
+        "goal_context": json.dumps(goal_progress, ensure_ascii=False) if goal_progress else "Brak aktywnego celu z datą.",
+    }
+
+
+def _clean_chat_reply(response) -> str:
+    return (response.text or "").replace("```html", "").replace("```", "").replace("**", "")
+
+
+def _chat_usage(response, started: float, session_id: int | None = None) -> dict:
+    meta = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(meta, "prompt_token_count", None) if meta is not None else None
+    cached_tokens = getattr(meta, "cached_content_token_count", None) if meta is not None else None
+    return {
+        "session_id": session_id,
+        "prompt_tokens": int(prompt_tokens) if prompt_tokens else None,
+        "cached_tokens": int(cached_tokens) if cached_tokens else None,
+        "latency_ms": int(round((time.perf_counter() - started) * 1000)),
+    }
+
+
+def _chat_reply_full_prompt(user_msg: str, sections: dict, language_rule: str) -> tuple[str, dict]:
+    """Dotychczasowa ścieżka: cały kontekst + ostatnie 20 wiadomości w jednym prompcie."""
+    full_prompt = build_chat_prompt(
+        today_iso=datetime.now().strftime("%Y-%m-%d"),
+        chat_history=build_chat_history(_recent_chat_messages(current_user.id), max_age_days=14),
+        user_msg=user_msg,
+        **sections,
+    )
+    full_prompt += "\n\n" + language_rule
+
+    started = time.perf_counter()
+    response = llm_generate(llm.chat_model, full_prompt, feature="chat")
+    return _clean_chat_reply(response), _chat_usage(response, started)
+
+
+def _recent_chat_messages(user_id: int, limit: int = 20) -> list[ChatMessage]:
+    return (
+        ChatMessage.query
+        .filter_by(user_id=user_id)
+        .order_by(ChatMessage.timestamp.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def _context_hashes(sections: dict) -> dict:
+    return {k: hashlib.sha1((v or "").encode("utf-8")).hexdigest() for k, v in sections.items()}
+
+
+def _get_open_chat_session(user_id: int, lang: str) -> ChatSession | None:
+    """Aktywne okno rozmowy, jeśli nadal się nadaje (ten sam dzień i język, nie za stare, nie za długie)."""
+    sess = (
+        ChatSession.query
+        .filter_by(user_id=user_id, is_active=True)
+        .order_by(ChatSession.last_message_at.desc())
+        .first()
+    )
+    if not sess:
+        return None
+    now = datetime.utcnow()
+    expired = (
+        sess.lang != lang
+        or (sess.started_at and sess.started_at.date() != now.date())
+        or (sess.last_message_at and now - sess.last_message_at > timedelta(minutes=CHAT_SESSION_IDLE_MINUTES))
+        or (sess.turns or 0) >= CHAT_SESSION_MAX_TURNS
+    )
+    if expired:
+        sess.is_active = False
+        return None
+    return sess
+
+
+def _chat_reply_session(user_msg: str, sections: dict, language_rule: str) -> tuple[str, dict]:
+    """Tryb sesji: kontekst idzie raz na początku okna, potem tylko nowe wiadomości i zmienione sekcje.
+
+    Stan (dokładne tury wysłane do modelu + hashe sekcji) jest w chat_sessions, więc rozmowa
+    przeżywa restart workera, a prefiks rozmowy pozostaje stały między turami.
+    """
+    lang = session.get("lang", "pl")
+    hashes = _context_hashes(sections)
+    sess = _get_open_chat_session(current_user.id, lang)
+
+    if sess is None:
+        sess = ChatSession(user_id=current_user.id, lang=lang, started_at=datetime.utcnow(), turns=0)
+        db.session.add(sess)
+        db.session.flush()
+        history = []
+        turn_text = build_chat_session_opening(
+            today_iso=datetime.now().strftime("%Y-%m-%d"),
+            sections=sections,
+            chat_history=build_chat_history(_recent_chat_messages(current_user.id), max_age_days=14),
+            user_msg=user_msg,
+        )
+    else:
+        try:
+            history = json.loads(sess.history_json or "[]")
+            sent_hashes = json.loads(sess.context_hashes_json or "{}")
+        except Exception:
+            history, sent_hashes = [], {}
+        changed = {k: v for k, v in sections.items() if sent_hashes.get(k) != hashes.get(k)}
+        turn_text = build_chat_session_turn(changed_sections=changed, user_msg=user_msg)
+
+    contents = [{"role": h["role"], "parts": [h["text"]]} for h in history]
+    contents.append({"role": "user", "parts": [turn_text]})
+
+    model = llm.build_generative_model(CHAT_MODEL, system_instruction=build_chat_session_system(language_rule))
+    started = time.perf_counter()
+    response = llm_generate(model, contents, feature="chat_session")
+    clean_text = _clean_chat_reply(response)
+
+    history.append({"role": "user", "text": turn_text})
+    history.append({"role": "model", "text": clean_text})
+    sess.history_json = json.dumps(history, ensure_ascii=False)
+    sess.context_hashes_json = json.dumps(hashes)
+    sess.turns = (sess.turns or 0) + 1
+    sess.last_message_at = datetime.utcnow()
+    return clean_text, _chat_usage(response, started, session_id=sess.id)
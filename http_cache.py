@@ -0,0 +1,272 @@
+"""Warunkowe GET (ETag / 304) dla stron liczonych z danych użytkownika.
+
+Każdy zapis danych treningowych (aktywności, ćwiczenia, plany, check-iny, profil, stan)
+podbija `users.data_version`, a zapis czatu — `users.chat_version`. Robi to listener
+sesji SQLAlchemy w tej samej transakcji, więc żaden widok nie musi o tym pamiętać.
+
+Widoki z `@conditional_on_data_version()` liczą ETag z wersji (wiersz users jest już
+wczytany przez load_user — zero dodatkowych zapytań) i przy trafieniu w If-None-Match
+zwracają 304 przed jakąkolwiek agregacją. Zapisy z pominięciem ORM (surowy SQL, masowe
+Query.update bez innych zmian w tym flushu) wersji nie podbijają.
+"""
+
+import gzip
+import hashlib
+import os
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+try:
+    import brotli
+except Exception:  # optional dependency for Content-Encoding: br
+    brotli = None
+
+from models import (
+    Activity,
+    ChatMessage,
+    ChatSession,
+    Exercise,
+    GeneratedPlan,
+    PlanDay,
+    PlanExercise,
+    TrainingCheckin,
+    User,
+    UserProfile,
+    UserState,
+    WorkoutPlan,
+)
+
+# model -> kolumna wersji w users
+_VERSION_COLUMNS = {
+    Activity: "data_version",
+    Exercise: "data_version",
+    GeneratedPlan: "data_version",
+    PlanDay: "data_version",
+    WorkoutPlan: "data_version",
+    PlanExercise: "data_version",
+    TrainingCheckin: "data_version",
+    UserProfile: "data_version",
+    UserState: "data_version",
+    User: "data_version",
+    ChatMessage: "chat_version",
+    ChatSession: "chat_version",
+}
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+COMPRESSIBLE_MIMETYPES = {
+    "text/html",
+    "text/css",
+    "text/plain",
+    "application/json",
+    "application/geo+json",
+    "application/javascript",
+    "text/javascript",
+    "application/manifest+json",
+    "image/svg+xml",
+}
+# Pliki statyczne większe od tego limitu idą bez kompresji (strumieniowo z dysku).
+COMPRESS_STATIC_MAX_BYTES = 2 * 1024 * 1024
+_STATIC_COMPRESSED_MAX_ENTRIES = 64
+
+_PENDING_KEY = "pending_version_bumps"
+_BUMPED_KEY = "version_bumps_in_transaction"
+
+
+def _build_id() -> str:
+    """Wersja kodu/szablonów: APP_BUILD albo najnowszy mtime plików aplikacji (ten sam w każdym workerze)."""
+    explicit = (os.environ.get("APP_BUILD") or "").strip()
+    if explicit:
+        return explicit
+    root = os.path.dirname(os.path.abspath(__file__))
+    latest = 0.0
+    for directory in (root, os.path.join(root, "blueprints"), os.path.join(root, "templates")):
+        try:
+            for name in os.listdir(directory):
+                if name.endswith((".py", ".html")):
+                    latest = max(latest, os.path.getmtime(os.path.join(directory, name)))
+        except OSError:
+            continue
+    return str(int(latest))
+
+
+APP_BUILD = _build_id()
+
+
+# --- Podbijanie wersji przy zapisie ---
+
+def _collect_version_bumps(session, flush_context, instances) -> None:
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    for bucket in (session.new, session.dirty, session.deleted):
+        for obj in bucket:
+            column = _VERSION_COLUMNS.get(type(obj))
+            if column is None:
+                continue
+            if bucket is session.dirty and not session.is_modified(obj):
+                continue
+            user_id = obj.id if isinstance(obj, User) else getattr(obj, "user_id", None)
+            if user_id is not None:
+                pending.add((column, user_id))
+
+
+def _apply_version_bumps(session, flush_context) -> None:
+    # Jeden UPDATE na użytkownika i transakcję: autoflush w pętli importu nie mnoży zapytań,
+    # a i tak wszystkie zmiany stają się widoczne razem z commitem.
+    pending = session.info.pop(_PENDING_KEY, None)
+    bumped = session.info.setdefault(_BUMPED_KEY, set())
+    todo = (pending or set()) - bumped
+    if not todo:
+        return
+    users = User.__table__
+    for column in {c for c, _ in todo}:
+        user_ids = sorted(uid for c, uid in todo if c == column)
+        session.connection().execute(
+            users.update()
+            .where(users.c.id.in_(user_ids))
+            .values({column: users.c[column] + 1})
+        )
+    bumped |= todo
+
+
+def _reset_version_bumps(session) -> None:
+    session.info.pop(_BUMPED_KEY, None)
+    session.info.pop(_PENDING_KEY, None)
+
+
+def init_data_versioning() -> None:
+    if not event.contains(Session, "before_flush", _collect_version_bumps):
+        event.listen(Session, "before_flush", _collect_version_bumps)
+        event.listen(Session, "after_flush", _apply_version_bumps)
+        event.listen(Session, "after_commit", _reset_version_bumps)
+        event.listen(Session, "after_rollback", _reset_version_bumps)
+
+
+# --- ETag / 304 ---
+
+def data_etag(scope: str | tuple[str, ...] = "data_version") -> str:
+    """ETag strony: użytkownik, wersja danych, język, dzień, pełny URL i wersja kodu.
+
+    `scope` to kolumna wersji users (albo krotka kolumn dla widoków łączących np. dane i czat).
+    Klucz aplikacji w skrócie sprawia, że ETag nie da się policzyć dla cudzego zasobu.
+    """
+    scopes = (scope,) if isinstance(scope, str) else scope
+    raw = "|".join(str(x) for x in (
+        current_app.config.get("SECRET_KEY"),
+        current_user.id,
+        *(getattr(current_user, s, None) or 0 for s in scopes),
+        session.get("lang") or "",
+        date.today().isoformat(),
+        request.full_path,
+        APP_BUILD,
+    ))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:24]
+
+
+def conditional_on_data_version(scope: str | tuple[str, ...] = "data_version"):
+    """Dekorator widoku GET (pod @login_required): 304 bez liczenia, gdy dane się nie zmieniły.
+
+    Przy oczekującym komunikacie flash strona jest zawsze renderowana, a ETag dostaje tylko
+    wtedy, gdy go nie wyświetliła — inaczej kolejne 304 pokazywałyby stary komunikat z cache'u.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != "GET" or not current_user.is_authenticated:
+                return view(*args, **kwargs)
+
+            etag = data_etag(scope)
+            flashes_pending = bool(session.get("_flashes"))
+            if not flashes_pending and request.if_none_match.contains_weak(etag):
+                resp = current_app.response_class(status=304)
+                resp.set_etag(etag, weak=True)
+                resp.headers["Cache-Control"] = "private, no-cache"
+                return resp
+
+            resp = make_response(view(*args, **kwargs))
+            if resp.status_code == 200 and (not flashes_pending or session.get("_flashes")):
+                resp.set_etag(etag, weak=True)
+                resp.headers["Cache-Control"] = "private, no-cache"
+            return resp
+        return wrapper
+    return decorator
+
+
+# --- Kompresja odpowiedzi ---
+
+_static_compressed: OrderedDict = OrderedDict()
+
+
+def _negotiate_encoding() -> str | None:
+    if brotli is not None and request.accept_encodings["br"]:
+        return "br"
+    if request.accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def _encode(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def _compressed_static_body(resp, encoding: str) -> bytes | None:
+    # send_file: ETag (mtime-rozmiar-hash ścieżki) identyfikuje treść, więc kompresujemy raz na plik.
+    etag, _ = resp.get_etag()
+    key = (request.path, etag, encoding)
+    body = _static_compressed.get(key)
+    if body is None:
+        if resp.content_length is None or resp.content_length > COMPRESS_STATIC_MAX_BYTES:
+            return None
+        body = _encode(b"".join(resp.response), encoding)
+        if etag:
+            _static_compressed[key] = body
+            while len(_static_compressed) > _STATIC_COMPRESSED_MAX_ENTRIES:
+                _static_compressed.popitem(last=False)
+    else:
+        _static_compressed.move_to_end(key)
+    resp.response.close()
+    resp.direct_passthrough = False
+    return body
+
+
+def compress_response(resp):
+    """after_request: br/gzip dla HTML/JSON/CSS/JS od COMPRESS_MIN_BYTES wzwyż, wg Accept-Encoding.
+
+    Dotyczy tylko pełnych odpowiedzi 200 (bez 206/304 i strumieni). Silny ETag pliku statycznego
+    staje się słabym — ta sama wartość nadal daje 304 przy If-None-Match.
+    """
+    if (
+        resp.status_code != 200
+        or resp.mimetype not in COMPRESSIBLE_MIMETYPES
+        or resp.headers.get("Content-Encoding")
+        or resp.is_streamed and not resp.direct_passthrough
+    ):
+        return resp
+    resp.vary.add("Accept-Encoding")
+    encoding = _negotiate_encoding()
+    if encoding is None:
+        return resp
+
+    if resp.direct_passthrough:
+        if request.endpoint != "static":
+            return resp
+        body = _compressed_static_body(resp, encoding)
+        if body is None:
+            return resp
+    else:
+        raw = resp.get_data()
+        if len(raw) < COMPRESS_MIN_BYTES:
+            return resp
+        body = _encode(raw, encoding)
+
+    resp.set_data(body)
+    resp.headers["Content-Encoding"] = encoding
+    etag, weak = resp.get_etag()
+    if etag and not weak:
+        resp.set_etag(etag, weak=True)
+    return resp
@@ -0,0 +1,212 @@
+"""Teksty interfejsu PL/EN (`t(...)` w szablonach) i `tr(pl, en)` dla komunikatów z kodu."""
+
+from flask import session
+
+I18N = {
+    "pl": {
+        "nav_panel": "Panel",
+        "nav_metrics": "Metryki",
+        "nav_profile": "Profil",
+        "nav_plans": "Plany siłowe",
+        "nav_logout": "Wyloguj",
+        "header_dashboard": "📅 Panel",
+        "roadmap_title": "🧭 Plan tygodnia",
+        "roadmap_refresh": "⚡ Generuj / odśwież plan",
+        "roadmap_past": "Ostatnie 3 dni",
+        "roadmap_today": "Dziś",
+        "roadmap_next": "Najbliższe 3 dni",
+        "roadmap_details": "szczegóły",
+        "roadmap_today_badge": "DZIŚ",
+        "roadmap_activities": "aktyw.",
+        "week_goals_title": "🎯 Cele tygodnia",
+        "coach_note_title": "🧠 Opinia trenera",
+        "calendar_done": "Wykonane",
+        "calendar_planned": "Plan",
+        "calendar_empty": "Brak planu",
+        "calendar_discuss": "Omów z trenerem",
+        "calendar_swap_warning": "Uwaga: 2 ciężkie jednostki dzień po dniu.",
+        "calendar_reorder_ok": "Plan zaktualizowany",
+        "calendar_reorder_err": "Nie udało się zapisać zmiany",
+        "calendar_weather_loading": "Pogoda...",
+        "calendar_weather_error": "Brak pogody",
+        "calendar_city_prompt": "Podaj miasto do prognozy pogody (np. Warszawa):",
+        "calendar_city_not_found": "Nie znaleziono miasta",
+        "calendar_progress": "Realizacja tygodnia",
+        "calendar_goal_missing": "Ustaw cele tygodniowe w profilu, by lepiej śledzić postęp.",
+        "calendar_copy_garmin": "Kopiuj pod Garmin",
+        "calendar_copied": "Skopiowano opis treningu",
+        "plan_warmup": "Rozgrzewka",
+        "plan_main": "Trening główny",
+        "plan_cooldown": "Schłodzenie",
+        "add_title": "➕ Dodaj trening / raport",
+        "tab_manual": "Ręcznie",
+        "tab_checkin": "Raport",
+        "opt_run": "Bieganie",
+        "opt_ride": "Rower",
+        "opt_swim": "Pływanie",
+        "opt_gym": "Siłownia",
+        "opt_yoga": "Joga",
+        "opt_hike": "Wędrówka",
+        "opt_walk": "Spacer",
+        "opt_other": "Inne",
+        "label_type": "Typ",
+        "label_date": "Data",
+        "label_time": "Godzina startu",
+        "label_duration": "Czas (min)",
+        "label_distance": "Dystans (km)",
+        "label_notes": "Notatka",
+        "btn_add": "Dodaj",
+        "label_screenshot": "Zrzut ekranu (opcjonalnie)",
+        "label_screenshot_read": "Odczytaj dane ze zdjęcia",
+        "label_screenshot_apply_ok": "Dane ze zrzutu wczytane. Sprawdź i zatwierdź.",
+        "label_screenshot_apply_fail": "Nie udało się odczytać danych ze zrzutu.",
+        "label_confirm_data": "Potwierdź dane",
+        "label_avg_hr": "Średnie tętno (opcjonalnie)",
+        "label_avg_pace": "Średnie tempo min/km (opcjonalnie)",
+        "label_checkin_desc": "Opis (2–3 zdania)",
+        "btn_speak": "🎤 Mów",
+        "btn_save": "Zapisz",
+        "checkin_tip": "Wskazówka: raport to najlepszy sygnał dla AI (zmęczenie, ból, samopoczucie).",
+        "latest_title": "🕑 Ostatnie aktywności",
+        "all_btn": "Wszystkie →",
+        "no_activities": "Brak aktywności.",
+        "label_training": "Trening",
+        "chat_title": "🤖 Trener",
+        "chat_open": "Otwórz czat z trenerem",
+        "chat_close": "Zamknij czat",
+        "chat_ready": "Cześć! Jestem gotowy. Jak mogę pomóc?",
+        "chat_placeholder": "Wpisz pytanie...",
+        "chat_err": "Błąd.",
+        "speech_unsupported": "Rozpoznawanie mowy nie jest wspierane w tej przeglądarce.",
+        "status_generating": "Generuję plan…",
+        "status_server_error": "Błąd serwera ({code})",
+        "status_empty_plan": "Brak planu w odpowiedzi",
+        "status_plan_updated": "Plan zaktualizowany",
+        "status_draft_ready": "Szkic planu gotowy, dopracowuję z AI…",
+        "status_connection_error": "Błąd połączenia",
+        "modal_no_reason": "Brak uzasadnienia w planie.",
+        "metrics_header": "📊 Metryki",
+        "metrics_range": "📊 Metryki (ostatnie {days} dni)",
+        "run_label": "Bieganie",
+        "swim_label": "Basen",
+        "gym_label": "Siłownia",
+        "ride_label": "Rower",
+        "goal_title": "🎯 Postęp (prosty cel biegowy tygodnia)",
+        "goal_target": "Cel:",
+        "goal_done": "Wykonano:",
+        "goal_done_text": "Cel osiągnięty! 🎉",
+        "goal_left_text": "Zostało: {count}",
+        "goal_profile_hint": "Cel ustawisz w profilu",
+        "goal_per_week_label": "Cel biegów / tydzień",
+        "activity_count_title": "⏱️ Aktywności (liczba)",
+        "km_chart_title": "📏 Kilometry według dyscypliny",
+        "km_total_label": "Łącznie",
+        "discipline_label": "Dyscyplina",
+        "history_title": "📜 Pełna historia treningów",
+    },
+    "en": {
+        "nav_panel": "Dashboard",
+        "nav_metrics": "Metrics",
+        "nav_profile": "Profile",
+        "nav_plans": "Strength Plans",
+        "nav_logout": "Logout",
+        "header_dashboard": "📅 Dashboard",
+        "roadmap_title": "🧭 Weekly roadmap",
+        "roadmap_refresh": "⚡ Generate / refresh plan",
+        "roadmap_past": "Last 3 days",
+        "roadmap_today": "Today",
+        "roadmap_next": "Next 3 days",
+        "roadmap_details": "details",
+        "roadmap_today_badge": "TODAY",
+        "roadmap_activities": "activities",
+        "week_goals_title": "🎯 Weekly goals",
+        "coach_note_title": "🧠 Coach note",
+        "calendar_done": "Done",
+        "calendar_planned": "Plan",
+        "calendar_empty": "No plan",
+        "calendar_discuss": "Discuss with coach",
+        "calendar_swap_warning": "Warning: 2 hard sessions on consecutive days.",
+        "calendar_reorder_ok": "Plan updated",
+        "calendar_reorder_err": "Could not save changes",
+        "calendar_weather_loading": "Loading weather...",
+        "calendar_weather_error": "No weather",
+        "calendar_city_prompt": "Provide city for weather forecast (e.g. London):",
+        "calendar_city_not_found": "City not found",
+        "calendar_progress": "Weekly completion",
+        "calendar_goal_missing": "Set weekly goals in profile to better track progress.",
+        "calendar_copy_garmin": "Copy for Garmin",
+        "calendar_copied": "Workout description copied",
+        "plan_warmup": "Warm-up",
+        "plan_main": "Main set",
+        "plan_cooldown": "Cool-down",
+        "add_title": "➕ Add workout / check-in",
+        "tab_manual": "Manual",
+        "tab_checkin": "Check-in",
+        "opt_run": "Running",
+        "opt_ride": "Cycling",
+        "opt_swim": "Swimming",
+        "opt_gym": "Gym",
+        "opt_yoga": "Yoga",
+        "opt_hike": "Hike",
+        "opt_walk": "Walk",
+        "opt_other": "Other",
+        "label_type": "Type",
+        "label_date": "Date",
+        "label_time": "Start time",
+        "label_duration": "Duration (min)",
+        "label_distance": "Distance (km)",
+        "label_notes": "Notes",
+        "btn_add": "Add",
+        "label_screenshot": "Screenshot (optional)",
+        "label_screenshot_read": "Read data from screenshot",
+        "label_screenshot_apply_ok": "Screenshot data loaded. Review and confirm.",
+        "label_screenshot_apply_fail": "Could not read data from screenshot.",
+        "label_confirm_data": "Confirm data",
+        "label_avg_hr": "Average heart rate (optional)",
+        "label_avg_pace": "Average pace min/km (optional)",
+        "label_checkin_desc": "Description (2–3 sentences)",
+        "btn_speak": "🎤 Speak",
+        "btn_save": "Save",
+        "checkin_tip": "Tip: check-in is the best AI signal (fatigue, pain, wellbeing).",
+        "latest_title": "🕑 Recent activities",
+        "all_btn": "All →",
+        "no_activities": "No activities.",
+        "label_training": "Workout",
+        "chat_title": "🤖 Coach",
+        "chat_open": "Open coach chat",
+        "chat_close": "Close chat",
+        "chat_ready": "Hi! I am ready. How can I help?",
+        "chat_placeholder": "Type your question...",
+        "chat_err": "Error.",
+        "speech_unsupported": "Speech recognition is not supported in this browser.",
+        "status_generating": "Generating plan…",
+        "status_server_error": "Server error ({code})",
+        "status_empty_plan": "No plan in response",
+        "status_plan_updated": "Plan updated",
+        "status_draft_ready": "Draft plan ready, refining with AI…",
+        "status_connection_error": "Connection error",
+        "modal_no_reason": "No reason provided in the plan.",
+        "metrics_header": "📊 Metrics",
+        "metrics_range": "📊 Metrics (last {days} days)",
+        "run_label": "Running",
+        "swim_label": "Swimming",
+        "gym_label": "Gym",
+        "ride_label": "Cycling",
+        "goal_title": "🎯 Progress (simple weekly running goal)",
+        "goal_target": "Target:",
+        "goal_done": "Completed:",
+        "goal_done_text": "Goal achieved! 🎉",
+        "goal_left_text": "Remaining: {count}",
+        "goal_profile_hint": "Set your target in profile",
+        "goal_per_week_label": "Run goal / week",
+        "activity_count_title": "⏱️ Activities (count)",
+        "km_chart_title": "📏 Distance by discipline",
+        "km_total_label": "Total",
+        "discipline_label": "Discipline",
+        "history_title": "📜 Full training history",
+    },
+}
+
+
+def tr(pl: str, en: str) -> str:
+    return en if session.get("lang", "pl") == "en" else pl
@@ -0,0 +1,148 @@
+"""Idempotentne zapisy: nagłówek Idempotency-Key dla formularzy i API wysyłanych z kolejki offline.
+
+Service worker nadaje każdemu zapisowi klucz już przy pierwszej próbie i powtarza żądanie
+z tym samym kluczem, dopóki nie dostanie odpowiedzi. Serwer rezerwuje klucz przed widokiem
+i zapamiętuje jego odpowiedź, więc powtórka (także równoległa, gdy pierwsza odpowiedź
+zginęła po drodze) dostaje zapisaną odpowiedź zamiast drugiej aktywności.
+
+Ograniczenie: rezerwacja klucza, dane widoku i zapamiętana odpowiedź to trzy osobne commity
+(widoki zatwierdzają dane same). Jeśli worker zginie po commicie widoku, a przed zapisem
+odpowiedzi, klucz zostaje "w toku". Przez IDEMPOTENCY_PENDING_TIMEOUT powtórki dostają 409,
+a po nim powtórka przejmuje klucz i wykonuje widok ponownie — zapis może się wtedy zdublować.
+Okno jest krótkie (zapis odpowiedzi idzie zaraz po widoku), ale gwarancja nie jest pełna.
+
+Żądania bez nagłówka działają jak wcześniej.
+"""
+
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, jsonify, make_response, request
+from flask_login import current_user
+from sqlalchemy.exc import IntegrityError
+
+from i18n import tr
+from models import IdempotencyKey, db
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_KEY_MAX_LEN = 80
+# Kolejka offline może czekać kilka dni (np. wyjazd w góry) — klucze trzymamy dłużej.
+IDEMPOTENCY_TTL = timedelta(days=14)
+# Klucz "w toku" starszy niż to uznajemy za porzucony (proces przerwany między zapisem a odpowiedzią).
+IDEMPOTENCY_PENDING_TIMEOUT = timedelta(minutes=5)
+# Powyżej tego rozmiaru zapamiętujemy tylko status i Location (zapisy zwracają małe odpowiedzi).
+IDEMPOTENCY_MAX_BODY_BYTES = 64 * 1024
+
+
+def _replay(record: IdempotencyKey):
+    resp = current_app.response_class(
+        record.body or b"",
+        status=record.status_code,
+        content_type=record.content_type or None,
+    )
+    if record.location:
+        resp.headers["Location"] = record.location
+    resp.headers["Idempotent-Replayed"] = "true"
+    return resp
+
+
+def _error(status: int, pl: str, en: str):
+    return jsonify({"ok": False, "error": tr(pl, en)}), status
+
+
+def _purge_expired(user_id: int) -> None:
+    cutoff = datetime.utcnow() - IDEMPOTENCY_TTL
+    IdempotencyKey.query.filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.created_at < cutoff,
+    ).delete(synchronize_session=False)
+
+
+def _release(record_id: int) -> None:
+    db.session.rollback()
+    IdempotencyKey.query.filter_by(id=record_id).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def _check_existing(record: IdempotencyKey, endpoint: str):
+    """Zwraca odpowiedź dla znanego klucza albo `record`, gdy porzucone żądanie można przejąć."""
+    if record.endpoint != endpoint:
+        return _error(422, "Ten Idempotency-Key użyto dla innego zapisu.",
+                      "This Idempotency-Key was used for a different request.")
+    if record.status_code is not None:
+        return _replay(record)
+
+    # Klucz w toku. Jeśli wisi dłużej niż IDEMPOTENCY_PENDING_TIMEOUT, proces zginął w trakcie —
+    # przejmujemy go warunkowym UPDATE (wygrywa dokładnie jedna z równoległych powtórek).
+    # Gdy zginął już po commicie widoku, powtórka zapisze dane drugi raz (zob. docstring modułu).
+    now = datetime.utcnow()
+    if record.created_at and record.created_at < now - IDEMPOTENCY_PENDING_TIMEOUT:
+        taken = IdempotencyKey.query.filter_by(
+            id=record.id, created_at=record.created_at, status_code=None,
+        ).update({"created_at": now}, synchronize_session=False)
+        db.session.commit()
+        if taken:
+            return db.session.get(IdempotencyKey, record.id)
+
+    resp = make_response(_error(409, "Ten zapis jest właśnie przetwarzany.",
+                                "This request is already being processed."))
+    resp.headers["Retry-After"] = "1"
+    return resp
+
+
+def idempotent(view):
+    """Dekorator widoku POST (pod @login_required) honorujący nagłówek Idempotency-Key.
+
+    - znany klucz z zapisaną odpowiedzią -> ta sama odpowiedź (nagłówek Idempotent-Replayed)
+    - klucz w toku (równoległa próba) -> 409 z Retry-After
+    - klucz użyty dla innego endpointu -> 422
+    Po wyjątku lub odpowiedzi 5xx klucz jest zwalniany i powtórka wykona zapis.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = (request.headers.get(IDEMPOTENCY_HEADER) or "").strip()
+        if not key or not current_user.is_authenticated:
+            return view(*args, **kwargs)
+        if len(key) > IDEMPOTENCY_KEY_MAX_LEN:
+            return _error(400, "Za długi Idempotency-Key.", "Idempotency-Key is too long.")
+
+        endpoint = request.endpoint or ""
+        record = IdempotencyKey.query.filter_by(user_id=current_user.id, key=key).first()
+        if record is None:
+            # Klucz zatwierdzany przed widokiem, krótką transakcją (widok może czekać na model AI
+            # i nie powinien trzymać blokady zapisu). Równoległa próba dostaje IntegrityError.
+            record = IdempotencyKey(user_id=current_user.id, key=key, endpoint=endpoint)
+            db.session.add(record)
+            try:
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                record = IdempotencyKey.query.filter_by(user_id=current_user.id, key=key).first()
+                if record is None:
+                    raise
+                record = _check_existing(record, endpoint)
+        else:
+            record = _check_existing(record, endpoint)
+        if not isinstance(record, IdempotencyKey):
+            return record
+
+        try:
+            resp = make_response(view(*args, **kwargs))
+        except Exception:
+            _release(record.id)
+            raise
+
+        if resp.status_code >= 500:
+            _release(record.id)
+            return resp
+
+        record.status_code = resp.status_code
+        record.content_type = resp.headers.get("Content-Type")
+        record.location = resp.headers.get("Location")
+        if not resp.direct_passthrough and not resp.is_streamed:
+            body = resp.get_data()
+            record.body = body if len(body) <= IDEMPOTENCY_MAX_BODY_BYTES else None
+        _purge_expired(current_user.id)
+        db.session.commit()
+        return resp
+    return wrapper
@@ -0,0 +1,1125 @@
+"""Import archiwów ZIP z Garmin Connect i Stravy (aktywności, trasy z plików FIT, profil).
+
+Importowany dopiero przy imporcie archiwum — fitparse ładuje się razem z nim.
+"""
+
+import csv
+import io
+import json
+import os
+import time
+import tracemalloc
+import zipfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from flask import current_app
+
+try:
+    from fitparse import FitFile
+except Exception:  # optional dependency for Garmin route/stat parsing
+    FitFile = None
+
+from models import Activity, User, UserProfile, db
+from parsing import _normalize_gps_coord, _safe_float, _safe_int, _safe_json_dict, _to_naive_utc
+
+
+# --- Pamięć importu ---
+# Import dużego eksportu Garmina (setki MB JSON + tysiące plików FIT) potrafi przekroczyć
+# limit pamięci hosta. Każda faza importu jest mierzona (RSS procesu; z IMPORT_TRACEMALLOC=1
+# także sterta Pythona), a przekroczenie limitu przerywa import wyjątkiem, zanim zrobi to
+# OOM killer. Limit: IMPORT_MEMORY_LIMIT_MB, a bez niego 85% limitu cgroup (jeśli jest).
+
+IMPORT_MEMORY_CHECK_EVERY = int(os.environ.get("IMPORT_MEMORY_CHECK_EVERY", "100"))
+IMPORT_TRACEMALLOC = os.environ.get("IMPORT_TRACEMALLOC") == "1"
+
+
+def _cgroup_memory_limit_mb() -> float | None:
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                raw = f.read().strip()
+        except OSError:
+            continue
+        if raw.isdigit() and int(raw) < (1 << 50):  # "max" / 2^63 oznaczają brak limitu
+            return int(raw) / 1024 / 1024
+    return None
+
+
+def _default_import_memory_limit_mb() -> float | None:
+    raw = (os.environ.get("IMPORT_MEMORY_LIMIT_MB") or "").strip()
+    if raw:
+        limit = _safe_float(raw)
+        return limit if limit and limit > 0 else None
+    cgroup = _cgroup_memory_limit_mb()
+    return round(cgroup * 0.85, 1) if cgroup else None
+
+
+def _rss_mb() -> float | None:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except Exception:
+        return None
+
+
+class ImportMemoryLimitExceeded(ValueError):
+    """Import przerwany, bo proces przekroczył limit pamięci importu."""
+
+
+class ImportMemoryTracker:
+    """Szczytowa i pozostała pamięć per faza importu + kontrola limitu.
+
+    Szczyt w trybie RSS to maksimum z próbek w `check()` (wołane w pętlach faz),
+    więc jest dolnym oszacowaniem; z tracemalloc szczyt sterty Pythona jest dokładny.
+    """
+
+    def __init__(self, limit_mb: float | None = None, use_tracemalloc: bool | None = None):
+        self.limit_mb = _default_import_memory_limit_mb() if limit_mb is None else (limit_mb or None)
+        self.use_tracemalloc = IMPORT_TRACEMALLOC if use_tracemalloc is None else use_tracemalloc
+        self.phases: list[dict] = []
+        self._current: dict | None = None
+        self._started_tracemalloc = False
+
+    @contextmanager
+    def phase(self, name: str):
+        if self.use_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        rss_start = _rss_mb()
+        self._current = {"name": name, "rss_peak": rss_start}
+        py_start = None
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            py_start = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        try:
+            self.check()
+            yield self
+        finally:
+            rss_end = _rss_mb()
+            samples = [x for x in (rss_start, self._current["rss_peak"], rss_end) if x is not None]
+            rss_peak = max(samples) if samples else None
+            measured = rss_start is not None and rss_end is not None
+            row = {
+                "phase": name,
+                "seconds": round(time.perf_counter() - t0, 3),
+                "rss_start_mb": round(rss_start, 1) if rss_start is not None else None,
+                "rss_peak_mb": round(rss_peak, 1) if rss_peak is not None else None,
+                "peak_mb": round(rss_peak - rss_start, 1) if measured else None,
+                "retained_mb": round(rss_end - rss_start, 1) if measured else None,
+            }
+            if py_start is not None and tracemalloc.is_tracing():
+                py_now, py_peak = tracemalloc.get_traced_memory()
+                row["py_peak_mb"] = round((py_peak - py_start) / 1024 / 1024, 1)
+                row["py_retained_mb"] = round((py_now - py_start) / 1024 / 1024, 1)
+            self.phases.append(row)
+            self._current = None
+
+    def check(self) -> None:
+        rss = _rss_mb()
+        if rss is None:
+            return
+        if self._current is not None and (self._current["rss_peak"] is None or rss > self._current["rss_peak"]):
+            self._current["rss_peak"] = rss
+        if self.limit_mb and rss > self.limit_mb:
+            phase = self._current["name"] if self._current else "?"
+            raise ImportMemoryLimitExceeded(
+                f"Import przerwany ({phase}): proces zajmuje {rss:.0f} MB przy limicie {self.limit_mb:.0f} MB. "
+                "Aktywności nie zostały zapisane — spróbuj mniejszego archiwum."
+            )
+
+    def close(self) -> None:
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{p['phase']} peak {p['peak_mb']} MB / retained {p['retained_mb']} MB ({p['seconds']} s)"
+            for p in self.phases
+        )
+
+
+class ImportResult(tuple):
+    """(source_kind, added, skipped) jak dotąd; pomiary pamięci per faza w `.memory`."""
+
+    def __new__(cls, source_kind: str, added: int, skipped: int, memory: list[dict] | None = None):
+        obj = super().__new__(cls, (source_kind, added, skipped))
+        obj.memory = memory or []
+        return obj
+
+
+def _rewind_fileobj(file_obj) -> None:
+    try:
+        file_obj.seek(0)
+    except Exception:
+        pass
+
+
+def detect_activity_archive_type(zip_file) -> str:
+    """Detect import archive type from ZIP contents."""
+    _rewind_fileobj(zip_file)
+    try:
+        with zipfile.ZipFile(zip_file) as z:
+            names = [n.lower() for n in z.namelist()]
+    finally:
+        _rewind_fileobj(zip_file)
+
+    if any(n.endswith("activities.csv") for n in names):
+        return "strava"
+    if any(n.endswith("_summarizedactivities.json") and "di-connect-fitness" in n for n in names):
+        return "garmin"
+    if any(n.endswith(".fit") for n in names):
+        return "garmin_fit_only"
+    return "unknown"
+
+
+def _garmin_activity_type_to_app(activity_type: str | None, sport_type: str | None, name: str | None) -> str:
+    t = (activity_type or "").strip().lower()
+    s = (sport_type or "").strip().lower()
+    n = (name or "").strip().lower()
+
+    direct = {
+        "running": "run",
+        "treadmill_running": "run",
+        "track_running": "run",
+        "cycling": "ride",
+        "lap_swimming": "swim",
+        "open_water_swimming": "swim",
+        "swimming": "swim",
+        "walking": "walk",
+        "hiking": "hike",
+        "yoga": "yoga",
+        "breathwork": "yoga",
+        "strength_training": "weighttraining",
+        "fitness_equipment": "workout",
+        "cardio_training": "workout",
+    }
+    if t in direct:
+        return direct[t]
+
+    if t == "other":
+        if any(k in s for k in ("swim",)):
+            return "swim"
+        if any(k in s for k in ("run", "track", "treadmill")):
+            return "run"
+        if any(k in s for k in ("cycle", "bike")):
+            return "ride"
+        if any(k in s for k in ("walk", "steps")):
+            return "walk"
+        if any(k in s for k in ("train", "strength", "generic", "invalid")):
+            return "workout"
+        if any(k in n for k in ("sił", "sil", "gym", "strength", "core", "mobility", "joga", "yoga")):
+            return "workout"
+
+    return "other"
+
+
+def _load_json_member_from_zip(z: zipfile.ZipFile, member_name: str):
+    with z.open(member_name) as f:
+        return json.load(io.TextIOWrapper(f, encoding="utf-8"))
+
+
+def _ms_to_datetime_utc(ms_value) -> datetime | None:
+    ms = _safe_float(ms_value)
+    if ms is None:
+        return None
+    try:
+        # Keep naive UTC to stay compatible with existing DB rows.
+        return datetime.fromtimestamp(ms / 1000.0, tz=timezone.utc).replace(tzinfo=None)
+    except Exception:
+        return None
+
+
+def _to_meters_from_garmin_distance(raw_distance) -> float:
+    # Garmin summarized exports distance in centimeters.
+    val = _safe_float(raw_distance)
+    if val is None:
+        return 0.0
+    return max(0.0, val / 100.0)
+
+
+def _to_seconds_from_ms(raw_ms) -> int:
+    val = _safe_float(raw_ms)
+    if val is None:
+        return 0
+    return max(0, int(round(val / 1000.0)))
+
+
+def _compact_route_points(points: list[list[float]], max_points: int = 1200) -> list[list[float]]:
+    if len(points) <= max_points:
+        return points
+
+    out: list[list[float]] = []
+    step = (len(points) - 1) / float(max_points - 1)
+    for i in range(max_points):
+        idx = int(round(i * step))
+        idx = min(max(idx, 0), len(points) - 1)
+        out.append(points[idx])
+
+    # remove duplicates generated by index rounding
+    deduped: list[list[float]] = []
+    prev = None
+    for p in out:
+        if prev is None or p[0] != prev[0] or p[1] != prev[1]:
+            deduped.append(p)
+            prev = p
+    return deduped
+
+
+def _extract_fit_activity_payload(fit_blob: bytes, source_name: str) -> dict | None:
+    if FitFile is None or not fit_blob:
+        return None
+
+    try:
+        try:
+            fit_file = FitFile(io.BytesIO(fit_blob), check_crc=False)
+        except TypeError:
+            fit_file = FitFile(io.BytesIO(fit_blob))
+
+        session_values = {}
+        for session_msg in fit_file.get_messages("session"):
+            try:
+                session_values = session_msg.get_values() or {}
+            except Exception:
+                session_values = {}
+            break
+
+        start_time = _to_naive_utc(session_values.get("start_time"))
+        route_points: list[list[float]] = []
+        hr_values: list[int] = []
+        cad_values: list[float] = []
+        power_values: list[float] = []
+        first_ts = None
+
+        for rec in fit_file.get_messages("record"):
+            try:
+                values = rec.get_values() or {}
+            except Exception:
+                continue
+
+            if first_ts is None:
+                first_ts = _to_naive_utc(values.get("timestamp"))
+
+            lat = _normalize_gps_coord(values.get("position_lat"))
+            lng = _normalize_gps_coord(values.get("position_long"))
+            if lat is not None and lng is not None:
+                route_points.append([lat, lng])
+
+            hr = _safe_int(values.get("heart_rate"))
+            if hr is not None and hr > 0:
+                hr_values.append(hr)
+
+            cadence = _safe_float(values.get("cadence") or values.get("fractional_cadence"))
+            if cadence is not None and cadence > 0:
+                cad_values.append(cadence)
+
+            power = _safe_float(values.get("power"))
+            if power is not None and power > 0:
+                power_values.append(power)
+
+        if not start_time:
+            start_time = first_ts
+
+        fit_meta = {}
+        important_fields = (
+            "sport",
+            "sub_sport",
+            "total_distance",
+            "total_elapsed_time",
+            "total_timer_time",
+            "total_ascent",
+            "total_descent",
+            "total_calories",
+            "total_steps",
+            "avg_speed",
+            "max_speed",
+            "avg_heart_rate",
+            "max_heart_rate",
+            "avg_cadence",
+            "max_cadence",
+            "avg_running_cadence",
+            "max_running_cadence",
+            "avg_power",
+            "max_power",
+            "normalized_power",
+            "training_stress_score",
+            "total_training_effect",
+            "aerobic_training_effect",
+            "anaerobic_training_effect",
+            "avg_stroke_distance",
+            "avg_stroke_count",
+            "avg_stroke_rate",
+            "max_stroke_rate",
+        )
+        for key in important_fields:
+            value = session_values.get(key)
+            if value in (None, ""):
+                continue
+            fit_meta[f"fit_{key}"] = value
+
+        if "fit_avg_heart_rate" not in fit_meta and hr_values:
+            fit_meta["fit_avg_heart_rate"] = round(sum(hr_values) / len(hr_values), 1)
+        if "fit_max_heart_rate" not in fit_meta and hr_values:
+            fit_meta["fit_max_heart_rate"] = max(hr_values)
+        if "fit_avg_cadence" not in fit_meta and cad_values:
+            fit_meta["fit_avg_cadence"] = round(sum(cad_values) / len(cad_values), 1)
+        if "fit_max_cadence" not in fit_meta and cad_values:
+            fit_meta["fit_max_cadence"] = max(cad_values)
+        if "fit_avg_power" not in fit_meta and power_values:
+            fit_meta["fit_avg_power"] = round(sum(power_values) / len(power_values), 1)
+        if "fit_max_power" not in fit_meta and power_values:
+            fit_meta["fit_max_power"] = max(power_values)
+
+        route_points = _compact_route_points(route_points, max_points=1200)
+        start_lat = route_points[0][0] if route_points else None
+        start_lng = route_points[0][1] if route_points else None
+        end_lat = route_points[-1][0] if route_points else None
+        end_lng = route_points[-1][1] if route_points else None
+
+        return {
+            "source_name": source_name,
+            "start_time": start_time,
+            "route_points": route_points,
+            "start_lat": start_lat,
+            "start_lng": start_lng,
+            "end_lat": end_lat,
+            "end_lng": end_lng,
+            "meta": fit_meta,
+            "_used": False,
+        }
+    except Exception:
+        return None
+
+
+def _iter_fit_blobs_from_zip(z: zipfile.ZipFile):
+    names = z.namelist()
+    for member in names:
+        lower = member.lower()
+        if lower.endswith(".fit"):
+            try:
+                yield member, z.read(member)
+            except Exception:
+                continue
+            continue
+
+        # Garmin export often stores FIT files in nested UploadedFiles_*.zip archives.
+        if lower.endswith(".zip") and ("uploadedfiles" in lower or "fit" in lower):
+            try:
+                nested_raw = z.read(member)
+                with zipfile.ZipFile(io.BytesIO(nested_raw)) as nested:
+                    for n2 in nested.namelist():
+                        if not n2.lower().endswith(".fit"):
+                            continue
+                        try:
+                            yield f"{member}::{n2}", nested.read(n2)
+                        except Exception:
+                            continue
+            except Exception:
+                continue
+
+
+def _build_fit_payload_index(
+    z: zipfile.ZipFile, memory: ImportMemoryTracker | None = None
+) -> tuple[list[dict], dict[int, list[int]]]:
+    if FitFile is None:
+        return [], {}
+
+    payloads: list[dict] = []
+    minute_index: dict[int, list[int]] = {}
+
+    for source_name, fit_blob in _iter_fit_blobs_from_zip(z):
+        if memory is not None:
+            memory.check()
+        payload = _extract_fit_activity_payload(fit_blob, source_name)
+        if not payload or not payload.get("start_time"):
+            continue
+        payloads.append(payload)
+        idx = len(payloads) - 1
+        minute_key = int(payload["start_time"].timestamp() // 60)
+        minute_index.setdefault(minute_key, []).append(idx)
+
+    return payloads, minute_index
+
+
+def _match_fit_payload(start_dt: datetime | None, fit_payloads: list[dict], minute_index: dict[int, list[int]]) -> dict | None:
+    if not start_dt or not fit_payloads or not minute_index:
+        return None
+
+    base_key = int(start_dt.timestamp() // 60)
+    best_idx = None
+    best_diff = None
+
+    for delta in range(0, 61):  # +/- 60 minutes tolerance
+        keys = [base_key] if delta == 0 else [base_key - delta, base_key + delta]
+        for key in keys:
+            for idx in minute_index.get(key, []):
+                item = fit_payloads[idx]
+                if item.get("_used"):
+                    continue
+                item_start = item.get("start_time")
+                if not item_start:
+                    continue
+                diff = abs((item_start - start_dt).total_seconds())
+                if diff > 3600:
+                    continue
+                if best_diff is None or diff < best_diff:
+                    best_diff = diff
+                    best_idx = idx
+        if best_idx is not None and best_diff is not None and best_diff <= 120:
+            break
+
+    if best_idx is None:
+        return None
+
+    fit_payloads[best_idx]["_used"] = True
+    return fit_payloads[best_idx]
+
+
+def _load_garmin_profile_snapshot(z: zipfile.ZipFile) -> dict:
+    snapshot = {
+        "first_name": None,
+        "last_name": None,
+        "gender": None,
+        "birth_date": None,
+        "height_cm": None,
+        "weight_kg": None,
+        "vo2max": None,
+        "resting_hr": None,
+        "avg_sleep_hours": None,
+        "avg_daily_steps": None,
+        "avg_daily_stress": None,
+    }
+    names = z.namelist()
+    lower_map = {n.lower(): n for n in names}
+
+    # Basic identity from Garmin profile files.
+    user_profile_member = lower_map.get("di_connect/di-connect-user/user_profile.json")
+    if user_profile_member:
+        try:
+            data = _load_json_member_from_zip(z, user_profile_member)
+            if isinstance(data, dict):
+                snapshot["first_name"] = (data.get("firstName") or "").strip() or None
+                snapshot["gender"] = (data.get("gender") or "").strip() or None
+                snapshot["birth_date"] = (data.get("birthDate") or "").strip() or None
+        except Exception:
+            pass
+
+    customer_member = lower_map.get("customer_data/customer.json")
+    if customer_member:
+        try:
+            data = _load_json_member_from_zip(z, customer_member)
+            if isinstance(data, dict):
+                if not snapshot["first_name"]:
+                    snapshot["first_name"] = (data.get("firstName") or "").strip() or None
+                last_name = (data.get("lastName") or "").strip()
+                snapshot["last_name"] = last_name or snapshot["last_name"]
+                if not snapshot["birth_date"]:
+                    dob = (data.get("dateOfBirth") or "").strip()
+                    snapshot["birth_date"] = dob[:10] if dob else None
+                if not snapshot["gender"]:
+                    snapshot["gender"] = (data.get("gender") or "").strip() or None
+        except Exception:
+            pass
+
+    # Body metrics.
+    bio_metric_member = next(
+        (n for n in names if n.lower().endswith("_userbiometricprofiledata.json")),
+        None,
+    )
+    if bio_metric_member:
+        try:
+            data = _load_json_member_from_zip(z, bio_metric_member)
+            row = data[0] if isinstance(data, list) and data else (data if isinstance(data, dict) else None)
+            if isinstance(row, dict):
+                snapshot["height_cm"] = _safe_float(row.get("height"))
+                w = _safe_float(row.get("weight"))
+                if w is not None:
+                    snapshot["weight_kg"] = round(w / 1000.0, 1) if w > 200 else round(w, 1)
+                snapshot["vo2max"] = _safe_float(row.get("vo2Max"))
+        except Exception:
+            pass
+
+    # Daily wellness aggregates (steps/stress/resting HR).
+    uds_members = [n for n in names if "/di-connect-aggregator/udsfile_" in n.lower() and n.lower().endswith(".json")]
+    daily_rows = {}
+    for member in uds_members:
+        try:
+            payload = _load_json_member_from_zip(z, member)
+            if not isinstance(payload, list):
+                continue
+            for row in payload:
+                if not isinstance(row, dict):
+                    continue
+                d = (row.get("calendarDate") or "").strip()
+                if not d:
+                    continue
+                daily_rows[d] = row
+        except Exception:
+            continue
+
+    if daily_rows:
+        steps = []
+        stresses = []
+        resting_hr = []
+        for row in daily_rows.values():
+            st = _safe_int(row.get("totalSteps"))
+            if st is not None:
+                steps.append(st)
+
+            rh = _safe_int(row.get("restingHeartRate"))
+            if rh is not None and rh > 0:
+                resting_hr.append(rh)
+
+            all_day_stress = row.get("allDayStress") or {}
+            agg = all_day_stress.get("aggregatorList") if isinstance(all_day_stress, dict) else None
+            if isinstance(agg, list):
+                total = next((x for x in agg if isinstance(x, dict) and (x.get("type") or "").upper() == "TOTAL"), None)
+                if total:
+                    avg_stress = _safe_float(total.get("averageStressLevel"))
+                    if avg_stress is not None:
+                        stresses.append(avg_stress)
+
+        if steps:
+            snapshot["avg_daily_steps"] = int(round(sum(steps) / len(steps)))
+        if stresses:
+            snapshot["avg_daily_stress"] = round(sum(stresses) / len(stresses), 1)
+        if resting_hr:
+            snapshot["resting_hr"] = int(round(sum(resting_hr) / len(resting_hr)))
+
+    # Sleep files: compute average sleep duration in hours.
+    sleep_members = [n for n in names if "/di-connect-wellness/" in n.lower() and "sleepdata" in n.lower() and n.lower().endswith(".json")]
+    sleep_hours = []
+    for member in sleep_members:
+        try:
+            payload = _load_json_member_from_zip(z, member)
+            if not isinstance(payload, list):
+                continue
+            for row in payload:
+                if not isinstance(row, dict):
+                    continue
+                start_ts = (row.get("sleepStartTimestampGMT") or "").strip()
+                end_ts = (row.get("sleepEndTimestampGMT") or "").strip()
+                if start_ts and end_ts:
+                    try:
+                        start = datetime.fromisoformat(start_ts.replace("Z", "+00:00"))
+                        end = datetime.fromisoformat(end_ts.replace("Z", "+00:00"))
+                        delta_h = (end - start).total_seconds() / 3600.0
+                        if 1.0 <= delta_h <= 16.0:
+                            sleep_hours.append(delta_h)
+                        continue
+                    except Exception:
+                        pass
+
+                total_sec = 0
+                for key in ("deepSleepSeconds", "lightSleepSeconds", "remSleepSeconds", "awakeSleepSeconds"):
+                    v = _safe_float(row.get(key))
+                    if v is not None:
+                        total_sec += max(0.0, v)
+                if total_sec > 0:
+                    sleep_hours.append(total_sec / 3600.0)
+        except Exception:
+            continue
+
+    if sleep_hours:
+        snapshot["avg_sleep_hours"] = round(sum(sleep_hours) / len(sleep_hours), 1)
+
+    return snapshot
+
+
+def _apply_imported_profile_snapshot(user_id: int, snapshot: dict) -> None:
+    user = db.session.get(User, int(user_id))
+    if not user:
+        return
+
+    profile = UserProfile.query.filter_by(user_id=user_id).first()
+    if not profile:
+        profile = UserProfile(user_id=user_id)
+        db.session.add(profile)
+
+    first_name = (snapshot.get("first_name") or "").strip()
+    last_name = (snapshot.get("last_name") or "").strip()
+    if first_name and not (user.first_name or "").strip():
+        user.first_name = first_name
+    if last_name and not (user.last_name or "").strip():
+        user.last_name = last_name
+
+    if snapshot.get("gender") and not profile.gender:
+        profile.gender = str(snapshot["gender"]).strip()[:20]
+
+    birth_date = (snapshot.get("birth_date") or "").strip()
+    if birth_date:
+        try:
+            profile_birth = datetime.strptime(birth_date[:10], "%Y-%m-%d").date()
+            if not profile.birth_date:
+                profile.birth_date = profile_birth
+        except Exception:
+            pass
+
+    if snapshot.get("height_cm") is not None:
+        profile.height_cm = round(float(snapshot["height_cm"]), 1)
+    if snapshot.get("weight_kg") is not None:
+        profile.weight_kg = round(float(snapshot["weight_kg"]), 1)
+    if snapshot.get("vo2max") is not None:
+        profile.vo2max = round(float(snapshot["vo2max"]), 1)
+    if snapshot.get("resting_hr") is not None:
+        profile.resting_hr = int(snapshot["resting_hr"])
+    if snapshot.get("avg_sleep_hours") is not None:
+        profile.avg_sleep_hours = round(float(snapshot["avg_sleep_hours"]), 1)
+    if snapshot.get("avg_daily_steps") is not None:
+        profile.avg_daily_steps = int(snapshot["avg_daily_steps"])
+    if snapshot.get("avg_daily_stress") is not None:
+        profile.avg_daily_stress = round(float(snapshot["avg_daily_stress"]), 1)
+
+    profile.updated_at = datetime.now(timezone.utc)
+    db.session.commit()
+
+
+def _prune_meta(meta: dict) -> dict:
+    out = {}
+    for key, value in (meta or {}).items():
+        if value in (None, ""):
+            continue
+        if isinstance(value, (list, dict)) and len(value) == 0:
+            continue
+        out[key] = value
+    return out
+
+
+def import_strava_zip_for_user(zip_file, user_id: int, memory: ImportMemoryTracker | None = None) -> tuple[int, int]:
+    """Importuje activities.csv z archiwum Stravy dla wskazanego usera.
+
+    Zwraca: (added_count, skipped_count)
+    """
+    memory = memory or ImportMemoryTracker()
+    with memory.phase("zip_listing"):
+        z = zipfile.ZipFile(zip_file)
+        csv_filename = None
+        for name in z.namelist():
+            if name.endswith("activities.csv"):
+                csv_filename = name
+                break
+
+    with z:
+        if not csv_filename:
+            raise ValueError("Nie znaleziono pliku activities.csv w archiwum")
+
+        with z.open(csv_filename) as f, memory.phase("merge_commit"):
+            csv_content = io.TextIOWrapper(f, encoding="utf-8")
+            reader = csv.DictReader(csv_content)
+
+            added_count = 0
+            skipped_count = 0
+
+            for row_no, row in enumerate(reader):
+                if row_no % IMPORT_MEMORY_CHECK_EVERY == 0:
+                    memory.check()
+                date_str = row.get("Activity Date", "")
+                start_time_obj = None
+                external_id = (row.get("Activity ID") or row.get("Activity Id") or "").strip() or None
+
+                formats = [
+                    "%b %d, %Y, %I:%M:%S %p",  # np. Apr 30, 2025, 7:59:42 PM
+                    "%Y-%m-%d %H:%M:%S",
+                ]
+
+                for fmt in formats:
+                    try:
+                        start_time_obj = datetime.strptime(date_str, fmt)
+                        break
+                    except ValueError:
+                        continue
+
+                if not start_time_obj:
+                    continue
+
+                if external_id:
+                    existing = Activity.query.filter_by(
+                        user_id=user_id,
+                        source="strava",
+                        external_id=external_id,
+                    ).first()
+                else:
+                    existing = Activity.query.filter_by(user_id=user_id, start_time=start_time_obj).first()
+                if existing:
+                    skipped_count += 1
+                    continue
+
+                def clean_float(val):
+                    if not val or val == "" or val == "nan":
+                        return 0.0
+                    return float(str(val).replace(",", ""))
+
+                dist = clean_float(row.get("Distance", "0"))
+                elapsed = clean_float(row.get("Elapsed Time", "0"))
+                if dist < 500 and elapsed > 300:
+                    dist = dist * 1000
+
+                moving = clean_float(row.get("Moving Time", "0"))
+                if moving == 0:
+                    moving = elapsed
+
+                avg_hr_val = row.get("Average Heart Rate", None)
+                if avg_hr_val in [None, "", "nan"]:
+                    avg_hr = None
+                else:
+                    avg_hr = int(float(avg_hr_val))
+
+                max_hr_val = row.get("Max Heart Rate", None)
+                if max_hr_val in [None, "", "nan"]:
+                    max_hr = None
+                else:
+                    max_hr = int(float(max_hr_val))
+
+                desc = row.get("Activity Description", "")
+                if desc == "nan":
+                    desc = ""
+
+                new_activity = Activity(
+                    user_id=user_id,
+                    activity_type=(row.get("Activity Type", "") or "").lower() or "run",
+                    start_time=start_time_obj,
+                    duration=int(moving),
+                    distance=dist,
+                    avg_hr=avg_hr,
+                    max_hr=max_hr,
+                    moving_duration=int(moving),
+                    elapsed_duration=int(elapsed),
+                    source="strava",
+                    external_id=external_id,
+                    notes=desc,
+                )
+
+                db.session.add(new_activity)
+                added_count += 1
+
+            db.session.commit()
+            return added_count, skipped_count
+
+
+def import_garmin_zip_for_user(zip_file, user_id: int, memory: ImportMemoryTracker | None = None) -> tuple[int, int]:
+    """Import Garmin data-export ZIP for given user.
+
+    Source of activities:
+    - DI_CONNECT/DI-Connect-Fitness/*_summarizedActivities.json
+    """
+    memory = memory or ImportMemoryTracker()
+    with memory.phase("zip_listing"):
+        z = zipfile.ZipFile(zip_file)
+        names = z.namelist()
+        summary_members = [
+            n for n in names
+            if n.lower().endswith("_summarizedactivities.json") and "di-connect-fitness" in n.lower()
+        ]
+
+    with z:
+        if not summary_members:
+            raise ValueError("Nie znaleziono plików *_summarizedActivities.json w archiwum Garmina")
+
+        summarized_rows = []
+        with memory.phase("summary_json"):
+            for member in summary_members:
+                memory.check()
+                try:
+                    payload = _load_json_member_from_zip(z, member)
+                except Exception:
+                    continue
+                if isinstance(payload, list):
+                    for item in payload:
+                        if isinstance(item, dict) and isinstance(item.get("summarizedActivitiesExport"), list):
+                            summarized_rows.extend(item["summarizedActivitiesExport"])
+                elif isinstance(payload, dict) and isinstance(payload.get("summarizedActivitiesExport"), list):
+                    summarized_rows.extend(payload["summarizedActivitiesExport"])
+                payload = None
+
+        if not summarized_rows:
+            raise ValueError("Pliki Garmina nie zawierają żadnych aktywności do importu")
+
+        # Import profile/wellness snapshot first (optional, best effort).
+        with memory.phase("profile_snapshot"):
+            try:
+                snapshot = _load_garmin_profile_snapshot(z)
+                memory.check()
+                _apply_imported_profile_snapshot(user_id=user_id, snapshot=snapshot)
+            except ImportMemoryLimitExceeded:
+                raise
+            except Exception:
+                # Do not fail activity import if profile snapshot fails.
+                pass
+
+        fit_payloads: list[dict] = []
+        fit_minute_index: dict[int, list[int]] = {}
+        if FitFile is not None:
+            with memory.phase("fit_index"):
+                try:
+                    fit_payloads, fit_minute_index = _build_fit_payload_index(z, memory=memory)
+                except ImportMemoryLimitExceeded:
+                    raise
+                except Exception as e:
+                    current_app.logger.warning("Garmin FIT parse skipped for user %s: %s", user_id, e)
+
+        # Deduplicate by Garmin activityId.
+        added_count = 0
+        skipped_count = 0
+        seen_external = set()
+        with memory.phase("merge_commit"):
+            for row_no, row in enumerate(summarized_rows):
+                if row_no % IMPORT_MEMORY_CHECK_EVERY == 0:
+                    memory.check()
+                if not isinstance(row, dict):
+                    continue
+
+                external_id = str(row.get("activityId") or "").strip()
+                if not external_id:
+                    skipped_count += 1
+                    continue
+                if external_id in seen_external:
+                    skipped_count += 1
+                    continue
+                seen_external.add(external_id)
+
+                start_dt = _ms_to_datetime_utc(row.get("startTimeGmt") or row.get("startTimeLocal") or row.get("beginTimestamp"))
+                if not start_dt:
+                    skipped_count += 1
+                    continue
+
+                existing = (
+                    Activity.query
+                    .options(db.undefer(Activity.route_points_json))
+                    .filter_by(user_id=user_id, source="garmin", external_id=external_id)
+                    .first()
+                )
+
+                raw_type = (row.get("activityType") or "").strip()
+                sport_type = (row.get("sportType") or "").strip()
+                activity_name = (row.get("name") or "").strip()
+                mapped_type = _garmin_activity_type_to_app(raw_type, sport_type, activity_name)
+
+                distance_m = _to_meters_from_garmin_distance(row.get("distance"))
+                duration_s = _to_seconds_from_ms(row.get("duration"))
+                moving_s = _to_seconds_from_ms(row.get("movingDuration")) or duration_s
+                elapsed_s = _to_seconds_from_ms(row.get("elapsedDuration")) or duration_s
+
+                avg_speed_mps = (distance_m / moving_s) if (distance_m > 0 and moving_s > 0) else None
+                max_speed_raw = _safe_float(row.get("maxSpeed"))
+                max_speed_mps = (max_speed_raw * 10.0) if max_speed_raw is not None else None
+                elev_gain_raw = _safe_float(row.get("elevationGain"))
+                elev_loss_raw = _safe_float(row.get("elevationLoss"))
+
+                notes_parts = []
+                if activity_name:
+                    notes_parts.append(activity_name)
+                location = (row.get("locationName") or "").strip()
+                if location:
+                    notes_parts.append(location)
+                notes = " | ".join(notes_parts)[:1000] if notes_parts else None
+
+                meta = {
+                    "eventTypeId": row.get("eventTypeId"),
+                    "manufacturer": row.get("manufacturer"),
+                    "lapCount": row.get("lapCount"),
+                    "averagePace": row.get("averagePace"),
+                    "averageMovingPace": row.get("averageMovingPace"),
+                    "bestLapTime": row.get("bestLapTime"),
+                    "moderateIntensityMinutes": row.get("moderateIntensityMinutes"),
+                    "vigorousIntensityMinutes": row.get("vigorousIntensityMinutes"),
+                    "differenceBodyBattery": row.get("differenceBodyBattery"),
+                    "avgRunCadence": row.get("avgRunCadence"),
+                    "maxRunCadence": row.get("maxRunCadence"),
+                    "avgStrideLength": row.get("avgStrideLength"),
+                    "avgPower": row.get("avgPower"),
+                    "maxPower": row.get("maxPower"),
+                    "normPower": row.get("normPower"),
+                    "aerobicTrainingEffect": row.get("aerobicTrainingEffect"),
+                    "anaerobicTrainingEffect": row.get("anaerobicTrainingEffect"),
+                    "trainingStressScore": row.get("trainingStressScore"),
+                    "workoutFeel": row.get("workoutFeel"),
+                    "workoutRpe": row.get("workoutRpe"),
+                    "splitSummaries": row.get("splitSummaries"),
+                    "sportTypeRaw": row.get("sportType"),
+                    "activityTypeRaw": row.get("activityType"),
+                }
+                fit_payload = _match_fit_payload(start_dt, fit_payloads, fit_minute_index)
+                route_points = None
+                if fit_payload:
+                    meta.update(_prune_meta(fit_payload.get("meta") or {}))
+                    route_points = fit_payload.get("route_points") or None
+
+                    # Fill route endpoints from FIT when available.
+                    if fit_payload.get("start_lat") is not None:
+                        meta["fitRouteStartLat"] = fit_payload.get("start_lat")
+                    if fit_payload.get("start_lng") is not None:
+                        meta["fitRouteStartLng"] = fit_payload.get("start_lng")
+                    if fit_payload.get("end_lat") is not None:
+                        meta["fitRouteEndLat"] = fit_payload.get("end_lat")
+                    if fit_payload.get("end_lng") is not None:
+                        meta["fitRouteEndLng"] = fit_payload.get("end_lng")
+
+                meta = _prune_meta(meta)
+                start_lat = _normalize_gps_coord(row.get("startLatitude"))
+                start_lng = _normalize_gps_coord(row.get("startLongitude"))
+                end_lat = _normalize_gps_coord(row.get("endLatitude"))
+                end_lng = _normalize_gps_coord(row.get("endLongitude"))
+                if fit_payload:
+                    if fit_payload.get("start_lat") is not None:
+                        start_lat = fit_payload.get("start_lat")
+                    if fit_payload.get("start_lng") is not None:
+                        start_lng = fit_payload.get("start_lng")
+                    if fit_payload.get("end_lat") is not None:
+                        end_lat = fit_payload.get("end_lat")
+                    if fit_payload.get("end_lng") is not None:
+                        end_lng = fit_payload.get("end_lng")
+
+                route_points_json = None
+                if route_points:
+                    try:
+                        route_points_json = json.dumps(route_points, ensure_ascii=False, separators=(",", ":"))
+                    except Exception:
+                        route_points_json = None
+
+                if existing:
+                    # Keep manual edits, but enrich existing Garmin rows with extra stats and route.
+                    if not existing.activity_type or existing.activity_type == "other":
+                        existing.activity_type = mapped_type
+                    if not existing.start_time:
+                        existing.start_time = start_dt
+                    if (existing.duration or 0) <= 0 and duration_s > 0:
+                        existing.duration = duration_s
+                    if (existing.distance or 0) <= 0 and distance_m > 0:
+                        existing.distance = distance_m
+                    if existing.avg_hr is None:
+                        existing.avg_hr = _safe_int(row.get("avgHr"))
+                    if existing.max_hr is None:
+                        existing.max_hr = _safe_int(row.get("maxHr"))
+                    if (existing.moving_duration or 0) <= 0 and moving_s > 0:
+                        existing.moving_duration = moving_s
+                    if (existing.elapsed_duration or 0) <= 0 and elapsed_s > 0:
+                        existing.elapsed_duration = elapsed_s
+                    if existing.avg_speed_mps is None and avg_speed_mps is not None:
+                        existing.avg_speed_mps = round(avg_speed_mps, 3)
+                    if existing.max_speed_mps is None and max_speed_mps is not None:
+                        existing.max_speed_mps = round(max_speed_mps, 3)
+                    if existing.elevation_gain is None and elev_gain_raw is not None:
+                        existing.elevation_gain = round(elev_gain_raw / 100.0, 2)
+                    if existing.elevation_loss is None and elev_loss_raw is not None:
+                        existing.elevation_loss = round(elev_loss_raw / 100.0, 2)
+                    if existing.calories is None:
+                        existing.calories = _safe_float(row.get("calories"))
+                    if existing.steps is None:
+                        existing.steps = _safe_int(row.get("steps"))
+                    if existing.vo2max is None:
+                        existing.vo2max = _safe_float(row.get("vO2MaxValue"))
+                    if existing.start_lat is None and start_lat is not None:
+                        existing.start_lat = start_lat
+                    if existing.start_lng is None and start_lng is not None:
+                        existing.start_lng = start_lng
+                    if existing.end_lat is None and end_lat is not None:
+                        existing.end_lat = end_lat
+                    if existing.end_lng is None and end_lng is not None:
+                        existing.end_lng = end_lng
+                    if not existing.route_points_json and route_points_json:
+                        existing.route_points_json = route_points_json
+                    if not existing.device_id and row.get("deviceId") is not None:
+                        existing.device_id = str(row.get("deviceId"))
+                    if not existing.sport_type and sport_type:
+                        existing.sport_type = sport_type
+                    if not (existing.notes or "").strip() and notes:
+                        existing.notes = notes
+
+                    merged_meta = _safe_json_dict(existing.metadata_json)
+                    merged_meta.update(meta)
+                    existing.metadata_json = json.dumps(_prune_meta(merged_meta), ensure_ascii=False)
+                    skipped_count += 1
+                    continue
+
+                act = Activity(
+                    user_id=user_id,
+                    activity_type=mapped_type,
+                    start_time=start_dt,
+                    duration=duration_s,
+                    distance=distance_m,
+                    avg_hr=_safe_int(row.get("avgHr")),
+                    max_hr=_safe_int(row.get("maxHr")),
+                    moving_duration=moving_s,
+                    elapsed_duration=elapsed_s,
+                    avg_speed_mps=round(avg_speed_mps, 3) if avg_speed_mps is not None else None,
+                    max_speed_mps=round(max_speed_mps, 3) if max_speed_mps is not None else None,
+                    elevation_gain=(round(elev_gain_raw / 100.0, 2) if elev_gain_raw is not None else None),
+                    elevation_loss=(round(elev_loss_raw / 100.0, 2) if elev_loss_raw is not None else None),
+                    calories=_safe_float(row.get("calories")),
+                    steps=_safe_int(row.get("steps")),
+                    vo2max=_safe_float(row.get("vO2MaxValue")),
+                    start_lat=start_lat,
+                    start_lng=start_lng,
+                    end_lat=end_lat,
+                    end_lng=end_lng,
+                    route_points_json=route_points_json,
+                    source="garmin",
+                    external_id=external_id,
+                    device_id=str(row.get("deviceId")) if row.get("deviceId") is not None else None,
+                    sport_type=sport_type or None,
+                    metadata_json=json.dumps(meta, ensure_ascii=False),
+                    notes=notes,
+                )
+                db.session.add(act)
+                added_count += 1
+
+            db.session.commit()
+        return added_count, skipped_count
+
+
+def import_activity_archive_for_user(zip_file, user_id: int) -> ImportResult:
+    """Auto-detect archive source and import workouts.
+
+    Returns: ImportResult (source_kind, added_count, skipped_count) with per-phase memory in `.memory`.
+    """
+    source_kind = detect_activity_archive_type(zip_file)
+    _rewind_fileobj(zip_file)
+    if source_kind == "garmin_fit_only":
+        raise ValueError(
+            "Wykryto ZIP z samymi plikami .fit (częściowy eksport Garmina). "
+            "Prześlij pełne archiwum Garmin Export z DI_CONNECT/DI-Connect-Fitness."
+        )
+    if source_kind not in ("strava", "garmin"):
+        raise ValueError("Nie rozpoznano formatu ZIP (obsługiwane: Strava lub Garmin)")
+
+    memory = ImportMemoryTracker()
+    importer = import_strava_zip_for_user if source_kind == "strava" else import_garmin_zip_for_user
+    try:
+        added, skipped = importer(zip_file, user_id, memory=memory)
+    except ImportMemoryLimitExceeded:
+        db.session.rollback()
+        current_app.logger.warning(
+            "Import %s aborted for user %s (limit %s MB): %s", source_kind, user_id, memory.limit_mb, memory.summary()
+        )
+        raise
+    finally:
+        memory.close()
+    current_app.logger.info("Import %s memory for user %s: %s", source_kind, user_id, memory.summary())
+    return ImportResult(source_kind, added, skipped, memory=memory.phases)
+
+
+def import_activity_archive_for_user_resilient(zip_file, user_id: int) -> ImportResult:
+    """Robust wrapper for archive import.
+
+    Some hosting/platform setups expose upload streams in ways that occasionally fail
+    on first pass. We retry by buffering bytes in-memory — but not after a memory-limit
+    abort, where buffering the whole upload would only make it worse.
+    """
+    try:
+        return import_activity_archive_for_user(zip_file, user_id)
+    except ImportMemoryLimitExceeded:
+        raise
+    except Exception:
+        _rewind_fileobj(zip_file)
+        blob = None
+        try:
+            blob = zip_file.read()
+        except Exception:
+            blob = None
+        if not blob:
+            raise
+        buf = io.BytesIO(blob)
+        return import_activity_archive_for_user(buf, user_id)
@@ -0,0 +1,474 @@
+"""Lekka instrumentacja żądań: czas, SQL, LLM, renderowanie szablonów i rozmiar odpowiedzi per endpoint.
+
+Dane trafiają do histogramów w pamięci procesu (wystawionych w formacie tekstowym Prometheusa)
+oraz do jednej linii logu JSON na żądanie. Każdy worker ma własne liczniki — scraper
+Prometheusa powinien odpytywać workery osobno (albo sumować po instancjach).
+"""
+
+from __future__ import annotations
+
+import cProfile
+import hmac
+import json
+import logging
+import math
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from flask import Response, abort, before_render_template, current_app, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+_ENVIRON_KEY = "app.request_metrics"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (512, 2048, 8192, 32768, 131072, 524288, 2097152)
+
+perf_logger = logging.getLogger("request_metrics")
+query_logger = logging.getLogger("query_detector")
+
+
+class Histogram:
+    """Histogram z etykietą `endpoint` (kumulatywne kubełki jak w Prometheusie)."""
+
+    def __init__(self, name: str, help_text: str, buckets: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series: dict[str, dict] = {}
+
+    def observe(self, endpoint: str, value: float) -> None:
+        with self._lock:
+            s = self._series.get(endpoint)
+            if s is None:
+                s = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._series[endpoint] = s
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    s["counts"][i] += 1
+            s["sum"] += value
+            s["count"] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for endpoint, s in sorted(self._series.items()):
+                label = _escape_label(endpoint)
+                for bound, cnt in zip(self.buckets, s["counts"]):
+                    lines.append(f'{self.name}_bucket{{endpoint="{label}",le="{_fmt(bound)}"}} {cnt}')
+                lines.append(f'{self.name}_bucket{{endpoint="{label}",le="+Inf"}} {s["count"]}')
+                lines.append(f'{self.name}_sum{{endpoint="{label}"}} {_fmt(s["sum"])}')
+                lines.append(f'{self.name}_count{{endpoint="{label}"}} {s["count"]}')
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+def _fmt(v: float) -> str:
+    if isinstance(v, float) and (math.isinf(v) or math.isnan(v)):
+        return "+Inf" if v > 0 else "NaN"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+def _escape_label(v: str) -> str:
+    return (v or "").replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_DURATION = Histogram("app_request_duration_seconds", "Wall time per request.", LATENCY_BUCKETS)
+SQL_QUERIES = Histogram("app_request_sql_queries", "SQL statements executed per request.", COUNT_BUCKETS)
+SQL_DURATION = Histogram("app_request_sql_duration_seconds", "Total SQL time per request.", LATENCY_BUCKETS)
+LLM_DURATION = Histogram("app_request_llm_duration_seconds", "Total LLM call time per request.", LATENCY_BUCKETS)
+RENDER_DURATION = Histogram("app_request_render_duration_seconds", "Total template render time per request.", LATENCY_BUCKETS)
+RESPONSE_SIZE = Histogram("app_response_size_bytes", "Response body size.", SIZE_BUCKETS)
+HISTOGRAMS = (REQUEST_DURATION, SQL_QUERIES, SQL_DURATION, LLM_DURATION, RENDER_DURATION, RESPONSE_SIZE)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Zapytanie (albo ich suma) przekroczyło budżet w żądaniu / bloku `query_budget`."""
+
+
+_RE_IN_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+))*\s*\)")
+_RE_STRING = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_SPACE = re.compile(r"\s+")
+
+
+def fingerprint_statement(statement: str) -> str:
+    """Kształt zapytania bez wartości: literały i listy IN (?, ?, ...) sprowadzone do jednego `?`."""
+    s = _RE_STRING.sub("?", statement or "")
+    s = _RE_NUMBER.sub("?", s)
+    s = _RE_IN_LIST.sub("(?...)", s)
+    return _RE_SPACE.sub(" ", s).strip()
+
+
+def _caller_location() -> str | None:
+    """Pierwsza ramka stosu z kodu aplikacji (poza SQLAlchemy / site-packages / tym modułem)."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        fname = frame.f_code.co_filename
+        if (
+            "site-packages" not in fname
+            and "sqlalchemy" not in fname
+            and fname != __file__
+            and not fname.startswith("<")
+        ):
+            return f"{os.path.basename(fname)}:{frame.f_lineno} ({frame.f_code.co_name})"
+        frame = frame.f_back
+    return None
+
+
+class QueryTracker:
+    """Licznik odcisków zapytań (per żądanie albo per blok `query_budget`)."""
+
+    def __init__(self):
+        self.total = 0
+        self.fingerprints: dict[str, int] = {}
+        self.locations: dict[str, str | None] = {}
+
+    def add(self, statement: str, capture_at: int | None = None) -> None:
+        fp = fingerprint_statement(statement)
+        cnt = self.fingerprints.get(fp, 0) + 1
+        self.fingerprints[fp] = cnt
+        self.total += 1
+        if capture_at is not None and cnt == capture_at and fp not in self.locations:
+            self.locations[fp] = _caller_location()
+
+    def repeated(self, threshold: int) -> list[tuple[str, int, str | None]]:
+        return sorted(
+            ((fp, cnt, self.locations.get(fp)) for fp, cnt in self.fingerprints.items() if cnt > threshold),
+            key=lambda x: -x[1],
+        )
+
+
+class RequestMetrics:
+    """Liczniki jednego żądania. Zapis z lockiem, bo wywołania LLM mogą iść z puli wątków."""
+
+    def __init__(self, track_queries: bool = False):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.llm_count = 0
+        self.llm_seconds = 0.0
+        self.render_count = 0
+        self.render_seconds = 0.0
+        self._render_started: list[float] = []
+        self.queries = QueryTracker() if track_queries else None
+        self._lock = threading.Lock()
+
+    def add_sql(self, seconds: float) -> None:
+        with self._lock:
+            self.sql_count += 1
+            self.sql_seconds += seconds
+
+    def add_llm(self, seconds: float) -> None:
+        with self._lock:
+            self.llm_count += 1
+            self.llm_seconds += seconds
+
+    def start_render(self) -> None:
+        self._render_started.append(time.perf_counter())
+
+    def finish_render(self) -> None:
+        if not self._render_started:
+            return
+        elapsed = time.perf_counter() - self._render_started.pop()
+        # render_template wywołany w trakcie innego renderowania nie liczy się podwójnie.
+        if not self._render_started:
+            self.render_count += 1
+            self.render_seconds += elapsed
+
+
+def current_metrics() -> RequestMetrics | None:
+    # Trzymamy w environ, a nie w `g`: kopia kontekstu żądania w wątku roboczym
+    # (copy_current_request_context) ma własne `g`, ale ten sam obiekt request.
+    if not has_request_context():
+        return None
+    return request.environ.get(_ENVIRON_KEY)
+
+
+def record_llm_call(seconds: float) -> None:
+    m = current_metrics()
+    if m is not None:
+        m.add_llm(seconds)
+
+
+def _before_render_template(sender, template, context, **extra):
+    m = current_metrics()
+    if m is not None:
+        m.start_render()
+
+
+def _template_rendered(sender, template, context, **extra):
+    m = current_metrics()
+    if m is not None:
+        m.finish_render()
+
+
+# Detektor N+1: włączony w debug/testach albo przez QUERY_DETECTOR=1.
+QUERY_REPEAT_THRESHOLD = int(os.environ.get("QUERY_REPEAT_THRESHOLD", "5"))
+_budget_stack = threading.local()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    m = current_metrics()
+    if m is not None and m.queries is not None:
+        m.queries.add(statement, capture_at=QUERY_REPEAT_THRESHOLD + 1)
+    for tracker in getattr(_budget_stack, "trackers", ()):
+        tracker.add(statement, capture_at=1)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get("query_start_time")
+    if not stack:
+        return
+    elapsed = time.perf_counter() - stack.pop()
+    m = current_metrics()
+    if m is not None:
+        m.add_sql(elapsed)
+
+
+@contextmanager
+def query_budget(max_queries: int | None = None, max_repeats: int | None = None):
+    """Budżet zapytań dla bloku kodu (testy / CI).
+
+        with query_budget(max_queries=15, max_repeats=2):
+            client.get("/")
+
+    Rzuca QueryBudgetExceeded, gdy łączna liczba zapytań przekroczy `max_queries`
+    albo ten sam odcisk zapytania wykona się więcej niż `max_repeats` razy.
+    """
+    tracker = QueryTracker()
+    stack = getattr(_budget_stack, "trackers", None)
+    if stack is None:
+        stack = _budget_stack.trackers = []
+    stack.append(tracker)
+    try:
+        yield tracker
+    finally:
+        stack.remove(tracker)
+
+    problems = []
+    if max_queries is not None and tracker.total > max_queries:
+        problems.append(f"{tracker.total} queries (budget {max_queries})")
+    if max_repeats is not None:
+        for fp, cnt, where in tracker.repeated(max_repeats):
+            problems.append(f"{cnt}x (budget {max_repeats}) at {where or '?'}: {fp[:200]}")
+    if problems:
+        raise QueryBudgetExceeded("Query budget exceeded:\n  " + "\n  ".join(problems))
+
+
+def _report_repeated_queries(endpoint: str, tracker: QueryTracker, strict: bool) -> None:
+    repeated = tracker.repeated(QUERY_REPEAT_THRESHOLD)
+    if not repeated:
+        return
+    for fp, cnt, where in repeated:
+        query_logger.warning(
+            "Repeated query in %s: %sx (threshold %s) at %s: %s",
+            endpoint, cnt, QUERY_REPEAT_THRESHOLD, where or "?", fp[:300],
+        )
+    if strict:
+        fp, cnt, where = repeated[0]
+        raise QueryBudgetExceeded(
+            f"{endpoint}: query repeated {cnt}x (threshold {QUERY_REPEAT_THRESHOLD}) at {where or '?'}: {fp[:200]}"
+        )
+
+
+def render_prometheus() -> str:
+    lines = []
+    for h in HISTOGRAMS:
+        lines.extend(h.render())
+    return "\n".join(lines) + "\n"
+
+
+def metrics_access_allowed() -> bool:
+    """Dostęp do endpointów /internal/*: `Authorization: Bearer <METRICS_TOKEN>`.
+
+    Token tylko w nagłówku — z query stringu trafiałby do logów proxy i historii.
+    Bez tokenu dostęp z localhostu jest tylko w debugu/testach: za reverse proxy
+    remote_addr to adres proxy, więc na produkcji wpuszczałby każdego.
+    """
+    token = os.environ.get("METRICS_TOKEN")
+    if token:
+        auth = request.headers.get("Authorization", "")
+        return hmac.compare_digest(auth.encode(), f"Bearer {token}".encode())
+    if not (current_app.debug or current_app.testing):
+        return False
+    return request.remote_addr in ("127.0.0.1", "::1")
+
+
+def init_instrumentation(app, skip_endpoints: tuple = ("static",)) -> None:
+    """Podpina hooki before/after_request, zdarzenia silnika SQLAlchemy, sygnały renderowania i /internal/metrics."""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    # Czas od before_render_template do template_rendered (razem z include'ami i cached_fragment).
+    before_render_template.connect(_before_render_template, app)
+    template_rendered.connect(_template_rendered, app)
+
+    log_enabled = os.environ.get("REQUEST_METRICS_LOG", "1") == "1"
+    if log_enabled and not perf_logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        perf_logger.addHandler(handler)
+        perf_logger.setLevel(logging.INFO)
+        perf_logger.propagate = False
+
+    detector_env = os.environ.get("QUERY_DETECTOR")
+    # QUERY_DETECTOR_STRICT=1: przekroczenie progu rzuca wyjątek (w testach wywraca test).
+    strict_queries = os.environ.get("QUERY_DETECTOR_STRICT") == "1"
+
+    @app.before_request
+    def _start_request_metrics():
+        # Sprawdzane per żądanie: DEBUG/TESTING bywa ustawiane już po imporcie aplikacji.
+        track = detector_env == "1" if detector_env is not None else bool(app.debug or app.testing)
+        request.environ[_ENVIRON_KEY] = RequestMetrics(track_queries=track)
+
+    @app.after_request
+    def _finish_request_metrics(response):
+        m = request.environ.get(_ENVIRON_KEY)
+        endpoint = request.endpoint or "unknown"
+        if m is None or endpoint in skip_endpoints or endpoint == "prometheus_metrics":
+            return response
+
+        if m.queries is not None:
+            _report_repeated_queries(endpoint, m.queries, strict_queries)
+
+        wall = time.perf_counter() - m.started
+        size = response.calculate_content_length()
+        REQUEST_DURATION.observe(endpoint, wall)
+        SQL_QUERIES.observe(endpoint, m.sql_count)
+        SQL_DURATION.observe(endpoint, m.sql_seconds)
+        LLM_DURATION.observe(endpoint, m.llm_seconds)
+        if m.render_count:
+            RENDER_DURATION.observe(endpoint, m.render_seconds)
+        if size is not None:
+            RESPONSE_SIZE.observe(endpoint, size)
+
+        if log_enabled:
+            perf_logger.info(json.dumps({
+                "event": "request",
+                "endpoint": endpoint,
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "wall_ms": round(wall * 1000, 1),
+                "sql_count": m.sql_count,
+                "sql_ms": round(m.sql_seconds * 1000, 1),
+                "llm_count": m.llm_count,
+                "llm_ms": round(m.llm_seconds * 1000, 1),
+                "render_ms": round(m.render_seconds * 1000, 1),
+                "bytes": size,
+            }))
+        return response
+
+    @app.route("/internal/metrics", endpoint="prometheus_metrics")
+    def prometheus_metrics():
+        if not metrics_access_allowed():
+            abort(404)
+        return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+# -------------------- profilowanie na żądanie --------------------
+
+_PROFILER_KEY = "app.request_profiler"
+
+
+def _resolve_user_id(user_id_getter):
+    try:
+        return user_id_getter()
+    except Exception:
+        return None
+
+
+def _profile_requested(user_id_getter) -> tuple[bool, object]:
+    # Najpierw tanie bramki (nagłówek, env); użytkownika ładujemy tylko, gdy profilowanie jest w grze,
+    # żeby zwykłe żądanie nie płaciło tu za current_user.
+    token = os.environ.get("PROFILE_TOKEN")
+    header = request.headers.get("X-Profile-Token")
+    if token and header and hmac.compare_digest(header, token):
+        return True, _resolve_user_id(user_id_getter)
+
+    # Flaga w konfiguracji: profiluj wybranych użytkowników / endpointy (np. zgłoszony wolny dashboard).
+    user_ids = {x.strip() for x in os.environ.get("PROFILE_USER_IDS", "").split(",") if x.strip()}
+    endpoints = {x.strip() for x in os.environ.get("PROFILE_ENDPOINTS", "").split(",") if x.strip()}
+    if not user_ids and not endpoints:
+        return False, None
+    if endpoints and request.endpoint not in endpoints:
+        return False, None
+    user_id = _resolve_user_id(user_id_getter)
+    if user_ids and (user_id is None or str(user_id) not in user_ids):
+        return False, None
+    return True, user_id
+
+
+def _dump_profile(state: dict, status: int | None) -> str | None:
+    profiler = state["profiler"]
+    profiler.disable()
+    directory = os.environ.get("PROFILE_DIR") or os.path.join(os.getcwd(), "profiles")
+    try:
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        name = f"{state['endpoint']}-u{state['user_id'] if state['user_id'] is not None else 'anon'}-{stamp}.prof"
+        path = os.path.join(directory, name)
+        profiler.dump_stats(path)
+    except Exception:
+        perf_logger.exception("Profile dump failed for %s", state.get("endpoint"))
+        return None
+    perf_logger.warning(json.dumps({
+        "event": "profile",
+        "endpoint": state["endpoint"],
+        "user_id": state["user_id"],
+        "status": status,
+        "file": path,
+    }))
+    return name
+
+
+def init_profiling(app, user_id_getter) -> None:
+    """cProfile dla pojedynczego żądania, na żądanie (bez redeployu).
+
+    Włączenie:
+    - nagłówek `X-Profile-Token: <PROFILE_TOKEN>` (sekret znany tylko adminom), albo
+    - konfiguracja PROFILE_USER_IDS i/lub PROFILE_ENDPOINTS (np. "12" + "index").
+    Statystyki trafiają do PROFILE_DIR (domyślnie ./profiles) jako
+    `<endpoint>-u<user_id>-<czas>.prof`; podgląd: `python -m pstats <plik>` albo snakeviz.
+    """
+
+    @app.before_request
+    def _start_profiler():
+        if request.endpoint in (None, "static", "prometheus_metrics"):
+            return
+        enabled, user_id = _profile_requested(user_id_getter)
+        if not enabled:
+            return
+        profiler = cProfile.Profile()
+        request.environ[_PROFILER_KEY] = {"profiler": profiler, "endpoint": request.endpoint, "user_id": user_id}
+        profiler.enable()
+
+    @app.after_request
+    def _stop_profiler(response):
+        state = request.environ.pop(_PROFILER_KEY, None)
+        if state is not None:
+            name = _dump_profile(state, response.status_code)
+            if name:
+                response.headers["X-Profile-File"] = name
+        return response
+
+    @app.teardown_request
+    def _stop_profiler_on_error(exc):
+        # after_request nie jest wołane przy nieobsłużonym wyjątku — nie zostawiaj włączonego profilera.
+        state = request.environ.pop(_PROFILER_KEY, None)
+        if state is not None:
+            _dump_profile(state, 500)
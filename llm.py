@@ -0,0 +1,165 @@
+"""Modele Gemini i wspólna ścieżka wywołań (pomiar + dziennik llm_calls).
+
+SDK google.generativeai (~0.7 s importu) ładuje się dopiero przy pierwszym wywołaniu modelu,
+więc sam import tego modułu jest tani. Testy / benchmarki podmieniają `llm.chat_model`,
+`llm.plan_model`, `llm.vision_model` i `llm.build_generative_model` — wywołujące moduły
+odwołują się do nich przez `llm.<nazwa>`, żeby podmiana działała.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app, has_request_context, request, session
+
+from models import LlmCall, db
+from instrumentation import record_llm_call
+
+VISION_MODEL = os.environ.get("VISION_MODEL", os.environ.get("CHECKIN_MODEL", "gemini-2.5-flash-lite"))
+CHAT_MODEL = os.environ.get("CHAT_MODEL", "gemini-2.5-flash")
+PLAN_MODEL = os.environ.get("PLAN_MODEL", "gemini-2.5-flash")
+
+_genai_lock = threading.Lock()
+_genai = None
+
+
+def _get_genai():
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
+                _genai = genai
+    return _genai
+
+
+def build_generative_model(model_name: str, **kwargs):
+    return _get_genai().GenerativeModel(model_name, **kwargs)
+
+
+class LazyGenerativeModel:
+    """Model Gemini tworzony dopiero przy pierwszym wywołaniu (szybszy zimny start)."""
+
+    def __init__(self, model_name: str, **kwargs):
+        self.model_name = model_name
+        self._kwargs = kwargs
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _get(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = build_generative_model(self.model_name, **self._kwargs)
+        return self._model
+
+    def generate_content(self, contents, **kwargs):
+        return self._get().generate_content(contents, **kwargs)
+
+
+vision_model = LazyGenerativeModel(VISION_MODEL)
+chat_model = LazyGenerativeModel(CHAT_MODEL)
+plan_model = LazyGenerativeModel(PLAN_MODEL)
+
+
+# --- Dziennik wywołań (llm_calls) ---
+_LLM_LEDGER_KEY = "app.llm_ledger"
+
+
+def _llm_prompt_size(contents) -> tuple[int, int]:
+    """(znaki tekstu, bajty załączników) dla promptu w dowolnym formacie SDK."""
+    chars = 0
+    blobs = 0
+
+    def _part(p):
+        nonlocal chars, blobs
+        if isinstance(p, str):
+            chars += len(p)
+        elif isinstance(p, (bytes, bytearray)):
+            blobs += len(p)
+        elif isinstance(p, dict):
+            if "data" in p:
+                blobs += len(p.get("data") or b"")
+            for sub in p.get("parts") or []:
+                _part(sub)
+
+    if isinstance(contents, (list, tuple)):
+        for item in contents:
+            _part(item)
+    else:
+        _part(contents)
+    return chars, blobs
+
+
+def llm_generate(model, contents, *, feature: str, **kwargs):
+    """Jedno miejsce wywołań modelu: mierzy czas (instrumentacja żądania) i zapisuje wpis w llm_calls."""
+    started = time.perf_counter()
+    response = None
+    error = None
+    try:
+        response = model.generate_content(contents, **kwargs)
+        return response
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        record_llm_call(elapsed)
+        try:
+            _record_llm_ledger(model, contents, feature, response, error, elapsed)
+        except Exception:
+            current_app.logger.exception("LLM ledger entry failed (%s)", feature)
+
+
+def _record_llm_ledger(model, contents, feature: str, response, error, elapsed: float) -> None:
+    prompt_chars, attachment_bytes = _llm_prompt_size(contents)
+    meta = getattr(response, "usage_metadata", None) if response is not None else None
+    text = None
+    if response is not None:
+        try:
+            text = response.text
+        except Exception:
+            text = None
+    outcome = "error" if error is not None else ("ok" if text else "empty")
+    row = {
+        "user_id": None,
+        "created_at": datetime.utcnow(),
+        "feature": feature,
+        "endpoint": None,
+        "model": str(getattr(model, "model_name", "") or "").replace("models/", "")[:80] or None,
+        "prompt_chars": prompt_chars,
+        "attachment_bytes": attachment_bytes or None,
+        "response_chars": len(text) if text else 0,
+        "prompt_tokens": getattr(meta, "prompt_token_count", None) if meta is not None else None,
+        "response_tokens": getattr(meta, "candidates_token_count", None) if meta is not None else None,
+        "cached_tokens": getattr(meta, "cached_content_token_count", None) if meta is not None else None,
+        "latency_ms": int(round(elapsed * 1000)),
+        "outcome": outcome,
+        "error": str(error)[:300] if error is not None else None,
+    }
+    if has_request_context():
+        # Flask-Login trzyma id w sesji — bez zapytania do bazy (działa też w wątkach puli).
+        uid = session.get("_user_id")
+        row["user_id"] = int(uid) if uid and str(uid).isdigit() else None
+        row["endpoint"] = request.endpoint
+        # Zapis po zakończeniu widoku, żeby nie commitować w połowie jego transakcji.
+        request.environ.setdefault(_LLM_LEDGER_KEY, []).append(row)
+        return
+    with db.engine.begin() as conn:
+        conn.execute(LlmCall.__table__.insert().values(**row))
+
+
+def _flush_llm_ledger(rollback_first: bool = False) -> None:
+    rows = request.environ.pop(_LLM_LEDGER_KEY, None)
+    if not rows:
+        return
+    try:
+        if rollback_first:
+            db.session.rollback()
+        db.session.add_all([LlmCall(**row) for row in rows])
+        db.session.commit()
+    except Exception:
+        current_app.logger.exception("LLM ledger flush failed (%s rows)", len(rows))
+        db.session.rollback()
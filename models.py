@@ -23,11 +23,16 @@ class User(db.Model, UserMixin):
 
     onboarding_completed = db.Column(db.Boolean, default=False, nullable=False)
 
+    # Liczniki zapisów (http_cache): podbijane przy zapisie danych treningowych / czatu, źródło ETagów.
+    data_version = db.Column(db.Integer, default=0, nullable=False)
+    chat_version = db.Column(db.Integer, default=0, nullable=False)
+
     profile = db.relationship("UserProfile", backref="user", uselist=False, cascade="all, delete-orphan")
     state_entries = db.relationship("UserState", backref="user", cascade="all, delete-orphan")
     activities = db.relationship("Activity", backref="user", cascade="all, delete-orphan")
     workout_plans = db.relationship("WorkoutPlan", backref="user", cascade="all, delete-orphan")
     chat_messages = db.relationship("ChatMessage", backref="user", cascade="all, delete-orphan")
+    chat_sessions = db.relationship("ChatSession", backref="user", cascade="all, delete-orphan")
     generated_plans = db.relationship("GeneratedPlan", backref="user", cascade="all, delete-orphan")
     checkins = db.relationship("TrainingCheckin", backref="user", cascade="all, delete-orphan")
 
@@ -121,7 +126,8 @@ class Activity(db.Model):
     start_lng = db.Column(db.Float)
     end_lat = db.Column(db.Float)
     end_lng = db.Column(db.Float)
-    route_points_json = db.Column(db.Text)  # compact [[lat, lng], ...] route for map rendering
+    # compact [[lat, lng], ...] route for map rendering; deferred — only the route endpoint needs it
+    route_points_json = db.deferred(db.Column(db.Text))
     source = db.Column(db.String(20), default="manual", nullable=False, index=True)
     external_id = db.Column(db.String(80), index=True)
     device_id = db.Column(db.String(80))
@@ -179,10 +185,44 @@ class GeneratedPlan(db.Model):
     start_date = db.Column(db.Date, default=date.today)
     horizon_days = db.Column(db.Integer, default=4)
 
-    html_content = db.Column(db.Text, nullable=False)
+    html_content = db.Column(db.Text, nullable=False)  # JSON snapshot from generation time
 
     is_active = db.Column(db.Boolean, default=True, nullable=False)
 
+    days = db.relationship(
+        "PlanDay",
+        backref="plan",
+        cascade="all, delete-orphan",
+        order_by="PlanDay.day_date",
+    )
+
+
+class PlanDay(db.Model):
+    """One day of a GeneratedPlan, parsed once at generation time (dashboard reads these rows)."""
+
+    __tablename__ = "plan_days"
+    __table_args__ = (db.Index("ix_plan_days_plan_date", "plan_id", "day_date"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    plan_id = db.Column(db.Integer, db.ForeignKey("generated_plans.id"), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+
+    day_date = db.Column(db.Date)
+    sport = db.Column(db.String(30))
+    intensity = db.Column(db.String(20))
+    phase = db.Column(db.String(40))
+    distance_km = db.Column(db.Float)
+    duration_min = db.Column(db.Integer)
+
+    workout = db.Column(db.Text)
+    why = db.Column(db.Text)
+    details = db.Column(db.Text)
+    goal_link = db.Column(db.Text)
+    warmup = db.Column(db.Text)
+    main_set = db.Column(db.Text)
+    cooldown = db.Column(db.Text)
+    source_facts_json = db.Column(db.Text)  # JSON list of strings
+
 
 class ChatMessage(db.Model):
     __tablename__ = "chat_messages"
@@ -194,6 +234,57 @@ class ChatMessage(db.Model):
     content = db.Column(db.Text)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Pomiar odpowiedzi AI (tylko dla sender='ai'): tryb promptu, tokeny wejścia, czas.
+    session_id = db.Column(db.Integer, db.ForeignKey("chat_sessions.id"), index=True)
+    chat_mode = db.Column(db.String(10))  # 'session' | 'prompt'
+    prompt_tokens = db.Column(db.Integer)
+    cached_tokens = db.Column(db.Integer)
+    latency_ms = db.Column(db.Integer)
+
+
+class ChatSession(db.Model):
+    """Okno rozmowy z trenerem: kontekst wysłany raz + kolejne tury (przeżywa restart workera)."""
+
+    __tablename__ = "chat_sessions"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_message_at = db.Column(db.DateTime, default=datetime.utcnow)
+    lang = db.Column(db.String(5))
+    turns = db.Column(db.Integer, default=0, nullable=False)
+
+    history_json = db.Column(db.Text)         # [{"role": "user"|"model", "text": ...}] dokładnie to, co poszło do modelu
+    context_hashes_json = db.Column(db.Text)  # {"section": sha1} ostatnio wysłanej wersji sekcji
+
+    is_active = db.Column(db.Boolean, default=True, nullable=False)
+
+
+class LlmCall(db.Model):
+    """Ledger wywołań modelu: koszt (tokeny / rozmiary) i opóźnienie per użytkownik i funkcja."""
+
+    __tablename__ = "llm_calls"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    feature = db.Column(db.String(40), index=True)   # chat | chat_session | forecast | screenshot_parse
+    endpoint = db.Column(db.String(80))
+    model = db.Column(db.String(80))
+
+    prompt_chars = db.Column(db.Integer)
+    attachment_bytes = db.Column(db.Integer)         # obrazy wysłane razem z promptem
+    response_chars = db.Column(db.Integer)
+    prompt_tokens = db.Column(db.Integer)
+    response_tokens = db.Column(db.Integer)
+    cached_tokens = db.Column(db.Integer)
+
+    latency_ms = db.Column(db.Integer)
+    outcome = db.Column(db.String(20))               # ok | empty | error
+    error = db.Column(db.String(300))
+
 
 class TrainingCheckin(db.Model):
     """User-provided check-in after a workout: screenshot + short note.
@@ -210,3 +301,32 @@ class TrainingCheckin(db.Model):
 
     notes = db.Column(db.Text)
     image_path = db.Column(db.String(500))
+
+
+class IdempotencyKey(db.Model):
+    """Odpowiedź zapisu powiązana z nagłówkiem Idempotency-Key (powtórki z kolejki offline nie dublują danych)."""
+
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (db.UniqueConstraint("user_id", "key", name="uq_idempotency_user_key"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False, index=True)
+    key = db.Column(db.String(80), nullable=False)
+    endpoint = db.Column(db.String(80), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    # NULL = żądanie w toku: klucz zatwierdzany przed widokiem, odpowiedź dopisywana osobnym commitem po nim
+    status_code = db.Column(db.Integer)
+    content_type = db.Column(db.String(120))
+    location = db.Column(db.String(500))
+    body = db.Column(db.LargeBinary)
+
+
+class SchemaVersion(db.Model):
+    """Jeden wiersz (id=1) z wersją schematu, do której doprowadziło ensure_schema()."""
+
+    __tablename__ = "schema_version"
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,315 @@
+"""Parsowanie wartości z formularzy, odpowiedzi AI i eksportów (liczby, daty, czasy, typy aktywności)."""
+
+import json
+import re
+from datetime import date, datetime, timedelta, timezone
+
+
+def _clip(value: str | None, max_len: int) -> str:
+    return (value or "").strip()[:max_len]
+
+
+def _parse_decimal_input(value) -> float | None:
+    """Parse decimal values from user/AI input, accepting both dot and comma."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        try:
+            return float(value)
+        except Exception:
+            return None
+
+    raw = str(value).strip().lower()
+    if not raw:
+        return None
+
+    norm = raw.replace("−", "-").replace("\u202f", " ").replace("\xa0", " ")
+    m = re.search(r"-?\d[\d\s.,]*", norm)
+    if not m:
+        return None
+
+    token = m.group(0).strip().replace(" ", "")
+    if not token:
+        return None
+
+    # both separators -> last one is decimal separator
+    if "," in token and "." in token:
+        if token.rfind(",") > token.rfind("."):
+            token = token.replace(".", "").replace(",", ".")
+        else:
+            token = token.replace(",", "")
+    elif "," in token:
+        # 1,425 -> thousand grouping, 5,5 -> decimal
+        if re.fullmatch(r"-?\d{1,3}(,\d{3})+", token):
+            token = token.replace(",", "")
+        else:
+            token = token.replace(",", ".")
+    elif "." in token:
+        # 1.425 -> thousand grouping in some locales
+        if re.fullmatch(r"-?\d{1,3}(\.\d{3})+", token):
+            token = token.replace(".", "")
+
+    try:
+        return float(token)
+    except Exception:
+        return None
+
+
+def _parse_distance_km_input(value, activity_type: str | None = None) -> float | None:
+    """Parse distance and normalize to km from mixed strings (km/m, EN/PL)."""
+    if value is None:
+        return None
+
+    raw = str(value).strip().lower()
+    if not raw:
+        return None
+
+    # Ignore pure pace strings like "7:00 /km" or "1:52 /100m".
+    if ("/km" in raw or "/100m" in raw) and ("distance" not in raw and "dystans" not in raw):
+        return None
+
+    num = _parse_decimal_input(raw)
+    if num is None:
+        return None
+
+    has_km = bool(re.search(r"\bkm\b|kilometr", raw))
+    has_m = bool(re.search(r"(^|[^a-z])m($|[^a-z])|metr", raw)) and not has_km
+
+    if has_km:
+        dist_km = num
+    elif has_m:
+        dist_km = num / 1000.0
+    else:
+        dist_km = num
+
+    t = (activity_type or "").lower()
+    # Safety net for meters accidentally interpreted as km.
+    if dist_km and dist_km > 0:
+        if t == "swim" and dist_km > 20:
+            dist_km = dist_km / 1000.0
+        elif t in {"run", "walk", "hike", "yoga", "weighttraining", "workout", "other"} and dist_km > 120:
+            dist_km = dist_km / 1000.0
+
+    return dist_km
+
+
+def _parse_minutes_input(value) -> float | None:
+    """Parse duration in minutes from flexible formats (e.g. 45, 45.5, 45,5, 1:15:00)."""
+    if value is None:
+        return None
+
+    raw = str(value).strip().lower()
+    if not raw:
+        return None
+
+    s = raw.replace(",", ".")
+
+    # Clock formats: MM:SS or HH:MM:SS (e.g. 49:06, 1:24:18)
+    m_clock = re.search(r"\b(\d{1,2}:\d{2}(?::\d{2})?)\b", s)
+    if m_clock:
+        parts = m_clock.group(1).split(":")
+        try:
+            nums = [float(p) for p in parts]
+            if len(nums) == 2:
+                return nums[0] + (nums[1] / 60.0)
+            if len(nums) == 3:
+                return nums[0] * 60.0 + nums[1] + (nums[2] / 60.0)
+        except Exception:
+            pass
+
+    # "1h 20min 6s", "49min 6s", "1 godz 24 min" styles
+    h_match = re.search(r"(\d+(?:\.\d+)?)\s*(?:h|hr|hrs|godz)", s)
+    m_match = re.search(r"(\d+(?:\.\d+)?)\s*(?:m|min|mins|minut)", s)
+    s_match = re.search(r"(\d+(?:\.\d+)?)\s*(?:s|sec|secs|sek)", s)
+    if h_match or m_match or s_match:
+        hours = _parse_decimal_input(h_match.group(1)) if h_match else 0.0
+        mins = _parse_decimal_input(m_match.group(1)) if m_match else 0.0
+        secs = _parse_decimal_input(s_match.group(1)) if s_match else 0.0
+        return float(hours or 0.0) * 60.0 + float(mins or 0.0) + float(secs or 0.0) / 60.0
+
+    return _parse_decimal_input(s)
+
+
+def _normalize_date_input(value: str | None) -> str | None:
+    raw = (value or "").strip()
+    if not raw:
+        return None
+
+    s = raw.lower().strip()
+    today = datetime.now().date()
+    if any(k in s for k in ("today", "dzis", "dziś")):
+        return today.isoformat()
+    if "yesterday" in s or "wczoraj" in s:
+        return (today - timedelta(days=1)).isoformat()
+
+    # Trim trailing noise like "at 8:31 PM - Porto".
+    candidates = [raw]
+    for sep in (" at ", " @ ", " - ", " • "):
+        if sep in raw:
+            candidates.append(raw.split(sep)[0].strip())
+
+    for cand in candidates:
+        for fmt in ("%Y-%m-%d", "%Y/%m/%d", "%d-%m-%Y", "%d.%m.%Y", "%d/%m/%Y", "%B %d, %Y", "%B %d %Y", "%b %d, %Y", "%b %d %Y"):
+            try:
+                return datetime.strptime(cand, fmt).strftime("%Y-%m-%d")
+            except Exception:
+                continue
+
+    month_map = {
+        "jan": 1, "january": 1, "stycz": 1, "sty": 1,
+        "feb": 2, "february": 2, "lut": 2, "luty": 2,
+        "mar": 3, "march": 3, "marz": 3,
+        "apr": 4, "april": 4, "kwi": 4, "kwiec": 4,
+        "may": 5, "maj": 5,
+        "jun": 6, "june": 6, "cze": 6,
+        "jul": 7, "july": 7, "lip": 7,
+        "aug": 8, "august": 8, "sie": 8,
+        "sep": 9, "sept": 9, "september": 9, "wrz": 9,
+        "oct": 10, "october": 10, "paz": 10, "paź": 10,
+        "nov": 11, "november": 11, "lis": 11,
+        "dec": 12, "december": 12, "gru": 12,
+    }
+    m = re.search(r"\b(\d{1,2})\s+([a-ząćęłńóśźż]+)\s*(\d{4})?\b", s)
+    if m:
+        day = int(m.group(1))
+        month_token = m.group(2)
+        year = int(m.group(3)) if m.group(3) else today.year
+        month = month_map.get(month_token)
+        if month is None:
+            month = month_map.get(month_token[:3])
+        if month:
+            try:
+                d = date(year, month, day)
+                return d.isoformat()
+            except Exception:
+                pass
+    return None
+
+
+def _normalize_time_input(value: str | None) -> str | None:
+    raw = (value or "").strip()
+    if not raw:
+        return None
+
+    # Support embedded text like "Today at 8:31 PM".
+    m_ampm = re.search(r"(\d{1,2}[:.]\d{2}(?::\d{2})?\s*[ap]m)", raw, re.IGNORECASE)
+    m_24 = re.search(r"\b(\d{1,2}[:.]\d{2}(?::\d{2})?)\b", raw)
+    extracted = m_ampm.group(1) if m_ampm else (m_24.group(1) if m_24 else raw)
+
+    candidates = [
+        extracted,
+        extracted.replace(".", ":"),
+        extracted.replace(" ", ""),
+    ]
+
+    for c in candidates:
+        for fmt in ("%H:%M", "%H:%M:%S", "%I:%M%p", "%I:%M %p"):
+            try:
+                return datetime.strptime(c, fmt).strftime("%H:%M")
+            except Exception:
+                continue
+
+    # "1730" -> "17:30", "830" -> "08:30"
+    digits = re.sub(r"\D", "", raw)
+    if re.fullmatch(r"\d{3,4}", digits):
+        if len(digits) == 3:
+            hhmm = f"0{digits[0]}:{digits[1:]}"
+        else:
+            hhmm = f"{digits[:2]}:{digits[2:]}"
+        try:
+            return datetime.strptime(hhmm, "%H:%M").strftime("%H:%M")
+        except Exception:
+            pass
+
+    return None
+
+
+def _normalize_activity_type_value(value: str | None) -> str:
+    raw = (value or "").strip().lower()
+    if not raw:
+        return "other"
+    if any(k in raw for k in ("swim", "pływ", "plyw", "basen")):
+        return "swim"
+    if any(k in raw for k in ("run", "bieg", "jog")):
+        return "run"
+    if any(k in raw for k in ("ride", "rower", "bike", "cycling")):
+        return "ride"
+    if any(k in raw for k in ("walk", "spacer")):
+        return "walk"
+    if any(k in raw for k in ("workout", "sił", "sil", "gym", "strength", "weight")):
+        return "weighttraining"
+    if any(k in raw for k in ("yoga", "joga")):
+        return "yoga"
+    if any(k in raw for k in ("hike", "trek", "gór", "gor", "szlak")):
+        return "hike"
+    return "other"
+
+
+def _safe_float(value) -> float | None:
+    try:
+        if value in (None, "", "nan"):
+            return None
+        return float(value)
+    except Exception:
+        return None
+
+
+def _safe_int(value) -> int | None:
+    try:
+        if value in (None, "", "nan"):
+            return None
+        return int(round(float(value)))
+    except Exception:
+        return None
+
+
+def _to_naive_utc(dt_value: datetime | None) -> datetime | None:
+    if not isinstance(dt_value, datetime):
+        return None
+    if dt_value.tzinfo is None:
+        return dt_value
+    return dt_value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _normalize_gps_coord(raw_value) -> float | None:
+    value = _safe_float(raw_value)
+    if value is None:
+        return None
+    if abs(value) > 180:
+        # FIT stores coordinates as semicircles.
+        value = value * (180.0 / 2147483648.0)
+    if abs(value) > 180:
+        return None
+    return round(value, 7)
+
+
+def _safe_json_dict(raw_value) -> dict:
+    if isinstance(raw_value, dict):
+        return dict(raw_value)
+    if not raw_value:
+        return {}
+    try:
+        data = json.loads(raw_value)
+        if isinstance(data, dict):
+            return data
+    except Exception:
+        pass
+    return {}
+
+
+def _parse_date_time(date_str: str, time_str: str) -> datetime:
+    date_str = _normalize_date_input(date_str) or ""
+    time_str = _normalize_time_input(time_str) or ""
+    try:
+        if date_str and time_str:
+            dt = datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
+        elif date_str:
+            dt = datetime.strptime(date_str, "%Y-%m-%d")
+        else:
+            dt = datetime.now(timezone.utc)
+
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt
+    except Exception:
+        return datetime.now(timezone.utc)
@@ -0,0 +1,701 @@
+"""Plan tygodnia: reguły i planer lokalny, zapis aktywnego planu (GeneratedPlan + PlanDay)."""
+
+import json
+import re
+from datetime import date, datetime, timedelta, timezone
+
+from flask import current_app
+
+from models import GeneratedPlan, PlanDay, UserProfile, db
+from i18n import tr
+from training_data import (
+    TARGET_SPORT_ORDER,
+    _infer_goal_discipline,
+    _target_bucket_label,
+    build_goal_link_text,
+    classify_sport,
+    get_recent_weekly_volume_km,
+    get_training_phase_for_day,
+)
+
+
+def _extract_estimates_from_text(text: str | None) -> tuple[float | None, int | None]:
+    raw = (text or "").lower()
+
+    dist_match = re.search(r'(\d+(?:[.,]\d+)?)\s*km', raw)
+    dist_km = None
+    if dist_match:
+        try:
+            dist_km = float(dist_match.group(1).replace(",", "."))
+        except Exception:
+            dist_km = None
+
+    dur_min = None
+    hour_match = re.search(r'(\d+)\s*h(?:\s*(\d{1,2})\s*min)?', raw)
+    min_match = re.search(r'(\d+)\s*min', raw)
+    try:
+        if hour_match:
+            hours = int(hour_match.group(1))
+            mins = int(hour_match.group(2) or 0)
+            dur_min = hours * 60 + mins
+        elif min_match:
+            dur_min = int(min_match.group(1))
+    except Exception:
+        dur_min = None
+
+    return dist_km, dur_min
+
+
+def _split_details_sections(details: str | None) -> tuple[str | None, str | None, str | None]:
+    txt = (details or "").strip()
+    if not txt:
+        return None, None, None
+
+    def _part(pattern: str) -> str | None:
+        m = re.search(pattern, txt, re.IGNORECASE | re.DOTALL)
+        if not m:
+            return None
+        val = " ".join((m.group(1) or "").strip().split())
+        return val or None
+
+    warm = _part(
+        r'(?:rozgrzewka|warm[\s-]?up)\s*[:\-]\s*(.+?)(?=(?:\n|\r|$)\s*(?:trening\s*główny|cz[eę][śs][ćc]\s*gł[óo]wna|main(?:\s*set)?|sch[łl]odzenie|cool[\s-]?down)\s*[:\-]|$)'
+    )
+    main = _part(
+        r'(?:trening\s*główny|cz[eę][śs][ćc]\s*gł[óo]wna|main(?:\s*set)?)\s*[:\-]\s*(.+?)(?=(?:\n|\r|$)\s*(?:sch[łl]odzenie|cool[\s-]?down)\s*[:\-]|$)'
+    )
+    cool = _part(r'(?:sch[łl]odzenie|cool[\s-]?down)\s*[:\-]\s*(.+)$')
+    return warm, main, cool
+
+
+def parse_plan_html(html_content: str) -> list[dict]:
+    """Parsuje zapis planu na listę dni.
+
+    Obsługuje:
+    - nowy format JSON (preferred)
+    - legacy HTML (<b>YYYY-MM-DD</b> + Trening/Dlaczego)
+    """
+    if not html_content:
+        return []
+
+    # Preferred: JSON
+    try:
+        parsed = json.loads(html_content)
+        if isinstance(parsed, dict) and isinstance(parsed.get("days"), list):
+            items = parsed["days"]
+        elif isinstance(parsed, list):
+            items = parsed
+        else:
+            items = None
+        if items is not None:
+            out = []
+            for item in items:
+                if not isinstance(item, dict):
+                    continue
+                date_str = (item.get("date") or "").strip() or None
+                workout = (item.get("workout") or "").strip() or None
+                why = (item.get("why") or "").strip() or None
+                details = (item.get("details") or "").strip() or None
+                intensity = (item.get("intensity") or "").strip() or None
+                phase = (item.get("phase") or "").strip() or None
+                goal_link = (item.get("goal_link") or "").strip() or None
+                warmup = (item.get("warmup") or "").strip() or None
+                main_set = (item.get("main_set") or item.get("main") or "").strip() or None
+                cooldown = (item.get("cooldown") or "").strip() or None
+                if details and (not warmup or not main_set or not cooldown):
+                    sw, sm, sc = _split_details_sections(details)
+                    warmup = warmup or sw
+                    main_set = main_set or sm
+                    cooldown = cooldown or sc
+                sport = (item.get("activity_type") or item.get("sport") or "").strip().lower()
+                sport = sport if sport else classify_sport((workout or "") + " " + (why or ""))
+                source_facts = item.get("source_facts") or []
+                dist_km = item.get("distance_km")
+                dur_min = item.get("duration_min")
+                parsed_dist, parsed_dur = _extract_estimates_from_text(workout)
+                try:
+                    dist_km = float(dist_km) if dist_km is not None else parsed_dist
+                except Exception:
+                    dist_km = parsed_dist
+                try:
+                    dur_min = int(round(float(dur_min))) if dur_min is not None else parsed_dur
+                except Exception:
+                    dur_min = parsed_dur
+                out.append({
+                    "date": date_str,
+                    "workout": workout,
+                    "why": why,
+                    "sport": sport,
+                    "details": details,
+                    "intensity": intensity,
+                    "phase": phase,
+                    "goal_link": goal_link,
+                    "warmup": warmup,
+                    "main_set": main_set,
+                    "cooldown": cooldown,
+                    "distance_km": dist_km,
+                    "duration_min": dur_min,
+                    "source_facts": source_facts if isinstance(source_facts, list) else [],
+                    "html": json.dumps(item, ensure_ascii=False),
+                })
+            if out:
+                return out
+    except Exception:
+        pass
+
+    # Normalizuj <br> na \n i usuń tagi HTML
+    norm = html_content.replace("<br/>", "\n").replace("<br />", "\n").replace("<br>", "\n")
+    text = re.sub(r'<[^>]+>', '', norm)
+    text = re.sub(r'\s+', ' ', text).strip()
+
+    # Podziel po datach (YYYY-MM-DD)
+    date_pattern = r'(\d{4}-\d{2}-\d{2})'
+    date_matches = list(re.finditer(date_pattern, text))
+
+    if not date_matches:
+        # Fallback: jeden blok bez daty
+        sport = classify_sport(text)
+        dist_km, dur_min = _extract_estimates_from_text(text)
+        return [{
+            "date": None,
+            "workout": text[:200] if text else None,
+            "why": None,
+            "sport": sport,
+            "details": None,
+            "intensity": None,
+            "phase": None,
+            "goal_link": None,
+            "warmup": None,
+            "main_set": None,
+            "cooldown": None,
+            "distance_km": dist_km,
+            "duration_min": dur_min,
+            "source_facts": [],
+            "html": html_content,
+        }]
+
+    blocks = []
+    for idx_m, m in enumerate(date_matches):
+        start = m.start()
+        end = date_matches[idx_m + 1].start() if idx_m + 1 < len(date_matches) else len(text)
+        chunk = text[start:end].strip()
+        date_str = m.group(1)
+
+        # Wyciągnij "Trening:" i "Dlaczego:"
+        workout = None
+        why = None
+
+        # Szukaj po "Trening:"
+        m_work = re.search(r'Trening\s*[:]\s*(.+?)(?=Dlaczego|$)', chunk, re.IGNORECASE | re.DOTALL)
+        if m_work:
+            workout = m_work.group(1).strip()
+            workout = workout.replace("**", "").replace("DATA:", "").strip()
+            # Ogranicz do jednej linii/300 znaków
+            workout = ' '.join(workout.split())[:300]
+
+        # Szukaj po "Dlaczego:"
+        m_why = re.search(r'Dlaczego\s*[:]\s*(.+)', chunk, re.IGNORECASE | re.DOTALL)
+        if m_why:
+            why = m_why.group(1).strip()
+            why = why.replace("**", "").replace("DATA:", "").strip()
+            why = ' '.join(why.split())[:300]
+
+        sport = classify_sport(chunk)
+        dist_km, dur_min = _extract_estimates_from_text(workout or chunk)
+
+        blocks.append({
+            "date": date_str,
+            "workout": workout,
+            "why": why,
+            "sport": sport,
+            "details": None,
+            "intensity": None,
+            "phase": None,
+            "goal_link": None,
+            "warmup": None,
+            "main_set": None,
+            "cooldown": None,
+            "distance_km": dist_km,
+            "duration_min": dur_min,
+            "source_facts": [],
+            "html": chunk,  # Możesz zwrócić clean text zamiast HTML
+        })
+
+    return blocks
+
+
+def _apply_plan_rules(days: list[dict], *, user_id: int, profile_obj: UserProfile | None, days_to_generate: int) -> list[dict]:
+    """Rule layer: avoid obvious overload and improve consistency."""
+    risk = (profile_obj.risk_tolerance or "balanced").lower() if profile_obj else "balanced"
+    ramp_pct = {"conservative": 0.06, "aggressive": 0.14}.get(risk, 0.10)
+    vol = get_recent_weekly_volume_km(user_id=user_id, weeks=4)
+    base_week_km = max(float(vol.get("avg_week_km", 0.0) or 0.0), float(vol.get("last_week_km", 0.0) or 0.0))
+    if profile_obj and profile_obj.weekly_distance_km:
+        base_week_km = max(base_week_km, float(profile_obj.weekly_distance_km))
+    allowed_week_km = max(6.0, round(base_week_km * (1.0 + ramp_pct), 1))
+    allowed_window_km = round((allowed_week_km * float(days_to_generate)) / 7.0, 1)
+
+    def parse_km(workout: str | None) -> float:
+        txt = (workout or "").lower()
+        vals = re.findall(r'(\d+(?:[.,]\d+)?)\s*km', txt)
+        out = 0.0
+        for raw in vals:
+            try:
+                out += float(raw.replace(",", "."))
+            except Exception:
+                continue
+        return out
+
+    km_pattern = re.compile(r'(\d+(?:[.,]\d+)?)\s*km', re.IGNORECASE)
+
+    def scale_km(item: dict, factor: float) -> None:
+        """Skaluje dystans treningu: km w `workout` oraz ten sam dystans w distance_km, main_set,
+        details i czasie trwania — karta w kalendarzu nie może przeczyć opisowi."""
+        match = km_pattern.search(item.get("workout") or "")
+        if not match:
+            return
+        try:
+            old_km = float(match.group(1).replace(",", "."))
+        except ValueError:
+            return
+        new_km = max(2.0, round(old_km * factor, 1))
+
+        def repl(m):
+            try:
+                val = float(m.group(1).replace(",", "."))
+            except ValueError:
+                return m.group(0)
+            return f"{new_km} km" if abs(val - old_km) < 0.05 else m.group(0)
+
+        item["workout"] = km_pattern.sub(f"{new_km} km", item["workout"], count=1)
+        for field in ("main_set", "details"):
+            if item.get(field):
+                item[field] = km_pattern.sub(repl, item[field])
+
+        try:
+            dist = float(item["distance_km"]) if item.get("distance_km") is not None else None
+        except (TypeError, ValueError):
+            dist = None
+        if dist is not None:
+            item["distance_km"] = new_km if abs(dist - old_km) < 0.05 else max(2.0, round(dist * factor, 1))
+        try:
+            if item.get("duration_min") and old_km > 0:
+                item["duration_min"] = int(round(float(item["duration_min"]) * new_km / old_km))
+        except (TypeError, ValueError):
+            pass
+
+    def is_hard(item: dict) -> bool:
+        txt = " ".join([
+            str(item.get("intensity") or ""),
+            str(item.get("workout") or ""),
+            str(item.get("why") or ""),
+        ]).lower()
+        hard_tokens = ["hard", "wysoka", "interwa", "interwał", "tempo", "threshold", "vo2", "maks", "max"]
+        return any(t in txt for t in hard_tokens)
+
+    out = []
+    hard_count = 0
+    for idx, day in enumerate(days):
+        item = dict(day)
+        km = parse_km(item.get("workout"))
+        item["_km"] = km
+
+        if idx > 0 and is_hard(out[-1]) and is_hard(item):
+            # Soften consecutive hard session by changing intensity and adding rationale.
+            item["intensity"] = "easy"
+            why = (item.get("why") or "").strip()
+            why += " " + tr(
+                "Skorygowano automatycznie: unikamy dwóch ciężkich jednostek dzień po dniu.",
+                "Auto-adjusted: avoid two hard sessions on consecutive days.",
+            )
+            item["why"] = why.strip()
+        if is_hard(item):
+            hard_count += 1
+        out.append(item)
+
+    # If event is close, keep max one hard day in a 4-day block.
+    if profile_obj and profile_obj.target_date:
+        days_left = (profile_obj.target_date - datetime.now().date()).days
+        if days_left <= 14 and hard_count > 1:
+            kept_hard = 0
+            for item in out:
+                if is_hard(item):
+                    kept_hard += 1
+                    if kept_hard > 1:
+                        item["intensity"] = "easy"
+                        item["why"] = ((item.get("why") or "").strip() + " " + tr(
+                            "Taper: zmniejszona intensywność przed startem.",
+                            "Taper: lowered intensity before race day.",
+                        )).strip()
+
+    # Keep 4-day km load near safe ramp based on recent weeks.
+    total_plan_km = sum(float(x.get("_km", 0.0) or 0.0) for x in out)
+    if total_plan_km > 0 and total_plan_km > allowed_window_km:
+        factor = max(0.55, allowed_window_km / total_plan_km)
+        for item in out:
+            scale_km(item, factor)
+            item["why"] = ((item.get("why") or "").strip() + " " + tr(
+                f"Dopasowano obciążenie (limit okna: {allowed_window_km} km).",
+                f"Load adjusted (window cap: {allowed_window_km} km).",
+            )).strip()
+
+    for item in out:
+        item.pop("_km", None)
+    return out
+
+
+def build_rule_based_plan_days(
+    *,
+    user_id: int,
+    profile_obj: UserProfile | None,
+    weekly_target_context: dict,
+    days_to_generate: int,
+    today_dt: date,
+) -> list[dict]:
+    """Deterministic planner producing the same `days` schema as the LLM prompt.
+
+    Sessions are picked from `remaining_to_fill` (largest backlog first, no sport twice
+    in a row), spread over the remaining days of the week and sized from recent run volume
+    and the training phase. Days without a session become rest days.
+    """
+    remaining = {
+        k: int(v or 0)
+        for k, v in (weekly_target_context.get("remaining_to_fill") or {}).items()
+        if int(v or 0) > 0
+    }
+    targets = weekly_target_context.get("targets") or {}
+    total_sessions = min(days_to_generate, sum(remaining.values()))
+
+    order = []
+    prev = None
+    left = dict(remaining)
+    for _ in range(total_sessions):
+        candidates = [k for k in TARGET_SPORT_ORDER if left.get(k, 0) > 0]
+        if not candidates:
+            break
+        non_repeat = [k for k in candidates if k != prev] or candidates
+        pick = max(non_repeat, key=lambda k: (left[k], -TARGET_SPORT_ORDER.index(k)))
+        order.append(pick)
+        left[pick] -= 1
+        prev = pick
+
+    slots: dict[int, str] = {}
+    for i, sport in enumerate(order):
+        idx = min(days_to_generate - 1, int(round(i * days_to_generate / float(len(order)))))
+        while idx in slots and idx < days_to_generate - 1:
+            idx += 1
+        slots[idx] = sport
+
+    run_vol = get_recent_weekly_volume_km(user_id=user_id, weeks=4, include_types={"run", "trailrun", "virtualrun"})
+    base_run_km = max(float(run_vol.get("avg_week_km", 0.0) or 0.0), float(run_vol.get("last_week_km", 0.0) or 0.0))
+    if profile_obj and profile_obj.weekly_distance_km and _infer_goal_discipline(profile_obj) == "run":
+        base_run_km = max(base_run_km, float(profile_obj.weekly_distance_km))
+    runs_per_week = max(1, int(targets.get("run", 0) or 0) or 3)
+    run_km = min(25.0, max(4.0, base_run_km / runs_per_week)) if base_run_km > 0 else 5.0
+    risk = (profile_obj.risk_tolerance or "balanced").lower() if profile_obj else "balanced"
+    target_date = profile_obj.target_date if profile_obj else None
+    total_runs = order.count("run")
+    quality_used = False
+    runs_seen = 0
+
+    days: list[dict] = []
+    for idx in range(days_to_generate):
+        day_date = today_dt + timedelta(days=idx)
+        phase = get_training_phase_for_day(target_date, day_date)
+        volume_factor = {"taper": 0.7, "post-race": 0.6}.get(phase, 1.0)
+        sport = slots.get(idx)
+        facts = [
+            tr(f"Faza: {phase}", f"Phase: {phase}"),
+            tr(
+                f"Średnio biegowo: {round(base_run_km, 1)} km/tydz.",
+                f"Average running: {round(base_run_km, 1)} km/week",
+            ),
+        ]
+        if sport:
+            facts.insert(0, tr(
+                f"Do celu tygodnia brakuje: {_target_bucket_label(sport)} {remaining.get(sport, 0)}",
+                f"Left to weekly goal: {_target_bucket_label(sport)} {remaining.get(sport, 0)}",
+            ))
+
+        item: dict
+        if sport == "run":
+            runs_seen += 1
+            is_last_run = runs_seen == total_runs and total_runs > 1
+            quality_ok = (
+                not quality_used
+                and total_runs > 1
+                and phase in ("base", "build")
+                and risk != "conservative"
+                and not is_last_run
+            )
+            if quality_ok:
+                quality_used = True
+                km = round(run_km * 0.8 * volume_factor, 1)
+                main_set = tr(
+                    "4 x 6 min w tempie progowym, 2 min truchtu przerwy",
+                    "4 x 6 min at threshold pace, 2 min jog recoveries",
+                ) if phase == "build" else tr(
+                    "20 min w tempie umiarkowanym + 6 x 20 s przebieżek",
+                    "20 min steady + 6 x 20 s strides",
+                )
+                item = {
+                    "activity_type": "run",
+                    "workout": tr(f"Bieg tempo {km} km", f"Tempo run {km} km"),
+                    "intensity": "hard" if phase == "build" else "moderate",
+                    "warmup": tr("15 min truchtu w strefie 1-2", "15 min easy jog in zone 1-2"),
+                    "main_set": main_set,
+                    "cooldown": tr("10 min truchtu + rozciąganie", "10 min easy jog + stretching"),
+                    "distance_km": km,
+                    "duration_min": int(round(km * 5.5)),
+                    "why": tr(
+                        "Jedna jakościowa jednostka w tygodniu buduje tempo bez przeciążenia.",
+                        "One quality session per week builds pace without overload.",
+                    ),
+                }
+            elif is_last_run and phase in ("base", "build"):
+                km = round(run_km * 1.3 * volume_factor, 1)
+                item = {
+                    "activity_type": "run",
+                    "workout": tr(f"Długi bieg {km} km", f"Long run {km} km"),
+                    "intensity": "easy",
+                    "warmup": tr("10 min spokojnego truchtu", "10 min easy jog"),
+                    "main_set": tr(f"{km} km w strefie 2, równe tempo", f"{km} km in zone 2, even pace"),
+                    "cooldown": tr("5 min marszu + rozciąganie", "5 min walk + stretching"),
+                    "distance_km": km,
+                    "duration_min": int(round(km * 6.2)),
+                    "why": tr(
+                        "Długi bieg rozwija bazę tlenową pod cel.",
+                        "Long run develops the aerobic base for the goal.",
+                    ),
+                }
+            else:
+                km = round(run_km * volume_factor, 1)
+                item = {
+                    "activity_type": "run",
+                    "workout": tr(f"Bieg spokojny {km} km", f"Easy run {km} km"),
+                    "intensity": "easy",
+                    "warmup": tr("10 min truchtu", "10 min easy jog"),
+                    "main_set": tr(f"{km} km w strefie 2", f"{km} km in zone 2"),
+                    "cooldown": tr("5 min marszu + rozciąganie", "5 min walk + stretching"),
+                    "distance_km": km,
+                    "duration_min": int(round(km * 6.0)),
+                    "why": tr(
+                        "Spokojny bieg utrzymuje objętość przy niskim koszcie zmęczenia.",
+                        "Easy running keeps volume at a low fatigue cost.",
+                    ),
+                }
+        elif sport == "gym":
+            minutes = int(round(50 * volume_factor))
+            item = {
+                "activity_type": "weighttraining",
+                "workout": tr(f"Siłownia: całe ciało {minutes} min", f"Gym: full body {minutes} min"),
+                "intensity": "moderate",
+                "warmup": tr("8 min rowerka + mobilizacja bioder i barków", "8 min bike + hip and shoulder mobility"),
+                "main_set": tr(
+                    "Przysiad, martwy ciąg rumuński, wiosłowanie, wyciskanie: 3 x 8-10, RIR 2",
+                    "Squat, Romanian deadlift, row, press: 3 x 8-10, RIR 2",
+                ),
+                "cooldown": tr("5 min rozciągania", "5 min stretching"),
+                "distance_km": None,
+                "duration_min": minutes,
+                "why": tr(
+                    "Siła wspiera ekonomię ruchu i chroni przed kontuzjami.",
+                    "Strength supports movement economy and injury resilience.",
+                ),
+            }
+        elif sport == "swim":
+            km = round(1.8 * volume_factor, 1)
+            item = {
+                "activity_type": "swim",
+                "workout": tr(f"Pływanie {km} km", f"Swim {km} km"),
+                "intensity": "moderate",
+                "warmup": tr("200 m luźno + 4 x 50 m technika", "200 m easy + 4 x 50 m drills"),
+                "main_set": tr("8 x 100 m równym tempem, 20 s przerwy", "8 x 100 m steady, 20 s rest"),
+                "cooldown": tr("200 m luźno", "200 m easy"),
+                "distance_km": km,
+                "duration_min": int(round(45 * volume_factor)),
+                "why": tr("Pływanie uzupełnia cel tygodnia.", "Swimming completes the weekly goal."),
+            }
+        elif sport == "ride":
+            minutes = int(round((90 if day_date.weekday() >= 5 else 60) * volume_factor))
+            km = round(minutes / 60.0 * 25.0, 1)
+            item = {
+                "activity_type": "ride",
+                "workout": tr(f"Rower spokojnie {minutes} min", f"Easy ride {minutes} min"),
+                "intensity": "easy",
+                "warmup": tr("10 min luźnego kręcenia", "10 min easy spin"),
+                "main_set": tr(f"{minutes - 15} min w strefie 2, kadencja 85-95", f"{minutes - 15} min in zone 2, cadence 85-95"),
+                "cooldown": tr("5 min luźno", "5 min easy"),
+                "distance_km": km,
+                "duration_min": minutes,
+                "why": tr("Rower buduje wytrzymałość bez obciążania stawów.", "Riding builds endurance without joint stress."),
+            }
+        elif sport == "mobility":
+            item = {
+                "activity_type": "yoga",
+                "workout": tr("Mobilność / joga 30 min", "Mobility / yoga 30 min"),
+                "intensity": "easy",
+                "warmup": tr("5 min oddechu i krążeń", "5 min breathing and joint circles"),
+                "main_set": tr("20 min mobilizacji bioder, kręgosłupa i kostek", "20 min hip, spine and ankle mobility"),
+                "cooldown": tr("5 min rozluźnienia", "5 min relaxation"),
+                "distance_km": None,
+                "duration_min": 30,
+                "why": tr("Mobilność poprawia regenerację i zakres ruchu.", "Mobility improves recovery and range of motion."),
+            }
+        else:
+            item = {
+                "activity_type": "other",
+                "workout": tr("Odpoczynek / spacer 20-30 min", "Rest / 20-30 min walk"),
+                "intensity": "easy",
+                "warmup": tr("Bez rozgrzewki", "No warm-up"),
+                "main_set": tr("Dzień wolny albo lekki spacer", "Day off or a light walk"),
+                "cooldown": tr("Rozciąganie 5-10 min (opcjonalnie)", "5-10 min stretching (optional)"),
+                "distance_km": None,
+                "duration_min": None,
+                "why": tr(
+                    "Cel tygodnia jest rozłożony na inne dni — regeneracja też jest treningiem.",
+                    "Weekly goal is covered on other days — recovery is part of training.",
+                ),
+            }
+
+        item["date"] = day_date.isoformat()
+        item["phase"] = phase
+        item["source_facts"] = facts[:3]
+        days.append(item)
+
+    return _apply_plan_rules(days, user_id=user_id, profile_obj=profile_obj, days_to_generate=days_to_generate)
+
+
+def _finalize_plan_days(days: list[dict], profile_obj: UserProfile | None, today_dt: date) -> list[dict]:
+    # Normalizuj daty do kolejnych dni od dziś, żeby kalendarz miał stabilny układ.
+    for idx, item in enumerate(days):
+        day_date = today_dt + timedelta(days=idx)
+        item["date"] = day_date.strftime("%Y-%m-%d")
+        if not item.get("phase"):
+            item["phase"] = get_training_phase_for_day(
+                profile_obj.target_date if profile_obj else None,
+                day_date,
+            )
+        if not item.get("goal_link"):
+            item["goal_link"] = build_goal_link_text(profile_obj, day_date)
+        warmup = (item.get("warmup") or "").strip()
+        main_set = (item.get("main_set") or "").strip()
+        cooldown = (item.get("cooldown") or "").strip()
+        details = (item.get("details") or "").strip()
+        if details and (not warmup or not main_set or not cooldown):
+            sw, sm, sc = _split_details_sections(details)
+            warmup = warmup or (sw or "")
+            main_set = main_set or (sm or "")
+            cooldown = cooldown or (sc or "")
+        item["warmup"] = warmup
+        item["main_set"] = main_set
+        item["cooldown"] = cooldown
+        if not details:
+            parts = []
+            if warmup:
+                parts.append(f"{tr('Rozgrzewka', 'Warm-up')}: {warmup}")
+            if main_set:
+                parts.append(f"{tr('Trening główny', 'Main set')}: {main_set}")
+            if cooldown:
+                parts.append(f"{tr('Schłodzenie', 'Cool-down')}: {cooldown}")
+            item["details"] = "\n".join(parts)
+    return days
+
+
+def _save_active_plan(user_id: int, days: list[dict], horizon_days: int) -> str:
+    text = json.dumps({"days": days}, ensure_ascii=False)
+
+    # Zapisz jako aktywny plan (wyłącz poprzedni)
+    GeneratedPlan.query.filter_by(user_id=user_id, is_active=True).update({"is_active": False})
+    plan = GeneratedPlan(
+        user_id=user_id,
+        created_at=datetime.now(timezone.utc),
+        start_date=datetime.now(timezone.utc).date(),
+        horizon_days=horizon_days,
+        html_content=text,
+        is_active=True,
+    )
+    db.session.add(plan)
+    _store_plan_days(plan, parse_plan_html(text))
+    db.session.commit()
+    return text
+
+
+def _store_plan_days(plan: GeneratedPlan, items: list[dict]) -> list[PlanDay]:
+    """Zapisz sparsowane dni planu jako wiersze plan_days (raz, przy generowaniu)."""
+    rows = []
+    for item in items:
+        try:
+            day_date = datetime.strptime((item.get("date") or "").strip(), "%Y-%m-%d").date()
+        except Exception:
+            continue
+        row = PlanDay(
+            user_id=plan.user_id,
+            day_date=day_date,
+            sport=item.get("sport") or None,
+            intensity=item.get("intensity"),
+            phase=item.get("phase"),
+            distance_km=item.get("distance_km"),
+            duration_min=item.get("duration_min"),
+            workout=item.get("workout"),
+            why=item.get("why"),
+            details=item.get("details"),
+            goal_link=item.get("goal_link"),
+            warmup=item.get("warmup"),
+            main_set=item.get("main_set"),
+            cooldown=item.get("cooldown"),
+            source_facts_json=json.dumps(item.get("source_facts") or [], ensure_ascii=False),
+        )
+        plan.days.append(row)
+        rows.append(row)
+    return rows
+
+
+def _plan_day_to_dict(row: PlanDay) -> dict:
+    try:
+        source_facts = json.loads(row.source_facts_json or "[]")
+    except Exception:
+        source_facts = []
+    return {
+        "date": row.day_date.isoformat() if row.day_date else None,
+        "workout": row.workout,
+        "why": row.why,
+        "sport": row.sport or "",
+        "details": row.details,
+        "intensity": row.intensity,
+        "phase": row.phase,
+        "goal_link": row.goal_link,
+        "warmup": row.warmup,
+        "main_set": row.main_set,
+        "cooldown": row.cooldown,
+        "distance_km": row.distance_km,
+        "duration_min": row.duration_min,
+        "source_facts": source_facts if isinstance(source_facts, list) else [],
+    }
+
+
+def get_active_plan_days(user_id: int) -> tuple[GeneratedPlan | None, list[PlanDay]]:
+    """Aktywny plan + jego dni z plan_days.
+
+    Plany zapisane przed wprowadzeniem tabeli nie mają wierszy — parsujemy je wtedy
+    jednorazowo i zapisujemy, kolejne odczyty idą już prosto z bazy.
+    """
+    active_plan = (
+        GeneratedPlan.query
+        .filter_by(user_id=user_id, is_active=True)
+        .order_by(GeneratedPlan.created_at.desc())
+        .first()
+    )
+    if not active_plan:
+        return None, []
+
+    rows = list(active_plan.days)
+    if not rows and active_plan.html_content:
+        try:
+            rows = _store_plan_days(active_plan, parse_plan_html(active_plan.html_content))
+            db.session.commit()
+        except Exception:
+            current_app.logger.exception("Backfill of plan_days failed for plan %s", active_plan.id)
+            db.session.rollback()
+            rows = []
+    return active_plan, rows
@@ -0,0 +1,116 @@
+"""Trasa aktywności do mapy: upraszczanie (poziomy szczegółowości), GeoJSON i encoded polyline."""
+
+import hashlib
+import math
+
+from training_data import _parse_route_points_json
+
+# poziom szczegółowości -> tolerancja Douglasa-Peuckera w metrach (0 = wszystkie punkty)
+ROUTE_DETAIL_TOLERANCE_M = {
+    "low": 25.0,
+    "medium": 8.0,
+    "high": 2.0,
+    "full": 0.0,
+}
+ROUTE_DEFAULT_DETAIL = "medium"
+ROUTE_FORMATS = ("geojson", "polyline")
+# 5 miejsc po przecinku ~ 1 m — tyle, ile ma sens dla trasy na mapie
+ROUTE_COORD_DECIMALS = 5
+
+_M_PER_DEG_LAT = 110_540.0
+_M_PER_DEG_LNG = 111_320.0
+
+
+def route_version(raw_json: str | None) -> str | None:
+    """Skrót zapisanej trasy (do ETag i wersjonowanego URL-a); None, gdy trasy brak."""
+    if not raw_json:
+        return None
+    return hashlib.sha1(raw_json.encode("utf-8")).hexdigest()[:12]
+
+
+def simplify_route(points: list[list[float]], tolerance_m: float) -> list[list[float]]:
+    """Douglas-Peucker w lokalnym rzucie równoodległościowym (metry); zachowuje pierwszy i ostatni punkt."""
+    if tolerance_m <= 0 or len(points) < 3:
+        return points
+
+    lat0 = math.radians(sum(p[0] for p in points) / len(points))
+    kx = _M_PER_DEG_LNG * math.cos(lat0)
+    xy = [(p[1] * kx, p[0] * _M_PER_DEG_LAT) for p in points]
+    tol2 = tolerance_m * tolerance_m
+
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        ax, ay = xy[first]
+        bx, by = xy[last]
+        dx, dy = bx - ax, by - ay
+        seg2 = dx * dx + dy * dy
+        max_d2 = -1.0
+        index = None
+        for i in range(first + 1, last):
+            px, py = xy[i]
+            if seg2 == 0.0:
+                d2 = (px - ax) ** 2 + (py - ay) ** 2
+            else:
+                t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / seg2))
+                d2 = (px - ax - t * dx) ** 2 + (py - ay - t * dy) ** 2
+            if d2 > max_d2:
+                max_d2 = d2
+                index = i
+        if index is not None and max_d2 > tol2:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return [p for p, k in zip(points, keep) if k]
+
+
+def encode_polyline(points: list[list[float]], precision: int = ROUTE_COORD_DECIMALS) -> str:
+    """Encoded polyline (format Google, kolejność lat,lng)."""
+    factor = 10 ** precision
+    out: list[str] = []
+    prev_lat = prev_lng = 0
+    for lat, lng in points:
+        ilat = int(round(lat * factor))
+        ilng = int(round(lng * factor))
+        for delta in (ilat - prev_lat, ilng - prev_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                out.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            out.append(chr(value + 63))
+        prev_lat, prev_lng = ilat, ilng
+    return "".join(out)
+
+
+def build_route_payload(raw_json: str | None, activity_id: int, detail: str, fmt: str) -> dict | None:
+    """Trasa na danym poziomie szczegółowości: GeoJSON Feature albo {"polyline": ...}; None bez trasy."""
+    points = _parse_route_points_json(raw_json)
+    if not points:
+        return None
+    simplified = simplify_route(points, ROUTE_DETAIL_TOLERANCE_M[detail])
+    lats = [p[0] for p in simplified]
+    lngs = [p[1] for p in simplified]
+    bbox = [round(min(lngs), ROUTE_COORD_DECIMALS), round(min(lats), ROUTE_COORD_DECIMALS),
+            round(max(lngs), ROUTE_COORD_DECIMALS), round(max(lats), ROUTE_COORD_DECIMALS)]
+    properties = {
+        "activity_id": activity_id,
+        "detail": detail,
+        "points": len(simplified),
+        "source_points": len(points),
+    }
+    if fmt == "polyline":
+        return {"ok": True, "polyline": encode_polyline(simplified), "bbox": bbox, **properties}
+    return {
+        "type": "Feature",
+        "bbox": bbox,
+        "geometry": {
+            "type": "LineString",
+            "coordinates": [
+                [round(lng, ROUTE_COORD_DECIMALS), round(lat, ROUTE_COORD_DECIMALS)] for lat, lng in simplified
+            ],
+        },
+        "properties": properties,
+    }
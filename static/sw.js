@@ -1,56 +1,283 @@
-const CACHE_NAME = "training-app-v1";
-const CORE_ASSETS = [
-  "/",
-  "/static/mobile.css",
-  "/static/manifest.webmanifest"
-];
-
-// Install: cache core assets
+// PRECACHE_VERSION i PRECACHE_ASSETS dokleja serwer (/sw.js, static_assets.py).
+const STATIC_CACHE = `training-static-${PRECACHE_VERSION}`;
+// Strony i dane użytkownika przeżywają wdrożenia; czyszczone przy logowaniu/wylogowaniu.
+const PAGES_CACHE = "training-pages-v1";
+const NETWORK_TIMEOUT_MS = 4000;
+
+// GET z danymi do szybkiego pokazania offline (network-first z fallbackiem do cache).
+const DATA_PATHS = ["/api/metrics/series", "/api/weather", "/api/dashboard"];
+// Zapisy kolejkowane w IndexedDB, gdy sieć nie odpowiada; serwer deduplikuje je po Idempotency-Key.
+const QUEUED_PATHS = ["/activity/manual", "/checkin", "/api/plan/move"];
+const FORWARDED_HEADERS = ["content-type", "accept", "x-requested-with"];
+
+const DB_NAME = "training-app";
+const OUTBOX_STORE = "outbox";
+const SYNC_TAG = "outbox-replay";
+
+// Install: cache fingerprinted static assets
 self.addEventListener("install", (event) => {
   event.waitUntil(
-    caches.open(CACHE_NAME).then((cache) => cache.addAll(CORE_ASSETS))
+    caches.open(STATIC_CACHE).then((cache) => cache.addAll(PRECACHE_ASSETS))
   );
   self.skipWaiting();
 });
 
-// Activate: clean old caches
+// Activate: clean old caches, send whatever is still queued
 self.addEventListener("activate", (event) => {
   event.waitUntil(
     caches.keys().then((keys) =>
-      Promise.all(keys.filter((k) => k !== CACHE_NAME).map((k) => caches.delete(k)))
-    )
+      Promise.all(keys.filter((k) => k !== STATIC_CACHE && k !== PAGES_CACHE).map((k) => caches.delete(k)))
+    ).then(() => self.clients.claim())
   );
-  self.clients.claim();
+  event.waitUntil(replayOutbox().catch(() => {}));
+});
+
+// --- IndexedDB outbox ---
+// Wpisy mają właściciela (id użytkownika z ostatniej strony, "meta"/"owner"): kolejka przeżywa
+// wylogowanie i wygasłą sesję, a powtarzane są tylko zapisy zalogowanego właściciela.
+// Wpis bez właściciela nie trafia do kolejki, a stary (sprzed właścicieli) jest usuwany przy
+// powtórce — nie wiadomo, czyj jest, więc nie może pójść w cudzej sesji.
+
+const META_STORE = "meta";
+
+function openDb() {
+  return new Promise((resolve, reject) => {
+    const open = indexedDB.open(DB_NAME, 2);
+    open.onupgradeneeded = () => {
+      const db = open.result;
+      if (!db.objectStoreNames.contains(OUTBOX_STORE)) {
+        db.createObjectStore(OUTBOX_STORE, { keyPath: "id", autoIncrement: true });
+      }
+      if (!db.objectStoreNames.contains(META_STORE)) {
+        db.createObjectStore(META_STORE, { keyPath: "key" });
+      }
+    };
+    open.onsuccess = () => resolve(open.result);
+    open.onerror = () => reject(open.error);
+  });
+}
+
+async function dbTx(storeName, mode, fn) {
+  const db = await openDb();
+  return new Promise((resolve, reject) => {
+    const tx = db.transaction(storeName, mode);
+    const store = tx.objectStore(storeName);
+    let result;
+    const req = fn(store);
+    if (req) req.onsuccess = () => { result = req.result; };
+    tx.oncomplete = () => { db.close(); resolve(result); };
+    tx.onerror = () => { db.close(); reject(tx.error); };
+    tx.onabort = () => { db.close(); reject(tx.error); };
+  });
+}
+
+const outboxAdd = (entry) => dbTx(OUTBOX_STORE, "readwrite", (s) => s.add(entry));
+const outboxDelete = (id) => dbTx(OUTBOX_STORE, "readwrite", (s) => s.delete(id));
+const outboxAll = () => dbTx(OUTBOX_STORE, "readonly", (s) => s.getAll()).then((all) => all || []);
+// Kolejność wysłania = rosnące klucze autoIncrement.
+const outboxEntries = (owner) => outboxAll()
+  .then((all) => (owner == null ? [] : all.filter((e) => e.owner === owner)));
+
+async function outboxDropOrphans() {
+  for (const entry of await outboxAll()) {
+    if (entry.owner == null) await outboxDelete(entry.id);
+  }
+}
+
+const getOwner = () => dbTx(META_STORE, "readonly", (s) => s.get("owner")).then((row) => (row ? row.value : null));
+const setOwner = (value) => dbTx(META_STORE, "readwrite", (s) => s.put({ key: "owner", value }));
+
+async function notifyClients(message) {
+  const all = await self.clients.matchAll({ includeUncontrolled: true, type: "window" });
+  all.forEach((client) => client.postMessage(message));
+}
+
+function buildRequest(entry, replay) {
+  return new Request(entry.url, {
+    method: entry.method,
+    headers: entry.headers,
+    body: entry.body,
+    credentials: "same-origin",
+    // Pierwsza próba formularza (nawigacja) oddaje przekierowanie przeglądarce. Powtórka idzie
+    // w tle — podąża za przekierowaniem, żeby dało się rozpoznać odesłanie na /login.
+    redirect: entry.navigate && !replay ? "manual" : "follow",
+  });
+}
+
+function queuedResponse(entry) {
+  if (entry.navigate) return Response.redirect("/?queued=1", 303);
+  return new Response(JSON.stringify({ ok: true, queued: true }), {
+    status: 202,
+    headers: { "Content-Type": "application/json" },
+  });
+}
+
+// Wygasła sesja: login_required odsyła 302 na /login (bez zapisu).
+function isLoginRedirect(res) {
+  if (res.type === "opaqueredirect") return true;
+  return res.redirected && new URL(res.url).pathname === "/login";
+}
+
+async function sendOrQueue(req) {
+  const headers = {};
+  FORWARDED_HEADERS.forEach((name) => {
+    const value = req.headers.get(name);
+    if (value) headers[name] = value;
+  });
+  // Ten sam klucz przy pierwszej próbie i każdej powtórce.
+  headers["Idempotency-Key"] = req.headers.get("Idempotency-Key") || self.crypto.randomUUID();
+  const entry = {
+    url: req.url,
+    method: req.method,
+    headers,
+    body: await req.clone().arrayBuffer(),
+    navigate: req.mode === "navigate",
+    createdAt: Date.now(),
+  };
+
+  try {
+    return await fetch(buildRequest(entry, false));
+  } catch (_err) {
+    entry.owner = await getOwner().catch(() => null);
+    // Nieznany użytkownik (strona jeszcze się nie przedstawiła): zwykły błąd sieci jak bez SW.
+    if (entry.owner == null) return Response.error();
+    await outboxAdd(entry);
+    if (self.registration.sync) self.registration.sync.register(SYNC_TAG).catch(() => {});
+    notifyClients({ type: "outbox", pending: (await outboxEntries(entry.owner)).length, sent: 0 });
+    return queuedResponse(entry);
+  }
+}
+
+// Odtwarzanie po kolei; przerwa na pierwszym błędzie sieci, 5xx/408/409/429 (spróbujemy później)
+// i na odesłaniu do logowania (wpis zostaje, strona prosi o ponowne zalogowanie).
+let replaying = null;
+
+function replayOutbox() {
+  if (!replaying) {
+    replaying = (async () => {
+      await outboxDropOrphans();
+      const owner = await getOwner();
+      let sent = 0;
+      let authRequired = false;
+      for (const entry of await outboxEntries(owner)) {
+        let res;
+        try {
+          res = await fetch(buildRequest(entry, true));
+        } catch (_err) {
+          break;
+        }
+        if (isLoginRedirect(res)) {
+          authRequired = true;
+          break;
+        }
+        if (res.status >= 500 || [408, 409, 429].includes(res.status)) break;
+        await outboxDelete(entry.id);
+        sent += 1;
+      }
+      const pending = (await outboxEntries(owner)).length;
+      if (sent || pending) notifyClients({ type: "outbox", pending, sent, authRequired });
+      return { pending, authRequired };
+    })().finally(() => { replaying = null; });
+  }
+  return replaying;
+}
+
+self.addEventListener("sync", (event) => {
+  if (event.tag !== SYNC_TAG) return;
+  // Odrzucenie = przeglądarka ponowi sync z backoffem (bez sesji ponowienie nic nie da —
+  // kolejkę obudzi strona po zalogowaniu).
+  event.waitUntil(replayOutbox().then(({ pending, authRequired }) => {
+    if (pending && !authRequired) throw new Error("outbox not empty");
+  }));
+});
+
+// Bez Background Sync (Safari/Firefox) kolejkę budzą strony: po "online" i przy wczytaniu.
+// Strona podaje też zalogowanego użytkownika — właściciela nowych i powtarzanych wpisów.
+self.addEventListener("message", (event) => {
+  const data = event.data || {};
+  const ready = data.user != null ? setOwner(data.user).catch(() => {}) : Promise.resolve();
+  if (data.type === "replay-outbox") event.waitUntil(ready.then(() => replayOutbox()).catch(() => {}));
+  if (data.type === "outbox-status") {
+    event.waitUntil(ready.then(() => getOwner()).then(outboxEntries).then((entries) => (
+      event.source && event.source.postMessage({ type: "outbox", pending: entries.length, sent: 0 })
+    )));
+  }
 });
 
-// Fetch: network first for HTML, cache first for static
+// --- Odczyty ---
+
+function networkFirst(req, fallbackPaths) {
+  const network = fetch(req).then((res) => {
+    if (res.ok && !res.redirected) {
+      const copy = res.clone();
+      caches.open(PAGES_CACHE).then((cache) => cache.put(req, copy));
+    }
+    return res;
+  });
+  const fromCache = async () => {
+    let cached = await caches.match(req);
+    for (const path of fallbackPaths) {
+      if (cached) break;
+      cached = await caches.match(path, { ignoreSearch: true });
+    }
+    return cached;
+  };
+  // Słaby zasięg: po NETWORK_TIMEOUT_MS pokaż ostatnią wersję z cache (sieć dalej odświeża cache).
+  const timeout = new Promise((resolve) => setTimeout(resolve, NETWORK_TIMEOUT_MS)).then(fromCache);
+  return Promise.race([
+    network.catch(() => null),
+    timeout,
+  ]).then((res) => res || network.catch(fromCache)).then((res) => res || Response.error());
+}
+
 self.addEventListener("fetch", (event) => {
   const req = event.request;
   const url = new URL(req.url);
 
-  if (req.method !== "GET") return;
-
   // Same-origin only
   if (url.origin !== self.location.origin) return;
 
-  // HTML: network-first
-  if (req.headers.get("accept")?.includes("text/html")) {
+  if (req.method === "POST" && QUEUED_PATHS.includes(url.pathname)) {
+    event.respondWith(sendOrQueue(req));
+    return;
+  }
+
+  // Zmiana użytkownika: strony/dane z cache należą do poprzedniej sesji. Niewysłanych zapisów
+  // nie kasujemy — zostają w kolejce poprzedniego właściciela do jego następnego logowania.
+  if (url.pathname === "/logout" || (url.pathname === "/login" && req.method === "POST")) {
+    const flush = url.pathname === "/logout" ? replayOutbox().catch(() => {}) : Promise.resolve();
     event.respondWith(
-      fetch(req).then((res) => {
-        const copy = res.clone();
-        caches.open(CACHE_NAME).then((cache) => cache.put(req, copy));
-        return res;
-      }).catch(() => caches.match(req).then((r) => r || caches.match("/")))
+      flush
+        .then(() => Promise.all([caches.delete(PAGES_CACHE), setOwner(null)]))
+        .catch(() => {})
+        .then(() => fetch(req))
     );
     return;
   }
 
-  // Static: cache-first
-  event.respondWith(
-    caches.match(req).then((cached) => cached || fetch(req).then((res) => {
-      const copy = res.clone();
-      caches.open(CACHE_NAME).then((cache) => cache.put(req, copy));
-      return res;
-    }))
-  );
-});
\ No newline at end of file
+  if (req.method !== "GET") return;
+
+  // HTML: network-first, z cache przy braku sieci lub zbyt długiej odpowiedzi
+  if (req.mode === "navigate" || req.headers.get("accept")?.includes("text/html")) {
+    event.respondWith(networkFirst(req, [url.pathname, "/"]));
+    return;
+  }
+
+  if (DATA_PATHS.includes(url.pathname)) {
+    event.respondWith(networkFirst(req, []));
+    return;
+  }
+
+  // Static: cache-first (URL z ?v=<hash> nigdy nie zmienia treści)
+  if (url.pathname.startsWith("/static/")) {
+    event.respondWith(
+      caches.match(req).then((cached) => cached || fetch(req).then((res) => {
+        if (res.ok) {
+          const copy = res.clone();
+          caches.open(STATIC_CACHE).then((cache) => cache.put(req, copy));
+        }
+        return res;
+      }))
+    );
+  }
+});
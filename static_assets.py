@@ -0,0 +1,92 @@
+"""Pliki statyczne z odciskiem treści i manifest precache service workera.
+
+Szablony linkują zasoby przez `asset_url("css/main.css")` -> `/static/css/main.css?v=<hash>`.
+Odpowiedź pod adresem z aktualnym hashem dostaje `Cache-Control: immutable` na rok — zmiana
+pliku zmienia URL, więc przeglądarka nigdy nie trzyma starej wersji. Adres bez `v` (albo ze
+starym hashem) jest serwowany jak dotąd, z rewalidacją.
+
+`/sw.js` jest składany z `static/sw.js` i listy aktualnych, odciskowanych zasobów; nazwa
+cache'u SW wynika z tej listy, więc nowe wdrożenie samo podmienia precache.
+"""
+
+import hashlib
+import json
+import os
+
+from flask import current_app, request
+
+STATIC_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Źródło SW — nie jest zasobem do precache, serwujemy go spod /sw.js (zakres "/").
+SERVICE_WORKER_SOURCE = "sw.js"
+
+_manifest_cache: dict[str, dict[str, str]] = {}
+
+
+def _file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(65536), b""):
+            h.update(chunk)
+    return h.hexdigest()[:12]
+
+
+def _scan_static(static_dir: str) -> dict[str, str]:
+    assets = {}
+    for root, _dirs, files in os.walk(static_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, static_dir).replace(os.sep, "/")
+            if rel == SERVICE_WORKER_SOURCE or name.startswith("."):
+                continue
+            assets[rel] = _file_digest(path)
+    return dict(sorted(assets.items()))
+
+
+def asset_manifest() -> dict[str, str]:
+    """{ścieżka względem static/: hash treści}. Liczone raz na proces; w trybie debug przy każdym wywołaniu."""
+    static_dir = current_app.static_folder
+    if current_app.debug or static_dir not in _manifest_cache:
+        _manifest_cache[static_dir] = _scan_static(static_dir)
+    return _manifest_cache[static_dir]
+
+
+def asset_url(filename: str) -> str:
+    """URL zasobu z odciskiem treści (globalna funkcja Jinja)."""
+    filename = filename.lstrip("/")
+    digest = asset_manifest().get(filename)
+    url = f"{current_app.static_url_path}/{filename}"
+    return f"{url}?v={digest}" if digest else url
+
+
+def apply_static_cache_headers(resp):
+    """after_request: adres z aktualnym hashem -> cache publiczny, immutable na rok."""
+    if request.endpoint != "static" or resp.status_code not in (200, 304):
+        return resp
+    filename = (request.view_args or {}).get("filename", "")
+    version = request.args.get("v")
+    if version and version == asset_manifest().get(filename):
+        resp.headers["Cache-Control"] = f"public, max-age={STATIC_IMMUTABLE_MAX_AGE}, immutable"
+    return resp
+
+
+def precache_assets() -> list[str]:
+    return [asset_url(name) for name in asset_manifest()]
+
+
+def service_worker_response():
+    """Treść /sw.js: manifest precache + kod SW ze static/sw.js."""
+    assets = precache_assets()
+    with open(os.path.join(current_app.static_folder, SERVICE_WORKER_SOURCE), encoding="utf-8") as fh:
+        source = fh.read()
+    version = hashlib.sha256(("\n".join(assets) + source).encode("utf-8")).hexdigest()[:12]
+    body = (
+        "// Generowane przez static_assets.service_worker_response()\n"
+        f"const PRECACHE_VERSION = {json.dumps(version)};\n"
+        f"const PRECACHE_ASSETS = {json.dumps(assets, indent=2)};\n\n"
+        + source
+    )
+    resp = current_app.response_class(body, mimetype="application/javascript")
+    resp.set_etag(version)
+    # Skrypt SW musi być rewalidowany przy każdej rejestracji/aktualizacji.
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp.make_conditional(request)
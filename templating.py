@@ -0,0 +1,72 @@
+"""Szablony: trwały cache bajtkodu Jinja i cache fragmentów stron.
+
+Bajtkod: skompilowane szablony lądują w katalogu JINJA_BYTECODE_CACHE_DIR (domyślnie
+katalog tymczasowy Jinja per użytkownik systemu), więc nowy worker nie kompiluje od zera
+index.html, metrics.html i partiali. Wpis jest unieważniany po sumie kontrolnej źródła,
+więc wdrożenie nowej wersji szablonu nie wymaga czyszczenia katalogu.
+JINJA_BYTECODE_CACHE=0 wyłącza.
+
+Fragmenty: `{{ cached_fragment("_chat_widget.html") }}` zamiast `{% include %}` renderuje
+partial raz na język i potem wstawia gotowy HTML. Partiale zależne od danych użytkownika
+podają `per_user=True` — klucz obejmuje wtedy użytkownika i users.data_version (http_cache),
+a `extra` dokłada to, czego wersja danych nie obejmuje (np. dzisiejszą datę).
+Fragment dostaje kontekst strony tak jak include, ale jego wynik nie może zależeć
+od niczego spoza klucza.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+from flask_login import current_user
+from jinja2 import FileSystemBytecodeCache, pass_context
+from markupsafe import Markup
+
+FRAGMENT_CACHE_MAX_ENTRIES = 1024
+
+# (szablon, język, user_id | None) -> ((data_version, extra), html); jeden wpis na klucz,
+# nowa wersja danych nadpisuje poprzednią.
+_fragment_cache: OrderedDict = OrderedDict()
+_fragment_lock = threading.Lock()
+
+
+@pass_context
+def cached_fragment(ctx, template_name: str, per_user: bool = False, extra=None) -> Markup:
+    lang = ctx.get("lang") or "pl"
+    owner = None
+    version = (None, extra)
+    if per_user:
+        if not current_user.is_authenticated:
+            return Markup(ctx.environment.get_template(template_name).render(ctx.get_all()))
+        owner = current_user.id
+        version = (current_user.data_version or 0, extra)
+
+    # W debugu szablony przeładowują się po edycji — cache pokazywałby starą wersję.
+    use_cache = not current_app.debug
+    key = (template_name, lang, owner)
+    if use_cache:
+        with _fragment_lock:
+            hit = _fragment_cache.get(key)
+            if hit is not None and hit[0] == version:
+                _fragment_cache.move_to_end(key)
+                return hit[1]
+
+    html = Markup(ctx.environment.get_template(template_name).render(ctx.get_all()))
+    if use_cache:
+        with _fragment_lock:
+            _fragment_cache[key] = (version, html)
+            _fragment_cache.move_to_end(key)
+            while len(_fragment_cache) > FRAGMENT_CACHE_MAX_ENTRIES:
+                _fragment_cache.popitem(last=False)
+    return html
+
+
+def init_templating(app) -> None:
+    """Podpina cache bajtkodu (przed pierwszym wczytaniem szablonu) i helper cached_fragment."""
+    if os.environ.get("JINJA_BYTECODE_CACHE", "1") == "1":
+        directory = (os.environ.get("JINJA_BYTECODE_CACHE_DIR") or "").strip() or None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+    app.jinja_env.globals["cached_fragment"] = cached_fragment
@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Konfiguracja bazy musi być ustawiona przed importem aplikacji (config.py czyta ją przy imporcie).
+_DB_PATH = os.path.join(tempfile.mkdtemp(prefix="training-tests-"), "test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_PATH}"
+os.environ.setdefault("REQUEST_METRICS_LOG", "0")
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import app as flask_app, db
+
+    flask_app.config["TESTING"] = True
+    with flask_app.app_context():
+        db.create_all()
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    """Klient zalogowany jako świeży użytkownik po onboardingu."""
+    from werkzeug.security import generate_password_hash
+
+    from app import db
+    from models import User
+
+    with app.app_context():
+        email = f"user{User.query.count() + 1}@example.com"
+        db.session.add(User(email=email, password_hash=generate_password_hash("x"), onboarding_completed=True))
+        db.session.commit()
+
+    c = app.test_client()
+    resp = c.post("/login", data={"email": email, "password": "x"})
+    assert resp.status_code in (200, 302)
+    return c
@@ -0,0 +1,32 @@
+from blueprints.metrics import SERIES_MAX_DAYS
+
+
+def test_series_ok_for_supported_range(client):
+    resp = client.get("/api/metrics/series?days=30&resolution=day")
+    assert resp.status_code == 200
+    assert resp.get_json()["ok"] is True
+
+
+def test_series_rejects_huge_days(client):
+    # Wcześniej timedelta rzucała OverflowError -> 500.
+    for days in (SERIES_MAX_DAYS + 1, 99999999, 10**30):
+        resp = client.get(f"/api/metrics/series?days={days}")
+        assert resp.status_code == 400, days
+        assert resp.get_json()["ok"] is False
+
+
+def test_series_accepts_max_days(client):
+    resp = client.get(f"/api/metrics/series?days={SERIES_MAX_DAYS}&resolution=month")
+    assert resp.status_code == 200
+
+
+def test_series_rejects_out_of_range_start_end(client):
+    for query in (
+        "start=0001-01-01&end=9999-12-31",
+        "start=2024-02-01&end=2024-01-01",
+        "start=2024-13-01",
+        "start=2024-01-01&end=10000-01-01",
+    ):
+        resp = client.get(f"/api/metrics/series?{query}")
+        assert resp.status_code == 400, query
+        assert resp.get_json()["ok"] is False
@@ -0,0 +1,1420 @@
+"""Dane treningowe użytkownika dla panelu, metryk, planera i kontekstu AI.
+
+Etykiety i stałe sportów, ładowanie aktywności, agregaty tygodniowe, cele tygodniowe,
+postęp celu, kontekst profilu/stanu (urazy) i statystyki do wykresów.
+"""
+
+import json
+import re
+from datetime import date, datetime, timedelta, timezone
+
+from flask import session
+
+from models import Activity, Exercise, TrainingCheckin, User, UserProfile, UserState, db
+from i18n import tr
+from parsing import _normalize_gps_coord, _safe_float, _safe_int, _safe_json_dict, _to_naive_utc
+
+SPORT_STYLES = {
+    "run": {"icon": "🏃", "color": "var(--color-run)"},
+    "ride": {"icon": "🚴", "color": "var(--color-ride)"},
+    "swim": {"icon": "🏊", "color": "var(--color-swim)"},
+    "weighttraining": {"icon": "🏋️", "color": "var(--color-gym)"},
+    "workout": {"icon": "🏋️", "color": "var(--color-gym)"},
+    "yoga": {"icon": "🧘", "color": "var(--color-yoga)"},
+    "hike": {"icon": "⛰️", "color": "var(--color-hike)"},
+    "walk": {"icon": "🚶", "color": "var(--color-walk)"},
+    "rowing": {"icon": "🚣", "color": "var(--color-row)"},
+    "tennis": {"icon": "🎾", "color": "var(--color-tennis)"},
+    "soccer": {"icon": "⚽", "color": "var(--color-soccer)"},
+    "basketball": {"icon": "🏀", "color": "var(--color-basketball)"},
+    "ski": {"icon": "🎿", "color": "var(--color-ski)"},
+    "climb": {"icon": "🧗", "color": "var(--color-climb)"},
+    "other": {"icon": "🏅", "color": "var(--color-default)"},
+}
+
+ACTIVITY_LABELS = {
+    "pl": {
+        "run": "Bieganie",
+        "ride": "Rower",
+        "swim": "Pływanie",
+        "gym": "Siłownia",
+        "mobility": "Mobilność",
+        "weighttraining": "Siłownia",
+        "workout": "Trening",
+        "yoga": "Joga",
+        "hike": "Wędrówka",
+        "walk": "Spacer",
+        "other": "Inne",
+    },
+    "en": {
+        "run": "Running",
+        "ride": "Cycling",
+        "swim": "Swimming",
+        "gym": "Gym",
+        "mobility": "Mobility",
+        "weighttraining": "Gym",
+        "workout": "Workout",
+        "yoga": "Yoga",
+        "hike": "Hike",
+        "walk": "Walk",
+        "other": "Other",
+    },
+}
+
+TARGET_SPORT_FIELDS = {
+    "run": "weekly_run_sessions",
+    "gym": "weekly_gym_sessions",
+    "swim": "weekly_swim_sessions",
+    "mobility": "weekly_mobility_sessions",
+    "ride": "weekly_ride_sessions",
+}
+
+TARGET_SPORT_ORDER = ["run", "gym", "swim", "mobility", "ride"]
+
+WEEKDAYS_FULL = {
+    "pl": ["poniedziałek", "wtorek", "środa", "czwartek", "piątek", "sobota", "niedziela"],
+    "en": ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"],
+}
+
+WEEKDAYS_SHORT = {
+    "pl": ["pon", "wt", "śr", "czw", "pt", "sob", "nd"],
+    "en": ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"],
+}
+
+MONTHS_FULL = {
+    "pl": ["stycznia", "lutego", "marca", "kwietnia", "maja", "czerwca", "lipca", "sierpnia", "września", "października", "listopada", "grudnia"],
+    "en": ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"],
+}
+
+
+def activity_label(activity_type: str | None) -> str:
+    label_key = (activity_type or "").lower()
+    lang = session.get("lang", "pl")
+    labels = ACTIVITY_LABELS.get(lang, ACTIVITY_LABELS["pl"])
+    fallback = "Other" if lang == "en" else "Inne"
+    return labels.get(label_key, label_key or fallback)
+
+
+def format_dt(value: datetime | date | None, style: str = "list") -> str:
+    if not value:
+        return ""
+    if isinstance(value, date) and not isinstance(value, datetime):
+        value = datetime.combine(value, datetime.min.time())
+
+    lang = session.get("lang", "pl")
+    if lang not in ("pl", "en"):
+        lang = "pl"
+
+    weekday = WEEKDAYS_FULL[lang][value.weekday()]
+    if style == "long":
+        month = MONTHS_FULL[lang][value.month - 1]
+        return f"{weekday}, {value.day:02d} {month} {value.year}"
+    return f"{value.day:02d}.{value.month:02d}.{value.year} ({weekday})"
+
+
+def _format_duration_hms(seconds_value) -> str | None:
+    total_seconds = _safe_int(seconds_value)
+    if total_seconds is None or total_seconds < 0:
+        return None
+    h = total_seconds // 3600
+    m = (total_seconds % 3600) // 60
+    s = total_seconds % 60
+    if h > 0:
+        return f"{h}h {m:02d}m {s:02d}s"
+    return f"{m}m {s:02d}s"
+
+
+def _format_number(value, decimals: int = 1) -> str | None:
+    num = _safe_float(value)
+    if num is None:
+        return None
+    if decimals <= 0:
+        return str(int(round(num)))
+    text = f"{num:.{decimals}f}"
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+    return text
+
+
+def _parse_route_points_json(raw_json: str | None) -> list[list[float]]:
+    if not raw_json:
+        return []
+    try:
+        data = json.loads(raw_json)
+    except Exception:
+        return []
+    if not isinstance(data, list):
+        return []
+
+    points: list[list[float]] = []
+    for item in data:
+        if not isinstance(item, (list, tuple)) or len(item) < 2:
+            continue
+        lat = _normalize_gps_coord(item[0])
+        lng = _normalize_gps_coord(item[1])
+        if lat is None or lng is None:
+            continue
+        points.append([lat, lng])
+    return points
+
+
+def _build_activity_detail_payload(activity: Activity) -> list[dict]:
+    meta = _safe_json_dict(activity.metadata_json)
+    cards: list[dict] = []
+
+    def add_card(pl: str, en: str, value_text: str | None):
+        if not value_text:
+            return
+        cards.append({"pl": pl, "en": en, "value": value_text})
+
+    # Core activity metrics
+    add_card("Maks. tętno", "Max HR", (f"{int(activity.max_hr)} bpm" if activity.max_hr else None))
+    add_card("Czas ruchu", "Moving time", _format_duration_hms(activity.moving_duration))
+    add_card("Czas całkowity", "Elapsed time", _format_duration_hms(activity.elapsed_duration))
+    add_card("Śr. prędkość", "Avg speed", (f"{_format_number((activity.avg_speed_mps or 0) * 3.6, 2)} km/h" if activity.avg_speed_mps else None))
+    add_card("Maks. prędkość", "Max speed", (f"{_format_number((activity.max_speed_mps or 0) * 3.6, 2)} km/h" if activity.max_speed_mps else None))
+    add_card("Przewyższenie +", "Elevation gain", (f"{_format_number(activity.elevation_gain, 1)} m" if activity.elevation_gain is not None else None))
+    add_card("Przewyższenie -", "Elevation loss", (f"{_format_number(activity.elevation_loss, 1)} m" if activity.elevation_loss is not None else None))
+    add_card("Kalorie", "Calories", (f"{_format_number(activity.calories, 0)} kcal" if activity.calories is not None else None))
+    add_card("Kroki", "Steps", (_format_number(activity.steps, 0) if activity.steps is not None else None))
+    add_card("VO2max", "VO2max", (f"{_format_number(activity.vo2max, 1)}" if activity.vo2max is not None else None))
+
+    known_meta = [
+        ("avgRunCadence", "Śr. kadencja biegu", "Avg run cadence", 1, "spm"),
+        ("maxRunCadence", "Maks. kadencja biegu", "Max run cadence", 1, "spm"),
+        ("avgStrideLength", "Śr. długość kroku", "Avg stride length", 1, "cm"),
+    ]
+
+    for key, label_pl, label_en, decimals, unit in known_meta:
+        if key not in meta:
+            continue
+        value = meta.get(key)
+        if decimals < 0:
+            text = _format_duration_hms(value)
+        else:
+            text = _format_number(value, decimals)
+            if text and unit:
+                text = f"{text} {unit}"
+        add_card(label_pl, label_en, text)
+
+    return cards
+
+
+def classify_sport(text: str) -> str:
+    t = (text or "").lower()
+    # uwaga: to są heurystyki — lepsze mapowanie zrobimy później na podstawie activity_type z planu JSON
+    if any(k in t for k in ["interwa", "tempo", "bieg", "easy run", "long run", "run "]):
+        return "run"
+    if any(k in t for k in ["rower", "ride", "kolar", "bike"]):
+        return "ride"
+    if any(k in t for k in ["pływ", "basen", "swim"]):
+        return "swim"
+    if any(k in t for k in ["siłown", "strength", "core", "gym", "weights", "workout"]):
+        return "weighttraining"
+    if any(k in t for k in ["joga", "yoga", "mobility", "stretch"]):
+        return "yoga"
+    if any(k in t for k in ["hike", "trek", "góry", "szlak"]):
+        return "hike"
+    if any(k in t for k in ["spacer", "walk"]):
+        return "walk"
+    if "tenis" in t or "tennis" in t:
+        return "tennis"
+    if any(k in t for k in ["piłka", "football", "soccer"]):
+        return "soccer"
+    if any(k in t for k in ["basket", "kosz"]):
+        return "basketball"
+    if any(k in t for k in ["ski", "narty"]):
+        return "ski"
+    if any(k in t for k in ["climb", "wspin"]):
+        return "climb"
+    return "other"
+
+
+def normalize_activity_bucket(activity_type: str | None, notes: str | None = None) -> str:
+    t = (activity_type or "").lower()
+    n = (notes or "").lower()
+    if t in {"run", "trailrun", "virtualrun"}:
+        return "run"
+    if t in {"ride", "virtualride"}:
+        return "ride"
+    if t in {"swim"}:
+        return "swim"
+    if t in {"yoga"}:
+        return "mobility"
+    if t in {"weighttraining", "workout", "strengthtraining", "gym"}:
+        if any(k in n for k in ["mobility", "stabilizacja", "core", "rozciągan", "stretch", "rehab", "bioder", "stability"]):
+            return "mobility"
+        return "gym"
+    return "other"
+
+
+def _activity_start_dt(activity: Activity) -> datetime | None:
+    dt = getattr(activity, "start_time", None)
+    if isinstance(dt, datetime):
+        return dt
+    if isinstance(dt, str):
+        try:
+            return datetime.fromisoformat(dt.replace("Z", "+00:00"))
+        except Exception:
+            return None
+    return None
+
+
+def _load_user_activities_with_fallback(
+    *,
+    user_id: int,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    order_asc: bool = True,
+    limit: int | None = None,
+) -> list[Activity]:
+    q = Activity.query.filter(Activity.user_id == user_id)
+    if start is not None:
+        q = q.filter(Activity.start_time >= start)
+    if end is not None:
+        q = q.filter(Activity.start_time < end)
+    q = q.order_by(Activity.start_time.asc() if order_asc else Activity.start_time.desc())
+    if limit:
+        q = q.limit(limit)
+    rows = q.all()
+    if rows:
+        return rows
+
+    # Fallback for mixed datetime formats in SQLite (naive/aware/string).
+    if start is None and end is None:
+        return rows
+
+    base_q = Activity.query.filter(Activity.user_id == user_id).order_by(Activity.start_time.asc() if order_asc else Activity.start_time.desc())
+    base_rows = base_q.all()
+    if not base_rows:
+        return []
+
+    start_n = _to_naive_utc(start)
+    end_n = _to_naive_utc(end)
+    filtered: list[Activity] = []
+    for a in base_rows:
+        dt = _to_naive_utc(_activity_start_dt(a))
+        if not dt:
+            continue
+        if start_n and dt < start_n:
+            continue
+        if end_n and dt >= end_n:
+            continue
+        filtered.append(a)
+        if limit and len(filtered) >= limit:
+            break
+    return filtered
+
+
+def _load_exercise_map(activity_ids: list[int]) -> dict[int, list[Exercise]]:
+    if not activity_ids:
+        return {}
+    rows = Exercise.query.filter(Exercise.activity_id.in_(activity_ids)).all()
+    out: dict[int, list[Exercise]] = {}
+    for ex in rows:
+        out.setdefault(ex.activity_id, []).append(ex)
+    return out
+
+
+def compute_profile_defaults_from_history(user_id: int) -> None:
+    """Auto-uzupełnia profil po imporcie historii.
+
+    Priorytet:
+    - ostatnie 3 tygodnie (bardziej aktualny poziom),
+    - fallback: ostatnie 12 tygodni, gdy danych jest mało.
+    """
+    profile = UserProfile.query.filter_by(user_id=user_id).first()
+    if not profile:
+        profile = UserProfile(user_id=user_id)
+        db.session.add(profile)
+        db.session.commit()
+
+    now = datetime.now()
+    recent_acts = _load_user_activities_with_fallback(
+        user_id=user_id,
+        start=now - timedelta(days=21),
+        order_asc=True,
+    )
+    acts = recent_acts
+    if len(acts) < 3:
+        acts = _load_user_activities_with_fallback(
+            user_id=user_id,
+            start=now - timedelta(days=84),
+            order_asc=True,
+        )
+    if not acts:
+        return
+
+    # top sporty
+    counts = {}
+    bucket_counts = {"run": 0, "gym": 0, "swim": 0, "mobility": 0, "ride": 0}
+    for a in acts:
+        key = (a.activity_type or "other").lower()
+        counts[key] = counts.get(key, 0) + 1
+        bucket = normalize_activity_bucket(a.activity_type, a.notes)
+        if bucket in bucket_counts:
+            bucket_counts[bucket] += 1
+    top = sorted(counts.items(), key=lambda x: x[1], reverse=True)[:4]
+    top_sports = ",".join([t[0] for t in top])
+
+    # tygodniowe agregaty: dystans (km), czas (h), dni aktywne, liczba treningów
+    # grupujemy po tygodniu (poniedziałek)
+    buckets = {}
+    for a in acts:
+        start_dt = _activity_start_dt(a)
+        if not start_dt:
+            continue
+        d = start_dt.date()
+        week_start = d - timedelta(days=d.weekday())
+        b = buckets.setdefault(week_start, {"dist_km": 0.0, "dur_h": 0.0, "days": set(), "count": 0})
+        if a.distance:
+            b["dist_km"] += (a.distance / 1000.0)
+        if a.duration:
+            b["dur_h"] += (a.duration / 3600.0)
+        b["days"].add(d)
+        b["count"] += 1
+
+    weeks = list(buckets.values())
+    if not weeks:
+        return
+
+    avg_dist = sum(w["dist_km"] for w in weeks) / len(weeks)
+    avg_days = sum(len(w["days"]) for w in weeks) / len(weeks)
+    avg_count = sum(w["count"] for w in weeks) / len(weeks)
+
+    # Days per week based on last 7 days (unique active days)
+    last_week_acts = _load_user_activities_with_fallback(
+        user_id=user_id,
+        start=now - timedelta(days=7),
+        order_asc=True,
+    )
+    last_week_days = set()
+    for a in last_week_acts:
+        start_dt = _activity_start_dt(a)
+        if start_dt:
+            last_week_days.add(start_dt.date())
+    days_last_7 = len(last_week_days)
+
+    changed = False
+    if profile.primary_sports in (None, "") and top_sports:
+        profile.primary_sports = top_sports
+        changed = True
+    if profile.weekly_distance_km is None and avg_dist > 0:
+        profile.weekly_distance_km = round(avg_dist, 1)
+        changed = True
+    if profile.days_per_week is None and days_last_7 > 0:
+        profile.days_per_week = int(days_last_7)
+        changed = True
+    if profile.weekly_goal_workouts is None and avg_count > 0:
+        profile.weekly_goal_workouts = max(1, int(round(avg_count)))
+        changed = True
+    for bucket, field_name in TARGET_SPORT_FIELDS.items():
+        if getattr(profile, field_name, None) is not None:
+            continue
+        bucket_total = bucket_counts.get(bucket, 0)
+        if bucket_total <= 0:
+            continue
+        avg_bucket_sessions = bucket_total / max(1, len(weeks))
+        setattr(profile, field_name, max(1, int(round(avg_bucket_sessions))))
+        changed = True
+    if not (profile.weekly_focus_sports or "").strip():
+        inferred_focus = [k for k in TARGET_SPORT_ORDER if bucket_counts.get(k, 0) > 0]
+        if inferred_focus:
+            profile.weekly_focus_sports = ",".join(inferred_focus)
+            changed = True
+
+    if changed:
+        _sync_legacy_weekly_goal(profile)
+        profile.updated_at = datetime.now(timezone.utc)
+        db.session.commit()
+
+
+def get_weekly_aggregates(user_id: int, weeks: int = 12) -> str:
+    """Agregaty tygodniowe zamiast wysyłania całej historii do AI."""
+    # bierzemy okno tygodniowe (rolling): ostatnie N tygodni licząc od poniedziałku
+    today = datetime.now().date()
+    # poniedziałek bieżącego tygodnia
+    monday = today - timedelta(days=today.weekday())
+    start_date = monday - timedelta(weeks=weeks - 1)
+
+    activities = _load_user_activities_with_fallback(
+        user_id=user_id,
+        start=datetime.combine(start_date, datetime.min.time()),
+        order_asc=True,
+    )
+
+    # week_start (date) -> totals
+    weeks_map = {}
+
+    def week_start(d: date) -> date:
+        return d - timedelta(days=d.weekday())
+
+    for a in activities:
+        start_dt = _activity_start_dt(a)
+        if not start_dt:
+            continue
+        ws = week_start(start_dt.date())
+        entry = weeks_map.setdefault(ws, {"count": 0, "duration": 0, "distance": 0.0, "by_type": {}})
+        entry["count"] += 1
+        entry["duration"] += int(a.duration or 0)
+        entry["distance"] += float(a.distance or 0)
+        t = (a.activity_type or "unknown").lower()
+        bt = entry["by_type"].setdefault(t, {"count": 0, "duration": 0, "distance": 0.0})
+        bt["count"] += 1
+        bt["duration"] += int(a.duration or 0)
+        bt["distance"] += float(a.distance or 0)
+
+    # Uporządkuj: od najstarszego do najnowszego, ale pokaż też puste tygodnie
+    lines = ["AGREGATY TYGODNIOWE (ostatnie %d tygodni):" % weeks]
+    cur = start_date
+    for _ in range(weeks):
+        ws = cur
+        entry = weeks_map.get(ws)
+        if not entry:
+            lines.append(f"- {ws.isoformat()} | 0 treningów")
+        else:
+            total_km = entry["distance"] / 1000.0
+            total_h = entry["duration"] / 3600.0
+            lines.append(f"- {ws.isoformat()} | {entry['count']} treningów | {total_km:.1f} km | {total_h:.1f} h")
+        cur = cur + timedelta(weeks=1)
+    return "\n".join(lines)
+
+
+def get_recent_activity_details(user_id: int, days: int = 21, limit: int = 120) -> str:
+    cutoff = datetime.now() - timedelta(days=days)
+    activities = _load_user_activities_with_fallback(
+        user_id=user_id,
+        start=cutoff,
+        order_asc=True,
+        limit=limit,
+    )
+
+    if not activities:
+        return "OSTATNIE TRENINGI: brak danych w tym oknie."
+
+    exercise_map = _load_exercise_map([a.id for a in activities])
+
+    out = [f"OSTATNIE TRENINGI (ostatnie {days} dni):"]
+    for act in activities:
+        start_dt = _activity_start_dt(act)
+        if not start_dt:
+            continue
+        d = start_dt.strftime('%Y-%m-%d')
+        t = (act.activity_type or 'unknown').lower()
+        dist_km = (act.distance or 0) / 1000.0
+        dur_min = int((act.duration or 0) // 60)
+        hr = f" | HR {act.avg_hr}" if act.avg_hr else ""
+        pace = ""
+        if getattr(act, "avg_speed_mps", None) and float(act.avg_speed_mps) > 0:
+            sec_per_km = 1000.0 / float(act.avg_speed_mps)
+            mm = int(sec_per_km // 60)
+            ss = int(round(sec_per_km % 60))
+            pace = f" | tempo {mm}:{ss:02d}/km"
+        elev = f" | +{int(round(act.elevation_gain))}m" if getattr(act, "elevation_gain", None) else ""
+        out.append(f"- {d} | {t} | {dist_km:.1f} km | {dur_min} min{hr}{pace}{elev}")
+        if act.notes:
+            out.append(f"  Notatka: {act.notes}")
+        exercises = exercise_map.get(act.id) or []
+        if exercises:
+            parts = []
+            for ex in exercises[:8]:
+                name = (ex.name or "").strip()
+                if not name:
+                    continue
+                sets = ex.sets or 0
+                reps = ex.reps or 0
+                weight = ex.weight if ex.weight is not None else None
+                if weight is not None and weight > 0:
+                    parts.append(f"{name} ({sets}x{reps}, {weight}kg)")
+                else:
+                    parts.append(f"{name} ({sets}x{reps})")
+            if parts:
+                out.append(f"  Ćwiczenia: {', '.join(parts)}")
+    return "\n".join(out)
+
+
+def get_recent_checkins_summary(user_id: int, days: int = 14, limit: int = 30) -> str:
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    rows = (
+        TrainingCheckin.query
+        .filter(TrainingCheckin.user_id == user_id, TrainingCheckin.created_at >= cutoff)
+        .order_by(TrainingCheckin.created_at.asc())
+        .limit(limit)
+        .all()
+    )
+    if not rows:
+        return "CHECK-INY: brak ostatnich raportów."
+
+    out = [f"CHECK-INY (ostatnie {days} dni):"]
+    for r in rows:
+        ts = r.created_at.strftime("%Y-%m-%d")
+        note = (r.notes or "").strip()
+        if len(note) > 220:
+            note = note[:220] + "..."
+        out.append(f"- {ts} | {note or 'brak opisu'}")
+    return "\n".join(out)
+
+
+def get_execution_context(user_id: int, days: int = 10) -> str:
+    cutoff = datetime.now() - timedelta(days=days)
+    acts = _load_user_activities_with_fallback(
+        user_id=user_id,
+        start=cutoff,
+        order_asc=True,
+    )
+    if not acts:
+        return "WYKONANE TRENINGI: brak danych."
+
+    exercise_map = _load_exercise_map([a.id for a in acts])
+
+    today_iso = datetime.now().strftime("%Y-%m-%d")
+    counts = {"run": 0, "ride": 0, "swim": 0, "gym": 0, "mobility": 0, "other": 0}
+    today_counts = {"run": 0, "ride": 0, "swim": 0, "gym": 0, "mobility": 0, "other": 0}
+    lines = [f"WYKONANE TRENINGI (ostatnie {days} dni):"]
+
+    for act in acts[-30:]:
+        dt = _activity_start_dt(act)
+        if not dt:
+            continue
+        ds = dt.strftime("%Y-%m-%d")
+        b = normalize_activity_bucket(act.activity_type, act.notes)
+        counts[b] = counts.get(b, 0) + 1
+        if ds == today_iso:
+            today_counts[b] = today_counts.get(b, 0) + 1
+
+        dist_km = (act.distance or 0.0) / 1000.0
+        dur_min = int((act.duration or 0) // 60)
+        lines.append(f"- {ds} | {b} | {dist_km:.1f} km | {dur_min} min")
+        exercises = exercise_map.get(act.id) or []
+        if exercises:
+            parts = []
+            for ex in exercises[:8]:
+                name = (ex.name or "").strip()
+                if not name:
+                    continue
+                sets = ex.sets or 0
+                reps = ex.reps or 0
+                weight = ex.weight if ex.weight is not None else None
+                if weight is not None and weight > 0:
+                    parts.append(f"{name} ({sets}x{reps}, {weight}kg)")
+                else:
+                    parts.append(f"{name} ({sets}x{reps})")
+            if parts:
+                lines.append(f"  Ćwiczenia: {', '.join(parts)}")
+
+    lines.append(
+        "PODSUMOWANIE TYPU: "
+        + " | ".join([f"{k}={counts[k]}" for k in ("run", "ride", "swim", "gym", "mobility", "other")])
+    )
+    lines.append(
+        "DZISIAJ WYKONANO: "
+        + " | ".join([f"{k}={today_counts[k]}" for k in ("run", "ride", "swim", "gym", "mobility", "other")])
+    )
+    return "\n".join(lines)
+
+
+def get_week_execution_context(user_id: int, week_start: date, week_end: date) -> str:
+    start_dt = datetime.combine(week_start, datetime.min.time())
+    end_dt = datetime.combine(week_end + timedelta(days=1), datetime.min.time())
+    acts = _load_user_activities_with_fallback(
+        user_id=user_id,
+        start=start_dt,
+        end=end_dt,
+        order_asc=True,
+    )
+    if not acts:
+        return "W TYM TYGODNIU: brak wykonanych treningów."
+
+    exercise_map = _load_exercise_map([a.id for a in acts])
+    lines = [f"WYKONANE W TYM TYGODNIU ({week_start.isoformat()} → {week_end.isoformat()}):"]
+    for act in acts:
+        start_act = _activity_start_dt(act)
+        if not start_act:
+            continue
+        d = start_act.strftime("%Y-%m-%d")
+        b = normalize_activity_bucket(act.activity_type, act.notes)
+        dist_km = (act.distance or 0.0) / 1000.0
+        dur_min = int((act.duration or 0) // 60)
+        lines.append(f"- {d} | {b} | {dist_km:.1f} km | {dur_min} min")
+        exercises = exercise_map.get(act.id) or []
+        if exercises:
+            parts = []
+            for ex in exercises[:8]:
+                name = (ex.name or "").strip()
+                if not name:
+                    continue
+                sets = ex.sets or 0
+                reps = ex.reps or 0
+                weight = ex.weight if ex.weight is not None else None
+                if weight is not None and weight > 0:
+                    parts.append(f"{name} ({sets}x{reps}, {weight}kg)")
+                else:
+                    parts.append(f"{name} ({sets}x{reps})")
+            if parts:
+                lines.append(f"  Ćwiczenia: {', '.join(parts)}")
+    return "\n".join(lines)
+
+
+def get_checkin_signal_snapshot(user_id: int, days: int = 14, limit: int = 30) -> dict:
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    rows = (
+        TrainingCheckin.query
+        .filter(TrainingCheckin.user_id == user_id, TrainingCheckin.created_at >= cutoff)
+        .order_by(TrainingCheckin.created_at.asc())
+        .limit(limit)
+        .all()
+    )
+    if not rows:
+        return {
+            "status": "no_data",
+            "window_days": days,
+            "fatigue": "unknown",
+            "pain": "unknown",
+            "readiness": "unknown",
+            "latest_notes": [],
+        }
+
+    fatigue_score = 0
+    pain_score = 0
+    readiness_score = 0
+
+    fatigue_bad = ["zmęcz", "zmec", "fatigue", "tired", "brak sił", "brak sil", "wyczerp", "zajech"]
+    fatigue_good = ["lekko", "śwież", "swiez", "easy", "dobrze", "dobry trening"]
+    pain_bad = ["ból", "bol", "pain", "kontuz", "injury", "kolano", "achilles", "shin", "piszczel", "back pain"]
+    readiness_good = ["gotow", "ready", "moc", "energia", "energ", "forma", "strong"]
+    readiness_bad = ["słabo", "slabo", "zajech", "przemęcz", "przemecz", "bez energii", "masakra"]
+
+    latest_notes = []
+    for row in rows:
+        note = (row.notes or "").strip()
+        if not note:
+            continue
+        t = note.lower()
+        if any(k in t for k in fatigue_bad):
+            fatigue_score += 1
+        if any(k in t for k in fatigue_good):
+            fatigue_score -= 1
+        if any(k in t for k in pain_bad):
+            pain_score += 2
+        if any(k in t for k in readiness_good):
+            readiness_score += 1
+        if any(k in t for k in readiness_bad):
+            readiness_score -= 1
+        latest_notes.append(note[:160])
+
+    def _level(score: int, *, low: int = 1, high: int = 3) -> str:
+        if score >= high:
+            return "high"
+        if score >= low:
+            return "medium"
+        return "low"
+
+    if readiness_score >= 2:
+        readiness = "up"
+    elif readiness_score <= -2:
+        readiness = "down"
+    else:
+        readiness = "flat"
+
+    return {
+        "status": "ok",
+        "window_days": days,
+        "fatigue": _level(max(0, fatigue_score)),
+        "pain": _level(max(0, pain_score), low=1, high=2),
+        "readiness": readiness,
+        "latest_notes": latest_notes[-3:],
+    }
+
+
+def get_recent_weekly_volume_km(user_id: int, weeks: int = 4, include_types: set[str] | None = None) -> dict:
+    """Returns last/previous/average weekly distance in km for recent window."""
+    today = datetime.now().date()
+    monday = today - timedelta(days=today.weekday())
+    start_date = monday - timedelta(weeks=weeks - 1)
+    allowed = {t.lower() for t in include_types} if include_types else None
+
+    acts = _load_user_activities_with_fallback(
+        user_id=user_id,
+        start=datetime.combine(start_date, datetime.min.time()),
+        order_asc=True,
+    )
+
+    buckets = {}
+    for a in acts:
+        start_dt = _activity_start_dt(a)
+        if not start_dt:
+            continue
+        if allowed is not None:
+            at = (a.activity_type or "").lower()
+            if at not in allowed:
+                continue
+        d = start_dt.date()
+        ws = d - timedelta(days=d.weekday())
+        buckets[ws] = buckets.get(ws, 0.0) + float(a.distance or 0.0) / 1000.0
+
+    ordered = []
+    cur = start_date
+    for _ in range(weeks):
+        ordered.append(round(buckets.get(cur, 0.0), 1))
+        cur += timedelta(weeks=1)
+
+    avg = round(sum(ordered) / len(ordered), 1) if ordered else 0.0
+    last_week = ordered[-1] if ordered else 0.0
+    prev_week = ordered[-2] if len(ordered) > 1 else 0.0
+    labels = []
+    cur = start_date
+    for _ in range(weeks):
+        labels.append(cur.isoformat())
+        cur += timedelta(weeks=1)
+    return {
+        "weekly_series": ordered,
+        "weekly_labels": labels,
+        "avg_week_km": avg,
+        "last_week_km": last_week,
+        "prev_week_km": prev_week,
+    }
+
+
+def _infer_goal_discipline(profile_obj: UserProfile | None) -> str:
+    if not profile_obj:
+        return "run"
+
+    txt = " ".join([
+        profile_obj.target_event or "",
+        profile_obj.goals_text or "",
+        profile_obj.primary_sports or "",
+    ]).lower()
+
+    if any(k in txt for k in ("marathon", "maraton", "half marathon", "półmaraton", "polmaraton", "10k", "5k", "run", "bieg")):
+        return "run"
+    if any(k in txt for k in ("ride", "rower", "bike", "cycling", "kolar")):
+        return "ride"
+    if any(k in txt for k in ("swim", "pływ", "plyw", "basen")):
+        return "swim"
+    return "run"
+
+
+def _infer_goal_distance_km(profile_obj: UserProfile | None) -> float | None:
+    if not profile_obj:
+        return None
+
+    txt = " ".join([
+        profile_obj.target_event or "",
+        profile_obj.goals_text or "",
+    ]).lower()
+
+    if any(k in txt for k in ("half marathon", "półmaraton", "polmaraton", "21k", "21.1")):
+        return 21.1
+    if any(k in txt for k in ("marathon", "maraton", "42k", "42.2")):
+        return 42.2
+
+    m = re.search(r"(\d+(?:[.,]\d+)?)\s*(?:km|k)\b", txt)
+    if m:
+        try:
+            val = float(m.group(1).replace(",", "."))
+            if 3 <= val <= 120:
+                return val
+        except Exception:
+            pass
+    return None
+
+
+def _recommended_weekly_volume_range_km(goal_discipline: str, goal_distance_km: float | None, days_per_week: int | None) -> tuple[float, float]:
+    dpw = max(2, min(7, int(days_per_week or 4)))
+    factor_map = {2: 0.75, 3: 0.88, 4: 1.0, 5: 1.12, 6: 1.22, 7: 1.30}
+    f = factor_map.get(dpw, 1.0)
+
+    if goal_discipline == "run":
+        dist = float(goal_distance_km or 0.0)
+        if dist >= 40:
+            base_low, base_high = 42.0, 82.0
+        elif dist >= 20:
+            base_low, base_high = 28.0, 62.0
+        elif dist >= 10:
+            base_low, base_high = 18.0, 44.0
+        elif dist >= 5:
+            base_low, base_high = 14.0, 32.0
+        else:
+            base_low, base_high = 16.0, 36.0
+    elif goal_discipline == "ride":
+        base_low, base_high = 80.0, 260.0
+    elif goal_discipline == "swim":
+        base_low, base_high = 4.0, 18.0
+    else:
+        return 0.0, 0.0
+
+    return round(base_low * f, 1), round(base_high * f, 1)
+
+
+def _target_bucket_label(bucket: str) -> str:
+    labels = {
+        "run": tr("Bieganie", "Running"),
+        "gym": tr("Siłownia", "Gym"),
+        "swim": tr("Pływanie", "Swimming"),
+        "mobility": tr("Mobilność", "Mobility"),
+        "ride": tr("Rower", "Cycling"),
+    }
+    return labels.get(bucket, bucket)
+
+
+def _normalize_focus_sports(raw_values: list[str] | tuple[str, ...] | None) -> list[str]:
+    if not raw_values:
+        return ["run"]
+
+    out = []
+    seen = set()
+    for raw in raw_values:
+        if raw is None:
+            continue
+        parts = str(raw).split(",")
+        for part in parts:
+            key = part.strip().lower()
+            if key not in TARGET_SPORT_FIELDS:
+                continue
+            if key in seen:
+                continue
+            out.append(key)
+            seen.add(key)
+    return out or ["run"]
+
+
+def _get_focus_sports(profile_obj: UserProfile | None, weekly_targets: dict[str, int] | None = None) -> list[str]:
+    if weekly_targets is None:
+        weekly_targets = _get_weekly_session_targets(profile_obj)
+
+    if profile_obj and getattr(profile_obj, "weekly_focus_sports", None):
+        selected = _normalize_focus_sports([profile_obj.weekly_focus_sports])
+        if selected:
+            return selected
+
+    inferred = [k for k in TARGET_SPORT_ORDER if int(weekly_targets.get(k, 0) or 0) > 0]
+    if inferred:
+        return inferred
+    return ["run"]
+
+
+def _build_weekly_target_form_context(profile_obj: UserProfile | None) -> tuple[list[str], dict[str, int]]:
+    targets = _get_weekly_session_targets(profile_obj)
+    focus_sports = _get_focus_sports(profile_obj, targets)
+    return focus_sports, targets
+
+
+def _get_weekly_session_targets(profile_obj: UserProfile | None) -> dict[str, int]:
+    targets = {k: 0 for k in TARGET_SPORT_FIELDS}
+    if profile_obj:
+        for key, field in TARGET_SPORT_FIELDS.items():
+            val = getattr(profile_obj, field, None)
+            try:
+                targets[key] = max(0, int(val or 0))
+            except Exception:
+                targets[key] = 0
+
+        if not any(targets.values()):
+            fallback = int(profile_obj.weekly_goal_workouts or 0)
+            if fallback <= 0:
+                fallback = int(profile_obj.days_per_week or 0)
+            if fallback <= 0:
+                fallback = 3
+            targets["run"] = fallback
+    else:
+        targets["run"] = 3
+
+    return targets
+
+
+def _sync_legacy_weekly_goal(profile_obj: UserProfile) -> None:
+    targets = _get_weekly_session_targets(profile_obj)
+    total = sum(targets.values())
+    if total > 0:
+        profile_obj.weekly_goal_workouts = total
+
+
+def _count_week_sessions_by_target(user_id: int, week_start: date, week_end: date | None = None) -> dict[str, int]:
+    if week_end is None:
+        week_end = week_start + timedelta(days=6)
+    acts = _load_user_activities_with_fallback(
+        user_id=user_id,
+        start=datetime.combine(week_start, datetime.min.time()),
+        end=datetime.combine(week_end + timedelta(days=1), datetime.min.time()),
+        order_asc=True,
+    )
+    return _count_sessions_by_target(acts)
+
+
+def _count_sessions_by_target(acts: list[Activity]) -> dict[str, int]:
+    out = {k: 0 for k in TARGET_SPORT_ORDER}
+    for a in acts:
+        b = normalize_activity_bucket(a.activity_type, a.notes)
+        if b in out:
+            out[b] += 1
+    return out
+
+
+def build_goal_progress(user_id: int, profile_obj: UserProfile | None) -> dict | None:
+    if not profile_obj or not profile_obj.target_date:
+        return None
+
+    today = datetime.now().date()
+    days_left = (profile_obj.target_date - today).days
+
+    goal_discipline = _infer_goal_discipline(profile_obj)
+    include_types = None
+    if goal_discipline == "run":
+        include_types = {"run", "trailrun", "virtualrun"}
+    elif goal_discipline == "ride":
+        include_types = {"ride", "virtualride"}
+    elif goal_discipline == "swim":
+        include_types = {"swim"}
+
+    vol = get_recent_weekly_volume_km(user_id=user_id, weeks=6, include_types=include_types)
+    avg_week = float(vol.get("avg_week_km", 0.0) or 0.0)
+    last_week = float(vol.get("last_week_km", 0.0) or 0.0)
+    declared_weekly = float(profile_obj.weekly_distance_km or 0.0)
+    current_weekly = max(avg_week, last_week, declared_weekly, 0.0)
+    if current_weekly <= 0 and vol.get("weekly_series"):
+        current_weekly = max(float(x or 0.0) for x in vol["weekly_series"])
+
+    risk = (profile_obj.risk_tolerance or "balanced").lower()
+    ramp_pct = {"conservative": 0.05, "aggressive": 0.11}.get(risk, 0.08)
+
+    weeks_left = max(0, int((days_left + 6) // 7))
+    low_rec, high_rec = _recommended_weekly_volume_range_km(
+        goal_discipline=goal_discipline,
+        goal_distance_km=_infer_goal_distance_km(profile_obj),
+        days_per_week=profile_obj.days_per_week,
+    )
+
+    bias = {"conservative": 0.35, "aggressive": 0.75}.get(risk, 0.55)
+    recommended_peak = low_rec + (high_rec - low_rec) * bias if high_rec > 0 else 0.0
+    if declared_weekly > 0:
+        recommended_peak = max(recommended_peak, declared_weekly)
+    if recommended_peak <= 0:
+        recommended_peak = max(current_weekly, declared_weekly)
+
+    growth_weeks = max(1, min(10, weeks_left))
+    safe_cap = current_weekly * (1.0 + ramp_pct * growth_weeks) if current_weekly > 0 else recommended_peak
+
+    target_weekly = min(recommended_peak, safe_cap) if recommended_peak > 0 else safe_cap
+    if current_weekly > 0:
+        target_weekly = max(target_weekly, current_weekly)
+
+    if current_weekly > 0:
+        projected_cap = current_weekly * (1.0 + ramp_pct * min(4, growth_weeks))
+        projected_4w = min(target_weekly, projected_cap)
+    else:
+        projected_4w = target_weekly
+
+    weekly_targets = _get_weekly_session_targets(profile_obj)
+    focus_sports = _get_focus_sports(profile_obj, weekly_targets)
+    weekly_goal = max(1, sum(int(weekly_targets.get(k, 0) or 0) for k in focus_sports))
+    week_start = today - timedelta(days=today.weekday())
+    done_targets = _count_week_sessions_by_target(user_id=user_id, week_start=week_start, week_end=today)
+    workouts_done = sum(int(done_targets.get(k, 0) or 0) for k in focus_sports)
+    completion_pct = int(round(min(100.0, (workouts_done / max(1, weekly_goal)) * 100.0)))
+
+    if days_left <= 0:
+        phase = tr("po starcie", "post-race")
+    elif days_left <= 14:
+        phase = tr("taper", "taper")
+    elif days_left <= 84:
+        phase = tr("build", "build")
+    else:
+        phase = tr("base", "base")
+
+    readiness_pct = 0
+    if target_weekly > 0:
+        readiness_pct = int(round(min(100.0, (current_weekly / target_weekly) * 100.0)))
+
+    return {
+        "event": profile_obj.target_event or tr("Cel", "Goal"),
+        "target_date": profile_obj.target_date.isoformat(),
+        "target_date_pretty": format_dt(profile_obj.target_date, "long"),
+        "days_left": max(0, days_left),
+        "phase": phase,
+        "risk": risk,
+        "goal_discipline": goal_discipline,
+        "volume_source": tr("profil + ostatnie 6 tygodni", "profile + last 6 weeks"),
+        "weekly_volume_now": round(current_weekly, 1),
+        "weekly_volume_target": round(target_weekly, 1),
+        "weekly_volume_target_min": round(low_rec, 1) if high_rec > 0 else None,
+        "weekly_volume_target_max": round(high_rec, 1) if high_rec > 0 else None,
+        "weekly_volume_safe_cap": round(safe_cap, 1),
+        "weekly_volume_projected_4w": round(projected_4w, 1),
+        "target_time_text": profile_obj.target_time_text or "",
+        "weekly_labels": vol.get("weekly_labels", []),
+        "weekly_series": vol.get("weekly_series", []),
+        "readiness_pct": readiness_pct,
+        "completion_pct": completion_pct,
+        "weekly_goal": weekly_goal,
+        "workouts_done_this_week": workouts_done,
+        "weekly_targets": weekly_targets,
+        "weekly_done_targets": done_targets,
+        "focus_sports": focus_sports,
+        "updated_on": today.isoformat(),
+    }
+
+
+def get_training_phase_for_day(target_date: date | None, day_date: date) -> str:
+    if not target_date:
+        return "base"
+    days_left = (target_date - day_date).days
+    if days_left < 0:
+        return "post-race"
+    if days_left <= 14:
+        return "taper"
+    if days_left <= 56:
+        return "build"
+    return "base"
+
+
+def build_goal_link_text(profile_obj: UserProfile | None, day_date: date) -> str:
+    event = (profile_obj.target_event if profile_obj and profile_obj.target_event else tr("cel treningowy", "training goal"))
+    if profile_obj and profile_obj.target_date:
+        days_left = max(0, (profile_obj.target_date - day_date).days)
+        return tr(
+            f"Wspiera przygotowanie do: {event} (do startu: {days_left} dni).",
+            f"Supports preparation for: {event} (days to event: {days_left}).",
+        )
+    return tr(
+        f"Wspiera realizację celu: {event}.",
+        f"Supports progress toward: {event}.",
+    )
+
+
+def get_profile_and_state_context(user: User) -> str:
+    """Kontekst: FACTS + GOALS + STATE (czasowo wrażliwe)."""
+    profile = user.profile
+    lines = ["PROFIL ZAWODNIKA:"]
+
+    if profile:
+        # FACTS
+        facts = []
+        if profile.primary_sports:
+            facts.append(f"Dyscypliny: {profile.primary_sports}")
+        if profile.weekly_time_hours is not None:
+            facts.append(f"Czas tygodniowo: {profile.weekly_time_hours} h")
+        if profile.weekly_distance_km is not None:
+            facts.append(f"Kilometry tygodniowo: {profile.weekly_distance_km} km")
+        if profile.height_cm is not None:
+            facts.append(f"Wzrost: {profile.height_cm} cm")
+        if profile.weight_kg is not None:
+            facts.append(f"Waga: {profile.weight_kg} kg")
+        if profile.gender:
+            facts.append(f"Płeć: {profile.gender}")
+        if profile.vo2max is not None:
+            facts.append(f"VO2max: {profile.vo2max}")
+        if profile.resting_hr is not None:
+            facts.append(f"Tętno spoczynkowe: {profile.resting_hr}")
+        if profile.avg_sleep_hours is not None:
+            facts.append(f"Śr. sen: {profile.avg_sleep_hours} h")
+        if profile.avg_daily_steps is not None:
+            facts.append(f"Śr. kroki/dzień: {profile.avg_daily_steps}")
+        if profile.avg_daily_stress is not None:
+            facts.append(f"Śr. stres dzienny: {profile.avg_daily_stress}")
+        if profile.days_per_week is not None:
+            facts.append(f"Dni treningowe/tydz.: {profile.days_per_week}")
+        if profile.weekly_goal_workouts is not None:
+            facts.append(f"Cel treningów/tydz.: {profile.weekly_goal_workouts}")
+        weekly_targets = _get_weekly_session_targets(profile)
+        focus_sports = _get_focus_sports(profile, weekly_targets)
+        if focus_sports:
+            freq_parts = [f"{sport} {weekly_targets.get(sport, 0)}" for sport in focus_sports]
+            facts.append("Preferowana częstotliwość/tydz.: " + ", ".join(freq_parts))
+        if profile.experience_text:
+            facts.append(f"Doświadczenie: {profile.experience_text}")
+        lines.append("FACTS: " + (" | ".join(facts) if facts else "brak"))
+
+        # GOALS
+        goals = []
+        if profile.goals_text:
+            goals.append(profile.goals_text)
+        if profile.target_event:
+            goals.append(f"Wydarzenie docelowe: {profile.target_event}")
+        if profile.target_date:
+            goals.append(f"Data: {profile.target_date.isoformat()}")
+        lines.append("GOALS: " + (" | ".join(goals) if goals else "brak"))
+
+        if profile.preferences_text:
+            lines.append(f"PREFERENCJE: {profile.preferences_text}")
+        if profile.constraints_text:
+            lines.append(f"OGRANICZENIA: {profile.constraints_text}")
+        if profile.coach_style:
+            lines.append(f"STYL TRENERA: {profile.coach_style}")
+        if profile.risk_tolerance:
+            lines.append(f"TOLERANCJA RYZYKA: {profile.risk_tolerance}")
+        if profile.training_priority:
+            lines.append(f"PRIORYTET: {profile.training_priority}")
+        if profile.target_time_text:
+            lines.append(f"CZAS DOCELOWY: {profile.target_time_text}")
+
+        if profile.updated_at:
+            lines.append(f"(Profil zaktualizowany: {profile.updated_at.date().isoformat()})")
+    else:
+        lines.append("Brak profilu (użytkownik nie ukończył onboardingu).")
+
+    # STATE (time-sensitive)
+    active_states = (
+        UserState.query
+        .filter(UserState.user_id == user.id, UserState.is_active == True)
+        .order_by(UserState.updated_at.desc())
+        .all()
+    )
+
+    def is_expired(st: UserState) -> bool:
+        # Używamy datetime.now(timezone.utc) i usuwamy informację o strefie (replace),
+        # aby uzyskać "naive UTC" zgodne z tym, co zwracała stara metoda utcnow().
+        now_utc = datetime.now(timezone.utc).replace(tzinfo=None)
+
+        exp = st.expires_at
+        if not exp:
+            return False
+
+        # Jeżeli data z bazy ma jednak tzinfo, normalizujemy ją do naive UTC.
+        if getattr(exp, "tzinfo", None) is not None:
+            exp = exp.astimezone(timezone.utc).replace(tzinfo=None)
+
+        return exp < now_utc
+
+    changed = False
+    active_lines = []
+    for st in active_states:
+        if is_expired(st):
+            st.is_active = False
+            changed = True
+            continue
+        active_lines.append(
+            f"- {st.kind}: {st.summary}"
+            + (f" | severity={st.severity}" if st.severity is not None else "")
+        )
+
+    if changed:
+        db.session.commit()
+
+    if active_lines:
+        lines.append("STATE:\n" + "\n".join(active_lines))
+    else:
+        lines.append("STATE: brak aktywnych wpisów.")
+
+    return "\n".join(lines)
+
+
+def set_or_refresh_injury_state(user_id: int, injuries_text: str) -> None:
+    """Prosty mechanizm: jeżeli użytkownik poda kontuzje/urazy, traktuj to jako STATE z wygaśnięciem."""
+    injuries_text = (injuries_text or "").strip()
+    if not injuries_text:
+        return
+
+    now = datetime.now(timezone.utc)
+    # 21 dni ważności bez aktualizacji
+    expires = now + timedelta(days=21)
+
+    existing = (
+        UserState.query
+        .filter_by(user_id=user_id, kind="injury", is_active=True)
+        .order_by(UserState.updated_at.desc())
+        .first()
+    )
+
+    if existing:
+        existing.summary = injuries_text[:200]
+        existing.details = injuries_text
+        existing.updated_at = now
+        existing.expires_at = expires
+    else:
+        st = UserState(
+            user_id=user_id,
+            kind="injury",
+            summary=injuries_text[:200],
+            details=injuries_text,
+            severity=3,
+            started_at=now,
+            updated_at=now,
+            expires_at=expires,
+            is_active=True,
+        )
+        db.session.add(st)
+
+
+def clear_active_injury_states(user_id: int) -> None:
+    rows = (
+        UserState.query
+        .filter_by(user_id=user_id, kind="injury", is_active=True)
+        .all()
+    )
+    now = datetime.now(timezone.utc)
+    for row in rows:
+        row.is_active = False
+        row.updated_at = now
+        row.expires_at = now
+
+
+def get_current_injury_text(user_id: int) -> str:
+    state = (
+        UserState.query
+        .filter_by(user_id=user_id, kind="injury", is_active=True)
+        .order_by(UserState.updated_at.desc())
+        .first()
+    )
+    if not state:
+        return ""
+
+    exp = state.expires_at
+    if exp:
+        now_utc = datetime.now(timezone.utc).replace(tzinfo=None)
+        exp_cmp = exp.astimezone(timezone.utc).replace(tzinfo=None) if getattr(exp, "tzinfo", None) else exp
+        if exp_cmp < now_utc:
+            state.is_active = False
+            db.session.commit()
+            return ""
+
+    return (state.details or state.summary or "").strip()
+
+
+# Dynamiczne kategorie (Strava ma wiele typów). Mapujemy najczęstsze + reszta do "other".
+STATS_SPORTS = ("run", "ride", "swim", "gym", "other")
+SERIES_RESOLUTIONS = ("day", "week", "month")
+
+
+def _stats_bucket(activity_type: str | None) -> str:
+    t = (activity_type or "unknown").lower()
+    if t in {"run", "trailrun", "virtualrun"}:
+        return "run"
+    if t in {"ride", "virtualride"}:
+        return "ride"
+    if t in {"swim"}:
+        return "swim"
+    if t in {"weighttraining", "workout", "strengthtraining", "gym"}:
+        return "gym"
+    return "other"
+
+
+def _series_period_start(d: date, resolution: str) -> date:
+    if resolution == "week":
+        return d - timedelta(days=d.weekday())
+    if resolution == "month":
+        return d.replace(day=1)
+    return d
+
+
+def _series_next_period(d: date, resolution: str) -> date:
+    if resolution == "week":
+        return d + timedelta(days=7)
+    if resolution == "month":
+        return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return d + timedelta(days=1)
+
+
+def compute_metric_series(user_id: int, start_date: date, end_date: date, resolution: str = "day") -> dict:
+    """Kolumnowe serie km / godzin per sport dla wykresów metryk (/api/metrics/series).
+
+    `km[i]` i `hours[i]` to serie dla `sports[i]` (ostatnia to "total"), wyrównane do `labels`
+    (początek dnia / tygodnia od poniedziałku / miesiąca). `totals` to sumy całego zakresu
+    w tej samej kolejności sportów — z nich strona liczy kafelki i wykres kołowy.
+    """
+    if resolution not in SERIES_RESOLUTIONS:
+        resolution = "day"
+    acts = _load_user_activities_with_fallback(
+        user_id=user_id,
+        start=datetime.combine(start_date, datetime.min.time()),
+        end=datetime.combine(end_date + timedelta(days=1), datetime.min.time()),
+        order_asc=True,
+    )
+
+    labels = []
+    cur = _series_period_start(start_date, resolution)
+    while cur <= end_date:
+        labels.append(cur.isoformat())
+        cur = _series_next_period(cur, resolution)
+    index = {key: i for i, key in enumerate(labels)}
+
+    sport_idx = {sport: i for i, sport in enumerate(STATS_SPORTS)}
+    km = [[0.0] * len(labels) for _ in STATS_SPORTS]
+    seconds = [[0] * len(labels) for _ in STATS_SPORTS]
+    counts = [0] * len(STATS_SPORTS)
+    for a in acts:
+        start_dt = _activity_start_dt(a)
+        if not start_dt or not (start_date <= start_dt.date() <= end_date):
+            continue
+        i = index.get(_series_period_start(start_dt.date(), resolution).isoformat())
+        if i is None:
+            continue
+        s = sport_idx[_stats_bucket(a.activity_type)]
+        km[s][i] += float(a.distance or 0.0) / 1000.0
+        seconds[s][i] += int(a.duration or 0)
+        counts[s] += 1
+
+    km_total = [sum(col) for col in zip(*km)] if labels else []
+    seconds_total = [sum(col) for col in zip(*seconds)] if labels else []
+    km_series = [[round(v, 2) for v in row] for row in km + [km_total]]
+    hours_series = [[round(v / 3600.0, 2) for v in row] for row in seconds + [seconds_total]]
+    return {
+        "start": start_date.isoformat(),
+        "end": end_date.isoformat(),
+        "resolution": resolution,
+        "sports": list(STATS_SPORTS) + ["total"],
+        "labels": labels,
+        "km": km_series,
+        "hours": hours_series,
+        "totals": {
+            "count": counts + [sum(counts)],
+            "km": [round(sum(row), 1) for row in km + [km_total]],
+            "hours": [round(sum(row) / 3600.0, 1) for row in seconds + [seconds_total]],
+        },
+    }
+
+
+def build_weekly_target_context(user_id: int, profile_obj: UserProfile | None, today_dt: date) -> dict:
+    """Weekly session targets vs. sessions done so far (input for both planners)."""
+    week_start = today_dt - timedelta(days=today_dt.weekday())
+    weekly_targets = _get_weekly_session_targets(profile_obj)
+    weekly_done = _count_week_sessions_by_target(
+        user_id=user_id,
+        week_start=week_start,
+        week_end=today_dt,
+    )
+    focus_sports = _get_focus_sports(profile_obj, weekly_targets)
+    weekly_remaining = {
+        k: max(0, int(weekly_targets.get(k, 0) or 0) - int(weekly_done.get(k, 0) or 0))
+        for k in focus_sports
+    }
+    return {
+        "week_start": week_start.isoformat(),
+        "today": today_dt.isoformat(),
+        "selected_sports": focus_sports,
+        "targets": {k: int(weekly_targets.get(k, 0) or 0) for k in focus_sports},
+        "done_until_today": {k: int(weekly_done.get(k, 0) or 0) for k in focus_sports},
+        "remaining_to_fill": weekly_remaining,
+    }
+
+
+def _looks_like_duplicate_activity(
+    *,
+    user_id: int,
+    activity_type: str,
+    start_time: datetime,
+    duration_sec: int,
+    distance_m: float,
+    notes: str | None,
+    window_seconds: int = 120,
+) -> bool:
+    """Best-effort dedupe guard for double form submit on slow mobile/web."""
+    start_min = start_time - timedelta(seconds=window_seconds)
+    start_max = start_time + timedelta(seconds=window_seconds)
+    needle_notes = (notes or "").strip()
+
+    q = (
+        Activity.query
+        .filter(
+            Activity.user_id == user_id,
+            Activity.activity_type == activity_type,
+            Activity.start_time >= start_min,
+            Activity.start_time <= start_max,
+            Activity.duration == int(duration_sec or 0),
+            Activity.distance == float(distance_m or 0.0),
+        )
+        .order_by(Activity.id.desc())
+    )
+    if needle_notes:
+        q = q.filter(Activity.notes == needle_notes)
+
+    return q.first() is not None
@@ -0,0 +1,470 @@
+"""Odczyt zrzutów ekranu treningów (Strava / Garmin) modelem wizyjnym.
+
+Importowany dopiero przez widoki, które przyjmują zdjęcia — Pillow ładuje się razem z nim.
+"""
+
+import io
+import json
+import os
+import re
+from datetime import date, datetime, timedelta
+
+try:
+    from PIL import Image, ImageOps
+except Exception:  # optional dependency for screenshot downscaling before vision calls
+    Image = None
+    ImageOps = None
+
+from i18n import tr
+from parsing import (
+    _normalize_activity_type_value,
+    _normalize_date_input,
+    _normalize_time_input,
+    _parse_decimal_input,
+    _parse_distance_km_input,
+    _parse_minutes_input,
+)
+import llm
+from llm import llm_generate
+
+
+def _extract_activity_from_free_text(raw: str) -> dict:
+    """Fallback when model returns non-JSON text."""
+    txt = (raw or "").strip()
+    low = txt.lower()
+    out: dict = {
+        "activity_type": _normalize_activity_type_value(txt),
+        "distance_km": None,
+        "duration_min": None,
+        "avg_hr": None,
+        "start_date": _normalize_date_input(txt),
+        "start_time": _normalize_time_input(txt),
+    }
+
+    # distance with units (skip pace fragments like "/100m")
+    for m in re.finditer(r"(\d[\d., ]*)\s*(km|m)\b", low):
+        start = m.start()
+        if start > 0 and low[start - 1] == "/":
+            continue
+        num_txt, unit = m.group(1), m.group(2)
+        parsed = _parse_distance_km_input(f"{num_txt} {unit}", out["activity_type"])
+        if parsed is not None and parsed > 0:
+            out["distance_km"] = parsed
+            break
+
+    # duration: prefer clock-like values near explicit duration labels.
+    duration_label_hits = []
+    clock_matches = list(re.finditer(r"\b(\d{1,2}:\d{2}(?::\d{2})?)\b", txt))
+    for m in clock_matches:
+        start = m.start()
+        end = m.end()
+        ctx = txt[max(0, start - 30): min(len(txt), end + 30)].lower()
+        tail = txt[start:start + 12].lower()
+
+        if "/km" in tail or "/100m" in tail:
+            continue
+        # Skip clock-times like "Today at 11:53 AM" / "@ 20:31"
+        if re.search(r"(today at|dzisiaj o|dziś o| at |\bam\b|\bpm\b|@\s*$)", txt[max(0, start - 12):start].lower()):
+            continue
+
+        mins = _parse_minutes_input(m.group(1))
+        if not mins or mins <= 0:
+            continue
+
+        if any(k in ctx for k in ("moving time", "elapsed time", "czas", "całkowity", "calkowity", "duration")):
+            duration_label_hits.append(mins)
+
+    if duration_label_hits:
+        out["duration_min"] = max(duration_label_hits)
+    else:
+        # Fallback: pick a sensible non-pace clock value.
+        candidates = []
+        for m in clock_matches:
+            start = m.start()
+            tail = txt[start:start + 12].lower()
+            if "/km" in tail or "/100m" in tail:
+                continue
+            if re.search(r"(today at|dzisiaj o|dziś o| at |\bam\b|\bpm\b|@\s*$)", txt[max(0, start - 12):start].lower()):
+                continue
+            mins = _parse_minutes_input(m.group(1))
+            if mins and mins > 0:
+                candidates.append(mins)
+        if candidates:
+            out["duration_min"] = max(candidates)
+
+    if out["duration_min"] is None:
+        mins = _parse_minutes_input(txt)
+        if mins and mins > 0:
+            out["duration_min"] = mins
+
+    # avg hr (average only)
+    hr_patterns = [
+        r"(?:avg(?:\.|\s)?heart(?:\s)?rate|average(?:\s)?heart(?:\s)?rate|avg hr|średnie(?:\s)?tętno|sr\.?\s*t[ęe]tno)\D{0,10}(\d{2,3})",
+        r"(\d{2,3})\s*bpm",
+    ]
+    for pat in hr_patterns:
+        m = re.search(pat, low, re.IGNORECASE)
+        if m:
+            hr = _parse_decimal_input(m.group(1))
+            if hr and 40 <= hr <= 230:
+                out["avg_hr"] = int(round(hr))
+                break
+
+    return out
+
+
+VISION_IMAGE_MAX_EDGE = int(os.environ.get("VISION_IMAGE_MAX_EDGE", "1600"))
+VISION_IMAGE_QUALITY = int(os.environ.get("VISION_IMAGE_QUALITY", "82"))
+
+
+def _guess_mime(path: str) -> str:
+    ext = (os.path.splitext(path)[1] or "").lower()
+    if ext in [".jpg", ".jpeg"]:
+        return "image/jpeg"
+    if ext in [".png"]:
+        return "image/png"
+    if ext in [".webp"]:
+        return "image/webp"
+    return "application/octet-stream"
+
+
+_IMAGE_EXT_BY_MIME = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp", "image/heic": ".heic"}
+
+
+def _sniff_image_mime(blob: bytes) -> str | None:
+    if blob.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if blob.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if blob[:4] == b"RIFF" and blob[8:12] == b"WEBP":
+        return "image/webp"
+    if blob[4:12] in (b"ftypheic", b"ftypheix", b"ftypmif1"):
+        return "image/heic"
+    return None
+
+
+def normalize_image_for_vision(blob: bytes, filename: str | None = None) -> tuple[bytes, str]:
+    """Downscale + re-encode an uploaded screenshot in memory before sending it to the model.
+
+    Phone screenshots are often 3-8 MB PNGs; the model only needs the text on them, so we cap
+    the longest edge at VISION_IMAGE_MAX_EDGE and store as JPEG. Without Pillow (or for formats
+    Pillow cannot open) the original bytes are returned with a sniffed mime type.
+    """
+    fallback_mime = _sniff_image_mime(blob) or _guess_mime(filename or "")
+    if Image is None or not blob:
+        return blob, fallback_mime
+
+    try:
+        with Image.open(io.BytesIO(blob)) as img:
+            img = ImageOps.exif_transpose(img)
+            if img.mode not in ("RGB", "L"):
+                # Flatten transparency onto white so text stays readable after JPEG encoding.
+                rgba = img.convert("RGBA")
+                img = Image.new("RGB", rgba.size, (255, 255, 255))
+                img.paste(rgba, mask=rgba.split()[-1])
+            resized = max(img.size) > VISION_IMAGE_MAX_EDGE
+            if resized:
+                img.thumbnail((VISION_IMAGE_MAX_EDGE, VISION_IMAGE_MAX_EDGE), Image.LANCZOS)
+            out = io.BytesIO()
+            img.save(out, format="JPEG", quality=VISION_IMAGE_QUALITY, optimize=True)
+    except Exception:
+        return blob, fallback_mime
+
+    encoded = out.getvalue()
+    if not resized and len(encoded) >= len(blob) and fallback_mime != "application/octet-stream":
+        return blob, fallback_mime
+    return encoded, "image/jpeg"
+
+
+def _read_upload_for_vision(file_storage) -> tuple[bytes, str] | None:
+    """Read an uploaded image from the request stream (no temp file) and normalize it."""
+    if not file_storage or not getattr(file_storage, "filename", ""):
+        return None
+    try:
+        blob = file_storage.read()
+    except Exception:
+        return None
+    if not blob:
+        return None
+    return normalize_image_for_vision(blob, file_storage.filename)
+
+
+def parse_strava_screenshot_to_activity_detailed(image: bytes | str, mime_type: str | None = None) -> tuple[dict, str | None]:
+    """Próbuje wyciągnąć zrzutu Stravy: typ, dystans, czas, tętno, data/godzina.
+
+    `image` to bajty obrazu (preferowane, np. z normalize_image_for_vision) albo ścieżka do pliku.
+
+    Returns:
+      (data, None) on success
+      ({}, error_message) on failure
+    """
+    try:
+        if isinstance(image, (bytes, bytearray)):
+            img_bytes = bytes(image)
+            mime_type = mime_type or _sniff_image_mime(img_bytes) or "application/octet-stream"
+        else:
+            with open(image, "rb") as f:
+                img_bytes = f.read()
+            mime_type = mime_type or _sniff_image_mime(img_bytes) or _guess_mime(image)
+
+        prompt = """
+Masz screenshot aktywności z Garmin/Strava (PL lub EN). Wyciągnij dane i zwróć WYŁĄCZNIE JSON (bez markdown).
+
+FORMAT:
+{
+  "activity_type": "run|ride|swim|workout|weighttraining|yoga|hike|walk|other",
+  "distance_km": number|null,
+  "duration_min": number|null,
+  "avg_hr": number|null,
+  "start_date": "YYYY-MM-DD"|null,
+  "start_time": "HH:MM"|null,
+  "distance_raw": "string|null",
+  "duration_raw": "string|null",
+  "avg_hr_raw": "string|null"
+}
+
+ZASADY:
+- Obsługuj etykiety PL i EN (np. Dystans/Distance, Czas/Moving Time/Elapsed Time, Średnie tętno/Avg Heart Rate).
+- distance_km zawsze w kilometrach. Jeśli widać metry (m), przelicz na km.
+- duration_min zawsze w minutach (może pochodzić z MM:SS lub HH:MM:SS).
+- avg_hr = ŚREDNIE tętno (nie max).
+- Nie myl kalorii, przewyższenia, tempa ani max HR z dystansem/czasem/avg_hr.
+- start_date/start_time wyciągaj z linii typu: "Today at 11:53 AM", "4 lut @ 20:31", "January 29, 2026 at 6:51 PM".
+- Jeśli brak wartości, daj null.
+        """.strip()
+
+        resp = llm_generate(llm.vision_model, [
+            prompt,
+            {"mime_type": mime_type, "data": img_bytes}
+        ], feature="screenshot_parse")
+
+        raw = (getattr(resp, "text", None) or "").strip()
+
+        def _load_json_relaxed(txt: str):
+            try:
+                return json.loads(txt)
+            except Exception:
+                pass
+            m = re.search(r"\{.*\}", txt, re.DOTALL)
+            if not m:
+                return None
+            try:
+                return json.loads(m.group(0))
+            except Exception:
+                return None
+
+        data = _load_json_relaxed(raw)
+        if not isinstance(data, dict):
+            # Fallback: best-effort regex extraction from free text.
+            fallback = _extract_activity_from_free_text(raw)
+            has_any_fallback = any([
+                fallback.get("distance_km"),
+                fallback.get("duration_min"),
+                fallback.get("avg_hr"),
+                fallback.get("start_date"),
+                fallback.get("start_time"),
+                fallback.get("activity_type") not in (None, "", "other"),
+            ])
+            if has_any_fallback:
+                return fallback, None
+            return {}, tr(
+                "Model zwrócił nieczytelny format odpowiedzi (nie-JSON). Spróbuj wyraźniejszy screenshot.",
+                "Model returned an unreadable response format (non-JSON). Try a clearer screenshot.",
+            )
+
+        # Normalization with key fallbacks (model can use slightly different keys).
+        out = {
+            "activity_type": _normalize_activity_type_value(
+                data.get("activity_type")
+                or data.get("activity")
+                or data.get("type")
+                or data.get("sport")
+            ),
+            "distance_km": None,
+            "duration_min": None,
+            "avg_hr": None,
+            "start_date": None,
+            "start_time": None,
+        }
+
+        # Distance
+        distance_sources = [
+            ("distance_km", "km"),
+            ("distance", None),
+            ("distance_raw", None),
+            ("distance_text", None),
+            ("dystans", None),
+            ("distance_m", "m"),
+            ("meters", "m"),
+            ("metres", "m"),
+        ]
+        for key, unit_hint in distance_sources:
+            if key not in data or data.get(key) in (None, ""):
+                continue
+            if unit_hint == "m":
+                meters = _parse_decimal_input(data.get(key))
+                dist_km = (meters / 1000.0) if meters is not None else None
+            elif unit_hint == "km":
+                dist_km = _parse_decimal_input(data.get(key))
+            else:
+                dist_km = _parse_distance_km_input(data.get(key), out["activity_type"])
+            if dist_km is not None and dist_km >= 0:
+                out["distance_km"] = dist_km
+                break
+
+        # Duration
+        duration_sources = [
+            "duration_min",
+            "moving_time",
+            "elapsed_time",
+            "duration",
+            "duration_raw",
+            "duration_text",
+            "czas",
+        ]
+        for key in duration_sources:
+            if key not in data or data.get(key) in (None, ""):
+                continue
+            dur = _parse_minutes_input(data.get(key))
+            if dur is not None and dur >= 0:
+                out["duration_min"] = dur
+                break
+
+        # HR (average only)
+        hr_sources = [
+            "avg_hr",
+            "avg_heart_rate",
+            "average_heart_rate",
+            "avg_hr_raw",
+            "srednie_tetno",
+            "średnie_tętno",
+        ]
+        for key in hr_sources:
+            if key not in data or data.get(key) in (None, ""):
+                continue
+            hr = _parse_decimal_input(data.get(key))
+            if hr is not None and 40 <= hr <= 230:
+                out["avg_hr"] = int(round(hr))
+                break
+
+        date_sources = ["start_date", "activity_date", "date", "workout_date", "start_datetime", "when"]
+        for key in date_sources:
+            if key not in data or data.get(key) in (None, ""):
+                continue
+            parsed_date = _normalize_date_input(str(data.get(key)))
+            if parsed_date:
+                out["start_date"] = parsed_date
+                break
+
+        time_sources = ["start_time", "activity_time", "clock_time", "start_datetime", "when"]
+        for key in time_sources:
+            if key not in data or data.get(key) in (None, ""):
+                continue
+            parsed_time = _normalize_time_input(str(data.get(key)))
+            if parsed_time:
+                out["start_time"] = parsed_time
+                break
+
+        # Fill missing fields from free-text fallback extracted from raw model response.
+        fb = _extract_activity_from_free_text(raw)
+        if out.get("activity_type") in ("", "other") and fb.get("activity_type") not in ("", "other", None):
+            out["activity_type"] = fb.get("activity_type")
+        for field in ("distance_km", "duration_min", "avg_hr", "start_date", "start_time"):
+            if out.get(field) in (None, "") and fb.get(field) not in (None, ""):
+                out[field] = fb.get(field)
+
+        # Sanity bounds.
+        if out["distance_km"] is not None and out["distance_km"] > 2000:
+            out["distance_km"] = out["distance_km"] / 1000.0
+        if out["duration_min"] is not None and out["duration_min"] > 24 * 60:
+            # Likely seconds accidentally parsed as minutes.
+            out["duration_min"] = out["duration_min"] / 60.0
+        if out["avg_hr"] is not None and not (40 <= out["avg_hr"] <= 230):
+            out["avg_hr"] = None
+
+        # Prefer "today" if screenshot text implies it, or if date is likely unreliable.
+        base_any = (
+            (out.get("distance_km") is not None and out.get("distance_km", 0) > 0)
+            or (out.get("duration_min") is not None and out.get("duration_min", 0) > 0)
+            or (out.get("avg_hr") is not None and out.get("avg_hr", 0) > 0)
+            or (out.get("activity_type") and out.get("activity_type") != "other")
+        )
+        if base_any:
+            raw_lower = raw.lower()
+            today = datetime.now().date()
+            if any(k in raw_lower for k in ("today", "dzis", "dziś")):
+                out["start_date"] = today.isoformat()
+            elif "yesterday" in raw_lower or "wczoraj" in raw_lower:
+                out["start_date"] = (today - timedelta(days=1)).isoformat()
+            else:
+                if not out.get("start_date"):
+                    out["start_date"] = today.isoformat()
+                else:
+                    try:
+                        parsed = date.fromisoformat(out["start_date"])
+                        has_year = re.search(r"\b20\d{2}\b", raw_lower) is not None
+                        month_tokens = (
+                            "jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec",
+                            "sty", "lut", "mar", "kwi", "maj", "cze", "lip", "sie", "wrz", "paz", "paź", "lis", "gru",
+                        )
+                        has_month_hint = any(tok in raw_lower for tok in month_tokens)
+                        if (not has_year and not has_month_hint) and abs((today - parsed).days) > 60:
+                            out["start_date"] = today.isoformat()
+                        elif abs(parsed.year - today.year) >= 2:
+                            # Treat far-off years as unreliable OCR and default to today.
+                            out["start_date"] = today.isoformat()
+                    except Exception:
+                        out["start_date"] = today.isoformat()
+
+        has_any = (
+            (out.get("distance_km") is not None and out.get("distance_km", 0) > 0)
+            or (out.get("duration_min") is not None and out.get("duration_min", 0) > 0)
+            or (out.get("avg_hr") is not None and out.get("avg_hr", 0) > 0)
+            or (out.get("activity_type") and out.get("activity_type") != "other")
+            or bool(out.get("start_date"))
+            or bool(out.get("start_time"))
+        )
+        if not has_any:
+            return {}, tr(
+                "Nie udało się odczytać danych treningowych z tego screenshotu.",
+                "Could not read training data from this screenshot.",
+            )
+        return out, None
+    except Exception as e:
+        msg = str(e).lower()
+        if "429" in msg or "quota" in msg or "rate limit" in msg or "resource_exhausted" in msg:
+            return {}, tr(
+                "Limit modelu AI został chwilowo wyczerpany. Spróbuj ponownie za chwilę.",
+                "AI model quota is temporarily exhausted. Please try again shortly.",
+            )
+        return {}, tr(
+            "Błąd odczytu screenshotu (AI/API). Spróbuj ponownie za chwilę.",
+            "Screenshot parsing failed (AI/API). Please try again shortly.",
+        )
+
+
+def parse_strava_screenshot_to_activity(image: bytes | str, mime_type: str | None = None) -> dict:
+    data, _err = parse_strava_screenshot_to_activity_detailed(image, mime_type)
+    return data
+
+
+def _screenshot_form_data(parsed: dict) -> dict:
+    """Map parser output onto the quick-add form fields (shared by single and batch parse)."""
+    dist = parsed.get("distance_km")
+    dur = parsed.get("duration_min")
+    pace = None
+    try:
+        if dist and dist > 0 and dur and dur > 0:
+            pace = round(float(dur) / float(dist), 2)
+    except Exception:
+        pace = None
+
+    return {
+        "activity_type": parsed.get("activity_type") or "other",
+        "date": parsed.get("start_date") or "",
+        "time": parsed.get("start_time") or "",
+        "duration_min": parsed.get("duration_min"),
+        "distance_km": parsed.get("distance_km"),
+        "avg_hr": parsed.get("avg_hr"),
+        "avg_pace_min_km": pace,
+    }
@@ -0,0 +1,212 @@
+"""Prognoza pogody do kalendarza tygodnia przez serwer (Open-Meteo), ze wspólnym cache'em.
+
+Przeglądarka nie pyta już Open-Meteo sama — pyta /api/weather. Współrzędne zaokrąglamy
+do siatki WEATHER_GRID_DECIMALS (0.1° ≈ 11 km), a wpis jest świeży w obrębie jednej
+godziny prognozy, więc użytkownicy z tego samego miasta dzielą jedno zapytanie na godzinę.
+
+- świeży wpis (ta sama godzina) -> z pamięci, bez sieci
+- wpis z poprzednich godzin, nie starszy niż WEATHER_MAX_STALE -> od razu stary wpis,
+  a odświeżenie idzie w wątku w tle (stale-while-revalidate)
+- brak wpisu -> zapytanie synchroniczne; równoległe żądania dla tej samej komórki
+  czekają na jedno zapytanie zamiast wysyłać własne
+
+Cache jest w pamięci procesu (każdy worker ma swój). Klienta HTTP można podmienić przez
+app.config["WEATHER_FETCHER"] — funkcję (url, params, timeout) -> dict — np. na lokalny stub.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+GEOCODING_URL = "https://geocoding-api.open-meteo.com/v1/search"
+FORECAST_DAILY_FIELDS = ("weather_code", "temperature_2m_max", "temperature_2m_min")
+
+WEATHER_GRID_DECIMALS = 1
+WEATHER_HOUR_SECONDS = 3600
+# Tyle najwyżej może mieć prognoza podana zamiast świeżej (gdy Open-Meteo nie odpowiada).
+WEATHER_MAX_STALE_SECONDS = 6 * 3600
+WEATHER_CACHE_MAX_CELLS = 2048
+WEATHER_FETCH_TIMEOUT_S = 4.0
+# Równoległe żądanie czeka na cudze zapytanie trochę dłużej niż timeout samego zapytania.
+WEATHER_INFLIGHT_WAIT_S = WEATHER_FETCH_TIMEOUT_S + 1.0
+
+GEOCODE_TTL_SECONDS = 7 * 24 * 3600
+GEOCODE_CACHE_MAX = 1024
+GEOCODE_NAME_MAX_LEN = 100
+
+
+class WeatherUnavailable(Exception):
+    """Open-Meteo nie odpowiedział (albo odpowiedział bzdurą), a w cache'u nie ma nic użytecznego."""
+
+
+def requests_fetch_json(url: str, params: dict, timeout: float) -> dict:
+    """Domyślny klient HTTP; requests importowany dopiero przy pierwszym zapytaniu."""
+    import requests
+
+    resp = requests.get(url, params=params, timeout=timeout)
+    resp.raise_for_status()
+    return resp.json()
+
+
+class _Cell:
+    __slots__ = ("hour", "fetched_at", "payload")
+
+    def __init__(self, hour: int, fetched_at: float, payload: dict):
+        self.hour = hour
+        self.fetched_at = fetched_at
+        self.payload = payload
+
+
+_forecast_cache: OrderedDict = OrderedDict()
+_geocode_cache: OrderedDict = OrderedDict()
+_inflight: dict = {}
+_lock = threading.Lock()
+
+
+def grid_cell(lat: float, lon: float) -> tuple[float, float]:
+    return round(lat, WEATHER_GRID_DECIMALS), round(lon, WEATHER_GRID_DECIMALS)
+
+
+def _current_hour(now: float) -> int:
+    return int(now // WEATHER_HOUR_SECONDS)
+
+
+def seconds_to_next_hour(now: float | None = None) -> int:
+    now = time.time() if now is None else now
+    return int(WEATHER_HOUR_SECONDS - (now % WEATHER_HOUR_SECONDS))
+
+
+def _trim_forecast(data: dict) -> dict:
+    """Z odpowiedzi Open-Meteo zostawiamy tylko to, czego potrzebuje kalendarz."""
+    daily = (data or {}).get("daily") or {}
+    days = daily.get("time")
+    if not isinstance(days, list):
+        raise WeatherUnavailable("forecast without daily.time")
+    trimmed = {"time": days}
+    for field in FORECAST_DAILY_FIELDS:
+        values = daily.get(field)
+        if isinstance(values, list) and len(values) == len(days):
+            trimmed[field] = values
+    return {"timezone": data.get("timezone"), "daily": trimmed}
+
+
+def _fetch_forecast(cell: tuple[float, float], fetcher) -> dict:
+    try:
+        data = fetcher(
+            FORECAST_URL,
+            {
+                "latitude": cell[0],
+                "longitude": cell[1],
+                "daily": ",".join(FORECAST_DAILY_FIELDS),
+                "timezone": "auto",
+            },
+            WEATHER_FETCH_TIMEOUT_S,
+        )
+    except WeatherUnavailable:
+        raise
+    except Exception as exc:
+        raise WeatherUnavailable(str(exc)) from exc
+    return _trim_forecast(data)
+
+
+def _store(cell: tuple[float, float], payload: dict) -> _Cell:
+    now = time.time()
+    entry = _Cell(_current_hour(now), now, payload)
+    with _lock:
+        _forecast_cache[cell] = entry
+        _forecast_cache.move_to_end(cell)
+        while len(_forecast_cache) > WEATHER_CACHE_MAX_CELLS:
+            _forecast_cache.popitem(last=False)
+    return entry
+
+
+def _refresh_in_background(cell: tuple[float, float], fetcher, logger) -> None:
+    with _lock:
+        if cell in _inflight:
+            return
+        done = _inflight[cell] = threading.Event()
+
+    def run():
+        try:
+            _store(cell, _fetch_forecast(cell, fetcher))
+        except WeatherUnavailable as exc:
+            logger.warning("Weather refresh failed for %s: %s", cell, exc)
+        finally:
+            with _lock:
+                _inflight.pop(cell, None)
+            done.set()
+
+    threading.Thread(target=run, name="weather-refresh", daemon=True).start()
+
+
+def get_forecast(lat: float, lon: float, fetcher, logger) -> tuple[dict, bool]:
+    """Prognoza dzienna dla komórki siatki: (payload, stale). Rzuca WeatherUnavailable."""
+    cell = grid_cell(lat, lon)
+    now = time.time()
+    with _lock:
+        entry = _forecast_cache.get(cell)
+        if entry is not None:
+            _forecast_cache.move_to_end(cell)
+
+    if entry is not None and entry.hour == _current_hour(now):
+        return entry.payload, False
+    if entry is not None and now - entry.fetched_at <= WEATHER_MAX_STALE_SECONDS:
+        _refresh_in_background(cell, fetcher, logger)
+        return entry.payload, True
+
+    # Brak użytecznego wpisu: jedno zapytanie na komórkę, reszta czeka na jego wynik.
+    with _lock:
+        waiting = _inflight.get(cell)
+        if waiting is None:
+            done = _inflight[cell] = threading.Event()
+    if waiting is not None:
+        waiting.wait(WEATHER_INFLIGHT_WAIT_S)
+        with _lock:
+            entry = _forecast_cache.get(cell)
+        if entry is not None and now - entry.fetched_at <= WEATHER_MAX_STALE_SECONDS:
+            return entry.payload, entry.hour != _current_hour(time.time())
+        raise WeatherUnavailable("concurrent fetch failed")
+
+    try:
+        return _store(cell, _fetch_forecast(cell, fetcher)).payload, False
+    finally:
+        with _lock:
+            _inflight.pop(cell, None)
+        done.set()
+
+
+def geocode_city(name: str, lang: str, fetcher) -> dict | None:
+    """Pierwsze trafienie geokodera Open-Meteo ({name, country, lat, lon}) albo None; cache na tydzień."""
+    key = (name.strip().lower(), lang)
+    now = time.time()
+    with _lock:
+        hit = _geocode_cache.get(key)
+    if hit is not None and now - hit[0] <= GEOCODE_TTL_SECONDS:
+        return hit[1]
+
+    try:
+        data = fetcher(
+            GEOCODING_URL,
+            {"name": name.strip(), "count": 1, "language": lang, "format": "json"},
+            WEATHER_FETCH_TIMEOUT_S,
+        )
+        results = (data or {}).get("results") or []
+        place = None
+        if results:
+            first = results[0]
+            place = {
+                "name": first.get("name"),
+                "country": first.get("country"),
+                "lat": float(first["latitude"]),
+                "lon": float(first["longitude"]),
+            }
+    except Exception as exc:
+        raise WeatherUnavailable(str(exc)) from exc
+
+    with _lock:
+        _geocode_cache[key] = (now, place)
+        _geocode_cache.move_to_end(key)
+        while len(_geocode_cache) > GEOCODE_CACHE_MAX:
+            _geocode_cache.popitem(last=False)
+    return place